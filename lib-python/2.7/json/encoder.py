@@ -206,6 +206,15 @@ class JSONEncoder(object):
         '{"foo": ["bar", "baz"]}'
 
         """
+        if (_native_encode is not None and self.ensure_ascii and
+                self.encoding == 'utf-8' and
+                (self.indent is None or isinstance(self.indent, (int, long)))
+                and type(self.item_separator) is str
+                and type(self.key_separator) is str):
+            return _native_encode(o, self.skipkeys, self.check_circular,
+                                  self.allow_nan, self.sort_keys, self.indent,
+                                  self.item_separator, self.key_separator,
+                                  self.default)
         if self.check_circular:
             markers = {}
         else:
@@ -536,3 +545,10 @@ try:
     from _pypyjson import raw_encode_basestring_ascii
 except ImportError:
     pass
+
+# the interp-level version of JSONEncoder.encode(), used when the output
+# is ascii-only
+try:
+    from _pypyjson import encode as _native_encode
+except ImportError:
+    _native_encode = None
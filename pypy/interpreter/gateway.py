@@ -944,7 +944,7 @@ class BuiltinCode4(BuiltinCode):
             w_result = space.w_None
         return w_result
 
-def interpindirect2app(unbound_meth, unwrap_spec=None):
+def interpindirect2app(unbound_meth, unwrap_spec=None, doc=None):
     base_cls = unbound_meth.im_class
     func = unbound_meth.im_func
     args = inspect.getargs(func.func_code)
@@ -969,7 +969,7 @@ def interpindirect2app(unbound_meth, unwrap_spec=None):
         assert isinstance(unwrap_spec, dict)
         unwrap_spec = unwrap_spec.copy()
     unwrap_spec['self'] = base_cls
-    return interp2app(globals()['unwrap_spec'](**unwrap_spec)(f))
+    return interp2app(globals()['unwrap_spec'](**unwrap_spec)(f), doc=doc)
 
 class interp2app(W_Root):
     """Build a gateway that calls 'f' at interp-level."""
@@ -198,6 +198,12 @@ class TestGateway:
         doc = space.str_w(space.getattr(w_c, space.wrap('__doc__')))
         assert doc == "This is a method"
 
+        w_c2 = space.wrap(gateway.interpindirect2app(BaseA.method, {'x': int},
+                                                     doc="Another doc"))
+        doc = space.str_w(space.getattr(w_c2, space.wrap('__doc__')))
+        assert doc == "Another doc"
+        assert space.int_w(space.call_function(w_c2, w_b, space.wrap(1))) == 2
+
         meth_with_default = gateway.interpindirect2app(
             BaseA.method_with_default, {'x': int})
         w_d = space.wrap(meth_with_default)
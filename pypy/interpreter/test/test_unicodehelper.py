@@ -91,3 +91,72 @@ def test_encode_decimal(space):
     result = uh.unicode_encode_decimal(
         u'12\u1234'.encode('utf8'), 'xmlcharrefreplace', handler)
     assert result == '12&#4660;'
+
+
+class TestFastutf8Codecs(object):
+    def setup_method(self, meth):
+        rutf8._fastutf8_untranslated = True
+
+    def teardown_method(self, meth):
+        rutf8._fastutf8_untranslated = False
+
+    def eh(self, errors, encoding, reason, p, start, end):
+        self.errors.append((reason, start, end))
+        return "?", end
+
+    def setup_class(cls):
+        cls.texts = [u"some text " * 5,
+                     u"t\xe9xt with \u20ac and \U0001f600, " * 5,
+                     u"\xe9" * 3 + u"x" * 40 + u"\U0001f600"]
+
+    def test_utf16(self):
+        for u in self.texts:
+            utf8 = u.encode("utf8")
+            for name, bo in [("utf-16", "native"), ("utf-16-le", "little"),
+                             ("utf-16-be", "big")]:
+                data = u.encode(name)
+                assert uh.unicode_encode_utf_16_helper(
+                    utf8, "strict", byteorder=bo) == data
+                res = uh.str_decode_utf_16_helper(data, "strict",
+                                                  byteorder=bo)
+                assert res[:3] == (utf8, len(data), len(u))
+
+    def test_utf16_partial(self):
+        u = u"\u20ac" * 20 + u"\U0001f600"
+        data = u.encode("utf-16-le")
+        for cut in [len(data) - 1, len(data) - 2, len(data) - 3]:
+            res = uh.str_decode_utf_16_helper(data[:cut], "strict", False,
+                                              byteorder="little")
+            assert res[:3] == (u"\u20ac".encode("utf8") * 20, 40, 20)
+
+    def test_utf16_errors(self):
+        self.errors = []
+        data = u"abc".encode("utf-16-le") * 10 + "\x00\xdc" + "a\x00"
+        res = uh.str_decode_utf_16_helper(data, "replace", True, self.eh,
+                                          "little")
+        assert res[:3] == ("abc" * 10 + "?a", len(data), 32)
+        assert self.errors == [("illegal encoding", 60, 62)]
+
+    def test_utf32(self):
+        for u in self.texts:
+            utf8 = u.encode("utf8")
+            for name, bo in [("utf-32", "native"), ("utf-32-le", "little"),
+                             ("utf-32-be", "big")]:
+                data = u.encode(name)
+                assert uh.unicode_encode_utf_32_helper(
+                    utf8, "strict", byteorder=bo) == data
+                res = uh.str_decode_utf_32_helper(data, "strict", True,
+                                                  self.eh, byteorder=bo)
+                assert res[:3] == (utf8, len(data), len(u))
+
+    def test_latin_1(self):
+        s = "".join(map(chr, range(256)))
+        utf8 = s.decode("latin-1").encode("utf8")
+        assert uh.str_decode_latin_1(s, "strict", True, None) == (
+            utf8, 256, 256)
+        assert uh.utf8_encode_latin_1(utf8, "strict", None) == s
+        self.errors = []
+        utf8 = (u"x" * 20 + u"\u20ac").encode("utf8")
+        assert uh.utf8_encode_latin_1(utf8, "replace", self.eh) == (
+            "x" * 20 + "?")
+        assert self.errors == [("ordinal not in range(256)", 20, 21)]
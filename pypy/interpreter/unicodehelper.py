@@ -139,28 +139,17 @@ def str_decode_latin_1(s, errors, final, errorhandler):
         return _str_decode_latin_1_slowpath(s, errors, final, errorhandler)
 
 def _str_decode_latin_1_slowpath(s, errors, final, errorhandler):
-    res = StringBuilder(len(s))
-    i = 0
-    while i < len(s):
-        if ord(s[i]) > 0x7F:
-            while i < len(s) and ord(s[i]) > 0x7F:
-                rutf8.unichr_as_utf8_append(res, ord(s[i]))
-                i += 1
-        else:
-            start = i
-            end = i + 1
-            while end < len(s) and ord(s[end]) <= 0x7F:
-                end += 1
-            res.append_slice(s, start, end)
-            i = end
     # cannot be ASCII, cannot have surrogates, I believe
-    return res.build(), len(s), len(s)
+    return rutf8._decode_latin_1_slowpath(s), len(s), len(s)
 
 def utf8_encode_latin_1(s, errors, errorhandler):
     try:
         rutf8.check_ascii(s)
         return s
     except rutf8.CheckError:
+        res = rutf8.encode_latin_1_fast(s)
+        if res is not None:
+            return res
         return _utf8_encode_latin_1_slowpath(s, errors, errorhandler)
 
 def _utf8_encode_latin_1_slowpath(s, errors, errorhandler):
@@ -1004,6 +993,16 @@ def str_decode_utf_16_helper(s, errors, final=True,
 
     result = StringBuilder(size // 2)
 
+    # convert everything but an odd byte or a high surrogate at the end
+    # with the fastutf8 kernel, if there is no error in the way
+    end = size - ((size - pos) & 1)
+    if end - pos >= 2 and 0xD8 <= ord(s[end - 2 + ihi]) <= 0xDB:
+        end -= 2
+    fast = rutf8.decode_utf16_fast(s, pos, end, ihi == 0)
+    if fast is not None:
+        result.append(fast)
+        pos = end
+
     #XXX I think the errors are not correctly handled here
     while pos < size:
         # remaining bytes at the end? (size should be even)
@@ -1081,6 +1080,11 @@ def unicode_encode_utf_16_helper(s, errors,
         _STORECHAR(result, 0xFEFF, BYTEORDER)
         byteorder = BYTEORDER
 
+    fast = rutf8.encode_utf16_fast(s, byteorder == 'big')
+    if fast is not None:
+        result.append(fast)
+        return result.build()
+
     pos = 0
     index = 0
     while pos < size:
@@ -1209,6 +1213,12 @@ def str_decode_utf_32_helper(s, errors, final,
 
     result = StringBuilder(size // 4)
 
+    end = size - ((size - pos) & 3)
+    fast = rutf8.decode_utf32_fast(s, pos, end, iorder[0] == 3)
+    if fast is not None:
+        result.append(fast)
+        pos = end
+
     while pos < size:
         # remaining bytes at the end? (size should be divisible by 4)
         if len(s) - pos < 4:
@@ -1277,6 +1287,11 @@ def unicode_encode_utf_32_helper(s, errors,
         _STORECHAR32(result, 0xFEFF, BYTEORDER)
         byteorder = BYTEORDER
 
+    fast = rutf8.encode_utf32_fast(s, byteorder == 'big')
+    if fast is not None:
+        result.append(fast)
+        return result.build()
+
     pos = 0
     index = 0
     while pos < size:
@@ -66,7 +66,7 @@ class W_UnicodeBuilder(W_Root):
 
     def descr_append(self, space, w_s):
         if isinstance(w_s, W_UnicodeObject):
-            self.builder.append_utf8(w_s._utf8, w_s._len())
+            self.builder.append_utf8(space.utf8_w(w_s), w_s._len())
         else:
             w_unicode = W_UnicodeObject.convert_arg_to_w_unicode(space, w_s)
             s = space.utf8_w(w_unicode)
@@ -50,6 +50,14 @@ def mapdict_cache_counter(space, name):
     return space.newtuple([space.newint(cache.hits.get(name, 0)),
                            space.newint(cache.misses.get(name, 0))])
 
+def json_string_cache_counter(space):
+    """Return a tuple (hits, misses) for the lookups of short strings and
+    keys in the cache of _pypyjson.loads()."""
+    from pypy.module._pypyjson.interp_decoder import StringCache
+    cache = space.fromcache(StringCache)
+    return space.newtuple([space.newint(cache.hits),
+                           space.newint(cache.misses)])
+
 def builtinify(space, w_func):
     """To implement at app-level modules that are, in CPython,
     implemented in C: this decorator protects a function from being ever
@@ -1,10 +1,12 @@
 import sys
 from rpython.rlib.rstring import StringBuilder
 from rpython.rlib.objectmodel import specialize, always_inline, r_dict
-from rpython.rlib import rfloat, rutf8
+from rpython.rlib import rfloat, rgc, rutf8
 from rpython.rtyper.lltypesystem import lltype, rffi
-from rpython.rlib.rarithmetic import r_uint
-from pypy.interpreter.error import oefmt
+from rpython.rlib.rarithmetic import r_uint, intmask
+from pypy.interpreter.baseobjspace import W_Root
+from pypy.interpreter.error import OperationError, oefmt
+from pypy.interpreter.typedef import TypeDef, interp2app
 from pypy.interpreter import unicodehelper
 
 OVF_DIGITS = len(str(sys.maxint))
@@ -36,12 +38,182 @@ def slice_hash(a):
     (ll_chars, start, length, h) = a
     return h
 
+# The keys of the decoded objects are stored in JSONMaps, which are kept
+# between the calls to loads().  To bound their memory, new maps are only
+# made until there are MAX_JSON_MAPS of them, and only for objects with
+# at most MAX_JSON_MAP_LENGTH keys; other objects become ordinary dicts.
+MAX_JSON_MAPS = 10000
+MAX_JSON_MAP_LENGTH = 64
+
+class JSONMap(object):
+    """ A sequence of keys of the decoded JSON objects.  The maps form a
+    tree: the root is the empty sequence, and the children of a map are
+    the maps with one more key that were seen after its keys.  All the
+    objects with the same keys in the same order become dicts that share
+    a map, see pypy/objspace/std/jsondict.py.
+    """
+
+    def __init__(self, prev, w_key, key_repr):
+        self.prev = prev
+        self.w_key = w_key
+        # the key as it is written between the quotes in the JSON source
+        self.key_repr = key_repr
+        if prev is None:
+            self.length = 0
+        else:
+            self.length = prev.length + 1
+        # the child that was used last, checked first by fast_next()
+        self.last_next = None
+        # all the children, by key_repr, as soon as there are two
+        self.all_next = None
+        self.keys_w = None
+        self.indexes = None
+        self.strategy_instance = None
+
+    def fast_next(self, decoder, i):
+        """ If the key at position i of the JSON source (the opening quote)
+        is the key of the child that was used last, return that child and
+        move the decoder after the key.  Otherwise return None.
+        """
+        nextmap = self.last_next
+        if nextmap is None:
+            return None
+        ll_chars = decoder.ll_chars
+        if ll_chars[i] != '"':
+            return None
+        key_repr = nextmap.key_repr
+        i += 1
+        # the '\0' at the end of ll_chars stops this loop in time
+        for j in range(len(key_repr)):
+            if ll_chars[i + j] != key_repr[j]:
+                return None
+        i += len(key_repr)
+        if ll_chars[i] != '"':
+            return None
+        decoder.pos = i + 1
+        return nextmap
+
+    def get_next(self, maps, w_key, key_repr):
+        """ Return the child with the additional key w_key, making it if
+        needed.  Returns None if the objects with these keys cannot be
+        stored with a map.
+        """
+        if self.all_next is not None:
+            nextmap = self.all_next.get(key_repr, None)
+        elif (self.last_next is not None and
+                self.last_next.key_repr == key_repr):
+            nextmap = self.last_next
+        else:
+            nextmap = None
+        if nextmap is None:
+            if (maps.num_maps >= MAX_JSON_MAPS or
+                    self.length >= MAX_JSON_MAP_LENGTH or
+                    self.get_index(w_key) >= 0):   # a repeated key
+                return None
+            nextmap = JSONMap(self, w_key, key_repr)
+            maps.num_maps += 1
+            if self.all_next is None and self.last_next is not None:
+                self.all_next = {self.last_next.key_repr: self.last_next}
+            if self.all_next is not None:
+                self.all_next[key_repr] = nextmap
+        self.last_next = nextmap
+        return nextmap
+
+    def get_keys_w(self):
+        keys_w = self.keys_w
+        if keys_w is None:
+            keys_w = [None] * self.length
+            jsonmap = self
+            while jsonmap.prev is not None:
+                keys_w[jsonmap.length - 1] = jsonmap.w_key
+                jsonmap = jsonmap.prev
+            self.keys_w = keys_w
+        return keys_w
+
+    def get_index(self, w_key):
+        """ The position of w_key in the keys, or -1. """
+        from pypy.objspace.std.dictmultiobject import unicode_eq, unicode_hash
+        indexes = self.indexes
+        if indexes is None:
+            indexes = r_dict(unicode_eq, unicode_hash, simple_hash_eq=True)
+            keys_w = self.get_keys_w()
+            for i in range(len(keys_w)):
+                indexes[keys_w[i]] = i
+            self.indexes = indexes
+        return indexes.get(w_key, -1)
+
+
+class JSONMapCache(object):
+    def __init__(self, space):
+        self.root = JSONMap(None, None, None)
+        self.num_maps = 0
+
+
+# Strings and keys of at most STRING_CACHE_MAX_LENGTH bytes are looked up
+# in a StringCache of STRING_CACHE_SIZE entries (a power of two), shared by
+# all the calls to loads()
+STRING_CACHE_SIZE = 4096
+STRING_CACHE_MAX_LENGTH = 24
+
+class StringCache(object):
+    """ The short strings decoded recently, by their representation in the
+    JSON source.  It is a two-way set-associative cache: each string can
+    be in one of two entries, chosen by its hash, and a new string replaces
+    the least recently used of the two.  __pypy__.json_string_cache_counter()
+    returns the hits and misses.
+    """
+
+    def __init__(self, space):
+        self.reprs = [None] * STRING_CACHE_SIZE
+        self.strings_w = [None] * STRING_CACHE_SIZE
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, decoder, start, end, bits):
+        ll_chars = decoder.ll_chars
+        length = end - start
+        h = length
+        for i in range(start, end):
+            h = intmask((1000003 * h) ^ ord(ll_chars[i]))
+        # 'index' is the most recently used entry of the set, 'index + 1'
+        # the other one
+        index = h & (STRING_CACHE_SIZE - 2)
+        if self._match(ll_chars, start, length, index):
+            self.hits += 1
+            return self.strings_w[index]
+        if self._match(ll_chars, start, length, index + 1):
+            self.hits += 1
+            self._swap(index)
+            return self.strings_w[index]
+        self.misses += 1
+        w_res = decoder._create_string(start, end, bits)
+        self.reprs[index + 1] = decoder.getslice(start, end)
+        self.strings_w[index + 1] = w_res
+        self._swap(index)
+        return w_res
+
+    def _match(self, ll_chars, start, length, index):
+        string_repr = self.reprs[index]
+        if string_repr is None or len(string_repr) != length:
+            return False
+        for j in range(length):
+            if ll_chars[start + j] != string_repr[j]:
+                return False
+        return True
+
+    def _swap(self, index):
+        reprs = self.reprs
+        strings_w = self.strings_w
+        reprs[index], reprs[index + 1] = reprs[index + 1], reprs[index]
+        strings_w[index], strings_w[index + 1] = (strings_w[index + 1],
+                                                  strings_w[index])
+
+
 TYPE_UNKNOWN = 0
 TYPE_STRING = 1
 class JSONDecoder(object):
     def __init__(self, space, s):
         self.space = space
-        self.s = s
         # we put our string in a raw buffer so:
         # 1) we automatically get the '\0' sentinel at the end of the string,
         #    which means that we never have to check for the "end of string"
@@ -57,8 +229,9 @@ class JSONDecoder(object):
 
     def getslice(self, start, end):
         assert start >= 0
-        assert end >= 0
-        return self.s[start:end]
+        assert end >= start
+        return rffi.charpsize2str(rffi.ptradd(self.ll_chars, start),
+                                  end - start)
 
     def skip_whitespace(self, i):
         while True:
@@ -248,10 +421,28 @@ class JSONDecoder(object):
             self.pos = i+1
             return self.space.newdict()
 
-        d = self._create_empty_dict()
+        # follow the keys in the tree of maps, collecting the values.  If
+        # the keys leave the tree, continue with an ordinary dict 'd'
+        maps = self.space.fromcache(JSONMapCache)
+        jsonmap = maps.root
+        values_w = []
+        d = None
         while True:
             # parse a key: value
-            w_name = self.decode_key(i)
+            w_name = None
+            if d is None:
+                i = self.skip_whitespace(i)
+                nextmap = jsonmap.fast_next(self, i)
+                if nextmap is None:
+                    w_name = self.decode_key(i)
+                    key_repr = self.getslice(i + 1, self.pos - 1)
+                    nextmap = jsonmap.get_next(maps, w_name, key_repr)
+                if nextmap is None:
+                    d = self._dict_from_jsonmap(jsonmap, values_w)
+                else:
+                    jsonmap = nextmap
+            else:
+                w_name = self.decode_key(i)
             i = self.skip_whitespace(self.pos)
             ch = self.ll_chars[i]
             if ch != ':':
@@ -260,12 +451,17 @@ class JSONDecoder(object):
             i = self.skip_whitespace(i)
             #
             w_value = self.decode_any(i)
-            d[w_name] = w_value
+            if d is None:
+                values_w.append(w_value)
+            else:
+                d[w_name] = w_value
             i = self.skip_whitespace(self.pos)
             ch = self.ll_chars[i]
             i += 1
             if ch == '}':
                 self.pos = i
+                if d is None:
+                    return self._create_dict_from_values(values_w, jsonmap)
                 return self._create_dict(d)
             elif ch == ',':
                 pass
@@ -286,6 +482,9 @@ class JSONDecoder(object):
             bits |= ord(ch)
             if ch == '"':
                 self.pos = i
+                if i - 1 - start <= STRING_CACHE_MAX_LENGTH:
+                    cache = self.space.fromcache(StringCache)
+                    return cache.lookup(self, start, i - 1, bits)
                 return self._create_string(start, i - 1, bits)
             elif ch == '\\' or ch < '\x20':
                 self.pos = i-1
@@ -309,17 +508,29 @@ class JSONDecoder(object):
         from pypy.objspace.std.dictmultiobject import from_unicode_key_dict
         return from_unicode_key_dict(self.space, d)
 
+    def _create_dict_from_values(self, values_w, jsonmap):
+        from pypy.objspace.std.jsondict import from_values_and_jsonmap
+        return from_values_and_jsonmap(self.space, values_w, jsonmap)
+
     def _create_empty_dict(self):
         from pypy.objspace.std.dictmultiobject import create_empty_unicode_key_dict
         return create_empty_unicode_key_dict(self.space)
 
+    def _dict_from_jsonmap(self, jsonmap, values_w):
+        d = self._create_empty_dict()
+        keys_w = jsonmap.get_keys_w()
+        for i in range(len(values_w)):
+            d[keys_w[i]] = values_w[i]
+        return d
+
 
     def decode_string_escaped(self, start):
         i = self.pos
         builder = StringBuilder((i - start) * 2) # just an estimate
         assert start >= 0
         assert i >= 0
-        builder.append_slice(self.s, start, i)
+        builder.append_charpsize(rffi.ptradd(self.ll_chars, start),
+                                 i - start)
         while True:
             ch = self.ll_chars[i]
             i += 1
@@ -419,6 +630,9 @@ class JSONDecoder(object):
             strhash ^= length
             strhash = intmask(strhash)
         self.pos = i
+        if length <= STRING_CACHE_MAX_LENGTH:
+            cache = self.space.fromcache(StringCache)
+            return cache.lookup(self, start, i - 1, bits)
         # check cache first:
         key = (ll_chars, start, length, strhash)
         try:
@@ -447,3 +661,158 @@ def loads(space, w_s):
         return w_res
     finally:
         decoder.close()
+
+
+# iterload() reads the file in chunks of STREAM_CHUNK_SIZE bytes into a
+# buffer, which only grows if a line does not fit
+STREAM_CHUNK_SIZE = 65536
+
+class JSONStreamDecoder(JSONDecoder):
+    """ Decodes the lines of a file directly out of a reusable buffer.
+    The unconsumed input is between 'start' and 'end' and is followed by
+    the '\0' sentinel.  'line_end' is the end of the current line, whose
+    newline was replaced with a sentinel too, or -1.
+    """
+
+    def __init__(self, space, w_file):
+        self.space = space
+        self.w_file = w_file
+        self.size = STREAM_CHUNK_SIZE
+        self.ll_chars = lltype.malloc(rffi.CCHARP.TO, self.size + 1,
+                                      flavor='raw')
+        self.ll_chars[0] = '\0'
+        self.end_ptr = lltype.malloc(rffi.CCHARPP.TO, 1, flavor='raw')
+        self.pos = 0
+        self.cache = r_dict(slice_eq, slice_hash, simple_hash_eq=True)
+        self.start = 0
+        self.end = 0
+        self.line_end = -1
+        self.eof = False
+
+    def close(self):
+        if self.ll_chars:
+            lltype.free(self.ll_chars, flavor='raw')
+            self.ll_chars = lltype.nullptr(rffi.CCHARP.TO)
+            lltype.free(self.end_ptr, flavor='raw')
+            self.end_ptr = lltype.nullptr(rffi.CCHARPP.TO)
+
+    @rgc.must_be_light_finalizer
+    def __del__(self):
+        if self.ll_chars:
+            lltype.free(self.ll_chars, flavor='raw')
+            lltype.free(self.end_ptr, flavor='raw')
+
+    def fill(self):
+        """ Move the unconsumed input to the start of the buffer, growing
+        it if it is full, and read the next chunk of the file. """
+        length = self.end - self.start
+        ll_chars = self.ll_chars
+        if self.start > 0:
+            for i in range(length):
+                ll_chars[i] = ll_chars[self.start + i]
+            self.start = 0
+            self.end = length
+            # the keys of the cache are positions in the buffer
+            self.cache = r_dict(slice_eq, slice_hash, simple_hash_eq=True)
+        if length == self.size:
+            self.grow(self.size * 2)
+        space = self.space
+        w_data = space.call_method(self.w_file, 'read',
+                                   space.newint(self.size - self.end))
+        data = space.bytes_w(w_data)
+        if not data:
+            self.eof = True
+        else:
+            if self.end + len(data) > self.size:
+                self.grow(self.end + len(data))
+            rffi.str2chararray(data, rffi.ptradd(self.ll_chars, self.end),
+                               len(data))
+            self.end += len(data)
+        self.ll_chars[self.end] = '\0'
+
+    def grow(self, size):
+        ll_chars = lltype.malloc(rffi.CCHARP.TO, size + 1, flavor='raw')
+        rffi.c_memcpy(rffi.cast(rffi.VOIDP, ll_chars),
+                      rffi.cast(rffi.VOIDP, self.ll_chars),
+                      rffi.cast(rffi.SIZE_T, self.end))
+        lltype.free(self.ll_chars, flavor='raw')
+        self.ll_chars = ll_chars
+        self.size = size
+
+    def next_line(self):
+        """ Find the end of the next line and replace its newline with a
+        sentinel.  Returns False at the end of the file. """
+        i = self.start
+        while True:
+            while i < self.end:
+                if self.ll_chars[i] == '\n':
+                    self.ll_chars[i] = '\0'
+                    self.line_end = i
+                    return True
+                i += 1
+            if self.eof:
+                if self.start == self.end:
+                    return False
+                # the last line has no newline
+                self.line_end = self.end
+                return True
+            scanned = i - self.start
+            self.fill()
+            i = self.start + scanned
+
+    def decode_next(self):
+        """ Decode the next value of the input, which is made of values
+        separated by whitespace, where each value fits on one line.
+        Returns None at the end of the input. """
+        while True:
+            if self.line_end < 0 and not self.next_line():
+                return None
+            line_end = self.line_end
+            i = self.skip_whitespace(self.start)
+            if i < line_end:
+                break
+            # blank line or end of the line: continue with the next one
+            self.start = min(line_end + 1, self.end)
+            self.line_end = -1
+        # on errors, continue after the bad line
+        self.start = min(line_end + 1, self.end)
+        self.line_end = -1
+        # the sentinel at the end of the line stops the decoder
+        w_res = self.decode_any(i)
+        self.start = self.pos
+        self.line_end = line_end
+        return w_res
+
+
+class W_JSONIterLoader(W_Root):
+    def __init__(self, space, w_file):
+        self.decoder = JSONStreamDecoder(space, w_file)
+
+    def iter_w(self):
+        return self
+
+    def next_w(self, space):
+        decoder = self.decoder
+        w_res = None
+        if decoder.ll_chars:
+            w_res = decoder.decode_next()
+        if w_res is None:
+            decoder.close()
+            raise OperationError(space.w_StopIteration, space.w_None)
+        return w_res
+
+W_JSONIterLoader.typedef = TypeDef(
+    '_pypyjson.iterload',
+    __iter__ = interp2app(W_JSONIterLoader.iter_w),
+    next = interp2app(W_JSONIterLoader.next_w),
+)
+W_JSONIterLoader.typedef.acceptable_as_base_class = False
+
+
+def iterload(space, w_file):
+    """Return an iterator over the values read from a file object, e.g.
+    the lines of a NDJSON file.  The values are separated by whitespace
+    and each one must be on a single line.  The file is read in chunks
+    with fileobj.read(size); the input is never held in memory as a
+    whole."""
+    return W_JSONIterLoader(space, w_file)
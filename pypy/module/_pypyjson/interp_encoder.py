@@ -1,6 +1,15 @@
+import math
+
 from rpython.rlib.rstring import StringBuilder
+from rpython.rlib.rfloat import isfinite
 from rpython.rlib import rutf8
 from pypy.interpreter import unicodehelper
+from pypy.interpreter.error import OperationError, oefmt
+from pypy.interpreter.gateway import unwrap_spec
+from pypy.objspace.std.dictmultiobject import W_DictObject
+from pypy.objspace.std.floatobject import float2string
+from pypy.objspace.std.intobject import W_IntObject
+from pypy.objspace.std.listobject import W_ListObject
 
 
 HEX = '0123456789abcdef'
@@ -16,23 +25,26 @@ ESCAPE_BEFORE_SPACE = [ESCAPE_DICT.get(chr(_i), '\\u%04x' % _i)
                        for _i in range(32)]
 
 
+def _first_special_char(s):
+    """Return the index of the first character of 's' that needs escaping,
+    or -1 if 's' contains only non-special ascii chars."""
+    for i in range(len(s)):
+        c = s[i]
+        if c >= ' ' and c <= '~' and c != '"' and c != '\\':
+            pass
+        else:
+            return i
+    return -1
+
+
 def raw_encode_basestring_ascii(space, w_string):
     if space.isinstance_w(w_string, space.w_bytes):
         s = space.bytes_w(w_string)
-        for i in range(len(s)):
-            c = s[i]
-            if c >= ' ' and c <= '~' and c != '"' and c != '\\':
-                pass
-            else:
-                first = i
-                break
-        else:
+        first = _first_special_char(s)
+        if first < 0:
             # the input is a string with only non-special ascii chars
             return w_string
-
         unicodehelper.check_utf8_or_raise(space, s)
-        sb = StringBuilder(len(s))
-        sb.append_slice(s, 0, first)
     else:
         # We used to check if 'u' contains only safe characters, and return
         # 'w_string' directly.  But this requires an extra pass over all
@@ -42,9 +54,17 @@ def raw_encode_basestring_ascii(space, w_string):
         # over the characters.  So we may as well directly turn it into a
         # string here --- only one pass.
         s = space.utf8_w(w_string)
-        sb = StringBuilder(len(s))
         first = 0
+    sb = StringBuilder(len(s))
+    sb.append_slice(s, 0, first)
+    _escape_utf8(sb, s, first)
+    res = sb.build()
+    return space.newtext(res)
+
 
+def _escape_utf8(sb, s, first):
+    # the characters before 'first' are known to be non-special ascii
+    # chars, and have already been appended to 'sb'
     it = rutf8.Utf8StringIterator(s)
     for i in range(first):
         it.next()
@@ -77,5 +97,275 @@ def raw_encode_basestring_ascii(space, w_string):
                 sb.append(HEX[(s2 >> 4) & 0x0f])
                 sb.append(HEX[s2 & 0x0f])
 
-    res = sb.build()
-    return space.newtext(res)
+
+class JSONEncoder(object):
+    """ Encodes an object to a JSON string, like JSONEncoder.encode() of
+    lib-python's json/encoder.py with ensure_ascii=True and the utf-8
+    encoding.  Exact lists and dicts are walked through their strategies,
+    so that e.g. the items of a list of ints are never boxed.  Objects of
+    other types are passed to 'w_default'.
+    """
+
+    def __init__(self, space, skipkeys, check_circular, allow_nan,
+                 sort_keys, indent, item_separator, key_separator,
+                 w_default):
+        self.space = space
+        self.skipkeys = skipkeys
+        self.check_circular = check_circular
+        self.allow_nan = allow_nan
+        self.sort_keys = sort_keys
+        self.indent = indent      # -1 for no indentation
+        self.item_separator = item_separator
+        self.key_separator = key_separator
+        self.w_default = w_default
+        self.markers = {}
+        self.builder = StringBuilder()
+
+    def encode(self, w_obj):
+        self.encode_any(w_obj, 0)
+        return self.builder.build()
+
+    def encode_any(self, w_obj, level):
+        space = self.space
+        if (space.isinstance_w(w_obj, space.w_unicode) or
+                space.isinstance_w(w_obj, space.w_bytes)):
+            self.encode_string(w_obj)
+        elif space.is_w(w_obj, space.w_None):
+            self.builder.append('null')
+        elif space.is_w(w_obj, space.w_True):
+            self.builder.append('true')
+        elif space.is_w(w_obj, space.w_False):
+            self.builder.append('false')
+        elif type(w_obj) is W_IntObject:
+            self.builder.append(str(w_obj.intval))
+        elif (space.isinstance_w(w_obj, space.w_int) or
+                space.isinstance_w(w_obj, space.w_long)):
+            self.builder.append(space.bytes_w(space.str(w_obj)))
+        elif space.isinstance_w(w_obj, space.w_float):
+            self.builder.append(self.floatstr(space.float_w(w_obj)))
+        elif (space.isinstance_w(w_obj, space.w_list) or
+                space.isinstance_w(w_obj, space.w_tuple)):
+            self.encode_list(w_obj, level)
+        elif space.isinstance_w(w_obj, space.w_dict):
+            self.encode_dict(w_obj, level)
+        else:
+            self.mark(w_obj)
+            w_res = space.call_function(self.w_default, w_obj)
+            self.encode_any(w_res, level)
+            self.unmark(w_obj)
+
+    def encode_string(self, w_string):
+        space = self.space
+        if space.isinstance_w(w_string, space.w_bytes):
+            s = space.bytes_w(w_string)
+            first = _first_special_char(s)
+            if first >= 0:
+                unicodehelper.check_utf8_or_raise(space, s)
+        else:
+            s = space.utf8_w(w_string)
+            first = _first_special_char(s)
+        self.encode_utf8(s, first)
+
+    def encode_utf8(self, s, first):
+        sb = self.builder
+        sb.append('"')
+        if first < 0:
+            sb.append(s)
+        else:
+            sb.append_slice(s, 0, first)
+            _escape_utf8(sb, s, first)
+        sb.append('"')
+
+    def floatstr(self, x):
+        if isfinite(x):
+            return float2string(x, 'r', 0)
+        if not self.allow_nan:
+            raise oefmt(self.space.w_ValueError,
+                        "Out of range float values are not JSON compliant: "
+                        "%R", self.space.newfloat(x))
+        if math.isnan(x):
+            return 'NaN'
+        elif x > 0.0:
+            return 'Infinity'
+        else:
+            return '-Infinity'
+
+    def mark(self, w_obj):
+        if self.check_circular:
+            if w_obj in self.markers:
+                raise oefmt(self.space.w_ValueError,
+                            "Circular reference detected")
+            self.markers[w_obj] = None
+
+    def unmark(self, w_obj):
+        if self.check_circular:
+            del self.markers[w_obj]
+
+    def open_container(self, bracket, level):
+        """ Append the opening bracket and, with indentation, the first
+        newline.  Returns the separator between the items. """
+        self.builder.append(bracket)
+        if self.indent < 0:
+            return self.item_separator
+        newline_indent = '\n' + ' ' * (self.indent * (level + 1))
+        self.builder.append(newline_indent)
+        return self.item_separator + newline_indent
+
+    def close_container(self, bracket, level):
+        if self.indent >= 0:
+            self.builder.append('\n')
+            self.builder.append(' ' * (self.indent * level))
+        self.builder.append(bracket)
+
+    def encode_list(self, w_list, level):
+        space = self.space
+        if not space.is_true(w_list):
+            self.builder.append('[]')
+            return
+        self.mark(w_list)
+        separator = self.open_container('[', level)
+        if type(w_list) is W_ListObject:
+            self.encode_list_items(w_list, separator, level + 1)
+        else:
+            items_w = space.listview(w_list)
+            for i in range(len(items_w)):
+                if i > 0:
+                    self.builder.append(separator)
+                self.encode_any(items_w[i], level + 1)
+        self.close_container(']', level)
+        self.unmark(w_list)
+
+    def encode_list_items(self, w_list, separator, level):
+        # use the unwrapped items of the list strategy if possible
+        sb = self.builder
+        intlist = w_list.getitems_int()
+        if intlist is not None:
+            for i in range(len(intlist)):
+                if i > 0:
+                    sb.append(separator)
+                sb.append(str(intlist[i]))
+            return
+        floatlist = w_list.getitems_float()
+        if floatlist is not None:
+            for i in range(len(floatlist)):
+                if i > 0:
+                    sb.append(separator)
+                sb.append(self.floatstr(floatlist[i]))
+            return
+        utf8list = w_list.getitems_utf8()
+        if utf8list is not None:
+            for i in range(len(utf8list)):
+                if i > 0:
+                    sb.append(separator)
+                s = utf8list[i]
+                self.encode_utf8(s, _first_special_char(s))
+            return
+        byteslist = w_list.getitems_bytes()
+        if byteslist is not None:
+            for i in range(len(byteslist)):
+                if i > 0:
+                    sb.append(separator)
+                s = byteslist[i]
+                first = _first_special_char(s)
+                if first >= 0:
+                    unicodehelper.check_utf8_or_raise(self.space, s)
+                self.encode_utf8(s, first)
+            return
+        items_w = w_list.getitems()
+        for i in range(len(items_w)):
+            if i > 0:
+                sb.append(separator)
+            self.encode_any(items_w[i], level)
+
+    def encode_dict(self, w_dict, level):
+        space = self.space
+        if not space.is_true(w_dict):
+            self.builder.append('{}')
+            return
+        self.mark(w_dict)
+        separator = self.open_container('{', level)
+        first = True
+        if type(w_dict) is W_DictObject and not self.sort_keys:
+            iterator = w_dict.iteritems()
+            while True:
+                w_key, w_value = iterator.next_item()
+                if w_key is None:
+                    break
+                if self.encode_item(w_key, w_value, separator, first,
+                                    level + 1):
+                    first = False
+        else:
+            if self.sort_keys:
+                # sort the keys only, like CPython: the values need not
+                # be comparable
+                w_keys = space.call_method(w_dict, 'keys')
+                space.call_method(w_keys, 'sort')
+                w_iter = space.iter(w_keys)
+            else:
+                w_iter = space.iter(space.call_method(w_dict, 'iteritems'))
+            while True:
+                try:
+                    w_item = space.next(w_iter)
+                except OperationError as e:
+                    if not e.match(space, space.w_StopIteration):
+                        raise
+                    break
+                if self.sort_keys:
+                    w_key = w_item
+                    w_value = space.getitem(w_dict, w_key)
+                else:
+                    w_key, w_value = space.fixedview(w_item, 2)
+                if self.encode_item(w_key, w_value, separator, first,
+                                    level + 1):
+                    first = False
+        self.close_container('}', level)
+        self.unmark(w_dict)
+
+    def encode_item(self, w_key, w_value, separator, first, level):
+        """ Append one key and value of a dict.  Returns False if the key
+        was skipped. """
+        space = self.space
+        if (space.isinstance_w(w_key, space.w_unicode) or
+                space.isinstance_w(w_key, space.w_bytes)):
+            if not first:
+                self.builder.append(separator)
+            self.encode_string(w_key)
+        else:
+            # JavaScript is weakly typed for these, so it makes sense to
+            # also allow them.  Many encoders seem to do something like this.
+            if space.isinstance_w(w_key, space.w_float):
+                key = self.floatstr(space.float_w(w_key))
+            elif space.is_w(w_key, space.w_True):
+                key = 'true'
+            elif space.is_w(w_key, space.w_False):
+                key = 'false'
+            elif space.is_w(w_key, space.w_None):
+                key = 'null'
+            elif (space.isinstance_w(w_key, space.w_int) or
+                    space.isinstance_w(w_key, space.w_long)):
+                key = space.bytes_w(space.str(w_key))
+            elif self.skipkeys:
+                return False
+            else:
+                raise oefmt(space.w_TypeError, "key %R is not a string",
+                            w_key)
+            if not first:
+                self.builder.append(separator)
+            self.encode_utf8(key, -1)
+        self.builder.append(self.key_separator)
+        self.encode_any(w_value, level)
+        return True
+
+
+@unwrap_spec(skipkeys=bool, check_circular=bool, allow_nan=bool,
+             sort_keys=bool, item_separator='bytes', key_separator='bytes')
+def encode(space, w_obj, skipkeys, check_circular, allow_nan, sort_keys,
+           w_indent, item_separator, key_separator, w_default):
+    if space.is_none(w_indent):
+        indent = -1
+    else:
+        indent = max(space.int_w(w_indent), 0)
+    encoder = JSONEncoder(space, skipkeys, check_circular, allow_nan,
+                          sort_keys, indent, item_separator, key_separator,
+                          w_default)
+    return space.newbytes(encoder.encode(w_obj))
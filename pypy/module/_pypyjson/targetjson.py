@@ -6,28 +6,58 @@ sys.path.insert(0, str(ROOT))
 import time
 from pypy.interpreter.error import OperationError
 from pypy.module._pypyjson.interp_decoder import loads, JSONDecoder
-from rpython.rlib.objectmodel import specialize, dont_inline
+from pypy.module._pypyjson.interp_decoder import JSONStreamDecoder
+from rpython.rlib.objectmodel import specialize, dont_inline, compute_hash
+from rpython.rlib.objectmodel import r_dict
+from rpython.rlib.rfile import create_file
 
 def _create_dict(self, d):
     w_res = W_Dict()
     w_res.dictval = d
     return w_res
 
+def _create_empty_dict(self):
+    return W_Dict().dictval
+
+def _create_dict_from_values(self, values_w, jsonmap):
+    w_res = W_Dict()
+    keys_w = jsonmap.get_keys_w()
+    for i in range(len(values_w)):
+        w_res.dictval[keys_w[i]] = values_w[i]
+    return w_res
+
 JSONDecoder._create_dict = _create_dict
+JSONDecoder._create_dict_from_values = _create_dict_from_values
+JSONDecoder._create_empty_dict = _create_empty_dict
 
 ## MSG = open('msg.json').read()
 
 class W_Root(object):
     pass
 
+def key_eq(w_key1, w_key2):
+    assert isinstance(w_key1, W_Unicode)
+    return w_key1.eq_w(w_key2)
+
+def key_hash(w_key):
+    assert isinstance(w_key, W_Unicode)
+    return w_key.hash_w()
+
 class W_Dict(W_Root):
     def __init__(self):
-        self.dictval = {}
+        self.dictval = r_dict(key_eq, key_hash)
 
 class W_Unicode(W_Root):
     def __init__(self, x):
         self.unival = x
 
+    def eq_w(self, w_other):
+        assert isinstance(w_other, W_Unicode)
+        return self.unival == w_other.unival
+
+    def hash_w(self):
+        return compute_hash(self.unival)
+
 class W_String(W_Root):
     def __init__(self, x):
         self.strval = x
@@ -44,12 +74,22 @@ class W_List(W_Root):
     def __init__(self):
         self.listval = []
 
+class W_File(W_Root):
+    def __init__(self, f):
+        self.f = f
+
 class W_Singleton(W_Root):
     def __init__(self, name):
         self.name = name
 
 class FakeSpace(object):
 
+    def __init__(self):
+        self._caches = {}
+
+    def _freeze_(self):
+        return True
+
     w_None = W_Singleton('None')
     w_True = W_Singleton('True')
     w_False = W_Singleton('False')
@@ -59,6 +99,14 @@ class FakeSpace(object):
     w_int = W_Int
     w_float = W_Float
 
+    @specialize.memo()
+    def fromcache(self, cls):
+        try:
+            return self._caches[cls]
+        except KeyError:
+            res = self._caches[cls] = cls(self)
+            return res
+
     def newtuple(self, items):
         return None
 
@@ -81,6 +129,10 @@ class FakeSpace(object):
 
     @dont_inline
     def call_method(self, obj, name, arg):
+        if name == 'read':
+            assert isinstance(obj, W_File)
+            assert isinstance(arg, W_Int)
+            return W_String(obj.f.read(arg.intval))
         assert name == 'append'
         assert isinstance(obj, W_List)
         obj.listval.append(arg)
@@ -91,12 +143,15 @@ class FakeSpace(object):
     def setitem(self, d, key, value):
         assert isinstance(d, W_Dict)
         assert isinstance(key, W_Unicode)
-        d.dictval[key.unival] = value
+        d.dictval[key] = value
 
     def newtext(self, x):
         return W_String(x)
     newbytes = newtext
 
+    def newutf8(self, x, lgt):
+        return W_Unicode(x)
+
     def newint(self, x):
         return W_Int(x)
 
@@ -120,6 +175,20 @@ fakespace = FakeSpace()
 def myloads(msg):
     return loads(fakespace, W_String(msg))
 
+def myiterload(filename):
+    # decode all the lines of a NDJSON file
+    w_file = W_File(create_file(filename, 'rb'))
+    decoder = JSONStreamDecoder(fakespace, w_file)
+    try:
+        count = 0
+        while decoder.decode_next() is not None:
+            count += 1
+    finally:
+        decoder.close()
+        w_file.f.close()
+    return count
+
+@specialize.arg(2)
 def bench(title, N, fn, arg):
     a = time.clock()
     for i in range(N):
@@ -128,16 +197,23 @@ def bench(title, N, fn, arg):
     print title, (b-a) / N * 1000
 
 def entry_point(argv):
-    if len(argv) != 3:
-        print 'Usage: %s FILE n' % argv[0]
+    if len(argv) == 4 and argv[3] == '--lines':
+        lines = True
+    elif len(argv) == 3:
+        lines = False
+    else:
+        print 'Usage: %s FILE n [--lines]' % argv[0]
         return 1
     filename = argv[1]
     N = int(argv[2])
-    f = open(filename)
-    msg = f.read()
 
     try:
-        bench('loads     ', N, myloads,  msg)
+        if lines:
+            bench('iterload  ', N, myiterload, filename)
+        else:
+            f = open(filename)
+            msg = f.read()
+            bench('loads     ', N, myloads,  msg)
     except OperationError as e:
         print 'Error', e._compute_value(fakespace)
 
@@ -27,8 +27,87 @@ def test_decode_key():
     assert y is x
     dec.close()
 
+class TestJSONMaps(object):
+    def loads(self, s):
+        from pypy.module._pypyjson.interp_decoder import loads
+        return loads(self.space, self.space.newbytes(s))
+
+    def test_shared_map(self):
+        from pypy.objspace.std.jsondict import JsonDictStrategy
+        w_res = self.loads('[{"a": 1, "b": 2}, {"a": 3, "b": 4}]')
+        w_d1, w_d2 = self.space.listview(w_res)
+        strategy = w_d1.get_strategy()
+        assert isinstance(strategy, JsonDictStrategy)
+        assert strategy.jsonmap.length == 2
+        assert w_d2.get_strategy() is strategy
+        # the maps are kept between calls
+        w_d3 = self.loads('{"a": 5, "b": 6}')
+        assert w_d3.get_strategy() is strategy
+        w_d4 = self.loads('{"b": 5, "a": 6}')
+        assert w_d4.get_strategy() is not strategy
+
+    def test_too_many_keys(self, monkeypatch):
+        from pypy.module._pypyjson import interp_decoder
+        from pypy.objspace.std.jsondict import JsonDictStrategy
+        monkeypatch.setattr(interp_decoder, 'MAX_JSON_MAP_LENGTH', 2)
+        w_d = self.loads('{"x1": 1, "x2": 2, "x3": 3}')
+        assert not isinstance(w_d.get_strategy(), JsonDictStrategy)
+        assert self.space.int_w(self.space.len(w_d)) == 3
+        w_d = self.loads('{"x1": 1, "x2": 2}')
+        assert isinstance(w_d.get_strategy(), JsonDictStrategy)
+
+    def test_string_cache_eviction(self, monkeypatch):
+        from pypy.module._pypyjson import interp_decoder
+        # all the strings go to the same set of two entries
+        monkeypatch.setattr(interp_decoder, 'STRING_CACHE_SIZE', 2)
+        cache = self.space.fromcache(interp_decoder.StringCache)
+        hits, misses = cache.hits, cache.misses
+        w_res = self.loads('["aa1", "bb1", "aa1", "cc1", "aa1", "bb1"]')
+        items_w = self.space.listview(w_res)
+        assert self.space.is_w(items_w[0], items_w[2])
+        assert self.space.is_w(items_w[0], items_w[4])
+        # "bb1" was the least recently used entry when "cc1" was added
+        assert not self.space.is_w(items_w[1], items_w[5])
+        assert cache.hits - hits == 2
+        assert cache.misses - misses == 4
+
+
+
+
+class TestIterload(object):
+    def test_small_buffer(self, monkeypatch):
+        from pypy.module._pypyjson import interp_decoder
+        monkeypatch.setattr(interp_decoder, 'STREAM_CHUNK_SIZE', 4)
+        space = self.space
+        data = '{"a": [1, 2, 3], "b": "xyz"}\n\n  17\n"last"  '
+        w_file = space.appexec([], """():
+            class File(object):
+                def __init__(self):
+                    self.sizes = []
+                    self.data = %r
+                def read(self, size):
+                    self.sizes.append(size)
+                    res, self.data = self.data[:size], self.data[size:]
+                    return res
+            return File()
+        """ % data)
+        w_iter = interp_decoder.iterload(space, w_file)
+        w_res = space.call_function(space.builtin.get('list'), w_iter)
+        assert space.eq_w(w_res, space.appexec([], """():
+            return [{"a": [1, 2, 3], "b": "xyz"}, 17, "last"]"""))
+        # the buffer grew to hold the first line only
+        sizes = space.unwrap(space.getattr(w_file, space.newtext('sizes')))
+        assert max(sizes) <= 32
+        assert not w_iter.decoder.ll_chars
+
+
 class AppTest(object):
-    spaceconfig = {"objspace.usemodules._pypyjson": True}
+    spaceconfig = {"objspace.usemodules._pypyjson": True,
+                   "objspace.usemodules.__pypy__": True}
+
+    def setup_class(cls):
+        from rpython.tool.udir import udir
+        cls.w_tmpfile = cls.space.wrap(str(udir.join('iterload.json')))
 
     def test_raise_on_unicode(self):
         import _pypyjson
@@ -179,6 +258,57 @@ class AppTest(object):
         raises(ValueError, _pypyjson.loads, '{"key"')
         raises(ValueError, _pypyjson.loads, '{"key": 42')
 
+    def test_decode_object_shared_keys(self):
+        import _pypyjson
+        from __pypy__ import strategy
+        res = _pypyjson.loads('[%s]' % ", ".join(
+            ['{"id": %d, "name": "n%d", "t\\u00e4g": null}' % (i, i)
+             for i in range(10)]))
+        for i, d in enumerate(res):
+            assert strategy(d) == "JsonDictStrategy"
+            assert d == {u"id": i, u"name": u"n%d" % i, u"t\xe4g": None}
+            assert d.keys() == [u"id", u"name", u"t\xe4g"]
+            assert d["id"] == d[u"id"] == i
+            assert "missing" not in d and 42 not in d
+        d = res[0]
+        d[u"id"] = 42
+        assert strategy(d) == "JsonDictStrategy"
+        assert d.setdefault(u"name", 5) == u"n0"
+        d[u"new"] = 1
+        assert strategy(d) == "UnicodeDictStrategy"
+        assert d == {u"id": 42, u"name": u"n0", u"t\xe4g": None, u"new": 1}
+        del res[1][u"name"]
+        assert res[1] == {u"id": 1, u"t\xe4g": None}
+        assert res[2] == {u"id": 2, u"name": u"n2", u"t\xe4g": None}
+        assert res[3].pop(u"id") == 3
+        assert res[3] == {u"name": u"n3", u"t\xe4g": None}
+
+    def test_decode_object_keys_vary(self):
+        import _pypyjson
+        s = '[{"a": 1, "ab": 2}, {"ab": 3, "a": 4}, {"a": 5}, {"a": 6, "a": 7}]'
+        assert _pypyjson.loads(s) == [{u"a": 1, u"ab": 2}, {u"ab": 3, u"a": 4},
+                                      {u"a": 5}, {u"a": 7}]
+        s = '[{"a": {"b": 1, "c": []}}, {"a": {"b": 2, "c": [3]}}]'
+        assert _pypyjson.loads(s) == [{u"a": {u"b": 1, u"c": []}},
+                                      {u"a": {u"b": 2, u"c": [3]}}]
+
+    def test_string_cache(self):
+        import _pypyjson
+        from __pypy__ import json_string_cache_counter
+        hits, misses = json_string_cache_counter()
+        res = _pypyjson.loads('[' + '["ok", "GET", "caf\xc3\xa9"], ' * 3 +
+                              '{"ok": "ok"}]')
+        assert res[0] == [u"ok", u"GET", u"caf\xe9"]
+        assert res[0][0] is res[1][0] is res[2][0]
+        assert res[0][2] is res[2][2]
+        assert res[3] == {u"ok": u"ok"}
+        hits2, misses2 = json_string_cache_counter()
+        assert hits2 - hits >= 7
+        assert misses2 - misses <= 3
+        long = "x" * 100
+        res = _pypyjson.loads('["%s", "%s"]' % (long, long))
+        assert res[0] == res[1] == long and res[0] is not res[1]
+
     def test_decode_object_nonstring_key(self):
         import _pypyjson
         raises(ValueError, "_pypyjson.loads('{42: 43}')")
@@ -236,6 +366,134 @@ class AppTest(object):
         assert check("\\\"\b\f\n\r\t") == '\\\\\\"\\b\\f\\n\\r\\t'
         assert check("\x07") == "\\u0007"
 
+    def test_encode(self):
+        import _pypyjson
+        def encode(obj, skipkeys=False, check_circular=True, allow_nan=True,
+                   sort_keys=False, indent=None, separators=(', ', ': '),
+                   default=None):
+            def raise_typeerror(o):
+                raise TypeError(repr(o) + " is not JSON serializable")
+            res = _pypyjson.encode(obj, skipkeys, check_circular, allow_nan,
+                                   sort_keys, indent, separators[0],
+                                   separators[1], default or raise_typeerror)
+            assert type(res) is str
+            return res
+        assert encode(None) == 'null'
+        assert encode([True, False, 1, -2L, 2 ** 70, 1.5]) == (
+            '[true, false, 1, -2, 1180591620717411303424, 1.5]')
+        assert encode([1, 2, 3]) == '[1, 2, 3]'
+        assert encode(range(3)) == '[0, 1, 2]'
+        assert encode([1.0, 2.5]) == '[1.0, 2.5]'
+        assert encode([u"a", u"\u20ac"]) == '["a", "\\u20ac"]'
+        assert encode(["a\n", "\xe2\x82\xac"]) == '["a\\n", "\\u20ac"]'
+        raises(UnicodeDecodeError, encode, ["\xc0"])
+        assert encode((1, [], {}, ())) == '[1, [], {}, []]'
+        assert encode({u"a": [1, {"b": None}]}) == '{"a": [1, {"b": null}]}'
+        assert encode({1: 2, 2.5: 3, None: 5}, sort_keys=True) == (
+            '{"null": 5, "1": 2, "2.5": 3}')
+        assert encode({True: 1, False: 0}, sort_keys=True) == (
+            '{"false": 0, "true": 1}')
+        raises(TypeError, encode, {(1,): 2})
+        assert encode({(1,): 2, "a": 3}, skipkeys=True) == '{"a": 3}'
+        assert encode({"b": 1, "a": 2}, sort_keys=True) == '{"a": 2, "b": 1}'
+        # sort_keys only compares the keys, never the values
+        class K(str):
+            def __eq__(self, other):
+                return True
+            def __hash__(self):
+                return id(self)
+        class V(list):
+            def __eq__(self, other):
+                raise AssertionError("values compared")
+            __ne__ = __lt__ = __le__ = __gt__ = __ge__ = __eq__
+        assert encode({K("b"): V([1]), K("a"): V([2])}, sort_keys=True) == (
+            '{"a": [2], "b": [1]}')
+        assert encode([1, {"a": 2}], indent=2, separators=(',', ':')) == (
+            '[\n  1,\n  {\n    "a":2\n  }\n]')
+        assert encode([1], indent=0) == '[\n1\n]'
+        assert encode([float("nan"), float("inf"), -float("inf")]) == (
+            '[NaN, Infinity, -Infinity]')
+        raises(ValueError, encode, [float("inf")], allow_nan=False)
+        raises(TypeError, encode, [1j])
+        assert encode([1j], default=lambda o: [o.real, o.imag]) == (
+            '[[0.0, 1.0]]')
+        l = [1]
+        l.append(l)
+        exc = raises(ValueError, encode, l)
+        assert str(exc.value) == "Circular reference detected"
+        d = {}
+        d["x"] = [d]
+        raises(ValueError, encode, d)
+        raises(ValueError, encode, [1j], default=lambda o: [o])
+        assert encode([l, l][0][:1] * 2) == '[1, 1]'
+
+    def test_encode_subclasses(self):
+        import _pypyjson
+        class MyList(list):
+            def __iter__(self):
+                return iter([42])
+        class MyDict(dict):
+            def iteritems(self):
+                return iter([("x", 42)])
+        class MyInt(int):
+            def __str__(self):
+                return "7"
+        class MyStr(str):
+            pass
+        def encode(obj):
+            return _pypyjson.encode(obj, False, True, True, False, None,
+                                    ', ', ': ', None)
+        assert encode(MyList([1, 2])) == '[42]'
+        assert encode(MyDict(a=1)) == '{"x": 42}'
+        assert encode([MyInt(5)]) == '[7]'
+        assert encode({MyStr("k"): MyStr("v")}) == '{"k": "v"}'
+
+    def test_iterload(self):
+        import _pypyjson
+        class File(object):
+            def __init__(self, data):
+                self.data = data
+            def read(self, size):
+                res, self.data = self.data[:size], self.data[size:]
+                return res
+        data = '{"id": 1}\n{"id": 2}\r\n\n[1, 2] 3\n"\xc3\xa9"'
+        it = _pypyjson.iterload(File(data))
+        assert iter(it) is it
+        assert list(it) == [{u"id": 1}, {u"id": 2}, [1, 2], 3, u"\xe9"]
+        raises(StopIteration, next, it)
+        assert list(_pypyjson.iterload(File(""))) == []
+        assert list(_pypyjson.iterload(File(" \n\n "))) == []
+
+    def test_iterload_errors(self):
+        import _pypyjson
+        class File(object):
+            def __init__(self, data):
+                self.data = data
+            def read(self, size):
+                res, self.data = self.data[:size], self.data[size:]
+                return res
+        it = _pypyjson.iterload(File('1\n[2,\n3]\n{"a": 4}\n'))
+        assert next(it) == 1
+        # values must be on a single line
+        raises(ValueError, next, it)
+        # decoding continues after the bad line
+        assert next(it) == 3
+        raises(ValueError, next, it)
+        assert next(it) == {u"a": 4}
+        raises(StopIteration, next, it)
+
+    def test_iterload_file(self):
+        import _pypyjson
+        # more than one chunk of STREAM_CHUNK_SIZE bytes
+        lines = ['{"n": %d, "s": "%s"}' % (i, "x" * 500) for i in range(150)]
+        f = open(self.tmpfile, "w")
+        f.write("\n".join(lines))
+        f.close()
+        with open(self.tmpfile) as f:
+            res = list(_pypyjson.iterload(f))
+        assert len(res) == 150
+        assert res[149] == {u"n": 149, u"s": u"x" * 500}
+
     def test_error_position(self):
         import _pypyjson
         test_cases = [
@@ -252,3 +510,19 @@ class AppTest(object):
         for inputtext, errmsg in test_cases:
             exc = raises(ValueError, _pypyjson.loads, inputtext)
             assert str(exc.value) == errmsg
+
+
+class AppTestDumps(object):
+    spaceconfig = {"objspace.usemodules._pypyjson": True,
+                   "objspace.usemodules.__pypy__": True,
+                   "objspace.usemodules.struct": True}
+
+    def test_dumps(self):
+        import json
+        from json import encoder
+        assert encoder._native_encode is not None
+        obj = {"a": [1, 2.5, u"\u20ac", "x", None, True], "b": {"c": ()}}
+        for kwds in [{}, {"indent": 4}, {"sort_keys": True},
+                     {"separators": (",", ":")}]:
+            expected = "".join(encoder.JSONEncoder(**kwds).iterencode(obj))
+            assert json.dumps(obj, **kwds) == expected
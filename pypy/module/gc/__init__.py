@@ -19,6 +19,7 @@ class Module(MixedModule):
                 space.config.translation.gctransformer == "framework"):
             self.appleveldefs.update({
                 'dump_rpy_heap': 'app_referents.dump_rpy_heap',
+                'dump_alloc_samples': 'app_referents.dump_alloc_samples',
                 'get_stats': 'app_referents.get_stats',
                 })
             self.interpleveldefs.update({
@@ -37,5 +38,10 @@ class Module(MixedModule):
                 'GcRef': 'referents.W_GcRef',
                 'hooks': 'space.fromcache(hook.W_AppLevelHooks)',
                 'GcCollectStepStats': 'hook.W_GcCollectStepStats',
+                'start_alloc_sampling': 'allocsample.start_alloc_sampling',
+                'stop_alloc_sampling': 'allocsample.stop_alloc_sampling',
+                'get_alloc_samples': 'allocsample.get_alloc_samples',
+                'get_alloc_sampling_interval':
+                    'allocsample.get_alloc_sampling_interval',
                 })
         MixedModule.__init__(self, space, w_name)
@@ -0,0 +1,188 @@
+"""
+Sampling of the allocations, to find which types of objects, allocated
+from where, are taking more and more memory.
+
+When enabled, the GC samples one allocation every 'interval' bytes
+allocated in the nursery, and calls the hooks in hook.LowLevelGcHooks,
+which forward to the AllocSampler below.  The sampler records the
+app-level stack of every sampled object, as found by the vmprof
+machinery, and forgets it when the GC reports that the object died.  So
+the samples recorded at any time give a statistical picture of the live
+objects, each sample standing for about 'interval' bytes.
+
+The hooks are called from inside the GC, so the samples are stored in
+raw memory, and only turned into app-level objects by get_alloc_samples().
+"""
+
+from rpython.rlib.objectmodel import we_are_translated
+from rpython.rtyper.lltypesystem import lltype, llmemory, rffi
+from pypy.interpreter.gateway import unwrap_spec
+from pypy.interpreter.error import oefmt
+
+
+DEFAULT_INTERVAL = 512 * 1024
+MAX_DEPTH = 16       # number of frames recorded, starting from the innermost
+
+# every sample is a record of RECORD_SIZE words in AllocSampler.table:
+#     [type_index] [size] [depth] [code_id] * MAX_DEPTH
+# 'type_index' is -1 until the GC tells us the type, at the next minor
+# collection.  The records of the dead objects have a 'depth' of -1 and
+# are chained with their 'size' field.
+RECORD_SIZE = 3 + MAX_DEPTH
+SIGNED_ARRAY = lltype.Array(lltype.Signed, hints={'nolength': True})
+
+
+def _capture_no_stack(sampler, base):
+    return 0
+
+def _get_no_code_names():
+    return {}
+
+def _capture_vmprof_stack(sampler, base):
+    from rpython.rlib.rvmprof import cintf, rvmprof
+    if not we_are_translated():
+        return 0     # the vmprof stack is not maintained
+    _cintf = rvmprof._get_vmprof().cintf
+    buf = sampler.traceback_buf
+    length = _cintf.vmprof_get_traceback(cintf.get_rvmprof_stack(),
+                                         llmemory.NULL, buf,
+                                         2 * MAX_DEPTH + 2)
+    depth = 0
+    i = 0
+    while i < length - 1 and depth < MAX_DEPTH:
+        tag = buf[i]
+        if (tag == rvmprof.VMPROF_CODE_TAG or
+                tag == rvmprof.VMPROF_JITTED_TAG):
+            sampler.table[base + depth] = buf[i + 1]
+            depth += 1
+        i += 2
+    return depth
+
+def _get_vmprof_code_names():
+    # map the vmprof unique ids to the code objects, like
+    # rvmprof.traceback.walk_traceback() does
+    from pypy.interpreter.pycode import PyCode
+    code_names = {}
+    for wref in PyCode._vmprof_weak_list.get_all_handles():
+        code = wref()
+        if code is not None and code._vmprof_unique_id != 0:
+            code_names[code._vmprof_unique_id] = '%s:%d:%s' % (
+                code.co_filename, code.co_firstlineno, code.co_name)
+    return code_names
+
+
+class AllocSampler(object):
+
+    def __init__(self, space):
+        self.space = space
+        self.interval = 0         # 0 if disabled
+        self.last_interval = 0
+        self.capacity = 0
+        self.table = lltype.nullptr(SIGNED_ARRAY)
+        self.used = 0             # records in use or in the free list
+        self.first_free = -1
+        if space.config.objspace.usemodules._vmprof:
+            self.capture_stack = _capture_vmprof_stack
+            self.get_code_names = _get_vmprof_code_names
+        else:
+            self.capture_stack = _capture_no_stack
+            self.get_code_names = _get_no_code_names
+        self.traceback_buf = lltype.malloc(rffi.SIGNEDP.TO, 2 * MAX_DEPTH + 2,
+                                           flavor='raw', immortal=True)
+
+    # the following methods are called by the GC hooks and must not
+    # allocate GC objects
+
+    def take_sample(self):
+        if self.first_free >= 0:
+            index = self.first_free
+            self.first_free = self.table[index * RECORD_SIZE + 1]
+        else:
+            if self.used == self.capacity:
+                self._grow()
+            index = self.used
+            self.used += 1
+        base = index * RECORD_SIZE
+        self.table[base] = -1
+        self.table[base + 1] = 0
+        self.table[base + 2] = self.capture_stack(self, base + 3)
+        return index
+
+    def _grow(self):
+        newcapacity = self.capacity * 2 + 64
+        newtable = lltype.malloc(SIGNED_ARRAY, newcapacity * RECORD_SIZE,
+                                 flavor='raw', zero=True,
+                                 track_allocation=False)
+        i = 0
+        while i < self.capacity * RECORD_SIZE:
+            newtable[i] = self.table[i]
+            i += 1
+        if self.table:
+            lltype.free(self.table, flavor='raw', track_allocation=False)
+        self.table = newtable
+        self.capacity = newcapacity
+
+    def set_type(self, index, type_index, size):
+        base = index * RECORD_SIZE
+        self.table[base] = type_index
+        self.table[base + 1] = size
+
+    def free_sample(self, index):
+        base = index * RECORD_SIZE
+        self.table[base + 1] = self.first_free
+        self.table[base + 2] = -1
+        self.first_free = index
+
+    # app-level interface
+
+    def get_samples_w(self):
+        space = self.space
+        code_names = self.get_code_names()
+        result_w = []
+        index = 0
+        while index < self.used:
+            base = index * RECORD_SIZE
+            depth = self.table[base + 2]
+            type_index = self.table[base]
+            if depth >= 0 and type_index >= 0:
+                frames_w = []
+                for i in range(depth):
+                    code_id = self.table[base + 3 + i]
+                    name = code_names.get(code_id, '?')
+                    frames_w.append(space.newtext(name))
+                result_w.append(space.newtuple([
+                    space.newint(type_index),
+                    space.newint(self.table[base + 1]),
+                    space.newtuple(frames_w)]))
+            index += 1
+        return space.newlist(result_w)
+
+
+@unwrap_spec(interval=int)
+def start_alloc_sampling(space, interval=DEFAULT_INTERVAL):
+    """Start sampling one allocation every 'interval' bytes allocated.
+    The sampling begins the next time the nursery is full."""
+    if interval <= 0:
+        raise oefmt(space.w_ValueError, "the interval must be positive")
+    sampler = space.fromcache(AllocSampler)
+    sampler.interval = interval
+    sampler.last_interval = interval
+
+def stop_alloc_sampling(space):
+    """Stop sampling new allocations.  The objects already sampled are
+    still reported by get_alloc_samples() as long as they are alive."""
+    space.fromcache(AllocSampler).interval = 0
+
+def get_alloc_samples(space):
+    """Return the list of the sampled objects which are still alive, as
+    tuples (type_index, size, stack).  'type_index' is as returned by
+    get_rpy_type_index() and 'stack' is a tuple of strings
+    'filename:firstlineno:name', starting from the innermost function.
+    Objects die only when the GC notices it, so call gc.collect() first
+    to get a precise picture."""
+    return space.fromcache(AllocSampler).get_samples_w()
+
+def get_alloc_sampling_interval(space):
+    """Return the interval given to the last call to
+    start_alloc_sampling(), or 0 if it was never called."""
+    return space.newint(space.fromcache(AllocSampler).last_interval)
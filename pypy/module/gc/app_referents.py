@@ -23,23 +23,7 @@ def dump_rpy_heap(file):
         f = open(file, 'wb')
         gc._dump_rpy_heap(f.fileno())
         f.close()
-        try:
-            import zlib, os
-        except ImportError:
-            pass
-        else:
-            filename2 = os.path.join(os.path.dirname(file), 'typeids.txt')
-            if not os.path.exists(filename2):
-                data = zlib.decompress(gc.get_typeids_z())
-                f = open(filename2, 'w')
-                f.write(data)
-                f.close()
-            filename2 = os.path.join(os.path.dirname(file), 'typeids.lst')
-            if not os.path.exists(filename2):
-                data = ''.join(['%d\n' % n for n in gc.get_typeids_list()])
-                f = open(filename2, 'w')
-                f.write(data)
-                f.close()
+        _write_typeids(file)
     else:
         if isinstance(file, int):
             fd = file
@@ -49,6 +33,54 @@ def dump_rpy_heap(file):
             fd = file.fileno()
         gc._dump_rpy_heap(fd)
 
+def _write_typeids(file):
+    try:
+        import zlib, os
+    except ImportError:
+        pass
+    else:
+        filename2 = os.path.join(os.path.dirname(file), 'typeids.txt')
+        if not os.path.exists(filename2):
+            data = zlib.decompress(gc.get_typeids_z())
+            f = open(filename2, 'w')
+            f.write(data)
+            f.close()
+        filename2 = os.path.join(os.path.dirname(file), 'typeids.lst')
+        if not os.path.exists(filename2):
+            data = ''.join(['%d\n' % n for n in gc.get_typeids_list()])
+            f = open(filename2, 'w')
+            f.write(data)
+            f.close()
+
+def dump_alloc_samples(file):
+    """Write the allocation samples of the objects still alive to the
+    given file (a file or a file name), after a full collection.  See
+    gc.start_alloc_sampling().  The first line gives the sampling
+    interval, and then there is one line per sample:
+
+        [typeindex] [size] [frame1] .. [framen]
+
+    separated by tabs, where [frame1] is the innermost function.  Two such
+    files can be compared with pypy/tool/allocdiff.py.
+
+    If the argument is a filename and the 'zlib' module is available,
+    we also write 'typeids.txt' and 'typeids.lst' in the same directory,
+    if they don't already exist.
+    """
+    gc.collect()
+    samples = gc.get_alloc_samples()
+    lines = ['# interval %d\n' % gc.get_alloc_sampling_interval()]
+    for type_index, size, stack in samples:
+        lines.append('\t'.join(['%d' % type_index, '%d' % size] +
+                               list(stack)) + '\n')
+    if isinstance(file, str):
+        f = open(file, 'w')
+        f.writelines(lines)
+        f.close()
+        _write_typeids(file)
+    else:
+        file.writelines(lines)
+
 class GcStats(object):
     def __init__(self, s):
         self._s = s
@@ -65,6 +97,21 @@ class GcStats(object):
         self.memory_allocated_sum = self._format(self._s.total_allocated_memory + self._s.total_memory_pressure +
                                             self._s.jit_backend_allocated)
         self.total_gc_time = self._s.total_gc_time
+        # the pauses are in microseconds
+        for item in ('minor_collections', 'minor_pause_p50',
+                     'minor_pause_p99', 'minor_pause_p999', 'minor_pause_max',
+                     'collect_steps', 'step_pause_p50', 'step_pause_p99',
+                     'step_pause_p999', 'step_pause_max',
+                     'total_nursery_allocated', 'total_nursery_promoted',
+                     'nursery_resizes'):
+            setattr(self, item, getattr(self._s, item))
+        # the fraction of the bytes allocated in the nursery that survived
+        # a minor collection
+        if self.total_nursery_allocated > 0:
+            self.survivor_rate = (float(self.total_nursery_promoted) /
+                                  self.total_nursery_allocated)
+        else:
+            self.survivor_rate = 0.0
 
     def _format(self, v):
         if v < 1000000:
@@ -72,6 +119,11 @@ class GcStats(object):
             return "%.1fkB" % (v / 1024.)
         return "%.1fMB" % (v / 1024. / 1024.)
 
+    def _format_pause(self, v):
+        if v < 1000:
+            return "%dus" % (v,)
+        return "%.1fms" % (v / 1000.)
+
     def __repr__(self):
         if self._s.total_memory_pressure != -1:
             extra = "\n    memory pressure:    %s" % self.total_memory_pressure
@@ -96,6 +148,14 @@ class GcStats(object):
     Total:                   %s
 
     Total time spent in GC:  %s
+
+    Minor collections:       %d
+       pauses:               p50 %s, p99 %s, p99.9 %s, max %s
+       nursery allocated:    %s
+       promoted:             %s (%.1f%%)
+       nursery size:         %s (resized %d times)
+    Major collection steps:  %d
+       pauses:               p50 %s, p99 %s, p99.9 %s, max %s
     """ % (self.total_gc_memory, self.peak_memory,
               self.total_arena_memory,
               self.total_rawmalloced_memory,
@@ -111,7 +171,22 @@ class GcStats(object):
            self.jit_backend_allocated,
            extra,
            self.memory_allocated_sum,
-           self.total_gc_time / 1000.0)
+           self.total_gc_time / 1000.0,
+
+           self.minor_collections,
+              self._format_pause(self.minor_pause_p50),
+              self._format_pause(self.minor_pause_p99),
+              self._format_pause(self.minor_pause_p999),
+              self._format_pause(self.minor_pause_max),
+              self._format(self.total_nursery_allocated),
+              self._format(self.total_nursery_promoted),
+              self.survivor_rate * 100.0,
+              self.nursery_size, self.nursery_resizes,
+           self.collect_steps,
+              self._format_pause(self.step_pause_p50),
+              self._format_pause(self.step_pause_p99),
+              self._format_pause(self.step_pause_p999),
+              self._format_pause(self.step_pause_max))
 
 
 def get_stats(memory_pressure=False):
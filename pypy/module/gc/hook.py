@@ -7,6 +7,7 @@ from pypy.interpreter.gateway import interp2app, unwrap_spec, WrappedDefault
 from pypy.interpreter.baseobjspace import W_Root
 from pypy.interpreter.typedef import TypeDef, interp_attrproperty, GetSetProperty
 from pypy.interpreter.executioncontext import AsyncAction
+from pypy.module.gc.allocsample import AllocSampler
 
 inf = float("inf")
 
@@ -24,6 +25,7 @@ class LowLevelGcHooks(GcHooks):
     def __init__(self, space):
         self.space = space
         self.w_hooks = space.fromcache(W_AppLevelHooks)
+        self.sampler = space.fromcache(AllocSampler)
 
     def is_gc_minor_enabled(self):
         return self.w_hooks.gc_minor_enabled
@@ -34,6 +36,9 @@ class LowLevelGcHooks(GcHooks):
     def is_gc_collect_enabled(self):
         return self.w_hooks.gc_collect_enabled
 
+    def get_gc_alloc_sample_interval(self):
+        return self.sampler.interval
+
     def on_gc_minor(self, duration, total_memory_used, pinned_objects):
         action = self.w_hooks.gc_minor
         action.count += 1
@@ -68,6 +73,15 @@ class LowLevelGcHooks(GcHooks):
         action.rawmalloc_bytes_after = rawmalloc_bytes_after
         action.fire()
 
+    def on_gc_alloc_sample_start(self):
+        return self.sampler.take_sample()
+
+    def on_gc_alloc_sample(self, sample, type_index, size):
+        self.sampler.set_type(sample, type_index, size)
+
+    def on_gc_alloc_sample_free(self, sample):
+        self.sampler.free_sample(sample)
+
 
 class W_AppLevelHooks(W_Root):
 
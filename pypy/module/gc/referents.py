@@ -190,6 +190,21 @@ class W_GcStats(W_Root):
         self.peak_rawmalloced_memory = rgc.get_stats(rgc.PEAK_RAWMALLOCED_MEMORY)
         self.nursery_size = rgc.get_stats(rgc.NURSERY_SIZE)
         self.total_gc_time = rgc.get_stats(rgc.TOTAL_GC_TIME)
+        self.minor_collections = rgc.get_stats(rgc.MINOR_COLLECTIONS)
+        self.minor_pause_p50 = rgc.get_stats(rgc.MINOR_PAUSE_P50)
+        self.minor_pause_p99 = rgc.get_stats(rgc.MINOR_PAUSE_P99)
+        self.minor_pause_p999 = rgc.get_stats(rgc.MINOR_PAUSE_P999)
+        self.minor_pause_max = rgc.get_stats(rgc.MINOR_PAUSE_MAX)
+        self.collect_steps = rgc.get_stats(rgc.COLLECT_STEPS)
+        self.step_pause_p50 = rgc.get_stats(rgc.STEP_PAUSE_P50)
+        self.step_pause_p99 = rgc.get_stats(rgc.STEP_PAUSE_P99)
+        self.step_pause_p999 = rgc.get_stats(rgc.STEP_PAUSE_P999)
+        self.step_pause_max = rgc.get_stats(rgc.STEP_PAUSE_MAX)
+        self.total_nursery_allocated = rgc.get_stats(
+            rgc.TOTAL_NURSERY_ALLOCATED)
+        self.total_nursery_promoted = rgc.get_stats(
+            rgc.TOTAL_NURSERY_PROMOTED)
+        self.nursery_resizes = rgc.get_stats(rgc.NURSERY_RESIZES)
 
 W_GcStats.typedef = TypeDef("GcStats",
     total_memory_pressure=interp_attrproperty("total_memory_pressure",
@@ -218,6 +233,32 @@ W_GcStats.typedef = TypeDef("GcStats",
         cls=W_GcStats, wrapfn="newint"),
     total_gc_time=interp_attrproperty("total_gc_time",
         cls=W_GcStats, wrapfn="newint"),
+    minor_collections=interp_attrproperty("minor_collections",
+        cls=W_GcStats, wrapfn="newint"),
+    minor_pause_p50=interp_attrproperty("minor_pause_p50",
+        cls=W_GcStats, wrapfn="newint"),
+    minor_pause_p99=interp_attrproperty("minor_pause_p99",
+        cls=W_GcStats, wrapfn="newint"),
+    minor_pause_p999=interp_attrproperty("minor_pause_p999",
+        cls=W_GcStats, wrapfn="newint"),
+    minor_pause_max=interp_attrproperty("minor_pause_max",
+        cls=W_GcStats, wrapfn="newint"),
+    collect_steps=interp_attrproperty("collect_steps",
+        cls=W_GcStats, wrapfn="newint"),
+    step_pause_p50=interp_attrproperty("step_pause_p50",
+        cls=W_GcStats, wrapfn="newint"),
+    step_pause_p99=interp_attrproperty("step_pause_p99",
+        cls=W_GcStats, wrapfn="newint"),
+    step_pause_p999=interp_attrproperty("step_pause_p999",
+        cls=W_GcStats, wrapfn="newint"),
+    step_pause_max=interp_attrproperty("step_pause_max",
+        cls=W_GcStats, wrapfn="newint"),
+    total_nursery_allocated=interp_attrproperty("total_nursery_allocated",
+        cls=W_GcStats, wrapfn="newint"),
+    total_nursery_promoted=interp_attrproperty("total_nursery_promoted",
+        cls=W_GcStats, wrapfn="newint"),
+    nursery_resizes=interp_attrproperty("nursery_resizes",
+        cls=W_GcStats, wrapfn="newint"),
 )
 
 @unwrap_spec(memory_pressure=bool)
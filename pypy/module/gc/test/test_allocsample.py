@@ -0,0 +1,87 @@
+import pytest
+from pypy.module.gc.hook import LowLevelGcHooks
+from pypy.interpreter.baseobjspace import ObjSpace
+from pypy.interpreter.gateway import interp2app, unwrap_spec
+
+
+class AppTestAllocSampling(object):
+
+    def setup_class(cls):
+        if cls.runappdirect:
+            pytest.skip("these tests cannot work with -A")
+        space = cls.space
+        gchooks = space.fromcache(LowLevelGcHooks)
+
+        def get_gc_alloc_sample_interval(space):
+            return space.newint(gchooks.get_gc_alloc_sample_interval())
+
+        def fire_gc_alloc_sample_start(space):
+            return space.newint(gchooks.fire_gc_alloc_sample_start())
+
+        @unwrap_spec(ObjSpace, int, int, int)
+        def fire_gc_alloc_sample(space, sample, type_index, size):
+            gchooks.fire_gc_alloc_sample(sample, type_index, size)
+
+        @unwrap_spec(ObjSpace, int)
+        def fire_gc_alloc_sample_free(space, sample):
+            gchooks.fire_gc_alloc_sample_free(sample)
+
+        cls.w_get_gc_alloc_sample_interval = space.wrap(
+            interp2app(get_gc_alloc_sample_interval))
+        cls.w_fire_gc_alloc_sample_start = space.wrap(
+            interp2app(fire_gc_alloc_sample_start))
+        cls.w_fire_gc_alloc_sample = space.wrap(
+            interp2app(fire_gc_alloc_sample))
+        cls.w_fire_gc_alloc_sample_free = space.wrap(
+            interp2app(fire_gc_alloc_sample_free))
+
+    def test_start_stop(self):
+        import gc
+        assert self.get_gc_alloc_sample_interval() == 0
+        gc.start_alloc_sampling(4096)
+        assert self.get_gc_alloc_sample_interval() == 4096
+        assert gc.get_alloc_sampling_interval() == 4096
+        gc.stop_alloc_sampling()
+        assert self.get_gc_alloc_sample_interval() == 0
+        assert gc.get_alloc_sampling_interval() == 4096
+        raises(ValueError, gc.start_alloc_sampling, 0)
+
+    def test_samples(self):
+        import gc
+        samples = [self.fire_gc_alloc_sample_start() for i in range(100)]
+        assert sorted(samples) == range(100)
+        # the type is only known at the next minor collection
+        assert gc.get_alloc_samples() == []
+        for i in samples:
+            self.fire_gc_alloc_sample(i, i % 3, 16 * i)
+        for i in samples[::2]:
+            self.fire_gc_alloc_sample_free(i)
+        result = gc.get_alloc_samples()
+        assert len(result) == 50
+        for type_index, size, stack in result:
+            assert size % 32 == 16
+            assert type_index == (size // 16) % 3
+            assert stack == ()     # no vmprof stack when not translated
+        #
+        # the records of the dead samples are reused
+        new = self.fire_gc_alloc_sample_start()
+        assert new in samples[::2]
+        self.fire_gc_alloc_sample(new, 5, 8)
+        assert (5, 8, ()) in gc.get_alloc_samples()
+        for i in samples[1::2] + [new]:
+            self.fire_gc_alloc_sample_free(i)
+        assert gc.get_alloc_samples() == []
+
+    def test_dump_alloc_samples(self):
+        import gc
+        class File(object):
+            def writelines(self, lines):
+                self.data = ''.join(lines)
+        gc.start_alloc_sampling(1000)
+        gc.stop_alloc_sampling()
+        sample = self.fire_gc_alloc_sample_start()
+        self.fire_gc_alloc_sample(sample, 42, 24)
+        f = File()
+        gc.dump_alloc_samples(f)
+        assert f.data == '# interval 1000\n42\t24\n'
+        self.fire_gc_alloc_sample_free(sample)
@@ -2,6 +2,8 @@ from pypy.interpreter.mixedmodule import MixedModule
 
 class Module(MixedModule):
     appleveldefs = {
+        'dump_warmup_profile': 'app_warmup.dump_warmup_profile',
+        'load_warmup_profile': 'app_warmup.load_warmup_profile',
     }
 
     interpleveldefs = {
@@ -17,6 +19,11 @@ class Module(MixedModule):
         'set_trace_too_long_hook': 'interp_resop.set_trace_too_long_hook',
         'get_stats_snapshot': 'interp_resop.get_stats_snapshot',
         'get_stats_asmmemmgr': 'interp_resop.get_stats_asmmemmgr',
+        'record_warmup_profile': 'warmup.record_warmup_profile',
+        'get_warmup_profile': 'warmup.get_warmup_profile',
+        'add_warmup_place': 'warmup.add_warmup_place',
+        'record_guard_stats': 'guardstats.record_guard_stats',
+        'get_guard_stats': 'guardstats.get_guard_stats',
         # those things are disabled because they have bugs, but if
         # they're found to be useful, fix test_ztranslation_jit_stats
         # in the backend first. get_stats_snapshot still produces
@@ -0,0 +1,40 @@
+import pypyjit
+
+
+def dump_warmup_profile(filename):
+    """Write the places where loops were compiled since
+    record_warmup_profile() was called to the given file, one per line,
+    hottest first.  Load it with load_warmup_profile() at the start of
+    another run of the program to compile the loops there sooner."""
+    profile = pypyjit.get_warmup_profile()
+    profile.sort(key=lambda entry: (-entry[4], entry[0], entry[1], entry[3]))
+    f = open(filename, 'w')
+    try:
+        f.write('# pypyjit warm-up profile\n')
+        f.write('# hotness\tbytecode index\tfirst line\tname\tfilename\n')
+        for filename, firstlineno, name, index, hotness in profile:
+            f.write('%d\t%d\t%d\t%s\t%s\n' % (hotness, index, firstlineno,
+                                              name, filename))
+    finally:
+        f.close()
+
+def load_warmup_profile(filename):
+    """Load a file written by dump_warmup_profile().  The places it
+    contains are traced the first time they run, instead of after
+    'threshold' iterations.  This only works for the code objects created
+    after the call, so it should be done at startup, before the modules
+    of the program are imported.  Returns the number of places loaded."""
+    count = 0
+    f = open(filename)
+    try:
+        for line in f:
+            if line.startswith('#'):
+                continue
+            hotness, index, firstlineno, name, filename = (
+                line.rstrip('\n').split('\t', 4))
+            pypyjit.add_warmup_place(filename, int(firstlineno), name,
+                                     int(index))
+            count += 1
+    finally:
+        f.close()
+    return count
@@ -0,0 +1,89 @@
+"""
+Warm-up benchmark for pypyjit.load_warmup_profile().
+
+Runs "requests" that call many different functions with small loops, the
+way a web service does, and prints the time taken by every batch of
+requests until the time per batch is steady.  Compare:
+
+    pypy warmup.py --record /tmp/profile.txt   # writes the profile
+    pypy warmup.py                             # cold start
+    pypy warmup.py --replay /tmp/profile.txt   # replays the profile
+
+The last line printed gives the time to steady state: the time after
+which every batch takes less than 1.2 times the median of the last
+batches.
+"""
+import sys, time
+
+NUM_FUNCTIONS = 300
+NUM_BATCHES = 60
+REQUESTS_PER_BATCH = 10
+
+TEMPLATE = """
+def handler(data):
+    total = 0
+    for i in range(len(data)):
+        x = data[i]
+        if x %% %(mod)d == 0:
+            total += x * %(mul)d
+        else:
+            total -= x >> 1
+    return total
+"""
+
+def make_handlers():
+    handlers = []
+    for n in range(NUM_FUNCTIONS):
+        src = TEMPLATE % {'mod': n % 7 + 2, 'mul': n % 5 + 1}
+        d = {}
+        # the filename must be the same in every run of the benchmark
+        exec compile(src, '<warmup-handler-%d>' % n, 'exec') in d
+        handlers.append(d['handler'])
+    return handlers
+
+def request(handlers, data):
+    total = 0
+    for handler in handlers:
+        total += handler(data)
+    return total
+
+def time_to_steady_state(times):
+    last = sorted(times[-NUM_BATCHES // 4:])
+    median = last[len(last) // 2]
+    i = len(times)
+    while i > 0 and times[i - 1] < median * 1.2:
+        i -= 1
+    return sum(times[:i])
+
+def main(args):
+    record = replay = None
+    if args[:1] == ['--record']:
+        record = args[1]
+    elif args[:1] == ['--replay']:
+        replay = args[1]
+    if record or replay:
+        import pypyjit
+    if replay:
+        print 'loaded %d places' % pypyjit.load_warmup_profile(replay)
+    if record:
+        pypyjit.record_warmup_profile()
+    #
+    t_start = time.time()
+    handlers = make_handlers()
+    data = range(200)
+    times = []
+    for batch in range(NUM_BATCHES):
+        t0 = time.time()
+        for i in range(REQUESTS_PER_BATCH):
+            request(handlers, data)
+        times.append(time.time() - t0)
+        print 'batch %2d: %.2f ms' % (batch, times[-1] * 1000.0)
+    print 'total: %.3f s' % (time.time() - t_start,)
+    #
+    if record:
+        pypyjit.dump_warmup_profile(record)
+        print 'profile written to %s' % (record,)
+    print 'time to steady state: %.3f s' % (time_to_steady_state(times),)
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,168 @@
+"""
+Guard statistics: for every live loop, how many times each of its guards
+failed, where the guard comes from in the Python source, and how many
+bridges and how much machine code the loop has.
+
+While recording, the compile hooks store the guards of every loop and
+bridge compiled, with the position of the last debug_merge_point that
+precedes them.  The failure counts are not copied: they are read from
+the guard descrs when get_guard_stats() is called, so the JIT itself
+pays nothing for it, and polling only costs the building of the result.
+A guard stops counting its failures when a bridge is attached to it, so
+each guard also reports the failures of the guards of its bridge, and of
+the bridges attached to them, recursively.
+A loop is forgotten as soon as the memory manager frees it.
+"""
+
+import weakref
+from rpython.rlib.objectmodel import compute_unique_id
+from rpython.tool.error import offset2lineno
+from pypy.interpreter.gateway import unwrap_spec
+from pypy.module.pypyjit.interp_resop import unwrap_pypy_greenkey
+
+
+class GuardInfo(object):
+    def __init__(self, descr, opname, pycode, next_instr):
+        self.descr = descr
+        self.opname = opname
+        self.pycode = pycode         # None if not in Python code
+        self.next_instr = next_instr
+        self.has_bridge = False
+        self.bridge_guards = []   # the GuardInfos of the attached bridge
+
+    def get_bridge_failures(self):
+        total = 0
+        for guard in self.bridge_guards:
+            total += guard.descr.get_fail_count()
+            total += guard.get_bridge_failures()
+        return total
+
+
+class LoopInfo(object):
+    def __init__(self, looptoken, location):
+        self.wref = weakref.ref(looptoken)
+        self.location = location
+        self.asmlen = 0
+        self.bridges = 0
+        self.guards = []      # list of GuardInfo, of the loop and bridges
+
+
+class GuardStats(object):
+
+    def __init__(self, space):
+        self.recording = False
+        self.loops = {}       # {loop number: LoopInfo}
+
+    def is_active(self):
+        return self.recording
+
+    def remove_dead_loops(self):
+        for loop_no, loop in self.loops.items():
+            if loop.wref() is None:
+                del self.loops[loop_no]
+
+    def record(self, debug_info, is_bridge):
+        looptoken = debug_info.looptoken
+        assert looptoken is not None
+        loop = self.loops.get(looptoken.number, None)
+        pycode = None
+        next_instr = -1
+        parent = None
+        if is_bridge:
+            if loop is None:
+                return      # loop compiled before recording started
+            loop.bridges += 1
+            for guard in loop.guards:
+                if guard.descr is debug_info.fail_descr:
+                    guard.has_bridge = True
+                    pycode = guard.pycode
+                    next_instr = guard.next_instr
+                    parent = guard
+        else:
+            if loop is None:
+                self.remove_dead_loops()
+                loop = LoopInfo(looptoken, debug_info.get_greenkey_repr())
+                self.loops[looptoken.number] = loop
+            if debug_info.get_jitdriver().name == 'pypyjit':
+                next_instr, pycode = unwrap_pypy_greenkey(debug_info.greenkey)
+        if debug_info.asminfo is not None:
+            loop.asmlen += debug_info.asminfo.asmlen
+        self._record_guards(loop, debug_info, pycode, next_instr, parent)
+
+    def _record_guards(self, loop, debug_info, pycode, next_instr, parent):
+        from rpython.jit.metainterp.resoperation import rop
+        jitdrivers_sd = debug_info.logger.metainterp_sd.jitdrivers_sd
+        for op in debug_info.operations:
+            if op.getopnum() == rop.DEBUG_MERGE_POINT:
+                jd_sd = jitdrivers_sd[op.getarg(0).getint()]
+                if jd_sd.jitdriver.name == 'pypyjit':
+                    next_instr, pycode = unwrap_pypy_greenkey(
+                        op.getarglist()[3:])
+                else:
+                    pycode = None
+                    next_instr = -1
+            elif op.is_guard():
+                descr = op.getdescr()
+                if descr is not None:
+                    guard = GuardInfo(descr, op.getopname(), pycode,
+                                      next_instr)
+                    loop.guards.append(guard)
+                    if parent is not None:
+                        parent.bridge_guards.append(guard)
+
+
+@unwrap_spec(enable=bool)
+def record_guard_stats(space, enable=True):
+    """Start or stop recording the guards of the loops and bridges
+    compiled, for get_guard_stats().  Stopping forgets all loops."""
+    guardstats = space.fromcache(GuardStats)
+    guardstats.recording = enable
+    if not enable:
+        guardstats.loops.clear()
+
+def wrap_guard(space, guard):
+    pycode = guard.pycode
+    if pycode is None:
+        w_location = space.w_None
+    else:
+        lineno = offset2lineno(pycode, guard.next_instr)
+        w_location = space.newtuple([space.newtext(pycode.co_filename),
+                                     space.newint(lineno),
+                                     space.newtext(pycode.co_name)])
+    return space.newtuple([space.newint(compute_unique_id(guard.descr)),
+                           space.newtext(guard.opname),
+                           space.newint(guard.descr.get_fail_count()),
+                           space.newbool(guard.has_bridge),
+                           space.newint(guard.get_bridge_failures()),
+                           w_location])
+
+@unwrap_spec(all_guards=bool)
+def get_guard_stats(space, all_guards=False):
+    """Return the statistics of the live loops compiled since
+    record_guard_stats() was called, as a list of tuples
+    (loop_no, location, asmlen, bridges, num_guards, guards), where
+    'asmlen' is the size of the machine code of the loop and its bridges
+    and 'guards' is a list of tuples
+    (guard_no, name, failures, has_bridge, bridge_failures,
+     (filename, lineno, funcname)).
+
+    'guard_no' is the same as the 'bridge_no' of the JitLoopInfo of a
+    bridge attached to that guard.  The failures after a bridge has been
+    attached are not counted in 'failures'; 'bridge_failures' is the
+    total of the failures of the guards of that bridge, and of the
+    bridges attached to them.  Only the guards that failed at least once
+    are returned, unless 'all_guards' is true.
+    """
+    guardstats = space.fromcache(GuardStats)
+    guardstats.remove_dead_loops()
+    result_w = []
+    for loop_no, loop in guardstats.loops.items():
+        guards_w = []
+        for guard in loop.guards:
+            if all_guards or guard.descr.get_fail_count() > 0:
+                guards_w.append(wrap_guard(space, guard))
+        result_w.append(space.newtuple([
+            space.newint(loop_no), space.newtext(loop.location),
+            space.newint(loop.asmlen), space.newint(loop.bridges),
+            space.newint(len(loop.guards)), space.newlist(guards_w)]))
+    return space.newlist(result_w)
@@ -4,7 +4,9 @@ from rpython.rlib.jit import JitHookInterface, Counters
 
 from pypy.interpreter.error import OperationError
 from pypy.module.pypyjit.interp_resop import (Cache, wrap_greenkey,
-    WrappedOp, W_JitLoopInfo, wrap_oplist)
+    WrappedOp, W_JitLoopInfo, wrap_oplist, unwrap_pypy_greenkey)
+from pypy.module.pypyjit.warmup import WarmupProfile
+from pypy.module.pypyjit.guardstats import GuardStats
 
 class PyPyJitIface(JitHookInterface):
     def are_hooks_enabled(self):
@@ -12,7 +14,9 @@ class PyPyJitIface(JitHookInterface):
         cache = space.fromcache(Cache)
         return (cache.w_compile_hook is not None or
                 cache.w_abort_hook is not None or
-                cache.w_trace_too_long_hook is not None)
+                cache.w_trace_too_long_hook is not None or
+                space.fromcache(WarmupProfile).is_active() or
+                space.fromcache(GuardStats).is_active())
 
 
     def on_abort(self, reason, jitdriver, greenkey, greenkey_repr, logops, operations):
@@ -67,6 +71,10 @@ class PyPyJitIface(JitHookInterface):
 
     def _compile_hook(self, debug_info, is_bridge):
         space = self.space
+        self._warmup_hook(debug_info, is_bridge)
+        guardstats = space.fromcache(GuardStats)
+        if guardstats.is_active():
+            guardstats.record(debug_info, is_bridge)
         cache = space.fromcache(Cache)
         if cache.in_recursion:
             return
@@ -83,4 +91,15 @@ class PyPyJitIface(JitHookInterface):
             finally:
                 cache.in_recursion = False
 
+    def _warmup_hook(self, debug_info, is_bridge):
+        warmup = self.space.fromcache(WarmupProfile)
+        if not warmup.is_active():
+            return
+        if (not is_bridge and
+                debug_info.get_jitdriver().name == 'pypyjit' and
+                debug_info.greenkey[1].getint() == 0):  # not is_being_profiled
+            next_instr, pycode = unwrap_pypy_greenkey(debug_info.greenkey)
+            warmup.record_loop(pycode, next_instr)
+        warmup.rearm()
+
 pypy_hooks = PyPyJitIface()
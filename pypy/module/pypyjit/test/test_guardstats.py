@@ -0,0 +1,182 @@
+import py
+from pypy.interpreter.gateway import interp2app, unwrap_spec
+from rpython.jit.metainterp.history import JitCellToken, ConstInt, ConstPtr
+from rpython.jit.metainterp.compile import ResumeGuardDescr
+from rpython.jit.metainterp.logger import Logger
+from rpython.jit.tool.oparser import parse
+from rpython.rtyper.annlowlevel import cast_instance_to_base_ptr
+from rpython.rtyper.lltypesystem import lltype, llmemory
+from rpython.rlib.jit import JitDebugInfo, AsmInfo
+from rpython.tool.error import offset2lineno
+from pypy.module.pypyjit.hooks import pypy_hooks
+from pypy.module.pypyjit.guardstats import GuardStats
+from pypy.module.pypyjit.test.test_jit_hook import MockJitDriverSD, MockSD
+
+
+class AppTestGuardStats(object):
+    spaceconfig = dict(usemodules=('pypyjit',))
+
+    def setup_class(cls):
+        if cls.runappdirect:
+            py.test.skip("Can't run this test with -A")
+        space = cls.space
+        w_f = space.appexec([], """():
+        def function(a):
+            x = a + 1
+            return x
+        return function
+        """)
+        pycode = w_f.code
+        last_instr = len(pycode.co_code) - 1
+        ll_code = cast_instance_to_base_ptr(pycode)
+        code_gcref = lltype.cast_opaque_ptr(llmemory.GCREF, ll_code)
+        logger = Logger(MockSD())
+        greenkey = [ConstInt(0), ConstInt(0), ConstPtr(code_gcref)]
+        cls.tokens = tokens = []
+        cls.descrs = descrs = []
+
+        def on_compile(space):
+            oplist = parse("""
+            [i1, p2]
+            debug_merge_point(0, 0, 0, 0, 0, ConstPtr(ptr0))
+            guard_nonnull(p2) []
+            debug_merge_point(0, 0, 0, %d, 0, ConstPtr(ptr0))
+            guard_true(i1) []
+            """ % last_instr, namespace={'ptr0': code_gcref}).operations
+            for op in oplist:
+                if op.is_guard():
+                    descr = ResumeGuardDescr()
+                    op.setdescr(descr)
+                    descrs.append(descr)
+            token = JitCellToken()
+            token.number = len(tokens)
+            tokens.append(token)
+            di_loop = JitDebugInfo(MockJitDriverSD, logger, token, oplist,
+                                   'loop', greenkey)
+            di_loop.asminfo = AsmInfo({}, 0x42, 120)
+            if pypy_hooks.are_hooks_enabled():
+                pypy_hooks.after_compile(di_loop)
+
+        @unwrap_spec(guard_index=int)
+        def on_compile_bridge(space, guard_index):
+            oplist = parse("""
+            [i1]
+            guard_false(i1) []
+            """).operations
+            descr = ResumeGuardDescr()
+            oplist[-1].setdescr(descr)
+            di_bridge = JitDebugInfo(MockJitDriverSD, logger, tokens[-1],
+                                     oplist, 'bridge',
+                                     fail_descr=descrs[guard_index])
+            di_bridge.asminfo = AsmInfo({}, 0x420, 30)
+            descrs.append(descr)
+            if pypy_hooks.are_hooks_enabled():
+                pypy_hooks.after_compile_bridge(di_bridge)
+
+        @unwrap_spec(guard_index=int, count=int)
+        def fail(space, guard_index, count):
+            descrs[guard_index].fail_count += count
+
+        def free_loops(space):
+            del tokens[:]
+
+        cls.w_on_compile = space.wrap(interp2app(on_compile))
+        cls.w_on_compile_bridge = space.wrap(interp2app(on_compile_bridge))
+        cls.w_fail = space.wrap(interp2app(fail))
+        cls.w_free_loops = space.wrap(interp2app(free_loops))
+        cls.w_f = w_f
+        cls.w_lineno_first = space.wrap(offset2lineno(pycode, 0))
+        cls.w_lineno_last = space.wrap(offset2lineno(pycode, last_instr))
+
+    def setup_method(self, meth):
+        space = self.space
+        space.fromcache(GuardStats).__init__(space)
+        del self.tokens[:]
+        del self.descrs[:]
+
+    def teardown_method(self, meth):
+        space = self.space
+        space.fromcache(GuardStats).__init__(space)
+
+    def test_record(self):
+        import pypyjit
+        self.on_compile()
+        assert pypyjit.get_guard_stats() == []
+        pypyjit.record_guard_stats()
+        self.on_compile()
+        [(loop_no, location, asmlen, bridges, num_guards, guards)] = (
+            pypyjit.get_guard_stats())
+        assert loop_no == 1
+        assert location == 'function'
+        assert asmlen == 120
+        assert bridges == 0
+        assert num_guards == 2
+        assert guards == []
+        #
+        self.fail(3, 5)
+        [(_, _, _, _, _, guards)] = pypyjit.get_guard_stats()
+        [(guard_no, name, failures, has_bridge, bridge_failures,
+          location)] = guards
+        assert name == 'guard_true'
+        assert failures == 5
+        assert not has_bridge
+        assert bridge_failures == 0
+        code = self.f.__code__
+        assert location == (code.co_filename, self.lineno_last, 'function')
+        #
+        [(_, _, _, _, _, guards)] = pypyjit.get_guard_stats(all_guards=True)
+        assert [guard[1:] for guard in guards] == [
+            ('guard_nonnull', 0, False, 0,
+             (code.co_filename, self.lineno_first, 'function')),
+            ('guard_true', 5, False, 0,
+             (code.co_filename, self.lineno_last, 'function'))]
+        #
+        pypyjit.record_guard_stats(False)
+        assert pypyjit.get_guard_stats() == []
+
+    def test_bridge(self):
+        import pypyjit
+        pypyjit.record_guard_stats()
+        self.on_compile()
+        self.fail(1, 2)
+        self.on_compile_bridge(1)
+        self.fail(2, 1)
+        [(_, _, asmlen, bridges, num_guards, guards)] = (
+            pypyjit.get_guard_stats())
+        assert asmlen == 120 + 30
+        assert bridges == 1
+        assert num_guards == 3
+        [guard, bridge_guard] = guards
+        assert guard[1:5] == ('guard_true', 2, True, 1)
+        # the guards of the bridge are at the position of its guard
+        # until the next debug_merge_point
+        assert bridge_guard[1:5] == ('guard_false', 1, False, 0)
+        assert bridge_guard[5] == guard[5]
+
+    def test_bridge_chain(self):
+        import pypyjit
+        pypyjit.record_guard_stats()
+        self.on_compile()
+        self.fail(1, 200)
+        self.on_compile_bridge(1)
+        self.fail(2, 200)
+        self.on_compile_bridge(2)
+        self.fail(3, 50)
+        [(_, _, _, bridges, _, guards)] = pypyjit.get_guard_stats()
+        assert bridges == 2
+        # the failures stop being counted when a bridge is attached, but
+        # the failures in the chain of bridges are reported
+        assert [guard[1:5] for guard in guards] == [
+            ('guard_true', 200, True, 250),
+            ('guard_false', 200, True, 50),
+            ('guard_false', 50, False, 0)]
+
+    def test_dead_loops(self):
+        import pypyjit, gc
+        pypyjit.record_guard_stats()
+        self.on_compile()
+        self.on_compile()
+        assert len(pypyjit.get_guard_stats()) == 2
+        self.free_loops()
+        gc.collect()
+        assert pypyjit.get_guard_stats() == []
@@ -0,0 +1,137 @@
+import py
+from pypy.interpreter.gateway import interp2app, unwrap_spec
+from pypy.interpreter.pycode import PyCode, CodeHookCache
+from rpython.jit.metainterp.history import JitCellToken, ConstInt, ConstPtr
+from rpython.rtyper.annlowlevel import cast_instance_to_base_ptr
+from rpython.rtyper.lltypesystem import lltype, llmemory
+from rpython.rlib.jit import JitDebugInfo
+from pypy.module.pypyjit.interp_jit import pypyjitdriver
+from pypy.module.pypyjit.hooks import pypy_hooks
+from pypy.module.pypyjit import warmup
+from pypy.module.pypyjit.interp_resop import Cache
+
+
+class MockJitDriverSD(object):
+    jitdriver = pypyjitdriver
+
+
+class AppTestWarmup(object):
+    spaceconfig = dict(usemodules=('pypyjit',))
+
+    def setup_class(cls):
+        if cls.runappdirect:
+            py.test.skip("Can't run this test with -A")
+        space = cls.space
+        cls.armed = armed = []
+
+        def fake_trace_next_iteration(pycode, next_instr):
+            armed.append((pycode.co_name, next_instr))
+        cls.orig_trace_next_iteration = warmup._trace_next_iteration
+        warmup._trace_next_iteration = fake_trace_next_iteration
+
+        @unwrap_spec(next_instr=int, is_being_profiled=int)
+        def on_compile(space, w_func, next_instr, is_being_profiled=0):
+            ll_code = cast_instance_to_base_ptr(w_func.code)
+            code_gcref = lltype.cast_opaque_ptr(llmemory.GCREF, ll_code)
+            greenkey = [ConstInt(next_instr), ConstInt(is_being_profiled),
+                        ConstPtr(code_gcref)]
+            di_loop = JitDebugInfo(MockJitDriverSD, None, JitCellToken(), [],
+                                   'loop', greenkey)
+            if pypy_hooks.are_hooks_enabled():
+                pypy_hooks.after_compile(di_loop)
+
+        def on_compile_bridge(space):
+            di_bridge = JitDebugInfo(MockJitDriverSD, None, JitCellToken(),
+                                     [], 'bridge', fail_descr=object())
+            if pypy_hooks.are_hooks_enabled():
+                pypy_hooks.after_compile_bridge(di_bridge)
+
+        def get_armed(space):
+            w_result = space.newlist([space.newtuple([space.newtext(name),
+                                                      space.newint(index)])
+                                      for name, index in armed])
+            del armed[:]
+            return w_result
+
+        cls.w_on_compile = space.wrap(interp2app(on_compile))
+        cls.w_on_compile_bridge = space.wrap(interp2app(on_compile_bridge))
+        cls.w_get_armed = space.wrap(interp2app(get_armed))
+        cls.w_tmpfile = space.wrap(str(py.test.ensuretemp('warmup')
+                                       .join('profile.txt')))
+
+    def teardown_class(cls):
+        warmup._trace_next_iteration = cls.orig_trace_next_iteration
+
+    def setup_method(self, meth):
+        space = self.space
+        space.fromcache(warmup.WarmupProfile).__init__(space)
+        space.fromcache(CodeHookCache)._interp_code_hook = None
+        space.fromcache(Cache).__init__(space)     # no compile hook
+        del self.armed[:]
+
+    def test_record(self):
+        import pypyjit
+        def f():
+            pass
+        self.on_compile(f, 10)
+        assert pypyjit.get_warmup_profile() == []
+        pypyjit.record_warmup_profile()
+        self.on_compile(f, 10)
+        self.on_compile(f, 10)
+        self.on_compile(f, 0)
+        self.on_compile(f, 4, 1)      # is_being_profiled: ignored
+        self.on_compile_bridge()
+        code = f.__code__
+        assert sorted(pypyjit.get_warmup_profile()) == [
+            (code.co_filename, code.co_firstlineno, 'f', 0, 1),
+            (code.co_filename, code.co_firstlineno, 'f', 10, 2)]
+        pypyjit.record_warmup_profile(False)
+        self.on_compile(f, 10)
+        assert len(pypyjit.get_warmup_profile()) == 2
+
+    def test_dump_and_load(self):
+        import pypyjit
+        def f():
+            pass
+        pypyjit.record_warmup_profile()
+        self.on_compile(f, 0)
+        self.on_compile(f, 3)
+        self.on_compile(f, 3)
+        pypyjit.record_warmup_profile(False)
+        pypyjit.dump_warmup_profile(self.tmpfile)
+        lines = open(self.tmpfile).readlines()
+        code = f.__code__
+        assert lines[2:] == [
+            '2\t3\t%d\tf\t%s\n' % (code.co_firstlineno, code.co_filename),
+            '1\t0\t%d\tf\t%s\n' % (code.co_firstlineno, code.co_filename)]
+        #
+        # load it, changing the filename
+        with open(self.tmpfile, 'w') as f:
+            f.write(''.join(lines).replace(code.co_filename, 'warmup.py'))
+        assert pypyjit.load_warmup_profile(self.tmpfile) == 2
+        assert self.get_armed() == []
+        src = '\n' * (code.co_firstlineno - 1) + 'def f():\n    return 42\n'
+        d = {}
+        exec compile(src, 'warmup.py', 'exec') in d
+        assert sorted(self.get_armed()) == [('f', 0), ('f', 3)]
+        # another code object with the same name is not armed
+        exec compile(src, 'warmup.py', 'exec') in {}
+        assert self.get_armed() == []
+        #
+        # the places not compiled yet are armed again after compiling
+        self.on_compile_bridge()
+        assert sorted(self.get_armed()) == [('f', 0), ('f', 3)]
+        self.on_compile(d['f'], 3)
+        assert self.get_armed() == [('f', 0)]
+        self.on_compile(d['f'], 0)
+        assert self.get_armed() == []
+        self.on_compile_bridge()
+        assert self.get_armed() == []
+
+    def test_load_out_of_range(self):
+        import pypyjit
+        with open(self.tmpfile, 'w') as f:
+            f.write('1\t10000\t1\tg\twarmup2.py\n')
+        pypyjit.load_warmup_profile(self.tmpfile)
+        exec compile('def g():\n    pass\n', 'warmup2.py', 'exec') in {}
+        assert self.get_armed() == []
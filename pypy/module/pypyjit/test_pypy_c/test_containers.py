@@ -106,6 +106,27 @@ class TestDicts(BaseTestPyPyC):
             jump(..., descr=...)
         """)
 
+    def test_virtual_dict_str_keys(self):
+        def main(n):
+            def helper(d):
+                return d['a'] + d['b'] + len(d.keys()) + d.values()[1]
+            i = 0
+            total = 0
+            while i < n:
+                d = {'a': i, 'b': 2}
+                total += helper(d)
+                i += 1
+            return total
+
+        log = self.run(main, [1000])
+        assert log.result == main(1000)
+        loop, = log.loops_by_filename(self.filepath)
+        opnames = log.opnames(loop.allops())
+        assert 'new' not in opnames
+        assert 'new_array_clear' not in opnames
+        assert 'call_r' not in opnames
+        assert 'call_i' not in opnames
+
 
 
 class TestOtherContainers(BaseTestPyPyC):
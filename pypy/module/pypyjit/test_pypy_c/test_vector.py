@@ -0,0 +1,120 @@
+import py
+from pypy.module.pypyjit.test_pypy_c.test_00_model import BaseTestPyPyC
+from pypy.module.pypyjit.test_pypy_c.test_micronumpy import no_vector_backend
+
+
+class TestVectorize(BaseTestPyPyC):
+    """ Elementwise loops over array.array('d') and over the float or int
+    list strategies are vectorized with vec_all, without going through
+    numpy.  Reductions (sum, dot product, min/max) stay scalar. """
+
+    def run_vec(self, main, args):
+        log = self.run(main, args, vec_all=0)
+        vlog = self.run(main, args, vec_all=1)
+        assert vlog.result == log.result
+        if log.jit_summary:
+            assert log.jit_summary.vecopt_tried == 0
+            assert vlog.jit_summary.vecopt_success > 0
+        return vlog
+
+    def vector_opnames(self, log):
+        opnames = []
+        for loop in log.loops_by_filename(self.filepath):
+            opnames += log.opnames(loop.allops())
+        return opnames
+
+    @py.test.mark.skipif('no_vector_backend()')
+    def test_array_float_add(self):
+        def main(n):
+            from array import array
+            a = array('d', [float(i) for i in range(n)])
+            b = array('d', [0.5] * n)
+            c = array('d', [0.0] * n)
+            i = 0
+            while i < n:
+                c[i] = a[i] + b[i]
+                i += 1
+            return sum(c)
+        log = self.run_vec(main, [3000])
+        assert log.result == main(3000)
+        opnames = self.vector_opnames(log)
+        assert 'vec_load_f' in opnames
+        assert 'vec_float_add' in opnames
+        assert 'vec_store' in opnames
+
+    @py.test.mark.skipif('no_vector_backend()')
+    def test_array_float_mul(self):
+        def main(n):
+            from array import array
+            a = array('d', [float(i) for i in range(n)])
+            b = array('d', [1.5] * n)
+            i = 0
+            while i < n:
+                b[i] = a[i] * b[i]
+                i += 1
+            return sum(b)
+        log = self.run_vec(main, [3000])
+        assert log.result == main(3000)
+        assert 'vec_float_mul' in self.vector_opnames(log)
+
+    @py.test.mark.skipif('no_vector_backend()')
+    def test_float_list_add(self):
+        def main(n):
+            a = [float(i) for i in range(n)]
+            b = [0.25] * n
+            c = [0.0] * n
+            i = 0
+            while i < n:
+                c[i] = a[i] + b[i]
+                i += 1
+            return sum(c)
+        log = self.run_vec(main, [3000])
+        assert log.result == main(3000)
+        opnames = self.vector_opnames(log)
+        assert 'vec_load_f' in opnames
+        assert 'vec_float_add' in opnames
+
+    @py.test.mark.skipif('no_vector_backend()')
+    def test_int_list_and(self):
+        def main(n):
+            a = [i for i in range(n)]
+            b = [0xff] * n
+            c = [0] * n
+            i = 0
+            while i < n:
+                c[i] = a[i] & b[i]
+                i += 1
+            return sum(c)
+        log = self.run_vec(main, [3000])
+        assert log.result == main(3000)
+        assert 'vec_int_and' in self.vector_opnames(log)
+
+    @py.test.mark.skipif('no_vector_backend()')
+    def test_float_list_sum_stays_scalar(self):
+        # reordering the additions could change the result
+        def main(n):
+            a = [float(i) / 3.0 for i in range(n)]
+            s = 0.0
+            i = 0
+            while i < n:
+                s += a[i]
+                i += 1
+            return s
+        log = self.run(main, [3000], vec_all=1)
+        assert log.result == main(3000)
+        assert 'vec_float_add' not in self.vector_opnames(log)
+
+    @py.test.mark.skipif('no_vector_backend()')
+    def test_int_list_sum_stays_scalar(self):
+        # the additions are int_add_ovf, which are not vectorized
+        def main(n):
+            a = [i for i in range(n)]
+            s = 0
+            i = 0
+            while i < n:
+                s += a[i]
+                i += 1
+            return s
+        log = self.run(main, [3000], vec_all=1)
+        assert log.result == main(3000)
+        assert 'vec_int_add' not in self.vector_opnames(log)
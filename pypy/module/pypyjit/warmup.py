@@ -0,0 +1,131 @@
+"""
+Warm-up profiles: the places where loops were compiled in a previous run
+of the program, to trace them as soon as they run in the next one.
+
+While recording, every loop compiled by the JIT adds its green key to the
+profile, with the number of loops compiled there as 'hotness'.  The green
+key is saved as the code object's filename, first line number and name,
+plus the bytecode index.  When a profile is loaded, every code object
+created afterwards that matches one of its keys has the JIT counters of
+these places set close to the threshold, so that they are traced the
+next time they run, instead of after 'threshold' iterations.
+
+The counters are regularly decayed, and entries of the table of counters
+can be reused by other places.  To make up for that, the places whose
+code object was created but that were not compiled yet are armed again
+after every loop or bridge compiled, which is when counters decay the
+most.
+"""
+
+import weakref
+from rpython.rlib import jit_hooks
+from rpython.rlib.rarithmetic import r_uint
+from rpython.rtyper.annlowlevel import cast_instance_to_gcref
+from pypy.interpreter.gateway import unwrap_spec
+from pypy.interpreter.pycode import CodeHookCache
+
+
+def _trace_next_iteration(pycode, next_instr):
+    ll_pycode = cast_instance_to_gcref(pycode)
+    jit_hooks.trace_next_iteration('pypyjit', r_uint(next_instr), 0,
+                                   ll_pycode)
+
+
+class ArmedCode(object):
+    def __init__(self, pycode, next_instrs):
+        self.wref = weakref.ref(pycode)
+        self.next_instrs = next_instrs
+
+
+class WarmupProfile(object):
+
+    def __init__(self, space):
+        self.recording = False
+        # {(filename, firstlineno, name, next_instr): hotness}
+        self.recorded = {}
+        # the places loaded from a profile whose code object was not
+        # created yet: {(filename, firstlineno, name): [next_instr]}
+        self.pending = {}
+        # the places whose code object exists, not compiled yet
+        self.armed = []      # list of ArmedCode
+
+    def is_active(self):
+        return self.recording or len(self.pending) > 0 or len(self.armed) > 0
+
+    def record_loop(self, pycode, next_instr):
+        if self.recording:
+            key = (pycode.co_filename, pycode.co_firstlineno, pycode.co_name,
+                   next_instr)
+            self.recorded[key] = self.recorded.get(key, 0) + 1
+        for armed in self.armed:
+            if armed.wref() is pycode and next_instr in armed.next_instrs:
+                armed.next_instrs.remove(next_instr)
+
+    def load(self, filename, firstlineno, name, next_instr):
+        key = (filename, firstlineno, name)
+        try:
+            lst = self.pending[key]
+        except KeyError:
+            lst = self.pending[key] = []
+        if next_instr not in lst:
+            lst.append(next_instr)
+
+    def code_created(self, pycode):
+        if not self.pending:
+            return
+        key = (pycode.co_filename, pycode.co_firstlineno, pycode.co_name)
+        try:
+            lst = self.pending[key]
+        except KeyError:
+            return
+        # only the first code object created with this key is armed
+        del self.pending[key]
+        next_instrs = []
+        for next_instr in lst:
+            if 0 <= next_instr < len(pycode.co_code):
+                next_instrs.append(next_instr)
+                _trace_next_iteration(pycode, next_instr)
+        if next_instrs:
+            self.armed.append(ArmedCode(pycode, next_instrs))
+
+    def rearm(self):
+        i = 0
+        while i < len(self.armed):
+            armed = self.armed[i]
+            pycode = armed.wref()
+            if pycode is None or not armed.next_instrs:
+                del self.armed[i]
+                continue
+            for next_instr in armed.next_instrs:
+                _trace_next_iteration(pycode, next_instr)
+            i += 1
+
+
+@unwrap_spec(enable=bool)
+def record_warmup_profile(space, enable=True):
+    """Start or stop recording the places where loops are compiled, to be
+    returned by get_warmup_profile()."""
+    space.fromcache(WarmupProfile).recording = enable
+
+def get_warmup_profile(space):
+    """Return the places where loops were compiled since
+    record_warmup_profile() was called, as a list of tuples
+    (filename, firstlineno, name, bytecode_index, hotness), where
+    'hotness' is the number of loops compiled there."""
+    warmup = space.fromcache(WarmupProfile)
+    result_w = []
+    for key, hotness in warmup.recorded.items():
+        filename, firstlineno, name, next_instr = key
+        result_w.append(space.newtuple([
+            space.newtext(filename), space.newint(firstlineno),
+            space.newtext(name), space.newint(next_instr),
+            space.newint(hotness)]))
+    return space.newlist(result_w)
+
+@unwrap_spec(filename='text', firstlineno=int, name='text', next_instr=int)
+def add_warmup_place(space, filename, firstlineno, name, next_instr):
+    """Trace the given place as soon as it runs, if the code object is
+    created after this call.  See load_warmup_profile()."""
+    warmup = space.fromcache(WarmupProfile)
+    warmup.load(filename, firstlineno, name, next_instr)
+    space.fromcache(CodeHookCache)._interp_code_hook = warmup
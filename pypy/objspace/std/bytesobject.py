@@ -1,6 +1,6 @@
 """The builtin str implementation"""
 
-from rpython.rlib import jit, rutf8
+from rpython.rlib import jit, rope, rutf8
 from rpython.rlib.objectmodel import (
     compute_hash, compute_unique_id, import_from_mixin)
 from rpython.rlib.buffer import StringBuffer
@@ -17,9 +17,10 @@ from pypy.objspace.std.basestringtype import basestring_typedef
 from pypy.objspace.std.formatting import mod_format
 from pypy.objspace.std.stringmethods import StringMethods
 from pypy.objspace.std.unicodeobject import (
-    decode_object, unicode_from_encoded_object,
+    LAZY_CONCAT_MIN_SIZE, decode_object, unicode_from_encoded_object,
     getdefaultencoding, unicode_from_string)
-from pypy.objspace.std.util import IDTAG_SPECIAL, IDTAG_SHIFT
+from pypy.objspace.std.util import (
+    IDTAG_SPECIAL, IDTAG_SHIFT, forward_to_flat)
 
 
 class W_AbstractBytesObject(W_Root):
@@ -435,12 +436,16 @@ class W_AbstractBytesObject(W_Root):
 
 class W_BytesObject(W_AbstractBytesObject):
     import_from_mixin(StringMethods)
+    # long concatenations are W_LazyBytesObject, see descr_add()
     _immutable_fields_ = ['_value']
 
     def __init__(self, str):
         assert str is not None
         self._value = str
 
+    def _flat(self):
+        return self
+
     def __repr__(self):
         """representation for debugging purposes"""
         return "%s(%r)" % (self.__class__.__name__, self._value)
@@ -614,32 +619,32 @@ class W_BytesObject(W_AbstractBytesObject):
     def descr_eq(self, space, w_other):
         if not isinstance(w_other, W_BytesObject):
             return space.w_NotImplemented
-        return space.newbool(self._value == w_other._value)
+        return space.newbool(self._value == w_other._flat()._value)
 
     def descr_ne(self, space, w_other):
         if not isinstance(w_other, W_BytesObject):
             return space.w_NotImplemented
-        return space.newbool(self._value != w_other._value)
+        return space.newbool(self._value != w_other._flat()._value)
 
     def descr_lt(self, space, w_other):
         if not isinstance(w_other, W_BytesObject):
             return space.w_NotImplemented
-        return space.newbool(self._value < w_other._value)
+        return space.newbool(self._value < w_other._flat()._value)
 
     def descr_le(self, space, w_other):
         if not isinstance(w_other, W_BytesObject):
             return space.w_NotImplemented
-        return space.newbool(self._value <= w_other._value)
+        return space.newbool(self._value <= w_other._flat()._value)
 
     def descr_gt(self, space, w_other):
         if not isinstance(w_other, W_BytesObject):
             return space.w_NotImplemented
-        return space.newbool(self._value > w_other._value)
+        return space.newbool(self._value > w_other._flat()._value)
 
     def descr_ge(self, space, w_other):
         if not isinstance(w_other, W_BytesObject):
             return space.w_NotImplemented
-        return space.newbool(self._value >= w_other._value)
+        return space.newbool(self._value >= w_other._flat()._value)
 
     # auto-conversion fun
 
@@ -654,6 +659,10 @@ class W_BytesObject(W_AbstractBytesObject):
             from .bytearrayobject import W_BytearrayObject, _make_data
             self_as_bytearray = W_BytearrayObject(_make_data(self._value))
             return space.add(self_as_bytearray, w_other)
+        elif isinstance(w_other, W_BytesObject):
+            if self._len() + w_other._len() >= LAZY_CONCAT_MIN_SIZE:
+                return W_LazyBytesObject(rope.lazy_concat(
+                    self._value, w_other._flat()._value))
         return self._StringMethods_descr_add(space, w_other)
 
     _StringMethods__startswith = _startswith
@@ -684,7 +693,7 @@ class W_BytesObject(W_AbstractBytesObject):
             self_as_unicode = unicode_from_encoded_object(space, self, None,
                                                           None)
             return space.newbool(
-                self_as_unicode._utf8.find(w_sub._utf8) >= 0)
+                self_as_unicode._utf8.find(space.utf8_w(w_sub)) >= 0)
         return self._StringMethods_descr_contains(space, w_sub)
 
     _StringMethods_descr_replace = descr_replace
@@ -827,6 +836,44 @@ class W_BytesObject(W_AbstractBytesObject):
         return tformat.formatter_field_name_split()
 
 
+class W_LazyBytesObject(W_BytesObject):
+    """A str that is the result of additions and is not built yet: '_lazy'
+    is a rope.LazyConcat.  Apart from the few methods below, all methods
+    build the string into a W_BytesObject, once, and call the same method
+    on it."""
+
+    def __init__(self, lazy):
+        self._lazy = lazy
+        self._w_flat = None
+
+    def _flat(self):
+        w_flat = self._w_flat
+        if w_flat is None:
+            w_flat = W_BytesObject(self._lazy.flatten())
+            self._w_flat = w_flat
+            self._lazy = None
+        return w_flat
+
+    def __repr__(self):
+        """representation for debugging purposes"""
+        return "%s(%r)" % (self.__class__.__name__, self._lazy)
+
+    def _len(self):
+        lazy = self._lazy
+        if lazy is None:
+            return self._w_flat._len()
+        return lazy.length()
+
+    def descr_add(self, space, w_other):
+        lazy = self._lazy
+        if lazy is not None and isinstance(w_other, W_BytesObject):
+            return W_LazyBytesObject(lazy.append(w_other._flat()._value))
+        return self._flat().descr_add(space, w_other)
+
+# the inherited __len__ only needs _len() above
+forward_to_flat(W_LazyBytesObject, W_BytesObject, inherited=['descr_len'])
+
+
 def _create_list_from_bytes(value):
     # need this helper function to allow the jit to look inside and inline
     # listview_bytes
@@ -12,6 +12,8 @@ from pypy.interpreter.gateway import (
 from pypy.interpreter.mixedmodule import MixedModule
 from pypy.interpreter.signature import Signature
 from pypy.interpreter.typedef import TypeDef
+from pypy.objspace.std.bytesobject import W_LazyBytesObject
+from pypy.objspace.std.unicodeobject import W_LazyUnicodeObject
 from pypy.objspace.std.util import negate
 
 
@@ -647,10 +649,12 @@ class EmptyDictStrategy(DictStrategy):
         return self.erase(None)
 
     def switch_to_correct_strategy(self, w_dict, w_key):
-        if type(w_key) is self.space.StringObjectCls:
+        if (type(w_key) is self.space.StringObjectCls or
+                type(w_key) is W_LazyBytesObject):
             self.switch_to_bytes_strategy(w_dict)
             return
-        elif type(w_key) is self.space.UnicodeObjectCls:
+        elif (type(w_key) is self.space.UnicodeObjectCls or
+                type(w_key) is W_LazyUnicodeObject):
             self.switch_to_unicode_strategy(w_dict)
             return
         w_type = self.space.type(w_key)
@@ -1025,6 +1029,8 @@ class AbstractTypedStrategy(object):
             self.switch_to_object_strategy(w_dict)
             return w_dict.getitem(w_key)
 
+    @jit.look_inside_iff(lambda self, w_dict:
+                         w_dict_unrolling_heuristic(w_dict))
     def w_keys(self, w_dict):
         l = [self.wrap(key)
              for key in self.unerase(w_dict.dstorage).iterkeys()]
@@ -1033,6 +1039,8 @@ class AbstractTypedStrategy(object):
     def values(self, w_dict):
         return self.unerase(w_dict.dstorage).values()
 
+    @jit.look_inside_iff(lambda self, w_dict:
+                         w_dict_unrolling_heuristic(w_dict))
     def items(self, w_dict):
         space = self.space
         dict_w = self.unerase(w_dict.dstorage)
@@ -1219,12 +1227,16 @@ class UnicodeDictStrategy(AbstractTypedStrategy, DictStrategy):
         return unwrapped
 
     def unwrap(self, wrapped):
+        if isinstance(wrapped, W_LazyUnicodeObject):
+            # the keys are flat: hashing builds the utf8 anyway
+            wrapped = wrapped._flat()
         assert type(wrapped) is self.space.UnicodeObjectCls
         return wrapped
 
     def is_correct_type(self, w_obj):
         space = self.space
-        return type(w_obj) is space.UnicodeObjectCls
+        return (type(w_obj) is space.UnicodeObjectCls or
+                type(w_obj) is W_LazyUnicodeObject)
 
     def get_empty_storage(self):
         res = create_empty_unicode_key_dict(self.space)
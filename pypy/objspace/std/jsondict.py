@@ -0,0 +1,167 @@
+"""dict implementation specialized for the objects decoded by _pypyjson.
+
+The dicts decoded from JSON objects with the same keys, in the same order,
+share a JSONMap (see pypy/module/_pypyjson/interp_decoder.py) that knows
+the keys.  The dicts themselves only store a list of the values.  Any
+change of the keys switches the dict to the UnicodeDictStrategy.
+"""
+
+from rpython.rlib import rerased, rutf8
+
+from pypy.objspace.std.dictmultiobject import (
+    DictStrategy, ObjectDictStrategy, UnicodeDictStrategy, W_DictObject,
+    _never_equal_to_string, create_iterator_classes)
+
+
+def from_values_and_jsonmap(space, values_w, jsonmap):
+    strategy = jsonmap.strategy_instance
+    if strategy is None:
+        strategy = JsonDictStrategy(space, jsonmap)
+        jsonmap.strategy_instance = strategy
+    return W_DictObject(space, strategy, strategy.erase(values_w))
+
+
+class JsonDictStrategy(DictStrategy):
+    erase, unerase = rerased.new_erasing_pair("jsondict")
+    erase = staticmethod(erase)
+    unerase = staticmethod(unerase)
+
+    _immutable_fields_ = ['jsonmap']
+
+    def __init__(self, space, jsonmap):
+        DictStrategy.__init__(self, space)
+        self.jsonmap = jsonmap
+
+    def wrapkey(space, key):
+        return key
+
+    def is_correct_type(self, w_obj):
+        space = self.space
+        return type(w_obj) is space.UnicodeObjectCls
+
+    def get_empty_storage(self):
+        raise NotImplementedError("a JSON dict is never empty")
+
+    def length(self, w_dict):
+        return len(self.unerase(w_dict.dstorage))
+
+    def getitem(self, w_dict, w_key):
+        space = self.space
+        if self.is_correct_type(w_key):
+            index = self.jsonmap.get_index(w_key)
+            if index < 0:
+                return None
+            return self.unerase(w_dict.dstorage)[index]
+        elif type(w_key) is space.StringObjectCls:
+            # an ASCII byte string is equal to the same unicode key
+            key = space.bytes_w(w_key)
+            if rutf8.first_non_ascii_char(key) < 0:
+                return self.getitem(w_dict, space.newutf8(key, len(key)))
+        elif _never_equal_to_string(space, space.type(w_key)):
+            return None
+        self.switch_to_object_strategy(w_dict)
+        return w_dict.getitem(w_key)
+
+    def getitem_str(self, w_dict, key):
+        return self.getitem(w_dict, self.space.newtext(key))
+
+    def setitem(self, w_dict, w_key, w_value):
+        if self.is_correct_type(w_key):
+            index = self.jsonmap.get_index(w_key)
+            if index >= 0:
+                self.unerase(w_dict.dstorage)[index] = w_value
+                return
+            self.switch_to_unicode_strategy(w_dict)
+        else:
+            self.switch_to_object_strategy(w_dict)
+        w_dict.setitem(w_key, w_value)
+
+    def setitem_str(self, w_dict, key, w_value):
+        self.setitem(w_dict, self.space.newtext(key), w_value)
+
+    def setdefault(self, w_dict, w_key, w_default):
+        if self.is_correct_type(w_key):
+            index = self.jsonmap.get_index(w_key)
+            if index >= 0:
+                return self.unerase(w_dict.dstorage)[index]
+            self.switch_to_unicode_strategy(w_dict)
+        else:
+            self.switch_to_object_strategy(w_dict)
+        return w_dict.setdefault(w_key, w_default)
+
+    def delitem(self, w_dict, w_key):
+        if self.is_correct_type(w_key):
+            self.switch_to_unicode_strategy(w_dict)
+        else:
+            self.switch_to_object_strategy(w_dict)
+        return w_dict.delitem(w_key)
+
+    def popitem(self, w_dict):
+        self.switch_to_unicode_strategy(w_dict)
+        return w_dict.get_strategy().popitem(w_dict)
+
+    def w_keys(self, w_dict):
+        return self.space.newlist(self.jsonmap.get_keys_w()[:])
+
+    def values(self, w_dict):
+        return self.unerase(w_dict.dstorage)[:]
+
+    def items(self, w_dict):
+        space = self.space
+        keys_w = self.jsonmap.get_keys_w()
+        values_w = self.unerase(w_dict.dstorage)
+        return [space.newtuple([keys_w[i], values_w[i]])
+                for i in range(len(values_w))]
+
+    def switch_to_unicode_strategy(self, w_dict):
+        strategy = self.space.fromcache(UnicodeDictStrategy)
+        storage = strategy.get_empty_storage()
+        d_new = strategy.unerase(storage)
+        keys_w = self.jsonmap.get_keys_w()
+        values_w = self.unerase(w_dict.dstorage)
+        for i in range(len(values_w)):
+            d_new[keys_w[i]] = values_w[i]
+        w_dict.set_strategy(strategy)
+        w_dict.dstorage = storage
+
+    def switch_to_object_strategy(self, w_dict):
+        strategy = self.space.fromcache(ObjectDictStrategy)
+        storage = strategy.get_empty_storage()
+        d_new = strategy.unerase(storage)
+        keys_w = self.jsonmap.get_keys_w()
+        values_w = self.unerase(w_dict.dstorage)
+        for i in range(len(values_w)):
+            d_new[keys_w[i]] = values_w[i]
+        w_dict.set_strategy(strategy)
+        w_dict.dstorage = storage
+
+    def getiterkeys(self, w_dict):
+        return iter(self.jsonmap.get_keys_w())
+
+    def getitervalues(self, w_dict):
+        return iter(self.unerase(w_dict.dstorage))
+
+    def getiteritems_with_hash(self, w_dict):
+        keys_w = self.jsonmap.get_keys_w()
+        return ZipItemsWithHash(keys_w, self.unerase(w_dict.dstorage))
+
+
+class ZipItemsWithHash(object):
+    def __init__(self, keys_w, values_w):
+        assert len(keys_w) == len(values_w)
+        self.keys_w = keys_w
+        self.values_w = values_w
+        self.i = 0
+
+    def __iter__(self):
+        return self
+
+    def next(self):
+        i = self.i
+        if i >= len(self.keys_w):
+            raise StopIteration
+        self.i = i + 1
+        w_key = self.keys_w[i]
+        return (w_key, self.values_w[i], w_key.hash_w())
+
+create_iterator_classes(JsonDictStrategy)
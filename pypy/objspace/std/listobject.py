@@ -16,6 +16,7 @@ from rpython.rlib.listsort import make_timsort_class
 from rpython.rlib.objectmodel import (
     import_from_mixin, instantiate, newlist_hint, resizelist_hint, specialize)
 from rpython.rlib.rarithmetic import ovfcheck
+from rpython.rlib.rstring import StringBuilder
 from rpython.rlib import longlong2float
 from rpython.tool.sourcetools import func_with_new_name
 
@@ -34,7 +35,8 @@ from pypy.objspace.std.iterobject import (
 from pypy.objspace.std.sliceobject import (
     W_SliceObject, normalize_simple_slice, unwrap_start_stop)
 from pypy.objspace.std.tupleobject import W_AbstractTupleObject
-from pypy.objspace.std.unicodeobject import W_UnicodeObject
+from pypy.objspace.std.unicodeobject import (
+    W_UnicodeObject, W_LazyUnicodeObject, is_ascii_unicode)
 from pypy.objspace.std.util import get_positive_index, negate
 
 __all__ = ['W_ListObject', 'make_range_list', 'make_empty_list_with_size']
@@ -97,11 +99,10 @@ def get_strategy_from_list_objects(space, list_w, sizehint):
         else:
             return space.fromcache(BytesListStrategy)
 
-    elif type(w_firstobj) is W_UnicodeObject and w_firstobj.is_ascii():
+    elif is_ascii_unicode(w_firstobj):
         # check for all-unicodes
         for i in range(1, len(list_w)):
-            item = list_w[i]
-            if type(item) is not W_UnicodeObject or not item.is_ascii():
+            if not is_ascii_unicode(list_w[i]):
                 break
         else:
             return space.fromcache(UnicodeListStrategy)
@@ -203,6 +204,12 @@ class W_ListObject(W_Root):
         storage = strategy.erase(list_u)
         return W_ListObject.from_storage_and_strategy(space, storage, strategy)
 
+    @staticmethod
+    def newlist_utf8_compact(space, list_u, lengths):
+        strategy = space.fromcache(CompactUnicodeListStrategy)
+        storage = strategy.erase(make_utf8_list_storage(list_u, lengths))
+        return W_ListObject.from_storage_and_strategy(space, storage, strategy)
+
     @staticmethod
     def newlist_int(space, list_i):
         strategy = space.fromcache(IntegerListStrategy)
@@ -947,7 +954,7 @@ class EmptyListStrategy(ListStrategy):
             strategy = self.space.fromcache(IntegerListStrategy)
         elif type(w_item) is W_BytesObject:
             strategy = self.space.fromcache(BytesListStrategy)
-        elif type(w_item) is W_UnicodeObject and w_item.is_ascii():
+        elif is_ascii_unicode(w_item):
             strategy = self.space.fromcache(UnicodeListStrategy)
         elif type(w_item) is W_FloatObject:
             strategy = self.space.fromcache(FloatListStrategy)
@@ -2007,7 +2014,7 @@ class UnicodeListStrategy(ListStrategy):
     unerase = staticmethod(unerase)
 
     def is_correct_type(self, w_obj):
-        return type(w_obj) is W_UnicodeObject and w_obj.is_ascii()
+        return is_ascii_unicode(w_obj)
 
     def list_is_correct_type(self, w_list):
         return w_list.strategy is self.space.fromcache(UnicodeListStrategy)
@@ -2022,6 +2029,256 @@ class UnicodeListStrategy(ListStrategy):
     def getitems_utf8(self, w_list):
         return self.unerase(w_list.lstorage)
 
+class Utf8ListStorage(object):
+    """The storage of CompactUnicodeListStrategy.  All the items are
+    encoded in utf8 and concatenated in 'utf8': item i is
+    utf8[offsets[i]:offsets[i + 1]] and has lengths[i] codepoints.
+    The storage is never modified, so it can be shared between lists."""
+    _immutable_fields_ = ['utf8', 'offsets[*]', 'lengths[*]', 'is_ascii']
+
+    def __init__(self, utf8, offsets, lengths, is_ascii):
+        self.utf8 = utf8
+        self.offsets = offsets
+        self.lengths = lengths
+        self.is_ascii = is_ascii
+
+    def length(self):
+        return len(self.lengths)
+
+    def getitem_utf8(self, i):
+        start = self.offsets[i]
+        end = self.offsets[i + 1]
+        assert start >= 0
+        assert end >= 0
+        return self.utf8[start:end]
+
+    def item_equals(self, i, utf8):
+        start = self.offsets[i]
+        if self.offsets[i + 1] - start != len(utf8):
+            return False
+        for j in range(len(utf8)):
+            if self.utf8[start + j] != utf8[j]:
+                return False
+        return True
+
+    def item_lt(self, i, k):
+        # compares the utf8 bytes, which gives the order of the codepoints
+        start1 = self.offsets[i]
+        length1 = self.offsets[i + 1] - start1
+        start2 = self.offsets[k]
+        length2 = self.offsets[k + 1] - start2
+        for j in range(min(length1, length2)):
+            c1 = self.utf8[start1 + j]
+            c2 = self.utf8[start2 + j]
+            if c1 != c2:
+                return c1 < c2
+        return length1 < length2
+
+    def reordered(self, order):
+        """Return a new storage with the items in the given order."""
+        builder = StringBuilder(len(self.utf8))
+        offsets = [0] * (len(order) + 1)
+        lengths = [0] * len(order)
+        for j in range(len(order)):
+            i = order[j]
+            builder.append_slice(self.utf8, self.offsets[i],
+                                 self.offsets[i + 1])
+            offsets[j + 1] = builder.getlength()
+            lengths[j] = self.lengths[i]
+        return Utf8ListStorage(builder.build(), offsets, lengths,
+                               self.is_ascii)
+
+
+def make_utf8_list_storage(list_u, lengths):
+    assert len(list_u) == len(lengths)
+    size = 0
+    for utf8 in list_u:
+        size += len(utf8)
+    builder = StringBuilder(size)
+    offsets = [0] * (len(list_u) + 1)
+    total_length = 0
+    for i in range(len(list_u)):
+        builder.append(list_u[i])
+        offsets[i + 1] = builder.getlength()
+        total_length += lengths[i]
+    return Utf8ListStorage(builder.build(), offsets, lengths[:],
+                           total_length == size)
+
+
+class CompactUnicodeListStrategy(ListStrategy):
+    """CompactUnicodeListStrategy is used for the lists of unicodes built
+    by the unicode methods, like split().  The storage is a Utf8ListStorage
+    that keeps all the items in a single utf8 string, and the items are
+    only wrapped when they are read.  The storage is immutable: on any
+    operation that changes the list, the strategy is switched to
+    UnicodeListStrategy or ObjectListStrategy."""
+
+    erase, unerase = rerased.new_erasing_pair("compact_unicode")
+    erase = staticmethod(erase)
+    unerase = staticmethod(unerase)
+
+    def switch_to_unicode_strategy(self, w_list):
+        storage = self.unerase(w_list.lstorage)
+        if storage.is_ascii:
+            list_u = [storage.getitem_utf8(i)
+                      for i in range(storage.length())]
+            strategy = self.space.fromcache(UnicodeListStrategy)
+            w_list.strategy = strategy
+            w_list.lstorage = strategy.erase(list_u)
+        else:
+            list_w = self.getitems_copy(w_list)
+            strategy = self.space.fromcache(ObjectListStrategy)
+            w_list.strategy = strategy
+            strategy.init_from_list_w(w_list, list_w)
+
+    def _wrap(self, storage, i):
+        return W_UnicodeObject(storage.getitem_utf8(i), storage.lengths[i])
+
+    def init_from_list_w(self, w_list, list_w):
+        list_u = [None] * len(list_w)
+        lengths = [0] * len(list_w)
+        for i in range(len(list_w)):
+            w_item = list_w[i]
+            assert isinstance(w_item, W_UnicodeObject)
+            list_u[i] = self.space.utf8_w(w_item)
+            lengths[i] = w_item._len()
+        w_list.lstorage = self.erase(make_utf8_list_storage(list_u, lengths))
+
+    def clone(self, w_list):
+        storage = w_list.lstorage  # the storage is immutable
+        return W_ListObject.from_storage_and_strategy(self.space, storage,
+                                                      self)
+
+    def _resize_hint(self, w_list, hint):
+        assert hint >= 0
+
+    def copy_into(self, w_list, w_other):
+        w_other.strategy = self
+        w_other.lstorage = w_list.lstorage
+
+    def find(self, w_list, w_obj, start, stop):
+        if (type(w_obj) is W_UnicodeObject or
+                type(w_obj) is W_LazyUnicodeObject):
+            utf8 = self.space.utf8_w(w_obj)
+            storage = self.unerase(w_list.lstorage)
+            for i in range(start, min(stop, storage.length())):
+                if storage.item_equals(i, utf8):
+                    return i
+            raise ValueError
+        return ListStrategy.find(self, w_list, w_obj, start, stop)
+
+    def length(self, w_list):
+        return self.unerase(w_list.lstorage).length()
+
+    def getitem(self, w_list, index):
+        storage = self.unerase(w_list.lstorage)
+        length = storage.length()
+        if index < 0:
+            index += length
+            if index < 0:
+                raise IndexError
+        elif index >= length:
+            raise IndexError
+        return self._wrap(storage, index)
+
+    def getitems_copy(self, w_list):
+        storage = self.unerase(w_list.lstorage)
+        return [self._wrap(storage, i) for i in range(storage.length())]
+
+    def _getitems_fixedsize(self, w_list):
+        storage = self.unerase(w_list.lstorage)
+        items_w = [None] * storage.length()
+        for i in range(len(items_w)):
+            items_w[i] = self._wrap(storage, i)
+        return items_w
+
+    @jit.dont_look_inside
+    def getitems_fixedsize(self, w_list):
+        return self._getitems_fixedsize(w_list)
+
+    def getitems_unroll(self, w_list):
+        return self._getitems_fixedsize(w_list)
+
+    def getitems_utf8(self, w_list):
+        storage = self.unerase(w_list.lstorage)
+        if not storage.is_ascii:
+            return None
+        return [storage.getitem_utf8(i) for i in range(storage.length())]
+
+    def getstorage_copy(self, w_list):
+        return w_list.lstorage
+
+    def join(self, w_list, sep, seplength):
+        """Return the utf8 and the length of sep.join(w_list)."""
+        storage = self.unerase(w_list.lstorage)
+        count = storage.length()
+        if count == 0:
+            return '', 0
+        size = (count - 1) * len(sep) + len(storage.utf8)
+        length = (count - 1) * seplength
+        builder = StringBuilder(size)
+        for i in range(count):
+            if i > 0:
+                builder.append(sep)
+            builder.append_slice(storage.utf8, storage.offsets[i],
+                                 storage.offsets[i + 1])
+            length += storage.lengths[i]
+        return builder.build(), length
+
+    def getslice(self, w_list, start, stop, step, length):
+        self.switch_to_unicode_strategy(w_list)
+        return w_list.getslice(start, stop, step, length)
+
+    def append(self, w_list, w_item):
+        self.switch_to_unicode_strategy(w_list)
+        w_list.append(w_item)
+
+    def inplace_mul(self, w_list, times):
+        self.switch_to_unicode_strategy(w_list)
+        w_list.inplace_mul(times)
+
+    def deleteslice(self, w_list, start, step, slicelength):
+        self.switch_to_unicode_strategy(w_list)
+        w_list.deleteslice(start, step, slicelength)
+
+    def pop(self, w_list, index):
+        self.switch_to_unicode_strategy(w_list)
+        return w_list.pop(index)
+
+    def setitem(self, w_list, index, w_item):
+        self.switch_to_unicode_strategy(w_list)
+        w_list.setitem(index, w_item)
+
+    def setslice(self, w_list, start, step, slicelength, sequence_w):
+        self.switch_to_unicode_strategy(w_list)
+        w_list.setslice(start, step, slicelength, sequence_w)
+
+    def insert(self, w_list, index, w_item):
+        self.switch_to_unicode_strategy(w_list)
+        w_list.insert(index, w_item)
+
+    def extend(self, w_list, w_any):
+        self.switch_to_unicode_strategy(w_list)
+        w_list.extend(w_any)
+
+    def reverse(self, w_list):
+        self.switch_to_unicode_strategy(w_list)
+        w_list.reverse()
+
+    def sort(self, w_list, reverse):
+        storage = self.unerase(w_list.lstorage)
+        order = range(storage.length())
+        sorter = Utf8ListSort(order, len(order))
+        sorter.storage = storage
+        # same trick as in W_ListObject.descr_sort() to keep the reverse
+        # sort stable
+        if reverse:
+            order.reverse()
+        sorter.sort()
+        if reverse:
+            order.reverse()
+        w_list.lstorage = self.erase(storage.reordered(order))
+
 # _______________________________________________________
 
 init_signature = Signature(['sequence'], None, None)
@@ -2055,6 +2312,7 @@ IntBaseTimSort = make_timsort_class()
 FloatBaseTimSort = make_timsort_class()
 IntOrFloatBaseTimSort = make_timsort_class()
 UnicodeBaseTimSort = make_timsort_class()
+Utf8ListBaseTimSort = make_timsort_class()
 
 
 class KeyContainer(W_Root):
@@ -2095,6 +2353,12 @@ class UnicodeSort(UnicodeBaseTimSort):
         return a < b
 
 
+class Utf8ListSort(Utf8ListBaseTimSort):
+    # sorts the indexes of the items of a Utf8ListStorage
+    def lt(self, a, b):
+        return self.storage.item_lt(a, b)
+
+
 class CustomCompareSort(SimpleSort):
     def lt(self, a, b):
         space = self.space
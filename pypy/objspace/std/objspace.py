@@ -32,7 +32,8 @@ from pypy.objspace.std.setobject import W_SetObject, W_FrozensetObject
 from pypy.objspace.std.sliceobject import W_SliceObject
 from pypy.objspace.std.tupleobject import W_AbstractTupleObject, W_TupleObject
 from pypy.objspace.std.typeobject import W_TypeObject, TypeCache
-from pypy.objspace.std.unicodeobject import W_UnicodeObject
+from pypy.objspace.std.unicodeobject import (
+    W_UnicodeObject, W_LazyUnicodeObject)
 
 
 class StdObjSpace(ObjSpace):
@@ -314,6 +315,9 @@ class StdObjSpace(ObjSpace):
             return W_ListObject.newlist_utf8(self, list_u)
         return ObjSpace.newlist_utf8(self, list_u, False)
 
+    def newlist_utf8_compact(self, list_u, lengths):
+        return W_ListObject.newlist_utf8_compact(self, list_u, lengths)
+
     def newlist_int(self, list_i):
         return W_ListObject.newlist_int(self, list_i)
 
@@ -340,6 +344,8 @@ class StdObjSpace(ObjSpace):
         return W_SliceObject(w_start, w_end, w_step)
 
     def newseqiter(self, w_obj):
+        if type(w_obj) is W_LazyUnicodeObject:
+            w_obj = w_obj._flat()
         if type(w_obj) is W_UnicodeObject:
             return W_FastUnicodeIterObject(w_obj)
         return W_SeqIterObject(w_obj)
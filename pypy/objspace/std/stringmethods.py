@@ -158,7 +158,7 @@ class StringMethods(object):
         if isinstance(w_sub, W_BytearrayObject):
             res = count(value, w_sub.getdata(), start, end)
         elif isinstance(w_sub, W_BytesObject):
-            res = count(value, w_sub._value, start, end)
+            res = count(value, space.bytes_w(w_sub), start, end)
         else:
             buffer = _get_buffer(space, w_sub)
             res = count(value, buffer, start, end)
@@ -247,7 +247,7 @@ class StringMethods(object):
         if isinstance(w_sub, W_BytearrayObject):
             res = find(value, w_sub.getdata(), start, end)
         elif isinstance(w_sub, W_BytesObject):
-            res = find(value, w_sub._value, start, end)
+            res = find(value, space.bytes_w(w_sub), start, end)
         else:
             buffer = _get_buffer(space, w_sub)
             res = find(value, buffer, start, end)
@@ -267,7 +267,7 @@ class StringMethods(object):
         if isinstance(w_sub, W_BytearrayObject):
             res = rfind(value, w_sub.getdata(), start, end)
         elif isinstance(w_sub, W_BytesObject):
-            res = rfind(value, w_sub._value, start, end)
+            res = rfind(value, space.bytes_w(w_sub), start, end)
         else:
             buffer = _get_buffer(space, w_sub)
             res = rfind(value, buffer, start, end)
@@ -285,7 +285,7 @@ class StringMethods(object):
         elif isinstance(w_sub, W_BytearrayObject):
             res = find(value, w_sub.getdata(), start, end)
         elif isinstance(w_sub, W_BytesObject):
-            res = find(value, w_sub._value, start, end)
+            res = find(value, space.bytes_w(w_sub), start, end)
         else:
             buffer = _get_buffer(space, w_sub)
             res = find(value, buffer, start, end)
@@ -307,7 +307,7 @@ class StringMethods(object):
         elif isinstance(w_sub, W_BytearrayObject):
             res = rfind(value, w_sub.getdata(), start, end)
         elif isinstance(w_sub, W_BytesObject):
-            res = rfind(value, w_sub._value, start, end)
+            res = rfind(value, space.bytes_w(w_sub), start, end)
         else:
             buffer = _get_buffer(space, w_sub)
             res = rfind(value, buffer, start, end)
@@ -1,6 +1,7 @@
 import pytest
 
 from pypy.interpreter.error import OperationError
+from pypy.objspace.std.bytesobject import W_BytesObject, W_LazyBytesObject
 
 
 class TestW_BytesObject:
@@ -91,6 +92,40 @@ class TestW_BytesObject:
         w_bytes = self.space.newbytes('abcd')
         assert self.space.listview_bytes(w_bytes) == list("abcd")
 
+    def test_lazy_concat(self):
+        from rpython.rlib import rope
+        space = self.space
+        w_piece = space.newbytes("abc" * 20)
+        w_s = space.newbytes("")
+        for i in range(100):
+            w_s = space.add(w_s, w_piece)
+        assert type(w_s) is W_LazyBytesObject
+        assert isinstance(w_s._lazy, rope.LazyConcat)
+        assert space.len_w(w_s) == 6000
+        assert w_s._w_flat is None
+        w_t = space.add(w_s, space.newbytes("!"))
+        assert space.bytes_w(w_t) == "abc" * 2000 + "!"
+        assert space.bytes_w(w_s) == "abc" * 2000
+        assert w_s._lazy is None
+        assert type(w_s._flat()) is W_BytesObject
+        assert w_s._flat() is w_s._flat()
+        assert space.len_w(w_s) == 6000
+        # adding to a built one starts a new LazyConcat
+        w_u = space.add(w_s, w_piece)
+        assert type(w_u) is W_LazyBytesObject
+        assert space.bytes_w(w_u) == "abc" * 2020
+
+    def test_lazy_concat_dict_key(self):
+        from pypy.objspace.std.dictmultiobject import BytesDictStrategy
+        space = self.space
+        w_s = space.add(space.newbytes("a" * 1000), space.newbytes("b" * 24))
+        assert type(w_s) is W_LazyBytesObject
+        w_d = space.newdict()
+        space.setitem(w_d, w_s, space.w_True)
+        assert isinstance(w_d.get_strategy(), BytesDictStrategy)
+        w_key = space.newbytes("a" * 1000 + "b" * 24)
+        assert space.is_true(space.getitem(w_d, w_key))
+
 
 try:
     from hypothesis import given, strategies
@@ -933,3 +968,40 @@ class AppTestBytesObject:
     def test_add(self):
         assert 'abc' + 'abc' == 'abcabc'
         assert isinstance('abc' + u'\u03a3', unicode)
+
+    def test_accumulate(self):
+        s = ''
+        for i in range(1000):
+            s += str(i % 10)
+        t = s
+        s += 'x'
+        t += 'y'
+        assert len(s) == len(t) == 1001
+        assert s[-2:] == '9x' and t[-2:] == '9y'
+        assert s.startswith('0123456789')
+        assert hash(s[:-1]) == hash(t[:-1])
+        assert s + u'\u03a3' == s.decode('ascii') + u'\u03a3'
+
+    def test_accumulate_methods(self):
+        s = 'x' * 1000
+        s += 'abc, def'
+        flat = ''.join(['x' * 1000, 'abc, def'])
+        assert s == flat and not s != flat and s <= flat and s >= flat
+        assert flat == s and flat < s + 'a' and s + 'a' > flat
+        assert hash(s) == hash(flat)
+        assert s[-3:] == flat[-3:] == 'def'
+        assert s.split(', ') == flat.split(', ')
+        assert s.find('abc') == flat.find('abc') == 1000
+        assert 'abc' in s and s.count('x') == 1000
+        assert bytearray('xx').find(s) == -1
+        assert bytearray(s).find(s) == 0
+        assert s.upper() == flat.upper()
+        assert str(s) == flat and type(str(s)) is str
+        assert s * 2 == flat * 2 and 2 * s == flat * 2
+        assert {s: 1}[flat] == 1 and {flat: 1}[s] == 1
+        assert int('1' * 1000 + '0' * 24) == int(('1' * 1000) + ('0' * 24))
+        assert repr(s) == repr(flat)
+        assert '%s' % s == flat and '{}'.format(s) == flat
+        class S(str):
+            pass
+        assert S(s) == flat and type(S(s)) is S
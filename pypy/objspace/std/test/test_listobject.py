@@ -1765,6 +1765,50 @@ class AppTestRangeListForcing:
         assert r == [1, 2, 3, 4, 5, 6, 7]
 
 
+class AppTestCompactUnicodeList:
+    spaceconfig = {"objspace.std.withliststrategies": True}
+
+    def setup_class(cls):
+        if cls.runappdirect:
+            py.test.skip("__pypy__.strategy() cannot be used to see "
+                         "if a compact unicode list was forced on top "
+                         "of pypy-c")
+
+    def test_read_only_operations(self):
+        from __pypy__ import strategy
+        l = u"\xe4 b c\n\u1234 b".split()
+        assert strategy(l) == "CompactUnicodeListStrategy"
+        assert u"b" in l
+        assert u"\u1234" in l
+        assert u"x" not in l
+        assert l.index(u"b", 2) == 4
+        assert l.count(u"b") == 2
+        assert u", ".join(l) == u"\xe4, b, c, \u1234, b"
+        assert [x + u"!" for x in l] == [u"\xe4!", u"b!", u"c!",
+                                         u"\u1234!", u"b!"]
+        s = sorted(l)
+        assert s == [u"b", u"b", u"c", u"\xe4", u"\u1234"]
+        assert strategy(s) == "CompactUnicodeListStrategy"
+        assert strategy(l) == "CompactUnicodeListStrategy"
+        assert len(l) == 5
+        assert l[-1] == u"b"
+
+    def test_mutation(self):
+        from __pypy__ import strategy
+        l = u"\xe4 b c".split()
+        l2 = list(l)
+        l[0] = u"a"
+        assert l == [u"a", u"b", u"c"]
+        assert strategy(l) != "CompactUnicodeListStrategy"
+        assert l2 == [u"\xe4", u"b", u"c"]
+        assert strategy(l2) == "CompactUnicodeListStrategy"
+        l2.reverse()
+        assert l2 == [u"c", u"b", u"\xe4"]
+        del l2[0]
+        assert l2 == [u"b", u"\xe4"]
+        assert l2.pop() == u"\xe4"
+
+
 class AppTestWithoutStrategies:
     spaceconfig = {"objspace.std.withliststrategies": False}
 
@@ -4,7 +4,7 @@ from pypy.objspace.std.listobject import (
     W_ListObject, EmptyListStrategy, ObjectListStrategy, IntegerListStrategy,
     FloatListStrategy, BytesListStrategy, RangeListStrategy,
     SimpleRangeListStrategy, make_range_list, UnicodeListStrategy,
-    IntOrFloatListStrategy)
+    IntOrFloatListStrategy, CompactUnicodeListStrategy)
 from pypy.objspace.std import listobject
 from pypy.objspace.std.test.test_listobject import TestW_ListObject
 
@@ -1050,6 +1050,76 @@ class TestW_ListStrategies(TestW_ListObject):
         w_item = l.getitem(0)
         assert isinstance(w_item, space.StringObjectCls)
 
+    def _unwrap_unicodes(self, w_l):
+        space = self.space
+        return [space.utf8_w(w_item).decode("utf-8")
+                for w_item in w_l.getitems()]
+
+    def test_compact_unicode(self):
+        space = self.space
+        items = [u"\xe4b", u"", u"c", u"\u1234\u5678", u"ab"]
+        w_l = W_ListObject.newlist_utf8_compact(
+            space, [u.encode("utf-8") for u in items], map(len, items))
+        assert isinstance(w_l.strategy, CompactUnicodeListStrategy)
+        assert w_l.length() == 5
+        assert self._unwrap_unicodes(w_l) == items
+        w_item = w_l.getitem(-2)
+        assert space.utf8_w(w_item).decode("utf-8") == u"\u1234\u5678"
+        assert w_item._length == 2
+        assert w_l.find(space.wrap(u"ab")) == 4
+        assert w_l.find(space.wrap(u"")) == 1
+        py.test.raises(ValueError, w_l.find, space.wrap(u"a"))
+        py.test.raises(ValueError, w_l.find, space.wrap(u"ab"), 0, 4)
+        w_res = space.call_method(space.wrap(u"-"), "join", w_l)
+        assert space.utf8_w(w_res).decode("utf-8") == u"-".join(items)
+        assert w_res._length == len(u"-".join(items))
+        # the storage is shared by the copies, and replaced by sort()
+        w_l2 = w_l.clone()
+        w_l2.sort(False)
+        assert self._unwrap_unicodes(w_l2) == sorted(items)
+        w_l2.sort(True)
+        assert self._unwrap_unicodes(w_l2) == sorted(items, reverse=True)
+        assert isinstance(w_l2.strategy, CompactUnicodeListStrategy)
+        assert self._unwrap_unicodes(w_l) == items
+        # mutating switches the strategy
+        w_l.append(space.wrap(u"x"))
+        assert isinstance(w_l.strategy, ObjectListStrategy)
+        assert self._unwrap_unicodes(w_l) == items + [u"x"]
+
+    def test_compact_unicode_ascii_switches_to_unicode(self):
+        space = self.space
+        w_l = W_ListObject.newlist_utf8_compact(space, ["a", "bc"], [1, 2])
+        assert w_l.getitems_utf8() == ["a", "bc"]
+        w_l.append(space.wrap(u"d"))
+        assert isinstance(w_l.strategy, UnicodeListStrategy)
+        assert self._unwrap_unicodes(w_l) == [u"a", u"bc", u"d"]
+
+    def test_compact_unicode_init_from_list_w(self):
+        space = self.space
+        items = [u"\xe4b", u"", u"\u1234"]
+        w_l = W_ListObject.newlist_utf8_compact(space, [], [])
+        strategy = w_l.strategy
+        strategy.init_from_list_w(w_l, [space.wrap(u) for u in items])
+        assert w_l.strategy is strategy
+        assert w_l.length() == 3
+        assert self._unwrap_unicodes(w_l) == items
+        assert w_l.getitem(2)._length == 1
+
+    def test_unicode_split_is_compact(self):
+        space = self.space
+        w_u = space.wrap(u"\xe4 b\nc \u1234")
+        w_l = space.call_method(w_u, "split")
+        assert isinstance(w_l.strategy, CompactUnicodeListStrategy)
+        assert self._unwrap_unicodes(w_l) == [u"\xe4", u"b", u"c", u"\u1234"]
+        w_l = space.call_method(w_u, "splitlines")
+        assert isinstance(w_l.strategy, CompactUnicodeListStrategy)
+        w_l = space.call_method(w_u, "split", space.wrap(u" "))
+        assert isinstance(w_l.strategy, CompactUnicodeListStrategy)
+        assert self._unwrap_unicodes(w_l) == [u"\xe4", u"b\nc", u"\u1234"]
+        w_l = space.call_method(space.wrap(u"a b"), "split")
+        assert isinstance(w_l.strategy, UnicodeListStrategy)
+
+
 
 class TestW_ListStrategiesDisabled:
     spaceconfig = {"objspace.std.withliststrategies": False}
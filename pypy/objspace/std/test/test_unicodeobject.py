@@ -9,6 +9,7 @@ except ImportError:
     
 from rpython.rlib import rutf8
 from pypy.interpreter.error import OperationError
+from pypy.objspace.std.unicodeobject import W_UnicodeObject, W_LazyUnicodeObject
 
 
 class TestUnicodeObject:
@@ -53,6 +54,185 @@ class TestUnicodeObject:
         assert space.eq_w(w_char1, w_uni._getitem_result(space, 0))
         assert space.eq_w(w_char2, w_uni._getitem_result(space, 1))
 
+    def test_index_storage_is_lazy(self):
+        space = self.space
+        w_uni = space.newutf8(u"ä".encode("utf-8") * 100000, 100000)
+        w_char = space.getitem(w_uni, space.newint(100))
+        assert space.utf8_w(w_char) == u"ä".encode("utf-8")
+        storage = w_uni._index_storage
+        assert storage.count == 100 // 64 + 1
+        assert len(storage.blocks) < 100
+        space.getitem(w_uni, space.newint(-1))
+        assert w_uni._index_storage is storage
+        assert storage.count == 100000 // 64 + 1
+
+    def test_find_loop_does_not_need_index_table(self):
+        space = self.space
+        u = u"äöü, " * 1000
+        w_uni = space.newutf8(u.encode("utf-8"), len(u))
+        w_comma = space.newutf8(",", 1)
+        pos = -1
+        found = []
+        while True:
+            w_pos = space.call_method(w_uni, "find", w_comma,
+                                      space.newint(pos + 1))
+            pos = space.int_w(w_pos)
+            if pos < 0:
+                break
+            found.append(pos)
+        assert found == range(3, len(u), 5)
+        assert w_uni._index_storage.count == 0
+        w_pos = space.call_method(w_uni, "rfind", w_comma,
+                                  space.newint(0), space.newint(len(u) - 2))
+        assert space.int_w(w_pos) == len(u) - 7
+
+
+    def test_slice_view(self):
+        space = self.space
+        u = u"GET /index.html HTTP/1.1 \xe4\xf6\xfc -- " * 3
+        w_uni = space.newutf8(u.encode("utf-8"), len(u))
+        w_slice = space.getitem(w_uni, space.newslice(
+            space.newint(4), space.w_None, space.w_None))
+        assert isinstance(w_slice, W_LazyUnicodeObject)     # a view
+        assert space.len_w(w_slice) == len(u) - 4
+        assert w_slice.is_ascii() == False
+        assert w_slice._w_flat is None
+        # the other operations build the utf8 once, into a W_UnicodeObject
+        w_same = space.newutf8(u[4:].encode("utf-8"), len(u) - 4)
+        assert space.eq_w(w_slice, w_same)
+        assert not space.eq_w(w_slice, w_uni)
+        w_flat = w_slice._w_flat
+        assert type(w_flat) is W_UnicodeObject
+        assert w_flat._utf8 == u[4:].encode("utf-8")
+        assert w_slice._lazy is None        # w_uni is not kept alive
+        assert space.hash_w(w_slice) == space.hash_w(w_same)
+        w_sum = space.add(w_slice, w_slice)
+        assert space.utf8_w(w_sum).decode("utf-8") == u[4:] * 2
+        assert w_slice._w_flat is w_flat
+        assert space.is_w(w_slice, w_slice)
+        assert not space.is_w(w_slice, w_same)
+
+    def test_slice_view_of_view(self):
+        space = self.space
+        u = u"x" * 200
+        w_uni = space.newutf8(u.encode("utf-8"), len(u))
+        w_slice = space.getslice(w_uni, space.newint(10), space.newint(190))
+        assert isinstance(w_slice, W_LazyUnicodeObject)
+        w_slice2 = space.getslice(w_slice, space.newint(10),
+                                  space.newint(170))
+        assert isinstance(w_slice2, W_LazyUnicodeObject)
+        assert w_slice2._lazy.parent is w_uni._utf8
+        assert w_slice2._lazy.start == 20
+        assert w_slice._w_flat is None
+        assert space.utf8_w(w_slice2) == "x" * 160
+        # small slices, and slices much smaller than their parent, are
+        # copied
+        w_small = space.getslice(w_uni, space.newint(10), space.newint(20))
+        assert type(w_small) is W_UnicodeObject
+        assert w_small._utf8 == "x" * 10
+        w_small = space.getslice(w_uni, space.newint(10), space.newint(45))
+        assert type(w_small) is W_UnicodeObject
+        assert w_small._utf8 == "x" * 35
+
+    def test_slice_view_dict_key(self):
+        from pypy.objspace.std.dictmultiobject import UnicodeDictStrategy
+        space = self.space
+        w_uni = space.newutf8("k" * 100, 100)
+        w_key = space.getslice(w_uni, space.newint(0), space.newint(50))
+        w_key2 = space.getslice(w_uni, space.newint(50), space.newint(100))
+        assert isinstance(w_key, W_LazyUnicodeObject)
+        w_d = space.newdict()
+        space.setitem(w_d, w_key, space.newint(42))
+        assert isinstance(w_d.get_strategy(), UnicodeDictStrategy)
+        assert space.int_w(space.getitem(w_d, w_key2)) == 42
+        space.setitem(w_d, space.newutf8("x", 1), space.newint(1))
+        assert isinstance(w_d.get_strategy(), UnicodeDictStrategy)
+        assert space.len_w(w_d) == 2
+
+    def test_slice_view_list_and_set(self):
+        from pypy.objspace.std.listobject import UnicodeListStrategy
+        from pypy.objspace.std.setobject import UnicodeSetStrategy
+        space = self.space
+        w_uni = space.newutf8("k" * 100, 100)
+        w_key = space.getslice(w_uni, space.newint(0), space.newint(50))
+        w_key2 = space.getslice(w_uni, space.newint(50), space.newint(100))
+        assert isinstance(w_key, W_LazyUnicodeObject)
+        w_l = space.newlist([w_key, space.newutf8("x", 1)])
+        assert isinstance(w_l.strategy, UnicodeListStrategy)
+        space.call_method(w_l, "append", w_key2)
+        assert isinstance(w_l.strategy, UnicodeListStrategy)
+        assert space.utf8_w(space.getitem(w_l, space.newint(2))) == "k" * 50
+        w_s = space.newset([w_key, w_key2])
+        assert isinstance(w_s.strategy, UnicodeSetStrategy)
+        assert space.len_w(w_s) == 1
+        assert space.is_true(space.contains(w_s, w_key2))
+
+    def test_slice_view_non_ascii(self):
+        space = self.space
+        u = u"GET /index.html HTTP/1.1 \xe4\xf6\xfc -- " * 3
+        w_uni = space.newutf8(u.encode("utf-8"), len(u))
+        w_view = space.getslice(w_uni, space.newint(4), space.newint(len(u)))
+        assert isinstance(w_view, W_LazyUnicodeObject)
+        # slices near the ends of a view are views of the same parent
+        w_slice = space.getslice(w_view, space.newint(6),
+                                 space.newint(len(u) - 7))
+        assert isinstance(w_slice, W_LazyUnicodeObject)
+        assert w_slice._lazy.parent is w_uni._utf8
+        assert w_view._w_flat is None
+        assert space.utf8_w(w_slice) == u[10:-3].encode("utf-8")
+        w_small = space.getslice(w_view, space.newint(0), space.newint(3))
+        assert space.utf8_w(w_small) == u[4:7].encode("utf-8")
+        assert w_view._w_flat is None
+        # far from both ends, the view is built first
+        w_mid = space.getslice(w_view, space.newint(40), space.newint(50))
+        assert space.utf8_w(w_mid) == u[44:54].encode("utf-8")
+        assert w_view._w_flat is not None
+
+    def test_strip_copies(self):
+        space = self.space
+        u = u" GET /index.html HTTP/1.1 \xe4\xf6\xfc -- \n"
+        w_uni = space.newutf8(u.encode("utf-8"), len(u))
+        w_res = space.call_method(w_uni, "strip")
+        assert type(w_res) is W_UnicodeObject
+        assert space.utf8_w(w_res) == u.strip().encode("utf-8")
+        # nothing to strip: no copy
+        assert space.call_method(w_res, "strip") is w_res
+
+    def test_lazy_concat(self):
+        from rpython.rlib import rope
+        space = self.space
+        w_piece = space.newutf8(u"\xe4bc".encode("utf-8"), 3)
+        w_s = space.newutf8("", 0)
+        for i in range(1000):
+            w_s = space.add(w_s, w_piece)
+        assert isinstance(w_s, W_LazyUnicodeObject)
+        assert isinstance(w_s._lazy, rope.LazyConcat)
+        assert space.len_w(w_s) == 3000
+        assert w_s._lazy.count < 1000     # the first additions were flat
+        w_t = space.add(w_s, w_s)
+        assert space.utf8_w(w_t) == u"\xe4bc".encode("utf-8") * 2000
+        assert w_s._w_flat is not None
+        assert w_s._lazy is None
+        assert space.utf8_w(w_s) == u"\xe4bc".encode("utf-8") * 1000
+
+    def test_splitlines_split_lengths(self):
+        space = self.space
+        u = (u"some words, \u1234\u2028long line\r\n"
+             u"\x85second\u3000line with t\xe4bs\there\n") * 3
+        w_uni = space.newutf8(u.encode("utf-8"), len(u))
+        for w_res, expected in [
+                (space.call_method(w_uni, "splitlines"), u.splitlines()),
+                (space.call_method(w_uni, "splitlines", space.w_True),
+                 u.splitlines(True)),
+                (space.call_method(w_uni, "split"), u.split()),
+                (space.call_method(w_uni, "split", space.w_None,
+                                   space.newint(2)), u.split(None, 2))]:
+            items_w = space.listview(w_res)
+            assert len(items_w) == len(expected)
+            for w_item, item in zip(items_w, expected):
+                assert space.utf8_w(w_item).decode("utf-8") == item
+                assert w_item._length == len(item)
+
 
     if HAS_HYPOTHESIS:
         @given(strategies.text(), strategies.integers(min_value=0, max_value=10),
@@ -423,6 +603,95 @@ class AppTestUnicodeString:
         assert u'\u0104'.upper() == u'\u0104'
         assert u'\ud800'.upper() == u'\ud800'
 
+    def test_lower_upper_long(self):
+        s = u'Hello, World! abcXYZ @[`{ 0123456789'
+        assert s.lower() == u'hello, world! abcxyz @[`{ 0123456789'
+        assert s.upper() == u'HELLO, WORLD! ABCXYZ @[`{ 0123456789'
+        assert s.swapcase() == u'hELLO, wORLD! ABCxyz @[`{ 0123456789'
+        s = u'Hello, World! \u0104\u0105 abcXYZ @[`{ \u1234 0123456789'
+        assert s.lower() == (
+            u'hello, world! \u0105\u0105 abcxyz @[`{ \u1234 0123456789')
+        assert s.upper() == (
+            u'HELLO, WORLD! \u0104\u0104 ABCXYZ @[`{ \u1234 0123456789')
+        assert s.swapcase() == (
+            u'hELLO, wORLD! \u0105\u0104 ABCxyz @[`{ \u1234 0123456789')
+        assert (u'x' * 20 + u'\u0104').lower() == u'x' * 20 + u'\u0105'
+        assert (u'X' * 20 + u'\u0104').lower() == u'x' * 20 + u'\u0105'
+        assert u'abcdefghijklmnopq'.islower()
+        assert not u'abcdefghijklmnopQ'.islower()
+        assert not u'0123456789012345'.islower()
+        assert u'0123456789012345a'.islower()
+        assert u'ABCDEFGHIJKLMNOPQ'.isupper()
+        assert not u'aBCDEFGHIJKLMNOPQ'.isupper()
+        assert u'A0123456789012345'.isupper()
+        assert not u'0123456789012345'.isupper()
+
+    def test_accumulate(self):
+        s = u""
+        for i in range(2000):
+            s += unichr(0x100 + i % 100)
+            if i == 1500:
+                t = s
+                u = s + u"!"
+        assert len(s) == 2000
+        assert s == u"".join([unichr(0x100 + i % 100) for i in range(2000)])
+        assert t == s[:1501]
+        assert u == t + u"!"
+        assert len(u) == 1502
+        d = {s: 1}
+        assert d[s[:1000] + s[1000:]] == 1
+        s2 = u"\xe4" * 600
+        assert (s2 + s2 + u"x")[-3:] == u"\xe4\xe4x"
+        assert s2 + s2 == u"\xe4" * 1200
+
+    def test_slice_view_methods(self):
+        base = u"GET /index.html HTTP/1.1 \xe4\xf6\xfc -- " * 4
+        ascii = u"GET /index.html HTTP/1.1 -- " * 4
+        for s in [base[4:], base[:-3], ascii[2:], ascii[2:][1:]]:
+            t = u"".join(list(s))      # not a view
+            assert s == t and not s != t
+            assert hash(s) == hash(t)
+            assert len(s) == len(t)
+            for name in ['upper', 'lower', 'title', 'swapcase', 'strip',
+                         'split', 'splitlines', 'isalpha', 'islower',
+                         'isspace', 'capitalize', '__repr__']:
+                assert getattr(s, name)() == getattr(t, name)()
+            assert s.find(u'HTTP', 5) == t.find(u'HTTP', 5)
+            assert s.rindex(u'-') == t.rindex(u'-')
+            assert s.count(u'--') == t.count(u'--')
+            assert s.replace(u'-', u'+') == t.replace(u'-', u'+')
+            assert s.partition(u' ') == t.partition(u' ')
+            assert s.encode('utf-8') == t.encode('utf-8')
+            assert s[3:40] == t[3:40] and s[5] == t[5]
+            assert s[2:-2] == t[2:-2] and s[-5:] == t[-5:]
+            assert s[40:60] == t[40:60] and s[:7] == t[:7]
+            assert s[::3] == t[::3]
+            assert s + u'!' == t + u'!' and u'!' + s == u'!' + t
+            assert s * 2 == t * 2
+            assert u'%s|%s' % (s, s) == u'{0}|{0}'.format(t)
+            assert s.join([u'a', u'b']) == t.join([u'a', u'b'])
+            assert t.startswith(s[:10]) and s.endswith(t[-10:])
+            assert s[10:20] in t and t[10:20] in s
+            assert {s: 1}[t] == 1 and {t: 2}[s] == 2
+            assert list(iter(s)) == list(t)
+            assert unicode(s) == t and type(unicode(s)) is unicode
+            class U(unicode):
+                pass
+            assert U(s) == t and type(U(s)) is U
+        assert int((u"1" * 40 + u" ")[:-1]) == int("1" * 40)
+
+    def test_lower_upper_unchanged(self):
+        s = u'hello world, nothing to change'
+        assert s.lower() is s
+        assert u'\u0105 hello world'.lower() == u'\u0105 hello world'
+        class U(unicode):
+            pass
+        u = U(u'hello')
+        assert type(u.lower()) is unicode
+        assert u.lower() == u'hello'
+        assert type(U(u'Hello World').title()) is unicode
+        assert U(u'Hello World').title() == u'Hello World'
+
     def test_capitalize(self):
         assert u"brown fox".capitalize() == u"Brown fox"
         assert u' hello '.capitalize() == u' hello '
@@ -9,12 +9,14 @@ from rpython.rlib.rarithmetic import ovfcheck
 from rpython.rlib.rstring import (
     StringBuilder, split, rsplit, UnicodeBuilder, replace_count, startswith,
     endswith)
-from rpython.rlib import rutf8, jit
+from rpython.rlib import rope, rutf8, jit
+from rpython.rtyper.lltypesystem import lltype
 
 from pypy.interpreter import unicodehelper
 from pypy.interpreter.baseobjspace import W_Root
 from pypy.interpreter.error import OperationError, oefmt
-from pypy.interpreter.gateway import WrappedDefault, interp2app, unwrap_spec
+from pypy.interpreter.gateway import (
+    WrappedDefault, interp2app, interpindirect2app, unwrap_spec)
 from pypy.interpreter.typedef import TypeDef
 from pypy.module.unicodedata import unicodedb
 from pypy.objspace.std import newformat
@@ -23,13 +25,54 @@ from pypy.objspace.std.formatting import mod_format
 from pypy.objspace.std.sliceobject import (W_SliceObject,
     unwrap_start_stop, normalize_simple_slice)
 from pypy.objspace.std.stringmethods import StringMethods
-from pypy.objspace.std.util import IDTAG_SPECIAL, IDTAG_SHIFT
+from pypy.objspace.std.util import (
+    IDTAG_SPECIAL, IDTAG_SHIFT, forward_to_flat)
 
 __all__ = ['W_UnicodeObject', 'wrapunicode', 'plain_str2unicode',
            'encode_object', 'decode_object', 'unicode_from_object',
            'unicode_from_string', 'unicode_to_decimal_w']
 
 
+class Utf8View(rope.LazyString):
+    """The bytes parent[start:stop], not copied yet."""
+    _immutable_fields_ = ['parent', 'start', 'stop']
+
+    def __init__(self, parent, start, stop):
+        self.parent = parent
+        self.start = start
+        self.stop = stop
+
+    def length(self):
+        return self.stop - self.start
+
+    def flatten(self):
+        start = self.start
+        stop = self.stop
+        assert start >= 0
+        assert stop >= 0
+        return self.parent[start:stop]
+
+
+# A slice of at least UNICODE_VIEW_MIN_SIZE bytes is not copied, but
+# is a W_LazyUnicodeObject that refers to the string it comes from.  To
+# avoid keeping a huge string alive for a small slice, the slice must
+# also be at least 1/UNICODE_VIEW_MAX_WASTE of that string.
+UNICODE_VIEW_MIN_SIZE = 32
+UNICODE_VIEW_MAX_WASTE = 4
+
+# Slicing a non-ASCII view walks the codepoints from the nearest end of
+# the view, if that is at most UNICODE_VIEW_MAX_WALK codepoints away.
+# Otherwise the view is built into a W_UnicodeObject first, which has an
+# index of its codepoints.
+UNICODE_VIEW_MAX_WALK = 32
+
+# The result of an addition of at least LAZY_CONCAT_MIN_SIZE bytes is a
+# W_LazyUnicodeObject that keeps a rope.LazyConcat.  Adding to such a
+# result again appends to the same LazyConcat, so that accumulating a
+# string with 's += piece' takes linear time.
+LAZY_CONCAT_MIN_SIZE = 1024
+
+
 class W_UnicodeObject(W_Root):
     import_from_mixin(StringMethods)
     _immutable_fields_ = ['_utf8']
@@ -56,6 +99,24 @@ class W_UnicodeObject(W_Root):
         return W_UnicodeObject(
             builder.build(), builder.getlength())
 
+    @staticmethod
+    def _new_slice(parent, start, stop, length):
+        """Return the unicode parent[start:stop], as a W_LazyUnicodeObject
+        if it is large enough."""
+        assert 0 <= start <= stop
+        size = stop - start
+        if size == len(parent):
+            return W_UnicodeObject(parent, length)
+        if (size >= UNICODE_VIEW_MIN_SIZE and
+                size * UNICODE_VIEW_MAX_WASTE >= len(parent)):
+            return W_LazyUnicodeObject(Utf8View(parent, start, stop), length)
+        return W_UnicodeObject(parent[start:stop], length)
+
+    def _flat(self):
+        """Return a W_UnicodeObject equal to self whose _utf8 can be read:
+        self, unless self is a W_LazyUnicodeObject."""
+        return self
+
     def __repr__(self):
         """representation for debugging purposes"""
         return "%s(%r)" % (self.__class__.__name__, self._utf8)
@@ -145,7 +206,7 @@ class W_UnicodeObject(W_Root):
         if space.is_w(space.type(w_other), space.w_unicode):
             # XXX why do we need this for translation???
             assert isinstance(w_other, W_UnicodeObject)
-            return w_other
+            return w_other._flat()
         if space.isinstance_w(w_other, space.w_bytes):
             return unicode_from_string(space, w_other)
         if strict:
@@ -220,6 +281,7 @@ class W_UnicodeObject(W_Root):
             return w_value
 
         assert isinstance(w_value, W_UnicodeObject)
+        w_value = w_value._flat()
         w_newobj = space.allocate_instance(W_UnicodeObject, w_unicodetype)
         W_UnicodeObject.__init__(w_newobj, w_value._utf8, w_value._length)
         if w_value._index_storage:
@@ -245,7 +307,7 @@ class W_UnicodeObject(W_Root):
     def eq_w(self, w_other):
         # shortcut for UnicodeDictStrategy
         assert isinstance(w_other, W_UnicodeObject)
-        return self._utf8 == w_other._utf8
+        return self._utf8 == w_other._flat()._utf8
 
     def descr_eq(self, space, w_other):
         try:
@@ -334,21 +396,25 @@ class W_UnicodeObject(W_Root):
         return mod_format(space, w_values, self, do_unicode=True)
 
     def descr_swapcase(self, space):
-        input = self._utf8
-        builder = rutf8.Utf8StringBuilder(len(input))
-        for ch in rutf8.Utf8StringIterator(input):
-            if unicodedb.isupper(ch):
-                ch = unicodedb.tolower(ch)
-            elif unicodedb.islower(ch):
-                ch = unicodedb.toupper(ch)
-            builder.append_code(ch)
-        return self.from_utf8builder(builder)
+        return self._casemap_result(space,
+                    _utf8_casemap(self._utf8, self._length, _SWAPCASE))
 
     def descr_title(self, space):
         if len(self._utf8) == 0:
             return self
+        if self.is_ascii():
+            return self._casemap_result(space, _ascii_title(self._utf8))
         return self.title_unicode(self._utf8)
 
+    def _casemap_result(self, space, utf8):
+        # 'utf8' is the result of a case mapping, which never changes the
+        # number of codepoints, or None if the mapping changed nothing
+        if utf8 is None:
+            if space.is_w(space.type(self), space.w_unicode):
+                return self
+            utf8 = self._utf8
+        return W_UnicodeObject(utf8, self._length)
+
     @jit.elidable
     def title_unicode(self, value):
         input = self._utf8
@@ -377,7 +443,8 @@ class W_UnicodeObject(W_Root):
                 elif space.isinstance_w(w_newval, space.w_int):
                     codepoint = space.int_w(w_newval)
                 elif isinstance(w_newval, W_UnicodeObject):
-                    builder.append_utf8(w_newval._utf8, w_newval._length)
+                    builder.append_utf8(space.utf8_w(w_newval),
+                                        w_newval._length)
                     continue
                 else:
                     raise oefmt(space.w_TypeError,
@@ -468,6 +535,13 @@ class W_UnicodeObject(W_Root):
 
     _StringMethods_descr_join = descr_join
     def descr_join(self, space, w_list):
+        from pypy.objspace.std.listobject import (
+            W_ListObject, CompactUnicodeListStrategy)
+        if (type(w_list) is W_ListObject and
+                isinstance(w_list.strategy, CompactUnicodeListStrategy)):
+            utf8, length = w_list.strategy.join(w_list, self._utf8,
+                                                self._length)
+            return W_UnicodeObject(utf8, length)
         l = space.listview_utf8(w_list)
         if l is not None and self.is_ascii():
             if len(l) == 1:
@@ -490,11 +564,8 @@ class W_UnicodeObject(W_Root):
         return tformat.formatter_field_name_split()
 
     def descr_lower(self, space):
-        builder = rutf8.Utf8StringBuilder(len(self._utf8))
-        for ch in rutf8.Utf8StringIterator(self._utf8):
-            lower = unicodedb.tolower(ch)
-            builder.append_code(lower)
-        return self.from_utf8builder(builder)
+        return self._casemap_result(space,
+                    _utf8_casemap(self._utf8, self._length, _LOWER))
 
     def descr_isdecimal(self, space):
         return self._is_generic(space, '_isdecimal')
@@ -503,6 +574,8 @@ class W_UnicodeObject(W_Root):
         return self._is_generic(space, '_isnumeric')
 
     def descr_islower(self, space):
+        if self.is_ascii() and rutf8.WORD_AT_A_TIME:
+            return space.newbool(_ascii_is_cased(self._utf8, _LOWER))
         cased = False
         for uchar in rutf8.Utf8StringIterator(self._utf8):
             if (unicodedb.isupper(uchar) or
@@ -530,6 +603,8 @@ class W_UnicodeObject(W_Root):
         return space.newbool(cased)
 
     def descr_isupper(self, space):
+        if self.is_ascii() and rutf8.WORD_AT_A_TIME:
+            return space.newbool(_ascii_is_cased(self._utf8, _UPPER))
         cased = False
         for uchar in rutf8.Utf8StringIterator(self._utf8):
             if (unicodedb.islower(uchar) or
@@ -574,8 +649,11 @@ class W_UnicodeObject(W_Root):
             if e.match(space, space.w_TypeError):
                 return space.w_NotImplemented
             raise
-        return W_UnicodeObject(self._utf8 + w_other._utf8,
-                               self._len() + w_other._len())
+        length = self._len() + w_other._len()
+        if len(self._utf8) + len(w_other._utf8) >= LAZY_CONCAT_MIN_SIZE:
+            return W_LazyUnicodeObject(
+                rope.lazy_concat(self._utf8, w_other._utf8), length)
+        return W_UnicodeObject(self._utf8 + w_other._utf8, length)
 
     @jit.look_inside_iff(lambda self, space, list_w, size:
                          jit.loop_unrolling_heuristic(list_w, size))
@@ -609,39 +687,16 @@ class W_UnicodeObject(W_Root):
     @unwrap_spec(keepends=bool)
     def descr_splitlines(self, space, keepends=False):
         value = self._utf8
-        length = len(value)
-        strs_w = []
-        pos = 0
-        while pos < length:
-            sol = pos
-            lgt = 0
-            while pos < length and not self._islinebreak(rutf8.codepoint_at_pos(value, pos)):
-                pos = rutf8.next_codepoint_pos(value, pos)
-                lgt += 1
-            eol = pos
-            if pos < length:
-                # read CRLF as one line break
-                if (value[pos] == '\r' and pos + 1 < length
-                                       and value[pos + 1] == '\n'):
-                    pos += 2
-                    line_end_chars = 2
-                else:
-                    pos = rutf8.next_codepoint_pos(value, pos)
-                    line_end_chars = 1
-                if keepends:
-                    eol = pos
-                    lgt += line_end_chars
-            assert eol >= 0
-            assert sol >= 0
-            strs_w.append(W_UnicodeObject(value[sol:eol], lgt))
-        return space.newlist(strs_w)
+        if self.is_ascii():
+            return space.newlist_utf8(_split_lines(value, keepends, None),
+                                      True)
+        lengths = []
+        strs = _split_lines(value, keepends, lengths)
+        return space.newlist_utf8_compact(strs, lengths)
 
     def descr_upper(self, space):
-        builder = rutf8.Utf8StringBuilder(len(self._utf8))
-        for ch in rutf8.Utf8StringIterator(self._utf8):
-            ch = unicodedb.toupper(ch)
-            builder.append_code(ch)
-        return self.from_utf8builder(builder)
+        return self._casemap_result(space,
+                    _utf8_casemap(self._utf8, self._length, _UPPER))
 
     @unwrap_spec(width=int)
     def descr_zfill(self, space, width):
@@ -668,15 +723,19 @@ class W_UnicodeObject(W_Root):
         res = []
         value = self._utf8
         if space.is_none(w_sep):
-            res = split(value, maxsplit=maxsplit, isutf8=True)
-            return space.newlist_utf8(res, self.is_ascii())
+            if self.is_ascii():
+                res = _split_whitespace(value, maxsplit, None)
+                return space.newlist_utf8(res, True)
+            lengths = []
+            res = _split_whitespace(value, maxsplit, lengths)
+            return space.newlist_utf8_compact(res, lengths)
 
         by = self.convert_arg_to_w_unicode(space, w_sep)._utf8
         if len(by) == 0:
             raise oefmt(space.w_ValueError, "empty separator")
         res = split(value, by, maxsplit, isutf8=True)
 
-        return space.newlist_utf8(res, self.is_ascii())
+        return _newlist_pieces(space, res, self.is_ascii())
 
     @unwrap_spec(maxsplit=int)
     def descr_rsplit(self, space, w_sep=None, maxsplit=-1):
@@ -684,14 +743,14 @@ class W_UnicodeObject(W_Root):
         value = self._utf8
         if space.is_none(w_sep):
             res = rsplit(value, maxsplit=maxsplit, isutf8=True)
-            return space.newlist_utf8(res, self.is_ascii())
+            return _newlist_pieces(space, res, self.is_ascii())
 
         by = self.convert_arg_to_w_unicode(space, w_sep)._utf8
         if len(by) == 0:
             raise oefmt(space.w_ValueError, "empty separator")
         res = rsplit(value, by, maxsplit, isutf8=True)
 
-        return space.newlist_utf8(res, self.is_ascii())
+        return _newlist_pieces(space, res, self.is_ascii())
 
     def descr_getitem(self, space, w_index):
         if isinstance(w_index, W_SliceObject):
@@ -737,7 +796,8 @@ class W_UnicodeObject(W_Root):
         assert stop >= 0
         byte_start = self._index_to_byte(start)
         byte_stop = self._index_to_byte(stop)
-        return W_UnicodeObject(self._utf8[byte_start:byte_stop], stop - start)
+        return W_UnicodeObject._new_slice(self._utf8, byte_start, byte_stop,
+                                          stop - start)
 
     def descr_capitalize(self, space):
         value = self._utf8
@@ -853,7 +913,8 @@ class W_UnicodeObject(W_Root):
             return W_UnicodeObject(self._utf8[0] * times, times)
         return W_UnicodeObject(self._utf8 * times, times * self._len())
 
-    descr_rmul = descr_mul
+    def descr_rmul(self, space, w_times):
+        return self.descr_mul(space, w_times)
 
     def _get_index_storage(self):
         return jit.conditional_call_elidable(self._index_storage,
@@ -885,7 +946,7 @@ class W_UnicodeObject(W_Root):
         if self.is_ascii():
             assert index >= 0
             return index
-        return rutf8.codepoint_position_at_index(
+        return rutf8.codepoint_position_near_cursor(
             self._utf8, self._get_index_storage(), index)
 
     @always_inline
@@ -912,6 +973,7 @@ class W_UnicodeObject(W_Root):
             skip = rutf8.codepoints_in_utf8(self._utf8, start_index, res_index)
             res = start + skip
             assert res >= 0
+            self._remember_index(res, res_index)
             return space.newint(res)
         else:
             res_index = self._utf8.rfind(w_sub._utf8, start_index, end_index)
@@ -920,8 +982,17 @@ class W_UnicodeObject(W_Root):
             skip = rutf8.codepoints_in_utf8(self._utf8, res_index, end_index)
             res = end - skip
             assert res >= 0
+            self._remember_index(res, res_index)
             return space.newint(res)
 
+    def _remember_index(self, index, bytepos):
+        # the next search is likely to start right after the one we just
+        # found, like in 'pos = s.find(sub, pos + 1)': move the cursor of
+        # the index storage there, so that the next _index_to_byte() is
+        # only a few steps away from it and doesn't need the table
+        if not self.is_ascii():
+            rutf8.move_cursor(self._get_index_storage(), index, bytepos)
+
     def _unwrap_and_compute_idx_params(self, space, w_start, w_end):
         # unwrap start and stop indices, optimized for the case where
         # start == 0 and end == self._length.  Note that 'start' and
@@ -979,9 +1050,9 @@ class W_UnicodeObject(W_Root):
     def _utf8_sliced(self, start, stop, lgt):
         assert start >= 0
         assert stop >= 0
-        #if start == 0 and stop == len(s) and space.is_w(space.type(orig_obj),
-        #                                                space.w_bytes):
-        #    return orig_obj
+        if (start == 0 and stop == len(self._utf8) and
+                type(self) is W_UnicodeObject):
+            return self
         return W_UnicodeObject(self._utf8[start:stop], lgt)
 
     def _strip_none(self, space, left, right):
@@ -1035,6 +1106,95 @@ class W_UnicodeObject(W_Root):
     _starts_ends_unicode = True
 
 
+class W_LazyUnicodeObject(W_UnicodeObject):
+    """A unicode whose utf8 is not built yet: a slice that still refers to
+    the string it is taken from (a Utf8View), or the result of additions
+    (a rope.LazyConcat).  Apart from the few methods below, all methods
+    build the utf8 into a W_UnicodeObject, once, and call the same method
+    on it."""
+
+    def __init__(self, lazy, length):
+        self._lazy = lazy
+        self._w_flat = None
+        self._length = length
+
+    def _flat(self):
+        w_flat = self._w_flat
+        if w_flat is None:
+            w_flat = W_UnicodeObject(self._lazy.flatten(), self._length)
+            self._w_flat = w_flat
+            self._lazy = None
+        return w_flat
+
+    def __repr__(self):
+        """representation for debugging purposes"""
+        return "%s(%r, %d)" % (self.__class__.__name__, self._lazy,
+                               self._length)
+
+    def is_ascii(self):
+        lazy = self._lazy
+        if lazy is None:
+            return self._w_flat.is_ascii()
+        return self._length == lazy.length()
+
+    def descr_add(self, space, w_other):
+        lazy = self._lazy
+        if not isinstance(lazy, rope.LazyConcat):
+            return self._flat().descr_add(space, w_other)
+        try:
+            w_other = self.convert_arg_to_w_unicode(space, w_other)
+        except OperationError as e:
+            if e.match(space, space.w_TypeError):
+                return space.w_NotImplemented
+            raise
+        return W_LazyUnicodeObject(lazy.append(w_other._utf8),
+                                   self._length + w_other._length)
+
+    def _unicode_sliced(self, space, start, stop):
+        lazy = self._lazy
+        if isinstance(lazy, Utf8View):
+            # slice of a view: slice the parent directly
+            byte_start = self._view_index_to_byte(lazy, start)
+            byte_stop = self._view_index_to_byte(lazy, stop)
+            if byte_start >= 0 and byte_stop >= 0:
+                return W_UnicodeObject._new_slice(lazy.parent, byte_start,
+                                                  byte_stop, stop - start)
+        return self._flat()._unicode_sliced(space, start, stop)
+
+    def _view_index_to_byte(self, view, index):
+        """Return the position in view.parent of the codepoint 'index' of
+        the view, or -1 if it is too far from both ends of the view."""
+        if self._length == view.length():
+            return view.start + index
+        parent = view.parent
+        if index <= self._length - index:
+            if index > UNICODE_VIEW_MAX_WALK:
+                return -1
+            pos = view.start
+            for i in range(index):
+                pos = rutf8.next_codepoint_pos(parent, pos)
+        else:
+            if self._length - index > UNICODE_VIEW_MAX_WALK:
+                return -1
+            pos = view.stop
+            for i in range(self._length - index):
+                pos = rutf8.prev_codepoint_pos(parent, pos)
+        return pos
+
+# the inherited methods only need _len() and the slicing above
+forward_to_flat(W_LazyUnicodeObject, W_UnicodeObject,
+                inherited=['_len', 'descr_len', 'descr_getitem',
+                           'descr_getslice'])
+
+
+def is_ascii_unicode(w_obj):
+    """Check if 'w_obj' is an ASCII unicode that the list and set
+    strategies can store as its utf8: a W_UnicodeObject or a
+    W_LazyUnicodeObject, but not an instance of a subclass of unicode."""
+    return ((type(w_obj) is W_UnicodeObject or
+             type(w_obj) is W_LazyUnicodeObject) and w_obj.is_ascii())
+
+
 def wrapunicode(space, uni):
     return W_UnicodeObject(uni)
 
@@ -1575,135 +1735,140 @@ W_UnicodeObject.typedef = TypeDef(
     __new__ = interp2app(W_UnicodeObject.descr_new),
     __doc__ = UnicodeDocstrings.__doc__,
 
-    __repr__ = interp2app(W_UnicodeObject.descr_repr,
-                          doc=UnicodeDocstrings.__repr__.__doc__),
-    __str__ = interp2app(W_UnicodeObject.descr_str,
-                         doc=UnicodeDocstrings.__str__.__doc__),
-    __hash__ = interp2app(W_UnicodeObject.descr_hash,
-                          doc=UnicodeDocstrings.__hash__.__doc__),
-
-    __eq__ = interp2app(W_UnicodeObject.descr_eq,
-                        doc=UnicodeDocstrings.__eq__.__doc__),
-    __ne__ = interp2app(W_UnicodeObject.descr_ne,
-                        doc=UnicodeDocstrings.__ne__.__doc__),
-    __lt__ = interp2app(W_UnicodeObject.descr_lt,
-                        doc=UnicodeDocstrings.__lt__.__doc__),
-    __le__ = interp2app(W_UnicodeObject.descr_le,
-                        doc=UnicodeDocstrings.__le__.__doc__),
-    __gt__ = interp2app(W_UnicodeObject.descr_gt,
-                        doc=UnicodeDocstrings.__gt__.__doc__),
-    __ge__ = interp2app(W_UnicodeObject.descr_ge,
-                        doc=UnicodeDocstrings.__ge__.__doc__),
-
-    __len__ = interp2app(W_UnicodeObject.descr_len,
-                         doc=UnicodeDocstrings.__len__.__doc__),
-    __contains__ = interp2app(W_UnicodeObject.descr_contains,
-                              doc=UnicodeDocstrings.__contains__.__doc__),
-
-    __add__ = interp2app(W_UnicodeObject.descr_add,
-                         doc=UnicodeDocstrings.__add__.__doc__),
-    __mul__ = interp2app(W_UnicodeObject.descr_mul,
-                         doc=UnicodeDocstrings.__mul__.__doc__),
-    __rmul__ = interp2app(W_UnicodeObject.descr_mul,
-                          doc=UnicodeDocstrings.__rmul__.__doc__),
-
-    __getitem__ = interp2app(W_UnicodeObject.descr_getitem,
-                             doc=UnicodeDocstrings.__getitem__.__doc__),
-    __getslice__ = interp2app(W_UnicodeObject.descr_getslice,
-                              doc=UnicodeDocstrings.__getslice__.__doc__),
-
-    capitalize = interp2app(W_UnicodeObject.descr_capitalize,
-                            doc=UnicodeDocstrings.capitalize.__doc__),
-    center = interp2app(W_UnicodeObject.descr_center,
-                        doc=UnicodeDocstrings.center.__doc__),
-    count = interp2app(W_UnicodeObject.descr_count,
-                       doc=UnicodeDocstrings.count.__doc__),
-    decode = interp2app(W_UnicodeObject.descr_decode,
-                        doc=UnicodeDocstrings.decode.__doc__),
-    encode = interp2app(W_UnicodeObject.descr_encode,
-                        doc=UnicodeDocstrings.encode.__doc__),
-    expandtabs = interp2app(W_UnicodeObject.descr_expandtabs,
-                            doc=UnicodeDocstrings.expandtabs.__doc__),
-    find = interp2app(W_UnicodeObject.descr_find,
-                      doc=UnicodeDocstrings.find.__doc__),
-    rfind = interp2app(W_UnicodeObject.descr_rfind,
-                       doc=UnicodeDocstrings.rfind.__doc__),
-    index = interp2app(W_UnicodeObject.descr_index,
-                       doc=UnicodeDocstrings.index.__doc__),
-    rindex = interp2app(W_UnicodeObject.descr_rindex,
-                        doc=UnicodeDocstrings.rindex.__doc__),
-    isalnum = interp2app(W_UnicodeObject.descr_isalnum,
-                         doc=UnicodeDocstrings.isalnum.__doc__),
-    isalpha = interp2app(W_UnicodeObject.descr_isalpha,
-                         doc=UnicodeDocstrings.isalpha.__doc__),
-    isdecimal = interp2app(W_UnicodeObject.descr_isdecimal,
-                           doc=UnicodeDocstrings.isdecimal.__doc__),
-    isdigit = interp2app(W_UnicodeObject.descr_isdigit,
-                         doc=UnicodeDocstrings.isdigit.__doc__),
-    islower = interp2app(W_UnicodeObject.descr_islower,
-                         doc=UnicodeDocstrings.islower.__doc__),
-    isnumeric = interp2app(W_UnicodeObject.descr_isnumeric,
-                           doc=UnicodeDocstrings.isnumeric.__doc__),
-    isspace = interp2app(W_UnicodeObject.descr_isspace,
-                         doc=UnicodeDocstrings.isspace.__doc__),
-    istitle = interp2app(W_UnicodeObject.descr_istitle,
-                         doc=UnicodeDocstrings.istitle.__doc__),
-    isupper = interp2app(W_UnicodeObject.descr_isupper,
-                         doc=UnicodeDocstrings.isupper.__doc__),
-    join = interp2app(W_UnicodeObject.descr_join,
-                      doc=UnicodeDocstrings.join.__doc__),
-    ljust = interp2app(W_UnicodeObject.descr_ljust,
-                       doc=UnicodeDocstrings.ljust.__doc__),
-    rjust = interp2app(W_UnicodeObject.descr_rjust,
-                       doc=UnicodeDocstrings.rjust.__doc__),
-    lower = interp2app(W_UnicodeObject.descr_lower,
-                       doc=UnicodeDocstrings.lower.__doc__),
-    partition = interp2app(W_UnicodeObject.descr_partition,
-                           doc=UnicodeDocstrings.partition.__doc__),
-    rpartition = interp2app(W_UnicodeObject.descr_rpartition,
-                            doc=UnicodeDocstrings.rpartition.__doc__),
-    replace = interp2app(W_UnicodeObject.descr_replace,
-                         doc=UnicodeDocstrings.replace.__doc__),
-    split = interp2app(W_UnicodeObject.descr_split,
-                       doc=UnicodeDocstrings.split.__doc__),
-    rsplit = interp2app(W_UnicodeObject.descr_rsplit,
-                        doc=UnicodeDocstrings.rsplit.__doc__),
-    splitlines = interp2app(W_UnicodeObject.descr_splitlines,
-                            doc=UnicodeDocstrings.splitlines.__doc__),
-    startswith = interp2app(W_UnicodeObject.descr_startswith,
-                            doc=UnicodeDocstrings.startswith.__doc__),
-    endswith = interp2app(W_UnicodeObject.descr_endswith,
-                          doc=UnicodeDocstrings.endswith.__doc__),
-    strip = interp2app(W_UnicodeObject.descr_strip,
-                       doc=UnicodeDocstrings.strip.__doc__),
-    lstrip = interp2app(W_UnicodeObject.descr_lstrip,
-                        doc=UnicodeDocstrings.lstrip.__doc__),
-    rstrip = interp2app(W_UnicodeObject.descr_rstrip,
-                        doc=UnicodeDocstrings.rstrip.__doc__),
-    swapcase = interp2app(W_UnicodeObject.descr_swapcase,
-                          doc=UnicodeDocstrings.swapcase.__doc__),
-    title = interp2app(W_UnicodeObject.descr_title,
-                       doc=UnicodeDocstrings.title.__doc__),
-    translate = interp2app(W_UnicodeObject.descr_translate,
-                           doc=UnicodeDocstrings.translate.__doc__),
-    upper = interp2app(W_UnicodeObject.descr_upper,
-                       doc=UnicodeDocstrings.upper.__doc__),
-    zfill = interp2app(W_UnicodeObject.descr_zfill,
-                       doc=UnicodeDocstrings.zfill.__doc__),
-
-    format = interp2app(W_UnicodeObject.descr_format,
-                        doc=UnicodeDocstrings.format.__doc__),
-    __format__ = interp2app(W_UnicodeObject.descr__format__,
-                            doc=UnicodeDocstrings.__format__.__doc__),
-    __mod__ = interp2app(W_UnicodeObject.descr_mod,
-                         doc=UnicodeDocstrings.__mod__.__doc__),
-    __rmod__ = interp2app(W_UnicodeObject.descr_rmod,
-                         doc=UnicodeDocstrings.__rmod__.__doc__),
-    __getnewargs__ = interp2app(W_UnicodeObject.descr_getnewargs,
-                                doc=UnicodeDocstrings.__getnewargs__.__doc__),
-    _formatter_parser = interp2app(W_UnicodeObject.descr_formatter_parser),
+    __repr__ = interpindirect2app(W_UnicodeObject.descr_repr,
+                                  doc=UnicodeDocstrings.__repr__.__doc__),
+    __str__ = interpindirect2app(W_UnicodeObject.descr_str,
+                                 doc=UnicodeDocstrings.__str__.__doc__),
+    __hash__ = interpindirect2app(W_UnicodeObject.descr_hash,
+                                  doc=UnicodeDocstrings.__hash__.__doc__),
+
+    __eq__ = interpindirect2app(W_UnicodeObject.descr_eq,
+                                doc=UnicodeDocstrings.__eq__.__doc__),
+    __ne__ = interpindirect2app(W_UnicodeObject.descr_ne,
+                                doc=UnicodeDocstrings.__ne__.__doc__),
+    __lt__ = interpindirect2app(W_UnicodeObject.descr_lt,
+                                doc=UnicodeDocstrings.__lt__.__doc__),
+    __le__ = interpindirect2app(W_UnicodeObject.descr_le,
+                                doc=UnicodeDocstrings.__le__.__doc__),
+    __gt__ = interpindirect2app(W_UnicodeObject.descr_gt,
+                                doc=UnicodeDocstrings.__gt__.__doc__),
+    __ge__ = interpindirect2app(W_UnicodeObject.descr_ge,
+                                doc=UnicodeDocstrings.__ge__.__doc__),
+
+    __len__ = interpindirect2app(W_UnicodeObject.descr_len,
+                                 doc=UnicodeDocstrings.__len__.__doc__),
+    __contains__ = interpindirect2app(
+        W_UnicodeObject.descr_contains,
+        doc=UnicodeDocstrings.__contains__.__doc__),
+
+    __add__ = interpindirect2app(W_UnicodeObject.descr_add,
+                                 doc=UnicodeDocstrings.__add__.__doc__),
+    __mul__ = interpindirect2app(W_UnicodeObject.descr_mul,
+                                 doc=UnicodeDocstrings.__mul__.__doc__),
+    __rmul__ = interpindirect2app(W_UnicodeObject.descr_rmul,
+                                  doc=UnicodeDocstrings.__rmul__.__doc__),
+
+    __getitem__ = interpindirect2app(
+        W_UnicodeObject.descr_getitem,
+        doc=UnicodeDocstrings.__getitem__.__doc__),
+    __getslice__ = interpindirect2app(
+        W_UnicodeObject.descr_getslice,
+        doc=UnicodeDocstrings.__getslice__.__doc__),
+
+    capitalize = interpindirect2app(W_UnicodeObject.descr_capitalize,
+                                    doc=UnicodeDocstrings.capitalize.__doc__),
+    center = interpindirect2app(W_UnicodeObject.descr_center,
+                                doc=UnicodeDocstrings.center.__doc__),
+    count = interpindirect2app(W_UnicodeObject.descr_count,
+                               doc=UnicodeDocstrings.count.__doc__),
+    decode = interpindirect2app(W_UnicodeObject.descr_decode,
+                                doc=UnicodeDocstrings.decode.__doc__),
+    encode = interpindirect2app(W_UnicodeObject.descr_encode,
+                                doc=UnicodeDocstrings.encode.__doc__),
+    expandtabs = interpindirect2app(W_UnicodeObject.descr_expandtabs,
+                                    doc=UnicodeDocstrings.expandtabs.__doc__),
+    find = interpindirect2app(W_UnicodeObject.descr_find,
+                              doc=UnicodeDocstrings.find.__doc__),
+    rfind = interpindirect2app(W_UnicodeObject.descr_rfind,
+                               doc=UnicodeDocstrings.rfind.__doc__),
+    index = interpindirect2app(W_UnicodeObject.descr_index,
+                               doc=UnicodeDocstrings.index.__doc__),
+    rindex = interpindirect2app(W_UnicodeObject.descr_rindex,
+                                doc=UnicodeDocstrings.rindex.__doc__),
+    isalnum = interpindirect2app(W_UnicodeObject.descr_isalnum,
+                                 doc=UnicodeDocstrings.isalnum.__doc__),
+    isalpha = interpindirect2app(W_UnicodeObject.descr_isalpha,
+                                 doc=UnicodeDocstrings.isalpha.__doc__),
+    isdecimal = interpindirect2app(W_UnicodeObject.descr_isdecimal,
+                                   doc=UnicodeDocstrings.isdecimal.__doc__),
+    isdigit = interpindirect2app(W_UnicodeObject.descr_isdigit,
+                                 doc=UnicodeDocstrings.isdigit.__doc__),
+    islower = interpindirect2app(W_UnicodeObject.descr_islower,
+                                 doc=UnicodeDocstrings.islower.__doc__),
+    isnumeric = interpindirect2app(W_UnicodeObject.descr_isnumeric,
+                                   doc=UnicodeDocstrings.isnumeric.__doc__),
+    isspace = interpindirect2app(W_UnicodeObject.descr_isspace,
+                                 doc=UnicodeDocstrings.isspace.__doc__),
+    istitle = interpindirect2app(W_UnicodeObject.descr_istitle,
+                                 doc=UnicodeDocstrings.istitle.__doc__),
+    isupper = interpindirect2app(W_UnicodeObject.descr_isupper,
+                                 doc=UnicodeDocstrings.isupper.__doc__),
+    join = interpindirect2app(W_UnicodeObject.descr_join,
+                              doc=UnicodeDocstrings.join.__doc__),
+    ljust = interpindirect2app(W_UnicodeObject.descr_ljust,
+                               doc=UnicodeDocstrings.ljust.__doc__),
+    rjust = interpindirect2app(W_UnicodeObject.descr_rjust,
+                               doc=UnicodeDocstrings.rjust.__doc__),
+    lower = interpindirect2app(W_UnicodeObject.descr_lower,
+                               doc=UnicodeDocstrings.lower.__doc__),
+    partition = interpindirect2app(W_UnicodeObject.descr_partition,
+                                   doc=UnicodeDocstrings.partition.__doc__),
+    rpartition = interpindirect2app(W_UnicodeObject.descr_rpartition,
+                                    doc=UnicodeDocstrings.rpartition.__doc__),
+    replace = interpindirect2app(W_UnicodeObject.descr_replace,
+                                 doc=UnicodeDocstrings.replace.__doc__),
+    split = interpindirect2app(W_UnicodeObject.descr_split,
+                               doc=UnicodeDocstrings.split.__doc__),
+    rsplit = interpindirect2app(W_UnicodeObject.descr_rsplit,
+                                doc=UnicodeDocstrings.rsplit.__doc__),
+    splitlines = interpindirect2app(W_UnicodeObject.descr_splitlines,
+                                    doc=UnicodeDocstrings.splitlines.__doc__),
+    startswith = interpindirect2app(W_UnicodeObject.descr_startswith,
+                                    doc=UnicodeDocstrings.startswith.__doc__),
+    endswith = interpindirect2app(W_UnicodeObject.descr_endswith,
+                                  doc=UnicodeDocstrings.endswith.__doc__),
+    strip = interpindirect2app(W_UnicodeObject.descr_strip,
+                               doc=UnicodeDocstrings.strip.__doc__),
+    lstrip = interpindirect2app(W_UnicodeObject.descr_lstrip,
+                                doc=UnicodeDocstrings.lstrip.__doc__),
+    rstrip = interpindirect2app(W_UnicodeObject.descr_rstrip,
+                                doc=UnicodeDocstrings.rstrip.__doc__),
+    swapcase = interpindirect2app(W_UnicodeObject.descr_swapcase,
+                                  doc=UnicodeDocstrings.swapcase.__doc__),
+    title = interpindirect2app(W_UnicodeObject.descr_title,
+                               doc=UnicodeDocstrings.title.__doc__),
+    translate = interpindirect2app(W_UnicodeObject.descr_translate,
+                                   doc=UnicodeDocstrings.translate.__doc__),
+    upper = interpindirect2app(W_UnicodeObject.descr_upper,
+                               doc=UnicodeDocstrings.upper.__doc__),
+    zfill = interpindirect2app(W_UnicodeObject.descr_zfill,
+                               doc=UnicodeDocstrings.zfill.__doc__),
+
+    format = interpindirect2app(W_UnicodeObject.descr_format,
+                                doc=UnicodeDocstrings.format.__doc__),
+    __format__ = interpindirect2app(W_UnicodeObject.descr__format__,
+                                    doc=UnicodeDocstrings.__format__.__doc__),
+    __mod__ = interpindirect2app(W_UnicodeObject.descr_mod,
+                                 doc=UnicodeDocstrings.__mod__.__doc__),
+    __rmod__ = interpindirect2app(W_UnicodeObject.descr_rmod,
+                                 doc=UnicodeDocstrings.__rmod__.__doc__),
+    __getnewargs__ = interpindirect2app(
+        W_UnicodeObject.descr_getnewargs,
+        doc=UnicodeDocstrings.__getnewargs__.__doc__),
+    _formatter_parser =
+        interpindirect2app(W_UnicodeObject.descr_formatter_parser),
     _formatter_field_name_split =
-        interp2app(W_UnicodeObject.descr_formatter_field_name_split),
+        interpindirect2app(W_UnicodeObject.descr_formatter_field_name_split),
 )
 W_UnicodeObject.typedef.flag_sequence_bug_compat = True
 
@@ -1714,6 +1879,255 @@ def _create_list_from_unicode(value):
     return [s for s in value]
 
 
+# Scanners for splitlines() and split().  Runs of ASCII characters above
+# ' ' cannot contain a whitespace or a linebreak, so they are skipped
+# rutf8.WORD_SIZE bytes at a time; only the other characters are looked
+# at one by one.  If 'lengths' is not None, the number of codepoints of
+# each piece is appended to it while scanning, so that the pieces don't
+# need to be counted again.
+
+@always_inline
+def _skip_plain_words(value, pos, end):
+    while rutf8.WORD_AT_A_TIME and pos + rutf8.WORD_SIZE <= end:
+        if not rutf8.ascii_word_is_plain(rutf8.load_word(value, pos)):
+            break
+        pos += rutf8.WORD_SIZE
+    return pos
+
+def _split_lines(value, keepends, lengths):
+    length = len(value)
+    res = []
+    pos = 0
+    while pos < length:
+        sol = pos
+        lgt = 0
+        while pos < length:
+            nextpos = _skip_plain_words(value, pos, length)
+            if nextpos > pos:
+                lgt += nextpos - pos
+                pos = nextpos
+                continue
+            if rutf8.islinebreak(value, pos):
+                break
+            pos = rutf8.next_codepoint_pos(value, pos)
+            lgt += 1
+        eol = pos
+        if pos < length:
+            # read CRLF as one line break
+            if (value[pos] == '\r' and pos + 1 < length
+                                   and value[pos + 1] == '\n'):
+                pos += 2
+                line_end_chars = 2
+            else:
+                pos = rutf8.next_codepoint_pos(value, pos)
+                line_end_chars = 1
+            if keepends:
+                eol = pos
+                lgt += line_end_chars
+        assert eol >= 0
+        assert sol >= 0
+        res.append(value[sol:eol])
+        if lengths is not None:
+            lengths.append(lgt)
+    return res
+
+def _split_whitespace(value, maxsplit, lengths):
+    length = len(value)
+    res = []
+    i = 0
+    while True:
+        # find the beginning of the next word
+        while i < length:
+            if not rutf8.isspace(value, i):
+                break   # found
+            i = rutf8.next_codepoint_pos(value, i)
+        else:
+            break  # end of string, finished
+
+        # find the end of the word
+        lgt = 0
+        if maxsplit == 0:
+            j = length   # take all the rest of the string
+            if lengths is not None:
+                lgt = rutf8.codepoints_in_utf8(value, i)
+        else:
+            j = i
+            while j < length:
+                nextj = _skip_plain_words(value, j, length)
+                if nextj > j:
+                    lgt += nextj - j
+                    j = nextj
+                    continue
+                if rutf8.isspace(value, j):
+                    break
+                j = rutf8.next_codepoint_pos(value, j)
+                lgt += 1
+            maxsplit -= 1   # NB. if it's already < 0, it stays < 0
+
+        # the word is value[i:j]
+        res.append(value[i:j])
+        if lengths is not None:
+            lengths.append(lgt)
+
+        # continue to look from the character following the space after
+        # the word
+        if j < length:
+            i = rutf8.next_codepoint_pos(value, j)
+        else:
+            break
+    return res
+
+def _newlist_pieces(space, strs, is_ascii):
+    if is_ascii:
+        return space.newlist_utf8(strs, True)
+    lengths = [rutf8.codepoints_in_utf8(utf8) for utf8 in strs]
+    return space.newlist_utf8_compact(strs, lengths)
+
+
+# Case mappings.  Runs of ASCII characters are handled rutf8.WORD_SIZE
+# bytes at a time, without looking at unicodedb; only the non-ASCII
+# characters go through the tables.
+_LOWER, _UPPER, _SWAPCASE = range(3)
+
+@specialize.arg(1)
+def _casemap_code(ch, kind):
+    if kind == _LOWER:
+        return unicodedb.tolower(ch)
+    elif kind == _UPPER:
+        return unicodedb.toupper(ch)
+    else:
+        if unicodedb.isupper(ch):
+            return unicodedb.tolower(ch)
+        elif unicodedb.islower(ch):
+            return unicodedb.toupper(ch)
+        return ch
+
+@specialize.arg(1)
+def _casemap_word(word, kind):
+    # 'word' contains only ASCII characters; flip bit 0x20 of the letters
+    # that change
+    if kind == _LOWER:
+        return word | (rutf8.ascii_word_upper_mask(word) >> 2)
+    elif kind == _UPPER:
+        return word ^ (rutf8.ascii_word_lower_mask(word) >> 2)
+    else:
+        return word ^ ((rutf8.ascii_word_upper_mask(word) |
+                        rutf8.ascii_word_lower_mask(word)) >> 2)
+
+@specialize.arg(1)
+def _casemap_unchanged_prefix(value, kind):
+    """Return a position such that the case mapping leaves value[:pos]
+    unchanged, or -1 if it leaves the whole string unchanged."""
+    pos = 0
+    end = len(value)
+    while pos < end:
+        if rutf8.WORD_AT_A_TIME and pos + rutf8.WORD_SIZE <= end:
+            word = rutf8.load_word(value, pos)
+            if rutf8.word_is_ascii(word):
+                if _casemap_word(word, kind) != word:
+                    return pos
+                pos += rutf8.WORD_SIZE
+                continue
+        ch = rutf8.codepoint_at_pos(value, pos)
+        if _casemap_code(ch, kind) != ch:
+            return pos
+        pos = rutf8.next_codepoint_pos(value, pos)
+    return -1
+
+@specialize.arg(2)
+def _utf8_casemap(value, length, kind):
+    """Apply the case mapping 'kind' to the utf8 string 'value'. Returns
+    None if nothing changes."""
+    first = _casemap_unchanged_prefix(value, kind)
+    if first < 0:
+        return None
+    end = len(value)
+    if length == end and rutf8.WORD_AT_A_TIME:
+        # only ASCII, the result has the same size
+        buf = MutableStringBuffer(end)
+        pos = 0
+        while pos + rutf8.WORD_SIZE <= end:
+            word = rutf8.load_word(value, pos)
+            buf.typed_write(lltype.Unsigned, pos, _casemap_word(word, kind))
+            pos += rutf8.WORD_SIZE
+        while pos < end:
+            buf.setitem(pos, chr(_casemap_code(ord(value[pos]), kind)))
+            pos += 1
+        return buf.finish()
+    builder = StringBuilder(end)
+    builder.append_slice(value, 0, first)
+    pos = first
+    while pos < end:
+        if rutf8.WORD_AT_A_TIME and pos + rutf8.WORD_SIZE <= end:
+            word = rutf8.load_word(value, pos)
+            if rutf8.word_is_ascii(word):
+                if _casemap_word(word, kind) == word:
+                    builder.append_slice(value, pos, pos + rutf8.WORD_SIZE)
+                else:
+                    for i in range(pos, pos + rutf8.WORD_SIZE):
+                        builder.append(
+                            chr(_casemap_code(ord(value[i]), kind)))
+                pos += rutf8.WORD_SIZE
+                continue
+        ch = rutf8.codepoint_at_pos(value, pos)
+        rutf8.unichr_as_utf8_append(builder, _casemap_code(ch, kind), True)
+        pos = rutf8.next_codepoint_pos(value, pos)
+    return builder.build()
+
+def _ascii_title(value):
+    """title() of an ASCII string, or None if nothing changes."""
+    buf = None
+    previous_is_cased = False
+    for i in range(len(value)):
+        ch = value[i]
+        if previous_is_cased:
+            newch = ch.lower()
+        else:
+            newch = ch.upper()
+        previous_is_cased = ch.isalpha()
+        if newch != ch and buf is None:
+            buf = MutableStringBuffer(len(value))
+            for j in range(i):
+                buf.setitem(j, value[j])
+        if buf is not None:
+            buf.setitem(i, newch)
+    if buf is None:
+        return None
+    return buf.finish()
+
+@specialize.arg(1)
+def _ascii_is_cased(value, kind):
+    """islower() or isupper() of an ASCII string."""
+    cased = False
+    pos = 0
+    end = len(value)
+    while pos + rutf8.WORD_SIZE <= end:
+        word = rutf8.load_word(value, pos)
+        if kind == _LOWER:
+            wrong = rutf8.ascii_word_upper_mask(word)
+            right = rutf8.ascii_word_lower_mask(word)
+        else:
+            wrong = rutf8.ascii_word_lower_mask(word)
+            right = rutf8.ascii_word_upper_mask(word)
+        if wrong:
+            return False
+        if right:
+            cased = True
+        pos += rutf8.WORD_SIZE
+    while pos < end:
+        ch = value[pos]
+        if kind == _LOWER:
+            if ch.isupper():
+                return False
+            cased = cased or ch.islower()
+        else:
+            if ch.islower():
+                return False
+            cased = cased or ch.isupper()
+        pos += 1
+    return cased
+
+
 W_UnicodeObject.EMPTY = W_UnicodeObject('', 0)
 
 
@@ -1721,7 +2135,7 @@ W_UnicodeObject.EMPTY = W_UnicodeObject('', 0)
 def unicode_to_decimal_w(space, w_unistr):
     if not isinstance(w_unistr, W_UnicodeObject):
         raise oefmt(space.w_TypeError, "expected unicode, got '%T'", w_unistr)
-    unistr = w_unistr._utf8
+    unistr = space.utf8_w(w_unistr)
     result = ['\0'] * w_unistr._length
     digits = ['0', '1', '2', '3', '4',
               '5', '6', '7', '8', '9']
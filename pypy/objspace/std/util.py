@@ -1,3 +1,9 @@
+import inspect
+import types
+
+import py
+
+from rpython.rlib.objectmodel import not_rpython
 from rpython.rlib.rstring import InvalidBaseError
 
 from pypy.interpreter.error import OperationError, oefmt
@@ -56,3 +62,34 @@ def wrap_parsestringerror(space, e, w_source):
     else:
         raise oefmt(space.w_ValueError, '%s: %R',
                     e.msg, w_source)
+
+
+@not_rpython
+def forward_to_flat(cls, base, inherited=()):
+    """Give 'cls', a lazy representation of the string class 'base', all
+    the methods of 'base' that 'cls' does not define itself, apart from
+    the 'inherited' ones.  They call the same method on self._flat(), the
+    equivalent instance of 'base'."""
+    for name, func in base.__dict__.items():
+        if not isinstance(func, types.FunctionType):
+            continue
+        if name in cls.__dict__ or name in inherited:
+            continue
+        args = inspect.getargs(func.func_code)
+        assert not args.keywords, "%s.%s: **kwds" % (base.__name__, name)
+        argnames = args.args[1:]
+        if args.varargs:
+            argnames.append('*' + args.varargs)
+        argspec = ', '.join(argnames)
+        func_code = py.code.Source("""
+        def %(name)s(self, %(args)s):
+            return self._flat().%(name)s(%(args)s)
+        """ % {'name': name, 'args': argspec})
+        d = {}
+        exec func_code.compile() in d
+        f = d[name]
+        f.func_defaults = func.func_defaults
+        f.__module__ = func.__module__
+        if hasattr(func, '_annspecialcase_'):
+            f._annspecialcase_ = func._annspecialcase_
+        setattr(cls, name, f)
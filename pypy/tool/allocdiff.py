@@ -0,0 +1,109 @@
+#! /usr/bin/env python
+"""
+Compares two files produced by gc.dump_alloc_samples(), and prints the
+types and the allocation sites whose live objects grew the most between
+the two, and optionally a typeids.txt.
+
+Syntax:  allocdiff.py  [-n N]  <old-samples>  <new-samples>  [<typeids.txt>]
+
+By default, typeids.txt is loaded from the same dir as new-samples.  The
+sizes are estimated from the number of samples: each sample stands for
+about 'interval' bytes.  The allocation site is the innermost app-level
+function (its first line number is given, not the line of the
+allocation); -n gives the number of lines printed for each report.
+"""
+import sys, os
+from pypy.tool.gcdump import Stat
+
+
+class Samples(object):
+
+    def __init__(self, filename):
+        self.interval = 0
+        self.by_type = {}     # {typenum: number of samples}
+        self.by_site = {}     # {innermost frame: number of samples}
+        self.by_type_and_site = {}
+        f = open(filename)
+        for line in f:
+            line = line.rstrip('\n')
+            if line.startswith('#'):
+                words = line[1:].split()
+                if words[0] == 'interval':
+                    self.interval = int(words[1])
+                continue
+            fields = line.split('\t')
+            typenum = int(fields[0])
+            if len(fields) > 2:
+                site = fields[2]
+            else:
+                site = '<no app-level frame>'
+            self._add(self.by_type, typenum)
+            self._add(self.by_site, site)
+            self._add(self.by_type_and_site, (typenum, site))
+        f.close()
+
+    def _add(self, d, key):
+        d[key] = d.get(key, 0) + 1
+
+
+def diff(old, new):
+    """Return a list of (difference, key), with the largest growth first."""
+    result = []
+    for key in set(old) | set(new):
+        delta = new.get(key, 0) - old.get(key, 0)
+        if delta != 0:
+            result.append((delta, key))
+    result.sort(reverse=True)
+    return result
+
+def format_size(nsamples, interval):
+    return '%+10.2fM' % (nsamples * interval / (1024.0*1024.0),)
+
+def print_report(title, lines, interval, format_key, limit):
+    print title
+    for delta, key in lines[:limit]:
+        print '%8d %s  %s' % (delta, format_size(delta, interval),
+                              format_key(key))
+    if len(lines) > limit:
+        print '  ... %d more' % (len(lines) - limit,)
+    print
+
+def print_diff(old, new, stat, limit=20):
+    interval = new.interval or old.interval
+    total = sum(new.by_type.values()) - sum(old.by_type.values())
+    print 'total: %+d samples, %s (interval %d bytes)' % (
+        total, format_size(total, interval).strip(), interval)
+    print
+    print_report('growth by type:', diff(old.by_type, new.by_type),
+                 interval, stat.get_type_name, limit)
+    print_report('growth by allocation site:', diff(old.by_site, new.by_site),
+                 interval, str, limit)
+    print_report('growth by type and allocation site:',
+                 diff(old.by_type_and_site, new.by_type_and_site),
+                 interval,
+                 lambda (typenum, site): '%s  %s' % (
+                     stat.get_type_name(typenum), site),
+                 limit)
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    limit = 20
+    if len(args) >= 2 and args[0] == '-n':
+        limit = int(args[1])
+        del args[:2]
+    if len(args) < 2:
+        print >> sys.stderr, __doc__
+        sys.exit(2)
+    old = Samples(args[0])
+    new = Samples(args[1])
+    #
+    stat = Stat()
+    if len(args) > 2:
+        typeid_name = args[2]
+    else:
+        typeid_name = os.path.join(os.path.dirname(args[1]), 'typeids.txt')
+    if os.path.isfile(typeid_name):
+        stat.load_typeids(typeid_name)
+    #
+    print_diff(old, new, stat, limit)
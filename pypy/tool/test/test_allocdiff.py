@@ -0,0 +1,39 @@
+from pypy.tool.allocdiff import Samples, diff, print_diff
+from pypy.tool.gcdump import Stat
+
+
+def write_samples(tmpdir, name, lines):
+    f = tmpdir.join(name)
+    f.write('# interval 1048576\n' + ''.join([line + '\n' for line in lines]))
+    return Samples(str(f))
+
+def test_diff(tmpdir, capsys):
+    old = write_samples(tmpdir, 'old', [
+        '1\t16\ta.py:1:f\tmain.py:1:main',
+        '2\t32\tb.py:5:g',
+        '2\t32\tb.py:5:g',
+        ])
+    new = write_samples(tmpdir, 'new', [
+        '1\t16\ta.py:1:f\tmain.py:1:main',
+        '1\t16\ta.py:1:f\tmain.py:1:main',
+        '1\t16\ta.py:1:f\tmain.py:1:main',
+        '2\t32\tb.py:5:g',
+        '3\t8',
+        ])
+    assert new.interval == 1048576
+    assert new.by_type == {1: 3, 2: 1, 3: 1}
+    assert new.by_site == {'a.py:1:f': 3, 'b.py:5:g': 1,
+                           '<no app-level frame>': 1}
+    assert diff(old.by_type, new.by_type) == [(2, 1), (1, 3), (-1, 2)]
+    assert diff(old.by_site, new.by_site) == [
+        (2, 'a.py:1:f'), (1, '<no app-level frame>'), (-1, 'b.py:5:g')]
+    #
+    stat = Stat()
+    stat.load_typeids(['', 'GcStruct W_IntObject', 'GcStruct W_ListObject'])
+    print_diff(old, new, stat)
+    out, err = capsys.readouterr()
+    assert 'total: +2 samples, +2.00M' in out
+    assert '       2      +2.00M  W_IntObject\n' in out
+    assert '      -1      -1.00M  W_ListObject\n' in out
+    assert '       1      +1.00M  <typenum 3>\n' in out
+    assert '       2      +2.00M  W_IntObject  a.py:1:f\n' in out
@@ -415,6 +415,8 @@ class __extend__(pairtype(SomeString, SomeTuple),
         for s_item in s_tuple.items:
             if isinstance(s_item, SomeFloat):
                 pass   # or s_item is a subclass, like SomeInteger
+            elif isinstance(s_item, SomeImpossibleValue):
+                pass   # not known yet: the result can only generalize
             elif (isinstance(s_item, SomeString) or
                   isinstance(s_item, SomeUnicodeString)) and s_item.no_nul:
                 pass
@@ -2207,6 +2207,16 @@ class TestAnnotateTestCase:
         assert isinstance(s, annmodel.SomeUnicodeString)
         assert s.no_nul
 
+    def test_no_nul_mod_impossible_item(self):
+        # an item that is not annotated yet must not make the result
+        # more general than the final one: it would shrink afterwards
+        from rpython.tool.pairtype import pair
+        s_format = self.RPythonAnnotator().bookkeeper.immutablevalue("%s")
+        s_tuple = annmodel.SomeTuple([annmodel.s_ImpossibleValue])
+        s = pair(s_format, s_tuple).mod()
+        assert isinstance(s, annmodel.SomeString)
+        assert s.no_nul
+
     def test_mul_str0(self):
         def f(s):
             return s*10
@@ -327,6 +327,7 @@ class LLGraphCPU(model.AbstractCPU):
     supports_longlong = r_uint is not r_ulonglong
     supports_singlefloats = True
     supports_guard_gc_type = True
+    supports_guard_always_fails = True
     translate_support_code = False
     is_llgraph = True
     vector_ext = VectorExt()
@@ -980,17 +981,29 @@ class LLGraphCPU(model.AbstractCPU):
     def bh_vec_int_signext(self, vx, ext, count):
         return [heaptracker.int_signext(_vx, ext) for _vx in vx]
 
+    def _vec_array(self, struct, offset, scale, disp, descr):
+        # returns the array and the index of the first item accessed.
+        # gc arrays (e.g. the items of a list) are not addresses: the
+        # byte offset is relative to their first item
+        byteofs = offset * scale + disp
+        if descr.A._gckind == 'gc':
+            a = support.cast_arg(lltype.Ptr(descr.A), struct)
+            itemsize = descr.get_item_size_in_bytes()
+            assert byteofs % itemsize == 0
+            return a._obj, byteofs // itemsize
+        adr = support.addr_add_bytes(struct, byteofs)
+        a = support.cast_arg(lltype.Ptr(descr.A), adr)
+        return a._obj, 0
+
     def build_load(func):
         def load(self, struct, offset, scale, disp, descr, _count):
             values = []
             count = self.vector_ext.vec_size() // descr.get_item_size_in_bytes()
             assert _count == count
             assert count > 0
-            adr = support.addr_add_bytes(struct, (offset * scale + disp))
-            a = support.cast_arg(lltype.Ptr(descr.A), adr)
-            array = a._obj
+            array, start = self._vec_array(struct, offset, scale, disp, descr)
             for i in range(count):
-                val = support.cast_result(descr.A.OF, array.getitem(i))
+                val = support.cast_result(descr.A.OF, array.getitem(start + i))
                 values.append(val)
             return values
         return load
@@ -1000,11 +1013,9 @@ class LLGraphCPU(model.AbstractCPU):
     del build_load
 
     def bh_vec_store(self, struct, offset, newvalues, scale, disp, descr, count):
-        adr = support.addr_add_bytes(struct, offset * scale + disp)
-        a = support.cast_arg(lltype.Ptr(descr.A), adr)
-        array = a._obj
+        array, start = self._vec_array(struct, offset, scale, disp, descr)
         for i,n in enumerate(newvalues):
-            array.setitem(i, support.cast_arg(descr.A.OF, n))
+            array.setitem(start + i, support.cast_arg(descr.A.OF, n))
 
     def store_fail_descr(self, deadframe, descr):
         pass # I *think*
@@ -1312,6 +1323,9 @@ class LLFrame(object):
         if self.lltrace.invalid:
             self.fail_guard(descr)
 
+    def execute_guard_always_fails(self, descr):
+        self.fail_guard(descr)
+
     def execute_int_add_ovf(self, _, x, y):
         try:
             z = ovfcheck(x + y)
@@ -7,6 +7,9 @@ class CPUTotalTracker(object):
     total_compiled_bridges = 0
     total_freed_loops = 0
     total_freed_bridges = 0
+    total_freed_code = 0
+    total_evicted_loops = 0
+    total_recompiled_loops = 0
 
 class AbstractCPU(object):
     supports_floats = False
@@ -16,6 +19,7 @@ class AbstractCPU(object):
     # Boxes and Consts are BoxFloats and ConstFloats.
     supports_singlefloats = False
     supports_guard_gc_type = False
+    supports_guard_always_fails = False
 
     propagate_exception_descr = None
 
@@ -27,6 +31,10 @@ class AbstractCPU(object):
     def _freeze_(self):
         return True
 
+    def get_code_size(self):
+        """Return the size of the machine code currently allocated."""
+        return 0
+
     def setup_once(self):
         """Called once by the front-end when the program starts."""
         pass
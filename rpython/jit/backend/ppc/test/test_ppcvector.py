@@ -22,5 +22,8 @@ class TestBasic(test_basic.JitPPCMixin, test_zvector.VectorizeTests):
     def test_list_vectorize(self):
         pass # needs support_guard_gc_type, disable for now
 
+    def test_list_vectorize_iterator(self):
+        pass # needs support_guard_gc_type, disable for now
+
     enable_opts = 'intbounds:rewrite:virtualize:string:earlyforce:pure:heap:unroll'
 
@@ -3545,6 +3545,38 @@ class LLtypeBackendTest(BaseBackendTest):
         assert fail.identifier == 3
         assert self.cpu.get_int_value(deadframe, 0) == 333
 
+    def test_guard_always_fails(self):
+        if not self.cpu.supports_guard_always_fails:
+            py.test.skip("guard_always_fails not supported")
+        faildescr = BasicFailDescr(1)
+        finaldescr = BasicFinalDescr(0)
+        loop = parse("""
+        [i0, i1]
+        i2 = int_add(i0, i1)
+        guard_always_fails(descr=faildescr) [i2, i1]
+        finish(i0, descr=finaldescr)
+        """, namespace=locals())
+        looptoken = JitCellToken()
+        self.cpu.compile_loop(loop.inputargs, loop.operations, looptoken)
+        deadframe = self.cpu.execute_token(looptoken, 40, 2)
+        fail = self.cpu.get_latest_descr(deadframe)
+        assert fail is faildescr
+        assert self.cpu.get_int_value(deadframe, 0) == 42
+        assert self.cpu.get_int_value(deadframe, 1) == 2
+        # attach a bridge: the guard now jumps to it
+        finaldescr2 = BasicFinalDescr(2)
+        bridge = parse("""
+        [i3, i4]
+        i5 = int_sub(i3, i4)
+        finish(i5, descr=finaldescr2)
+        """, namespace=locals())
+        self.cpu.compile_bridge(faildescr, bridge.inputargs,
+                                bridge.operations, looptoken)
+        deadframe = self.cpu.execute_token(looptoken, 40, 2)
+        fail = self.cpu.get_latest_descr(deadframe)
+        assert fail.identifier == 2
+        assert self.cpu.get_int_value(deadframe, 0) == 40
+
     # pure do_ / descr features
 
     def test_do_operations(self):
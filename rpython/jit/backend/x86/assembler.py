@@ -1775,6 +1775,17 @@ class Assembler386(BaseAssembler, VectorAssemblerMixin):
         guard_token.known_scratch_value = saved
         self.pending_guard_tokens.append(guard_token)
 
+    def genop_guard_guard_always_fails(self, guard_op, guard_token,
+                                       locs, ign):
+        # an unconditional JMP, patched later like the Jcond of other guards
+        self.mc.JMP_l(0)
+        self.mc.force_frame_size(DEFAULT_FRAME_BYTES)
+        pos = self.mc.get_relative_pos(break_basic_block=False)
+        guard_token.pos_jump_offset = pos - 4
+        saved = self.mc.get_scratch_register_known_value()
+        guard_token.known_scratch_value = saved
+        self.pending_guard_tokens.append(guard_token)
+
     def genop_guard_guard_exception(self, guard_op, guard_token, locs, resloc):
         loc = locs[0]
         loc1 = locs[1]
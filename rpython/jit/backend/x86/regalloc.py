@@ -479,6 +479,7 @@ class RegAlloc(BaseRegalloc, VectorRegallocMixin):
     consider_guard_no_overflow = consider_guard_no_exception
     consider_guard_overflow    = consider_guard_no_exception
     consider_guard_not_forced  = consider_guard_no_exception
+    consider_guard_always_fails = consider_guard_no_exception
 
     def consider_guard_value(self, op):
         x = self.make_sure_var_in_reg(op.getarg(0))
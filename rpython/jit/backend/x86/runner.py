@@ -16,6 +16,7 @@ class AbstractX86CPU(AbstractLLCPU):
     debug = True
     supports_floats = True
     supports_singlefloats = True
+    supports_guard_always_fails = True
 
     dont_keepalive_stuff = False # for tests
     with_threads = False
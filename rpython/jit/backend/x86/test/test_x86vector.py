@@ -29,6 +29,9 @@ class TestBasic(test_basic.Jit386Mixin, test_zvector.VectorizeTests):
     def test_list_vectorize(self):
         pass # needs support_guard_gc_type, disable for now
 
+    def test_list_vectorize_iterator(self):
+        pass # needs support_guard_gc_type, disable for now
+
     enable_opts = 'intbounds:rewrite:virtualize:string:earlyforce:pure:heap:unroll'
 
 @py.test.fixture
@@ -409,6 +409,9 @@ class JitCellToken(AbstractDescr):
     # and more data specified by the backend when the loop is compiled
     number = -1
     generation = r_int64(0)
+    entry_count = 0      # entries since the last eviction, see memmgr.py
+    code_size = 0        # computed by memmgr.py before evicting loops
+    segmented = False    # bridges are traced in segments, see pyjitpl.py
     # one purpose of LoopToken is to keep alive the CompiledLoopToken
     # returned by the backend.  When the LoopToken goes away, the
     # CompiledLoopToken has its __del__ called, which frees the assembler
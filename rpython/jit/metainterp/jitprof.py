@@ -11,7 +11,7 @@ from rpython.rlib.jit import Counters
 
 JITPROF_LINES = Counters.ncounters + 1 + 1
 # one for TOTAL, 1 for calls, update if needed
-_CPU_LINES = 4       # the last 4 lines are stored on the cpu
+_CPU_LINES = 7       # the last 7 lines are stored on the cpu
 
 class BaseProfiler(object):
     pass
@@ -110,6 +110,12 @@ class Profiler(BaseProfiler):
             return self.cpu.tracker.total_freed_loops
         elif num == Counters.TOTAL_FREED_BRIDGES:
             return self.cpu.tracker.total_freed_bridges
+        elif num == Counters.TOTAL_FREED_CODE:
+            return self.cpu.tracker.total_freed_code
+        elif num == Counters.TOTAL_EVICTED_LOOPS:
+            return self.cpu.tracker.total_evicted_loops
+        elif num == Counters.TOTAL_RECOMPILED_LOOPS:
+            return self.cpu.tracker.total_recompiled_loops
         return self.counters[num]
 
     def get_times(self, num):
@@ -147,11 +153,14 @@ class Profiler(BaseProfiler):
         self._print_intline("forcings", cnt[Counters.OPT_FORCINGS])
         self._print_intline("abort: trace too long",
                             cnt[Counters.ABORT_TOO_LONG])
+        self._print_intline("abort: segmented trace",
+                            cnt[Counters.ABORT_SEGMENTED_TRACE])
         self._print_intline("abort: compiling", cnt[Counters.ABORT_BRIDGE])
         self._print_intline("abort: vable escape", cnt[Counters.ABORT_ESCAPE])
         self._print_intline("abort: bad loop", cnt[Counters.ABORT_BAD_LOOP])
         self._print_intline("abort: force quasi-immut",
                             cnt[Counters.ABORT_FORCE_QUASIIMMUT])
+        self._print_intline("trace segments", cnt[Counters.TRACE_SEGMENTS])
         self._print_intline("nvirtuals", cnt[Counters.NVIRTUALS])
         self._print_intline("nvholes", cnt[Counters.NVHOLES])
         self._print_intline("nvreused", cnt[Counters.NVREUSED])
@@ -167,6 +176,12 @@ class Profiler(BaseProfiler):
                                 cpu.tracker.total_freed_loops)
             self._print_intline("Freed # of bridges",
                                 cpu.tracker.total_freed_bridges)
+            self._print_intline("Freed code bytes",
+                                cpu.tracker.total_freed_code)
+            self._print_intline("Evicted # of loops",
+                                cpu.tracker.total_evicted_loops)
+            self._print_intline("Recompiled # of loops",
+                                cpu.tracker.total_recompiled_loops)
 
     def _print_line_time(self, string, i, tim):
         final = "%s:%s\t%d\t%f" % (string, " " * max(0, 13-len(string)), i, tim)
@@ -1,7 +1,8 @@
-import math
+import math, weakref
 from rpython.rlib.rarithmetic import r_int64
 from rpython.rlib.debug import debug_start, debug_print, debug_stop
 from rpython.rlib.objectmodel import we_are_translated
+from rpython.rlib.listsort import make_timsort_class
 
 #
 # Logic to decide which loops are old and not used any more.
@@ -19,10 +20,42 @@ from rpython.rlib.objectmodel import we_are_translated
 # 'generation' field is much smaller than the current generation, and
 # removed from the set.
 #
+# In addition, if a code budget is set, the total size of the machine code
+# is checked at every generation.  When it is over budget, loops are
+# removed from 'alive_loops' until the code of the remaining ones fits in
+# 3/4 of the budget.  The loops removed first are the ones with the
+# smallest number of recent entries per byte of code, i.e. the cold and
+# large ones.  A loop is removed together with all its bridges, whose code
+# is counted in the loop's size.  The loops used since the previous
+# generation are never removed.
+#
+
+def _loop_code_size(looptoken):
+    clt = looptoken.compiled_loop_token
+    if clt is None or clt.asmmemmgr_blocks is None:
+        return 0
+    size = 0
+    for rawstart, rawstop in clt.asmmemmgr_blocks:
+        size += rawstop - rawstart
+    return size
+
+def _loop_score(looptoken):
+    # the number of recent entries per byte of code, plus one to sort
+    # the loops that were never entered by size
+    return (looptoken.entry_count + 1) / float(looptoken.code_size + 1)
+
+def _colder(looptoken1, looptoken2):
+    return _loop_score(looptoken1) < _loop_score(looptoken2)
+
+LoopSorter = make_timsort_class(lt=_colder)
+
+EVICTION_RETRY_DELAY = 16
+
 
 class MemoryManager(object):
 
-    def __init__(self):
+    def __init__(self, cpu=None):
+        self.cpu = cpu
         self.check_frequency = -1
         # NB. use of r_int64 to be extremely far on the safe side:
         # this is increasing by one after each loop or bridge is
@@ -38,6 +71,11 @@ class MemoryManager(object):
         self.current_generation = r_int64(1)
         self.next_check = r_int64(-1)
         self.alive_loops = {}
+        self.code_budget = 0           # in bytes, 0 if unlimited
+        self.next_eviction = r_int64(0)
+        # the code of the evicted loops is only freed when the GC frees
+        # their LoopToken: until then, don't count it in the code size
+        self.evicted_pending = []      # list of weakrefs to LoopTokens
 
     def set_max_age(self, max_age, check_frequency=0):
         if max_age <= 0:
@@ -49,17 +87,42 @@ class MemoryManager(object):
             self.check_frequency = check_frequency
             self.next_check = self.current_generation + 1
 
+    def set_code_budget(self, code_budget):
+        self.code_budget = max(code_budget, 0)
+
     def next_generation(self):
         self.current_generation += 1
         if self.current_generation == self.next_check:
             self._kill_old_loops_now()
             self.next_check = self.current_generation + self.check_frequency
+        if (self.code_budget > 0 and
+                self.current_generation >= self.next_eviction and
+                self.get_code_size() > self.code_budget):
+            self._evict_loops_now()
 
     def keep_loop_alive(self, looptoken):
+        looptoken.entry_count += 1
         if looptoken.generation != self.current_generation:
             looptoken.generation = self.current_generation
             self.alive_loops[looptoken] = None
 
+    def get_code_size(self):
+        """Return the size of the machine code that was not evicted yet."""
+        return self.cpu.get_code_size() - self._get_evicted_code_pending()
+
+    def _get_evicted_code_pending(self):
+        pending = 0
+        i = 0
+        while i < len(self.evicted_pending):
+            looptoken = self.evicted_pending[i]()
+            if looptoken is None or looptoken in self.alive_loops:
+                # freed, or used again and no longer evicted
+                del self.evicted_pending[i]
+            else:
+                pending += looptoken.code_size
+                i += 1
+        return pending
+
     def _kill_old_loops_now(self):
         debug_start("jit-mem-collect")
         oldtotal = len(self.alive_loops)
@@ -81,3 +144,45 @@ class MemoryManager(object):
             # a single one is not enough for all tests :-(
             rgc.collect(); rgc.collect(); rgc.collect()
         debug_stop("jit-mem-collect")
+
+    def _evict_loops_now(self):
+        debug_start("jit-mem-evict")
+        code_size = self.get_code_size()
+        debug_print("Code size:        ", code_size)
+        debug_print("Code budget:      ", self.code_budget)
+        candidates = []
+        max_generation = self.current_generation - 1
+        for looptoken in self.alive_loops.keys():
+            if looptoken.generation < max_generation:
+                looptoken.code_size = _loop_code_size(looptoken)
+                candidates.append(looptoken)
+        LoopSorter(candidates).sort()
+        target = self.code_budget - self.code_budget // 4
+        evicted_loops = 0
+        evicted_code = 0
+        for looptoken in candidates:
+            if code_size - evicted_code <= target:
+                break
+            assert looptoken is not None
+            del self.alive_loops[looptoken]
+            self.evicted_pending.append(weakref.ref(looptoken))
+            evicted_loops += 1
+            evicted_code += looptoken.code_size
+        # only the recent entries count for the next time
+        for looptoken in self.alive_loops:
+            looptoken.entry_count >>= 1
+        if code_size - evicted_code > target:
+            # all the other loops were used very recently: don't try
+            # again too soon
+            self.next_eviction = (self.current_generation +
+                                  EVICTION_RETRY_DELAY)
+        self.cpu.tracker.total_evicted_loops += evicted_loops
+        debug_print("Loop tokens evicted:", evicted_loops)
+        debug_print("Code evicted:     ", evicted_code)
+        debug_print("Loop tokens left:  ", len(self.alive_loops))
+        if not we_are_translated() and evicted_loops > 0:
+            candidates = None
+            looptoken = None
+            from rpython.rlib import rgc
+            rgc.collect(); rgc.collect(); rgc.collect()
+        debug_stop("jit-mem-evict")
@@ -64,9 +64,11 @@ class SchedulerState(object):
                 if op in indexvars:
                     opindexvar = indexvars[op]
                     # there might be a variable already, that
-                    # calculated the index variable, thus just reuse it
-                    for var, indexvar in indexvars.items(): 
+                    # calculated the index variable, thus just reuse it.
+                    # it might have been renamed itself (see below)
+                    for var, indexvar in indexvars.items():
                         if indexvar == opindexvar and var in self.seen:
+                            var = self.renamer.rename_box(var)
                             self.renamer.start_renaming(op, var)
                             break
                     else:
@@ -15,7 +15,7 @@ from rpython.jit.metainterp.optimizeopt.dependency import DependencyGraph
 from rpython.jit.metainterp.optimizeopt.vector import (VectorizingOptimizer,
         MemoryRef, isomorphic, Pair, NotAVectorizeableLoop, VectorLoop,
         NotAProfitableLoop, GuardStrengthenOpt, CostModel, GenericCostModel,
-        PackSet, optimize_vector)
+        PackSet, optimize_vector, user_loop_bail_fast_path)
 from rpython.jit.metainterp.optimizeopt.schedule import (Scheduler,
         SchedulerState, VecScheduleState, Pack)
 from rpython.jit.metainterp.optimizeopt.optimizer import BasicLoopInfo
@@ -391,6 +391,27 @@ class BaseTestVectorize(VecTestHelper):
         """
         self.assert_vectorize(self.parse_loop(ops), self.parse_loop(ops))
 
+    def test_user_loop_bail_fast_path(self):
+        """ user loops without any primitive array access are skipped """
+        loop = self.parse_loop("""
+        [i0]
+        i1 = int_add(i0,1)
+        i2 = int_le(i1, 10)
+        guard_true(i2) []
+        jump(i1)
+        """)
+        assert user_loop_bail_fast_path(loop, FakeWarmState())
+        loop = self.parse_loop("""
+        [p0,p1,i0]
+        f1 = getarrayitem_gc_f(p0,i0,descr=floatarraydescr)
+        setarrayitem_gc(p1,i0,f1,descr=floatarraydescr)
+        i1 = int_add(i0,1)
+        i2 = int_le(i1, 10)
+        guard_true(i2) []
+        jump(p0,p1,i1)
+        """)
+        assert not user_loop_bail_fast_path(loop, FakeWarmState())
+
     def test_load_primitive_python_list(self):
         """ it currently rejects pointer arrays """
         ops = """
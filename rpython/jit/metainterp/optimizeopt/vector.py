@@ -179,7 +179,7 @@ def user_loop_bail_fast_path(loop, warmstate):
     resop_count = 0 # the count of operations minus debug_merge_points
     vector_instr = 0
     guard_count = 0
-    at_least_one_array_access = True
+    at_least_one_array_access = False
     for i,op in enumerate(loop.operations):
         if rop.is_jit_debug(op.opnum):
             continue
@@ -1266,6 +1266,14 @@ class MIFrame(object):
                                self.metainterp.call_ids[-1],
                                greenboxes)
 
+        if (self.metainterp.force_finish_trace and
+                not self.metainterp.portal_call_depth and
+                jitdriver_sd is self.metainterp.jitdriver_sd and
+                self.metainterp.segment_is_long_enough()):
+            # cut the over-long trace here, see compile_segment()
+            self.pc = orgpc
+            self.metainterp.compile_segment(greenboxes + redboxes)
+
         if self.metainterp.seen_loop_header_for_jdindex < 0:
             if not any_operation:
                 return
@@ -2004,6 +2012,7 @@ class MetaInterpGlobalData(object):
 class MetaInterp(object):
     portal_call_depth = 0
     cancel_count = 0
+    force_finish_trace = False
     exported_state = None
     last_exc_box = None
     _last_op = None
@@ -2400,8 +2409,35 @@ class MetaInterp(object):
                     jd_sd = self.jitdriver_sd
                     greenkey = self.current_merge_points[0][0][:jd_sd.num_green_args]
                     warmrunnerstate.JitCell.trace_next_iteration(greenkey)
+            else:
+                # the trace is too long in the outermost function itself:
+                # if we can, trace it again in segments
+                self.prepare_segmented_trace()
             raise SwitchToBlackhole(Counters.ABORT_TOO_LONG)
 
+    def prepare_segmented_trace(self):
+        if (self.force_finish_trace or self.partial_trace or
+                not self.cpu.supports_guard_always_fails):
+            return
+        resumekey = self.resumekey
+        if isinstance(resumekey, compile.ResumeFromInterpDescr):
+            greenkey = resumekey.original_greenkey
+            warmrunnerstate = self.jitdriver_sd.warmstate
+            warmrunnerstate.mark_force_finish_tracing(greenkey)
+            warmrunnerstate.JitCell.trace_next_iteration(greenkey)
+        else:
+            # a bridge: its next attempt, and all other bridges of the
+            # same loop, are traced in segments
+            self.resumekey_original_loop_token.segmented = True
+        raise SwitchToBlackhole(Counters.ABORT_SEGMENTED_TRACE)
+
+    def segment_is_long_enough(self):
+        # leave a quarter of the trace_limit to reach the next
+        # jit_merge_point of the outermost function
+        trace_limit = self.jitdriver_sd.warmstate.trace_limit
+        return (self.history.length() > trace_limit - trace_limit // 4 and
+                not self.virtualref_boxes)
+
     def _interpret(self):
         # Execute the frames forward until we raise a DoneWithThisFrame,
         # a ExitFrameWithException, or a ContinueRunningNormally exception.
@@ -2448,6 +2484,9 @@ class MetaInterp(object):
         original_greenkey = original_boxes[:num_green_args]
         self.resumekey = compile.ResumeFromInterpDescr(original_greenkey)
         self.seen_loop_header_for_jdindex = -1
+        self.force_finish_trace = (
+            self.jitdriver_sd.warmstate.must_force_finish_tracing(
+                original_greenkey))
         try:
             self.create_empty_history()
             self.history.set_inputargs(original_boxes[num_green_args:],
@@ -2487,6 +2526,7 @@ class MetaInterp(object):
         self.prepare_resume_from_failure(deadframe, inputargs, resumedescr)
         if self.resumekey_original_loop_token is None:   # very rare case
             raise SwitchToBlackhole(Counters.ABORT_BRIDGE)
+        self.force_finish_trace = self.resumekey_original_loop_token.segmented
         self.interpret()
         assert False, "should always raise"
 
@@ -2599,7 +2639,8 @@ class MetaInterp(object):
         # ignore the loop_token passed in.  It means that we go back to
         # interpreted mode, but it should come back very quickly to the
         # JIT, find probably the same 'loop_token', and execute it.
-        if we_are_translated():
+        if we_are_translated() or loop_token is None:
+            # (untranslated, loop_token is None after compile_segment())
             num_green_args = self.jitdriver_sd.num_green_args
             gi, gr, gf = self._unpack_boxes(live_arg_boxes, 0, num_green_args)
             ri, rr, rf = self._unpack_boxes(live_arg_boxes, num_green_args,
@@ -2760,26 +2801,29 @@ class MetaInterp(object):
             jitcell_token = target_token.targeting_jitcell_token
             self.raise_continue_running_normally(live_arg_boxes, jitcell_token)
 
-    def compile_done_with_this_frame(self, exitbox):
-        # temporarily put a JUMP to a pseudo-loop
-        self.store_token_in_vable()
+    def get_done_with_this_frame_descr(self):
         sd = self.staticdata
         result_type = self.jitdriver_sd.result_type
         if result_type == history.VOID:
-            assert exitbox is None
-            exits = []
-            token = sd.done_with_this_frame_descr_void
+            return sd.done_with_this_frame_descr_void
         elif result_type == history.INT:
-            exits = [exitbox]
-            token = sd.done_with_this_frame_descr_int
+            return sd.done_with_this_frame_descr_int
         elif result_type == history.REF:
-            exits = [exitbox]
-            token = sd.done_with_this_frame_descr_ref
+            return sd.done_with_this_frame_descr_ref
         elif result_type == history.FLOAT:
-            exits = [exitbox]
-            token = sd.done_with_this_frame_descr_float
+            return sd.done_with_this_frame_descr_float
         else:
             assert False
+
+    def compile_done_with_this_frame(self, exitbox):
+        # temporarily put a JUMP to a pseudo-loop
+        self.store_token_in_vable()
+        token = self.get_done_with_this_frame_descr()
+        if self.jitdriver_sd.result_type == history.VOID:
+            assert exitbox is None
+            exits = []
+        else:
+            exits = [exitbox]
         # FIXME: can we call compile_trace?
         self.history.record(rop.FINISH, exits, None, descr=token)
         if self.history.trace_tag_overflow():
@@ -2789,6 +2833,35 @@ class MetaInterp(object):
         if target_token is not token:
             compile.giveup()
 
+    def compile_segment(self, live_arg_boxes):
+        """Called at a jit_merge_point of the outermost function when
+        tracing in segments and the trace is getting close to the
+        trace_limit.  Compile what we have so far, ending in a guard
+        that always fails: the interpreter continues from this
+        jit_merge_point, and the bridge eventually traced from the guard
+        is the next segment.  The FINISH after the guard is never reached.
+        """
+        self.generate_guard(rop.GUARD_ALWAYS_FAILS)
+        token = self.get_done_with_this_frame_descr()
+        result_type = self.jitdriver_sd.result_type
+        if result_type == history.VOID:
+            exits = []
+        elif result_type == history.INT:
+            exits = [history.CONST_FALSE]
+        elif result_type == history.REF:
+            exits = [history.CONST_NULL]
+        else:
+            exits = [history.CONST_FZERO]
+        self.history.record(rop.FINISH, exits, None, descr=token)
+        if self.history.trace_tag_overflow():
+            raise SwitchToBlackhole(Counters.ABORT_TOO_LONG)
+        self.history.trace.tracing_done()
+        target_token = compile.compile_trace(self, self.resumekey, exits)
+        if target_token is not token:
+            compile.giveup()
+        self.staticdata.profiler.count(Counters.TRACE_SEGMENTS)
+        self.raise_continue_running_normally(live_arg_boxes, None)
+
     def store_token_in_vable(self):
         vinfo = self.jitdriver_sd.virtualizable_info
         if vinfo is None:
@@ -945,6 +945,8 @@ _oplist = [
     'GUARD_NOT_FORCED/0d/n',      # may be called with an exception currently set
     'GUARD_NOT_FORCED_2/0d/n',    # same as GUARD_NOT_FORCED, but for finish()
     'GUARD_NOT_INVALIDATED/0d/n',
+    'GUARD_ALWAYS_FAILS/0d/n',  # ends a trace segment; only if
+                                # supports_guard_always_fails
     'GUARD_FUTURE_CONDITION/0d/n',
     # is removable, may be patched by an optimization
     '_GUARD_LAST', # ----- end of guard operations -----
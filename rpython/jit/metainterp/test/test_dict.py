@@ -381,6 +381,36 @@ class DictTests:
         self.meta_interp(f, [100])
         self.check_simple_loop(call_may_force_i=0, call_i=0, new=0)
 
+    def test_dict_virtual_str_keys(self):
+        myjitdriver = JitDriver(greens = [], reds = 'auto')
+        def g(d):
+            return d["a"] - d["b"]
+        def f(n):
+            while n > 0:
+                myjitdriver.jit_merge_point()
+                d = {}
+                d["a"] = n
+                d["b"] = n + 1
+                n += g(d) - 1
+            return n
+        self.meta_interp(f, [100])
+        self.check_simple_loop(call_i=0, call_n=0, new=0, new_array_clear=0)
+
+    def test_dict_virtual_keys_values_items(self):
+        myjitdriver = JitDriver(greens = [], reds = 'auto')
+        def f(n):
+            while n > 0:
+                myjitdriver.jit_merge_point()
+                d = {}
+                d["a"] = n
+                d["b"] = 1
+                n -= (len(d.keys()) + d.values()[1] + d.items()[0][1]
+                      - n - 1)
+            return n
+        res = self.meta_interp(f, [100], listops=True)
+        assert res == 0
+        self.check_simple_loop(call_r=0, new=0, new_array_clear=0)
+
 
 class TestLLtype(DictTests, LLJitMixin):
     pass
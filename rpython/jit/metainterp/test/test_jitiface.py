@@ -119,6 +119,32 @@ class JitHookInterfaceTests(object):
         self.meta_interp(loop, [1, 10], policy=JitPolicy(MyJitIface()))
         assert called == ["compile", "before_compile_bridge", "compile_bridge"]
 
+    def test_guard_fail_count(self):
+        guards = []
+
+        class MyJitIface(JitHookInterface):
+            def after_compile(self, di):
+                guards.extend([op.getdescr() for op in di.operations
+                               if op.is_guard()])
+
+        driver = JitDriver(greens = [], reds = ['i', 's'])
+
+        def loop(i):
+            s = 0
+            while i > 0:
+                driver.jit_merge_point(i=i, s=s)
+                if i < 10:
+                    s += 1
+                i -= 1
+            return s
+
+        self.meta_interp(loop, [20], policy=JitPolicy(MyJitIface()))
+        counts = [descr.get_fail_count() for descr in guards]
+        # the guard 'i < 10' fails once and goes to the blackhole
+        # interpreter, then a bridge is compiled when it fails again;
+        # the guard 'i > 0' fails once, when leaving the loop
+        assert counts == [2, 1]
+
     def test_get_stats(self):
         driver = JitDriver(greens = [], reds = ['i', 's'])
 
@@ -21,6 +21,29 @@ from rpython.rlib import rgc
 class FakeLoopToken:
     generation = 0
     invalidated = False
+    entry_count = 0
+    code_size = 0
+    compiled_loop_token = None
+
+class FakeCompiledLoopToken:
+    def __init__(self, size):
+        self.asmmemmgr_blocks = [(1000, 1000 + size)]
+
+class FakeCPU:
+    code_size = 0
+    class tracker:
+        total_evicted_loops = 0
+
+    def get_code_size(self):
+        return self.code_size
+
+def make_tokens(sizes):
+    tokens = []
+    for size in sizes:
+        token = FakeLoopToken()
+        token.compiled_loop_token = FakeCompiledLoopToken(size)
+        tokens.append(token)
+    return tokens
 
 
 class _TestMemoryManager:
@@ -78,6 +101,59 @@ class _TestMemoryManager:
             else:
                 assert tokens[i] in memmgr.alive_loops
 
+    def test_code_budget(self):
+        cpu = FakeCPU()
+        memmgr = MemoryManager(cpu)
+        memmgr.set_code_budget(4000)
+        tokens = make_tokens([1000] * 6)
+        for i in range(len(tokens)):
+            for j in range(i + 1):
+                memmgr.keep_loop_alive(tokens[i])
+        memmgr.next_generation()
+        cpu.code_size = 6000
+        memmgr.next_generation()
+        # the coldest loops are evicted until 3/4 of the budget is reached
+        assert memmgr.alive_loops == dict.fromkeys(tokens[3:])
+        assert cpu.tracker.total_evicted_loops == 3
+        assert [token.entry_count for token in tokens[3:]] == [2, 2, 3]
+        # the evicted loops are still alive, but no longer counted
+        assert memmgr.get_code_size() == 3000
+        del tokens[:3]
+        rgc.collect()
+        assert memmgr.get_code_size() == 6000
+        cpu.code_size = 3000
+        memmgr.next_generation()
+        assert len(memmgr.alive_loops) == 3
+
+    def test_code_budget_prefers_large_loops(self):
+        cpu = FakeCPU()
+        memmgr = MemoryManager(cpu)
+        memmgr.set_code_budget(4000)
+        tokens = make_tokens([500, 2500, 500, 1500])
+        for token in tokens:
+            memmgr.keep_loop_alive(token)
+        memmgr.next_generation()
+        memmgr.next_generation()
+        cpu.code_size = 5000
+        memmgr.next_generation()
+        assert memmgr.alive_loops == dict.fromkeys(
+            [tokens[0], tokens[2], tokens[3]])
+
+    def test_code_budget_keeps_recent_loops(self):
+        cpu = FakeCPU()
+        memmgr = MemoryManager(cpu)
+        memmgr.set_code_budget(1000)
+        tokens = make_tokens([1000, 1000])
+        memmgr.keep_loop_alive(tokens[0])
+        memmgr.next_generation()
+        memmgr.next_generation()
+        memmgr.keep_loop_alive(tokens[1])
+        cpu.code_size = 2000
+        memmgr.next_generation()
+        assert memmgr.alive_loops == {tokens[1]: None}
+        # tokens[1] cannot be evicted yet: don't try again too soon
+        assert memmgr.next_eviction > memmgr.current_generation
+
 
 class _TestIntegration(LLJitMixin):
     # See comments in TestMemoryManager.  To get temporarily the normal
@@ -7,6 +7,8 @@ from rpython.jit.metainterp.test.support import LLJitMixin
 from rpython.jit.codewriter.policy import StopAtXPolicy
 from rpython.rtyper.annlowlevel import hlstr
 from rpython.jit.metainterp.warmspot import get_stats
+from rpython.jit.metainterp.jitprof import Profiler
+from rpython.jit.metainterp import pyjitpl
 from rpython.jit.backend.llsupport import codemap
 
 class RecursiveTests:
@@ -343,7 +345,9 @@ class RecursiveTests:
         assert res == 0
         self.check_max_trace_length(TRACE_LIMIT)
         self.check_enter_count_at_most(10) # maybe
-        self.check_aborted_count(6)
+        # the first abort asks for a trace in segments, but no
+        # jit_merge_point is reached before the trace_limit either
+        self.check_aborted_count(8)
 
     def test_trace_limit_bridge(self):
         def recursive(n):
@@ -396,6 +400,51 @@ class RecursiveTests:
         res = self.meta_interp(loop, [100], trace_limit=TRACE_LIMIT)
         assert res == 80
 
+    def test_trace_limit_segments(self):
+        from rpython.rlib.jit import Counters
+        myjitdriver = JitDriver(greens=['pc', 'code'], reds=['n', 'acc'])
+        def interpret(code, n):
+            pc = 0
+            acc = 0
+            while pc < len(code):
+                myjitdriver.jit_merge_point(pc=pc, code=code, n=n, acc=acc)
+                op = code[pc]
+                if op == '+':
+                    acc += n
+                elif op == '*':
+                    acc *= 3
+                elif op == '&':
+                    acc &= 0xffff
+                elif op == 'l':         # not used: no loop in 'code'
+                    pc = 0
+                    myjitdriver.can_enter_jit(pc=pc, code=code, n=n, acc=acc)
+                    continue
+                pc += 1
+            return acc
+        def main(n, size):
+            set_param(None, 'function_threshold', 3)
+            set_param(None, 'trace_eagerness', 2)
+            code = '+*&' * size    # a long function without any loop
+            total = 0
+            i = 0
+            while i < n:
+                total += interpret(code, i)
+                i += 1
+            return total
+        TRACE_LIMIT = 60
+        expected = main(30, 40)
+        res = self.meta_interp(main, [30, 40], trace_limit=TRACE_LIMIT,
+                               ProfilerClass=Profiler)
+        assert res == expected
+        self.check_max_trace_length(TRACE_LIMIT)
+        # the first trace is too long and aborted, then it is traced
+        # again and compiled as a chain of segments, up to the return
+        self.check_aborted_count(1)
+        profiler = pyjitpl._warmrunnerdesc.metainterp_sd.profiler
+        assert profiler.get_counter(Counters.ABORT_SEGMENTED_TRACE) == 1
+        assert profiler.get_counter(Counters.ABORT_TOO_LONG) == 0
+        assert profiler.get_counter(Counters.TRACE_SEGMENTS) >= 4
+
     def test_max_failure_args(self):
         FAILARGS_LIMIT = 10
         jitdriver = JitDriver(greens = [], reds = ['i', 'n', 'o'])
@@ -982,6 +982,26 @@ class TestLLtypeUnicode(TestLLtype):
         self.meta_interp(f, [222, 3333])
         self.check_simple_loop(call_i=0)
 
+    def test_utf8_index_cursor(self):
+        from rpython.rlib import rutf8
+        jitdriver = JitDriver(greens=[], reds=['i', 'total', 'n',
+                                                'storage', 's'])
+        def f(n):
+            s = '\xe1\x88\xb4' * n
+            storage = rutf8.create_utf8_index_storage(s, n)
+            i = 0
+            total = 0
+            while i < n:
+                jitdriver.jit_merge_point(i=i, total=total, n=n,
+                                          storage=storage, s=s)
+                total += rutf8.codepoint_position_near_cursor(s, storage, i)
+                i += 1
+            return total
+        res = self.meta_interp(f, [200])
+        assert res == f(200)
+        # sequential indexing is only a walk in the string
+        self.check_simple_loop(call_i=0, strgetitem=1)
+
     def test_string_hashing(self):
         def f(i):
             s = str(i)
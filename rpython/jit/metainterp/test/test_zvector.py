@@ -691,6 +691,70 @@ class VectorizeTests(object):
         res = self.meta_interp(f, [22], vec=True, vec_all=True)
         assert res == f(22)
 
+    def check_vectorized(self, opname):
+        # the loop is compiled twice: the vectorized and the scalar version
+        summaries = [loop.summary() for loop in get_stats().loops]
+        assert [s for s in summaries if s.get(opname, 0) > 0]
+
+    def test_list_vectorize(self):
+        # the items of a list of floats are a gc array, as for the
+        # float list strategy of pypy
+        myjitdriver = JitDriver(greens = [], reds = 'auto')
+        def f(size):
+            a = [float(i) for i in range(size)]
+            b = [1.5] * size
+            c = [0.0] * size
+            i = 0
+            while i < size:
+                myjitdriver.jit_merge_point()
+                c[i] = a[i] * b[i] + a[i]
+                i += 1
+            return c[size - 1] + c[size // 2]
+        res = self.meta_interp(f, [60], vec_all=True)
+        assert res == f(60)
+        self.check_vectorized('vec_float_mul')
+        self.check_vectorized('vec_store')
+
+    def test_list_vectorize_iterator(self):
+        # a loop shaped like the ones of pypy: an iterator object, bounds
+        # checks and a counter that are all updated every iteration
+        class Iterator(object):
+            def __init__(self, length):
+                self.index = 0
+                self.length = length
+        class Counter(object):
+            pass
+        counter = Counter()
+        myjitdriver = JitDriver(greens = [], reds = 'auto')
+        def getitem(l, i):
+            if i >= len(l):
+                raise IndexError
+            return l[i]
+        def setitem(l, i, value):
+            if i >= len(l):
+                raise IndexError
+            l[i] = value
+        def f(size):
+            a = [float(i) for i in range(size)]
+            b = [float(i) / 2.0 for i in range(size)]
+            c = [0.0] * size
+            it = Iterator(size)
+            counter.value = 1000000
+            while True:
+                myjitdriver.jit_merge_point()
+                i = it.index
+                if i >= it.length:
+                    break
+                it.index = i + 1
+                setitem(c, i, getitem(a, i) - getitem(b, i))
+                counter.value -= 1
+                if counter.value < 0:
+                    break
+            return c[size - 1] + counter.value
+        res = self.meta_interp(f, [60], vec_all=True)
+        assert res == f(60)
+        self.check_vectorized('vec_float_sub')
+
     def run_unpack(self, unpack, vector_type, assignments, float=True):
         vars = {'v':0,'f':0,'i':0}
         def newvar(type):
@@ -138,6 +138,7 @@ JC_TRACING         = 0x01
 JC_DONT_TRACE_HERE = 0x02
 JC_TEMPORARY       = 0x04
 JC_TRACING_OCCURRED= 0x08
+JC_FORCE_FINISH    = 0x10
 
 class BaseJitCell(object):
     """Subclasses of BaseJitCell are used in tandem with the single
@@ -184,6 +185,11 @@ class BaseJitCell(object):
         this particular function.  (We only set this flag when aborting
         due to a trace too long, so we use the same flag as a hint to
         also mean "please trace from here as soon as possible".)
+
+        JC_FORCE_FINISH: the last trace from here was too long, but
+        not because of a call that we could stop inlining.  The next
+        trace from here is cut into segments, each one compiled when it
+        gets close to the trace_limit (see MetaInterp.compile_segment()).
     """
     flags = 0     # JC_xxx flags
     wref_procedure_token = None
@@ -215,7 +221,7 @@ class BaseJitCell(object):
             return False    # don't remove JitCells with a procedure_token
         if self.flags & JC_TRACING:
             return False    # don't remove JitCells that are being traced
-        if self.flags & JC_DONT_TRACE_HERE:
+        if self.flags & (JC_DONT_TRACE_HERE | JC_FORCE_FINISH):
             # if we have this flag, and we *had* a procedure_token but
             # we no longer have one, then remove me.  this prevents this
             # JitCell from being immortal.
@@ -289,6 +295,12 @@ class WarmEnterState(object):
             self.warmrunnerdesc.memory_manager is not None):   # all for tests
             self.warmrunnerdesc.memory_manager.set_max_age(value)
 
+    def set_param_code_budget(self, value):
+        # note: it's a global parameter, not a per-jitdriver one
+        if (self.warmrunnerdesc is not None and
+            self.warmrunnerdesc.memory_manager is not None):   # all for tests
+            self.warmrunnerdesc.memory_manager.set_code_budget(value * 1024)
+
     def set_param_retrace_limit(self, value):
         if self.warmrunnerdesc:
             if self.warmrunnerdesc.memory_manager:
@@ -326,9 +338,25 @@ class WarmEnterState(object):
         debug_print("disabled inlining", loc)
         debug_stop("jit-disableinlining")
 
+    def mark_force_finish_tracing(self, greenkey):
+        cell = self.JitCell.ensure_jit_cell_at_key(greenkey)
+        cell.flags |= JC_FORCE_FINISH
+        debug_start("jit-segmenttrace")
+        loc = self.get_location_str(greenkey)
+        debug_print("trace in segments from", loc)
+        debug_stop("jit-segmenttrace")
+
+    def must_force_finish_tracing(self, greenkey):
+        cell = self.JitCell.get_jit_cell_at_key(greenkey)
+        return cell is not None and bool(cell.flags & JC_FORCE_FINISH)
+
     def attach_procedure_to_interp(self, greenkey, procedure_token):
         cell = self.JitCell.ensure_jit_cell_at_key(greenkey)
         old_token = cell.get_procedure_token()
+        if (old_token is None and cell.has_seen_a_procedure_token() and
+                not (cell.flags & JC_TEMPORARY)):
+            # the previous loop at this place was freed by memmgr.py
+            self.cpu.tracker.total_recompiled_loops += 1
         cell.set_procedure_token(procedure_token)
         if old_token is not None:
             self.cpu.redirect_call_assembler(old_token, procedure_token)
@@ -468,11 +496,12 @@ class WarmEnterState(object):
             # machine code was already compiled for these greenargs
             procedure_token = cell.get_procedure_token()
             if procedure_token is None:
-                if cell.flags & JC_DONT_TRACE_HERE:
+                if cell.flags & (JC_DONT_TRACE_HERE | JC_FORCE_FINISH):
                     if not cell.has_seen_a_procedure_token():
                         # A JC_DONT_TRACE_HERE, i.e. a non-inlinable function.
                         # If we never tried to trace it, try it now immediately.
-                        # Otherwise, count normally.
+                        # Otherwise, count normally.  A JC_FORCE_FINISH
+                        # was always traced already: count normally.
                         if cell.flags & JC_TRACING_OCCURRED:
                             tick = jitcounter.tick(hash, increment_threshold)
                         else:
@@ -20,10 +20,12 @@ REGEXES = [
     (('opt_guards_shared',), '^opt guards shared:\s+(\d+)$'),
     (('forcings',), '^forcings:\s+(\d+)$'),
     (('abort.trace_too_long',), '^abort: trace too long:\s+(\d+)$'),
+    (('abort.segmented_trace',), '^abort: segmented trace:\s+(\d+)$'),
     (('abort.compiling',), '^abort: compiling:\s+(\d+)$'),
     (('abort.vable_escape',), '^abort: vable escape:\s+(\d+)$'),
     (('abort.bad_loop',), '^abort: bad loop:\s+(\d+)$'),
     (('abort.force_quasiimmut',), '^abort: force quasi-immut:\s+(\d+)$'),
+    (('trace_segments',), '^trace segments:\s+(\d+)$'),
     (('nvirtuals',), '^nvirtuals:\s+(\d+)$'),
     (('nvholes',), '^nvholes:\s+(\d+)$'),
     (('nvreused',), '^nvreused:\s+(\d+)$'),
@@ -33,6 +35,9 @@ REGEXES = [
     (('total_compiled_bridges',), '^Total # of bridges:\s+(\d+)$'),
     (('total_freed_loops',),      '^Freed # of loops:\s+(\d+)$'),
     (('total_freed_bridges',),    '^Freed # of bridges:\s+(\d+)$'),
+    (('total_freed_code',),       '^Freed code bytes:\s+(\d+)$'),
+    (('total_evicted_loops',),    '^Evicted # of loops:\s+(\d+)$'),
+    (('total_recompiled_loops',), '^Recompiled # of loops:\s+(\d+)$'),
     ]
 
 class Ops(object):
@@ -57,6 +62,7 @@ class OutputInfo(object):
     opt_ops = 0
     opt_guards = 0
     forcings = 0
+    trace_segments = 0
     nvirtuals = 0
     nvholes = 0
     nvreused = 0
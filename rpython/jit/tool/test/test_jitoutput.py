@@ -55,10 +55,12 @@ opt guards:             1
 opt guards shared:      1
 forcings:               1
 abort: trace too long:  10
+abort: segmented trace: 2
 abort: compiling:       11
 abort: vable escape:    12
 abort: bad loop:        135
 abort: force quasi-immut: 3
+trace segments:         7
 nvirtuals:              13
 nvholes:                14
 nvreused:               15
@@ -68,6 +70,9 @@ Total # of loops:       100
 Total # of bridges:     300
 Freed # of loops:       99
 Freed # of bridges:     299
+Freed code bytes:       81920
+Evicted # of loops:     20
+Recompiled # of loops:  5
 '''
 
 def test_parse():
@@ -88,8 +93,13 @@ def test_parse():
     assert info.abort.vable_escape == 12
     assert info.abort.bad_loop == 135
     assert info.abort.force_quasiimmut == 3
+    assert info.abort.segmented_trace == 2
+    assert info.trace_segments == 7
     assert info.nvirtuals == 13
     assert info.nvholes == 14
     assert info.nvreused == 15
     assert info.vecopt_tried == 12
     assert info.vecopt_success == 4
+    assert info.total_freed_code == 81920
+    assert info.total_evicted_loops == 20
+    assert info.total_recompiled_loops == 5
@@ -21,6 +21,14 @@ class GcHooks(object):
     def is_gc_collect_enabled(self):
         return False
 
+    def get_gc_alloc_sample_interval(self):
+        """
+        Return the number of bytes to allocate in the nursery between two
+        sampled allocations, or 0 to disable the sampling.  The GC only
+        asks when the nursery is full or when a sample was taken.
+        """
+        return 0
+
     def on_gc_minor(self, duration, total_memory_used, pinned_objects):
         """
         Called after a minor collection
@@ -45,6 +53,26 @@ class GcHooks(object):
         Called after a major collection is fully done
         """
 
+    def on_gc_alloc_sample_start(self):
+        """
+        Called when an allocation is sampled, before the object is
+        initialized.  Returns a number identifying the sample, which is
+        passed to the other on_gc_alloc_sample* methods; it should be >= 0.
+        """
+        return 0
+
+    def on_gc_alloc_sample(self, sample, type_index, size):
+        """
+        Called at the next minor collection for every sampled object.
+        ``type_index`` is as returned by rgc.get_rpy_type_index() and
+        ``size`` as by rgc.get_rpy_memory_usage().
+        """
+
+    def on_gc_alloc_sample_free(self, sample):
+        """
+        Called when a sampled object is found to be dead.
+        """
+
     # the fire_* methods are meant to be called from the GC are should NOT be
     # overridden
 
@@ -68,3 +96,15 @@ class GcHooks(object):
                                arenas_count_before, arenas_count_after,
                                arenas_bytes, rawmalloc_bytes_before,
                                rawmalloc_bytes_after)
+
+    @rgc.no_collect
+    def fire_gc_alloc_sample_start(self):
+        return self.on_gc_alloc_sample_start()
+
+    @rgc.no_collect
+    def fire_gc_alloc_sample(self, sample, type_index, size):
+        self.on_gc_alloc_sample(sample, type_index, size)
+
+    @rgc.no_collect
+    def fire_gc_alloc_sample_free(self, sample):
+        self.on_gc_alloc_sample_free(sample)
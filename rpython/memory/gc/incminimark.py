@@ -9,12 +9,33 @@ Environment variables can be used to fine-tune the following parameters:
  PYPY_GC_NURSERY_DEBUG   If set to non-zero, will fill nursery with garbage,
                          to help debugging.
 
+ PYPY_GC_NURSERY_MAX     If set to more than the nursery size, the nursery
+                         size becomes adaptive: after each minor collection,
+                         it can grow (when many objects survive) or shrink
+                         (when almost none survive, or when the minor
+                         collections take longer than
+                         PYPY_GC_TARGET_PAUSE_MS) up to this size.
+
+ PYPY_GC_NURSERY_MIN     The lower bound for the adaptive nursery size.
+                         Defaults to 1/4 of the initial nursery size.
+
  PYPY_GC_INCREMENT_STEP  The size of memory marked during the marking step.
                          Default is size of nursery * 2. If you mark it too high
                          your GC is not incremental at all. The minimum is set
                          to size that survives minor collection * 1.5 so we
                          reclaim anything all the time.
 
+ PYPY_GC_TARGET_PAUSE_MS If set, the work done by each major collection step
+                         (marking and sweeping) is computed from this target
+                         pause in milliseconds and from the throughput
+                         measured in the previous steps, instead of using
+                         PYPY_GC_INCREMENT_STEP.  Try values like '2'.
+
+ PYPY_GC_MARK_THREADS    The number of threads that mark the objects in
+                         parallel during a major collection (see
+                         parallelmark.py).  Default is 1, which means that
+                         marking is done by the current thread only.
+
  PYPY_GC_MAJOR_COLLECT   Major collection memory factor.  Default is '1.82',
                          which means trigger a major collection when the
                          memory consumed equals 1.82 times the memory
@@ -68,6 +89,8 @@ from rpython.rtyper.lltypesystem.lloperation import llop
 from rpython.rtyper.lltypesystem.llmemory import raw_malloc_usage
 from rpython.memory.gc.base import GCBase, MovingGCBase
 from rpython.memory.gc import env
+from rpython.memory.gc.pausehist import PauseHistogram
+from rpython.memory.gc import parallelmark
 from rpython.memory.support import mangle_hash
 from rpython.rlib.rarithmetic import ovfcheck, LONG_BIT, intmask, r_uint
 from rpython.rlib.rarithmetic import LONG_BIT_SHIFT
@@ -184,12 +207,29 @@ STATE_FINALIZING = 3
 
 GC_STATES = ['SCANNING', 'MARKING', 'SWEEPING', 'FINALIZING']
 
+# with an adaptive nursery size, the nursery doubles when the average
+# fraction of the nursery that survives minor collections is above
+# NURSERY_GROW_SURVIVAL, and halves when it is below NURSERY_SHRINK_SURVIVAL
+NURSERY_GROW_SURVIVAL = 0.10
+NURSERY_SHRINK_SURVIVAL = 0.01
+
+# with a target pause, after this number of marking steps in the same major
+# collection, the objects added during marking are all visited at once
+TARGET_PAUSE_MARKING_STEPS = 64
+
 
 FORWARDSTUB = lltype.GcStruct('forwarding_stub',
                               ('forw', llmemory.Address))
 FORWARDSTUBPTR = lltype.Ptr(FORWARDSTUB)
 NURSARRAY = lltype.Array(llmemory.Address)
 
+def _alloc_sample_adr(sample):
+    # the allocation samples are stored in AddressStacks next to the objects
+    return llmemory.cast_int_to_adr((sample << 1) | 1)
+
+def _alloc_sample_from_adr(adr):
+    return llmemory.cast_adr_to_int(adr) >> 1
+
 # ____________________________________________________________
 
 
@@ -284,6 +324,8 @@ class IncrementalMiniMarkGC(MovingGCBase):
                  growth_rate_max=2.5,   # for tests
                  card_page_indices=0,
                  large_object=8*WORD,
+                 nursery_min_size=0,
+                 nursery_max_size=0,
                  ArenaCollectionClass=None,
                  **kwds):
         "NOT_RPYTHON"
@@ -302,6 +344,21 @@ class IncrementalMiniMarkGC(MovingGCBase):
         self.max_delta = float(r_uint(-1))
         self.max_number_of_pinned_objects = 0      # computed later
         #
+        # If 'gc_target_pause' (in seconds) is not zero, the work of each
+        # major collection step is computed from it and from the measured
+        # throughput of marking (bytes per second) and of sweeping (raw
+        # objects and arena pages per second).
+        self.gc_target_pause = 0.0
+        self.marking_steps = 0
+        self.mark_rate = 0.0
+        self.sweep_raw_rate = 0.0
+        self.sweep_pages_rate = 0.0
+        #
+        # The number of threads used to mark objects, and the pool of
+        # workers, created when it is first needed.
+        self.gc_mark_threads = 1
+        self.mark_pool = None
+        #
         self.card_page_indices = card_page_indices
         if self.card_page_indices > 0:
             self.card_page_shift = 0
@@ -326,6 +383,40 @@ class IncrementalMiniMarkGC(MovingGCBase):
         self.ac = ArenaCollectionClass(arena_size, page_size,
                                        small_request_threshold)
         #
+        # Statistics returned by get_stats(): the distribution of the
+        # pauses, and the bytes allocated in the nursery and surviving it.
+        self.minor_pauses = PauseHistogram()
+        self.step_pauses = PauseHistogram()
+        self.nursery_allocated_total = r_uint(0)
+        self.nursery_promoted_total = r_uint(0)
+        #
+        # Adaptive nursery size (PYPY_GC_NURSERY_MAX): after a minor
+        # collection, the usable part of the nursery, 'nursery_size', can
+        # change between 'nursery_min_size' and 'nursery_max_size', which
+        # is the size really allocated.
+        self.nursery_adaptive = False
+        self.nursery_min_size = nursery_min_size
+        self.nursery_max_size = nursery_max_size
+        self.nursery_survival_avg = 0.0
+        self.nursery_resizes = 0
+        #
+        # Allocation sampling, enabled by the GC hooks: every time about
+        # 'alloc_sample_interval' bytes have been allocated in the nursery,
+        # the next allocation is sampled.  This is done by lowering
+        # 'nursery_top' to the sample point, so that the allocation goes
+        # through collect_and_reserve(); 'alloc_sample_top' is then the
+        # real 'nursery_top'.  The sampled objects are listed as pairs
+        # (sample number, object) in 'young_alloc_samples' until the next
+        # minor collection, and then in 'old_alloc_samples' (or in
+        # 'pinned_alloc_samples') until they die.  The sample numbers are
+        # stored as odd fake addresses, see _alloc_sample_adr().
+        self.alloc_sample_interval = 0
+        self.alloc_sample_countdown = 0
+        self.alloc_sample_top = llmemory.NULL
+        self.young_alloc_samples = self.AddressStack()
+        self.pinned_alloc_samples = self.AddressStack()
+        self.old_alloc_samples = self.AddressStack()
+        #
         # Used by minor collection: a list of (mostly non-young) objects that
         # (may) contain a pointer to a young object.  Populated by
         # the write barrier: when we clear GCFLAG_TRACK_YOUNG_PTRS, we
@@ -435,14 +526,15 @@ class IncrementalMiniMarkGC(MovingGCBase):
         # allocating a very small nursery, enough to do things like look
         # up the env var, which requires the GC; and then really
         # allocate the nursery of the final size.
+        minsize = 2 * (self.nonlarge_max + 1)
         if not self.read_from_env:
+            self._setup_adaptive_nursery(minsize)
             self.allocate_nursery()
             self.gc_increment_step = self.nursery_size * 4
             self.gc_nursery_debug = False
         else:
             #
             defaultsize = self.nursery_size
-            minsize = 2 * (self.nonlarge_max + 1)
             self.nursery_size = minsize
             self.allocate_nursery()
             #
@@ -495,14 +587,31 @@ class IncrementalMiniMarkGC(MovingGCBase):
             else:
                 self.gc_increment_step = newsize * 4
             #
+            mark_threads = env.read_from_env('PYPY_GC_MARK_THREADS')
+            if mark_threads > 1:
+                self.gc_mark_threads = min(mark_threads,
+                                           parallelmark.MAX_THREADS)
+            #
+            target_pause = env.read_float_from_env('PYPY_GC_TARGET_PAUSE_MS')
+            if target_pause > 0.0:
+                self.gc_target_pause = target_pause / 1000.0
+            #
             nursery_debug = env.read_uint_from_env('PYPY_GC_NURSERY_DEBUG')
             if nursery_debug > 0:
                 self.gc_nursery_debug = True
             else:
                 self.gc_nursery_debug = False
+            #
+            nursery_max = env.read_from_env('PYPY_GC_NURSERY_MAX')
+            nursery_min = env.read_from_env('PYPY_GC_NURSERY_MIN')
+            #
             self._minor_collection()    # to empty the nursery
             llarena.arena_free(self.nursery)
             self.nursery_size = newsize
+            if self.debug_tiny_nursery < 0:
+                self.nursery_max_size = nursery_max
+                self.nursery_min_size = nursery_min
+                self._setup_adaptive_nursery(minsize)
             self.allocate_nursery()
         #
         env_max_number_of_pinned_objects = os.environ.get('PYPY_GC_MAX_PINNED')
@@ -528,9 +637,23 @@ class IncrementalMiniMarkGC(MovingGCBase):
     def isenabled(self):
         return self.enabled
 
+    def _setup_adaptive_nursery(self, minsize):
+        # the nursery size is adaptive if 'nursery_max_size' is larger
+        # than the initial size
+        if self.nursery_max_size <= self.nursery_size:
+            self.nursery_max_size = 0
+            return
+        if (self.nursery_min_size <= 0 or
+                self.nursery_min_size > self.nursery_size):
+            self.nursery_min_size = self.nursery_size // 4
+        self.nursery_min_size = max(self.nursery_min_size, minsize)
+        self.nursery_min_size &= ~(WORD-1)
+        self.nursery_max_size &= ~(WORD-1)
+        self.nursery_adaptive = True
+
     def _nursery_memory_size(self):
         extra = self.nonlarge_max + 1
-        return self.nursery_size + extra
+        return max(self.nursery_size, self.nursery_max_size) + extra
 
     def _alloc_nursery(self):
         # the start of the nursery: we actually allocate a bit more for
@@ -850,6 +973,24 @@ class IncrementalMiniMarkGC(MovingGCBase):
         major collection, and finally reserve totalsize bytes.
         """
 
+        if self.alloc_sample_top:
+            # we reached the sample point: restore 'nursery_top', and
+            # sample this allocation if it fits there
+            sample_point = self.nursery_top
+            self.nursery_top = self.alloc_sample_top
+            self.alloc_sample_top = llmemory.NULL
+            result = self.nursery_free
+            if result + totalsize <= self.nursery_top:
+                self.nursery_free = result + totalsize
+                self.sample_allocation(result)
+                # count the part of the object after the sample point
+                self.alloc_sample_countdown -= (self.nursery_free -
+                                                sample_point)
+                self.arm_alloc_sample()
+                return result
+            # else sample the first allocation after the collection
+            self.alloc_sample_countdown = 0
+        #
         minor_collection_count = 0
         while True:
             self.nursery_free = llmemory.NULL      # debug: don't use me
@@ -926,9 +1067,48 @@ class IncrementalMiniMarkGC(MovingGCBase):
             if self.nursery_top - self.nursery_free > self.debug_tiny_nursery:
                 self.nursery_free = self.nursery_top - self.debug_tiny_nursery
         #
+        self.arm_alloc_sample()
         return result
     collect_and_reserve._dont_inline_ = True
 
+    def arm_alloc_sample(self):
+        # Called from collect_and_reserve() after 'nursery_free' and
+        # 'nursery_top' have been set.  Sampling is enabled or disabled
+        # here, so it follows the hooks after the nursery was filled once.
+        interval = self.hooks.get_gc_alloc_sample_interval()
+        if interval <= 0:
+            self.alloc_sample_interval = 0
+            return
+        if (self.alloc_sample_interval == 0 or
+                self.alloc_sample_countdown > interval):
+            self.alloc_sample_countdown = interval
+        self.alloc_sample_interval = interval
+        if self.alloc_sample_countdown < 0:
+            self.alloc_sample_countdown = 0
+        available = self.nursery_top - self.nursery_free
+        if self.alloc_sample_countdown < available:
+            self.alloc_sample_top = self.nursery_top
+            self.nursery_top = self.nursery_free + self.alloc_sample_countdown
+        else:
+            self.alloc_sample_countdown -= available
+
+    def disarm_alloc_sample(self):
+        # Restore the real 'nursery_top', remembering how far we are from
+        # the sample point.
+        if self.alloc_sample_top:
+            self.alloc_sample_countdown = self.nursery_top - self.nursery_free
+            self.nursery_top = self.alloc_sample_top
+            self.alloc_sample_top = llmemory.NULL
+
+    def sample_allocation(self, result):
+        # 'result' is the address reserved in the nursery.  The object is
+        # not initialized yet, so its type is only looked up at the next
+        # minor collection.
+        sample = self.hooks.fire_gc_alloc_sample_start()
+        self.young_alloc_samples.append(_alloc_sample_adr(sample))
+        self.young_alloc_samples.append(result)
+        self.alloc_sample_countdown = self.alloc_sample_interval
+
 
     # XXX kill alloc_young and make it always True
     def external_malloc(self, typeid, length, alloc_young):
@@ -1086,6 +1266,7 @@ class IncrementalMiniMarkGC(MovingGCBase):
         if self.next_major_collection_threshold < 0:
             # cannot trigger a full collection now, but we can ensure
             # that one will occur very soon
+            self.disarm_alloc_sample()
             self.nursery_free = self.nursery_top
 
     def can_optimize_clean_setarrayitems(self):
@@ -1694,6 +1875,19 @@ class IncrementalMiniMarkGC(MovingGCBase):
         #
         start = time.time()
         debug_start("gc-minor")
+        self.disarm_alloc_sample()
+        #
+        # Accounting: the part of the nursery used since the last minor
+        # collection, including the pinned objects and the space skipped
+        # around them.  When called from collect_and_reserve(),
+        # 'nursery_free' was cleared but the nursery is full.
+        if self.nursery_free:
+            nursery_used = self.nursery_free
+        else:
+            nursery_used = self.nursery_top
+        nursery_used_size = (llarena.getfakearenaaddress(nursery_used) -
+                             self.nursery)
+        self.nursery_allocated_total += r_uint(nursery_used_size)
         #
         # All nursery barriers are invalid from this point on.  They
         # are evaluated anew as part of the minor collection.
@@ -1818,6 +2012,12 @@ class IncrementalMiniMarkGC(MovingGCBase):
         if self.young_rawmalloced_objects:
             self.free_young_rawmalloced_objects()
         #
+        # Report the sampled young objects and find out which ones survived,
+        # before the nursery is cleared.
+        if (self.young_alloc_samples.non_empty() or
+                self.pinned_alloc_samples.non_empty()):
+            self.update_young_alloc_samples()
+        #
         # All live nursery objects are out of the nursery or pinned inside
         # the nursery.  Create nursery barriers to protect the pinned objects,
         # fill the rest of the nursery with zeros and reset the current nursery
@@ -1879,6 +2079,7 @@ class IncrementalMiniMarkGC(MovingGCBase):
         # Accounting: 'nursery_surviving_size' is the size of objects
         # from the nursery that we just moved out.
         self.size_objects_made_old += r_uint(self.nursery_surviving_size)
+        self.nursery_promoted_total += r_uint(self.nursery_surviving_size)
         #
         total_memory_used = self.get_total_memory_used()
         debug_print("minor collect, total memory used:", total_memory_used)
@@ -1893,11 +2094,48 @@ class IncrementalMiniMarkGC(MovingGCBase):
         debug_stop("gc-minor")
         duration = time.time() - start
         self.total_gc_time += duration
+        self.minor_pauses.record(duration)
+        if self.nursery_adaptive:
+            self.adapt_nursery_size(nursery_used_size, duration)
         self.hooks.fire_gc_minor(
             duration=duration,
             total_memory_used=total_memory_used,
             pinned_objects=self.pinned_objects_in_nursery)
 
+    def adapt_nursery_size(self, nursery_used_size, duration):
+        # Called at the end of a minor collection, when the nursery is
+        # empty.  If many objects survive, a larger nursery gives them
+        # more time to die before they are copied; if almost none
+        # survive, a smaller nursery is friendlier to the CPU caches.
+        # If the minor collections are longer than the target pause,
+        # the nursery also shrinks.  Pinned objects stay where they are,
+        # so the size cannot change while there are some.
+        if nursery_used_size <= 0 or self.pinned_objects_in_nursery > 0:
+            return
+        survival = (float(self.nursery_surviving_size) /
+                    float(nursery_used_size))
+        self.nursery_survival_avg = (self.nursery_survival_avg +
+                                     survival) * 0.5
+        newsize = self.nursery_size
+        if self.gc_target_pause > 0.0 and duration > self.gc_target_pause:
+            newsize = newsize // 2
+        elif self.nursery_survival_avg > NURSERY_GROW_SURVIVAL:
+            newsize = newsize * 2
+        elif self.nursery_survival_avg < NURSERY_SHRINK_SURVIVAL:
+            newsize = newsize // 2
+        newsize = max(self.nursery_min_size, min(newsize,
+                                                 self.nursery_max_size))
+        newsize &= ~(WORD-1)
+        assert newsize > 0
+        if newsize != self.nursery_size:
+            debug_start("gc-set-nursery-size")
+            debug_print("nursery size:", newsize, "survival rate:",
+                        self.nursery_survival_avg)
+            debug_stop("gc-set-nursery-size")
+            self.nursery_size = newsize
+            self.nursery_top = self.nursery + newsize
+            self.nursery_resizes += 1
+
     def _reset_flag_old_objects_pointing_to_pinned(self, obj, ignore):
         ll_assert(self.header(obj).tid & GCFLAG_PINNED_OBJECT_PARENT_KNOWN != 0,
                   "!GCFLAG_PINNED_OBJECT_PARENT_KNOWN, but requested to reset.")
@@ -2251,6 +2489,63 @@ class IncrementalMiniMarkGC(MovingGCBase):
         # and survives.  Otherwise, it dies.
         self.free_rawmalloced_object_if_unvisited(obj, GCFLAG_VISITED_RMY)
 
+    def update_young_alloc_samples(self):
+        # Called during a minor collection, after the surviving objects
+        # have been moved out of the nursery.  The new samples are reported
+        # to the hooks, with their type and size.
+        size_gc_header = self.gcheaderbuilder.size_gc_header
+        still_pinned = self.AddressStack()
+        while self.young_alloc_samples.non_empty():
+            obj = self.young_alloc_samples.pop() + size_gc_header
+            sample = _alloc_sample_from_adr(
+                self.young_alloc_samples.pop())
+            self._update_young_alloc_sample(sample, obj, still_pinned, True)
+        while self.pinned_alloc_samples.non_empty():
+            obj = self.pinned_alloc_samples.pop()
+            sample = _alloc_sample_from_adr(
+                self.pinned_alloc_samples.pop())
+            self._update_young_alloc_sample(sample, obj, still_pinned, False)
+        self.pinned_alloc_samples.delete()
+        self.pinned_alloc_samples = still_pinned
+
+    def _update_young_alloc_sample(self, sample, obj, still_pinned, new):
+        if self.is_forwarded(obj):
+            obj = self.get_forwarding_address(obj)
+            self.old_alloc_samples.append(_alloc_sample_adr(sample))
+            self.old_alloc_samples.append(obj)
+            alive = True
+        elif self.header(obj).tid & GCFLAG_VISITED:
+            # a pinned object that survives: it stays in the nursery
+            still_pinned.append(_alloc_sample_adr(sample))
+            still_pinned.append(obj)
+            alive = True
+        else:
+            alive = False
+        if new:
+            typeid = self.get_type_id(obj)
+            size = raw_malloc_usage(self.get_size_incl_hash(obj))
+            self.hooks.fire_gc_alloc_sample(sample,
+                                            self.get_member_index(typeid),
+                                            size)
+        if not alive:
+            self.hooks.fire_gc_alloc_sample_free(sample)
+
+    def free_dead_alloc_samples(self):
+        # Called at the end of the marking phase: the sampled objects which
+        # were not marked are going to be freed.
+        new_old_alloc_samples = self.AddressStack()
+        while self.old_alloc_samples.non_empty():
+            obj = self.old_alloc_samples.pop()
+            sample = self.old_alloc_samples.pop()
+            if self.header(obj).tid & GCFLAG_VISITED:
+                new_old_alloc_samples.append(sample)
+                new_old_alloc_samples.append(obj)
+            else:
+                self.hooks.fire_gc_alloc_sample_free(
+                    _alloc_sample_from_adr(sample))
+        self.old_alloc_samples.delete()
+        self.old_alloc_samples = new_old_alloc_samples
+
     def remove_young_arrays_from_old_objects_pointing_to_young(self):
         old = self.old_objects_pointing_to_young
         new = self.AddressStack()
@@ -2354,6 +2649,7 @@ class IncrementalMiniMarkGC(MovingGCBase):
             self.objects_to_trace = self.AddressStack()
             self.collect_roots()
             self.gc_state = STATE_MARKING
+            self.marking_steps = 0
             self.more_objects_to_trace = self.AddressStack()
             #END SCANNING
         elif self.gc_state == STATE_MARKING:
@@ -2361,11 +2657,22 @@ class IncrementalMiniMarkGC(MovingGCBase):
                         self.objects_to_trace.length(),
                         "plus",
                         self.more_objects_to_trace.length())
-            estimate = self.gc_increment_step
-            estimate_from_nursery = self.nursery_surviving_size * 2
-            if estimate_from_nursery > estimate:
-                estimate = estimate_from_nursery
-            estimate = intmask(estimate)
+            self.marking_steps += 1
+            if self.gc_target_pause > 0.0:
+                # The minimum is twice what survived the last minor
+                # collection, as without a target pause, so that marking
+                # does not fall behind the program.
+                estimate = self.step_budget(self.mark_rate,
+                                            intmask(self.gc_increment_step),
+                                            self.nursery_surviving_size * 2)
+            else:
+                estimate = self.gc_increment_step
+                estimate_from_nursery = self.nursery_surviving_size * 2
+                if estimate_from_nursery > estimate:
+                    estimate = estimate_from_nursery
+                estimate = intmask(estimate)
+            mark_start = time.time()
+            measured = True
             remaining = self.visit_all_objects_step(estimate)
             #
             if remaining >= estimate // 2:
@@ -2374,11 +2681,22 @@ class IncrementalMiniMarkGC(MovingGCBase):
                     # there are more objects added during the marking steps
                     # of this major collection.  Visit them all now.
                     # The idea is to ensure termination at the cost of some
-                    # incrementality, in theory.
+                    # incrementality, in theory.  With a target pause, only
+                    # use what is left of this step's budget, until this
+                    # major collection took TARGET_PAUSE_MARKING_STEPS.
                     swap = self.objects_to_trace
                     self.objects_to_trace = self.more_objects_to_trace
                     self.more_objects_to_trace = swap
-                    self.visit_all_objects()
+                    if (self.gc_target_pause > 0.0 and
+                            self.marking_steps < TARGET_PAUSE_MARKING_STEPS):
+                        remaining = self.visit_all_objects_step(remaining)
+                    else:
+                        self.visit_all_objects()
+                        measured = False    # the work done is not counted
+            if self.gc_target_pause > 0.0 and measured:
+                self.mark_rate = self.update_rate(self.mark_rate,
+                                                  estimate - remaining,
+                                                  time.time() - mark_start)
 
             # XXX A simplifying assumption that should be checked,
             # finalizers/weak references are rare and short which means that
@@ -2438,6 +2756,9 @@ class IncrementalMiniMarkGC(MovingGCBase):
                 if self.rrc_enabled:
                     self.rrc_major_collection_free()
                 #
+                if self.old_alloc_samples.non_empty():
+                    self.free_dead_alloc_samples()
+                #
                 self.stat_ac_arenas_count = self.ac.arenas_count
                 self.stat_rawmalloced_total_size = self.rawmalloced_total_size
                 self.gc_state = STATE_SWEEPING
@@ -2451,7 +2772,14 @@ class IncrementalMiniMarkGC(MovingGCBase):
                 # a total object size of at least '3 * nursery_size' bytes
                 # is processed.
                 limit = 3 * self.nursery_size // self.small_request_threshold
+                if self.gc_target_pause > 0.0:
+                    limit = self.step_budget(self.sweep_raw_rate, limit, 1)
+                sweep_start = time.time()
                 nobjects = self.free_unvisited_rawmalloc_objects_step(limit)
+                if self.gc_target_pause > 0.0:
+                    self.sweep_raw_rate = self.update_rate(
+                        self.sweep_raw_rate, limit - nobjects,
+                        time.time() - sweep_start)
                 debug_print("freeing raw objects:", limit-nobjects,
                             "freed, limit was", limit)
                 done = False    # the 2nd half below must still be done
@@ -2461,8 +2789,17 @@ class IncrementalMiniMarkGC(MovingGCBase):
                 # GCFLAG_VISITED on the others.  Visit at most '3 *
                 # nursery_size' bytes.
                 limit = 3 * self.nursery_size // self.ac.page_size
+                if self.gc_target_pause > 0.0:
+                    limit = self.step_budget(self.sweep_pages_rate, limit, 1)
+                sweep_start = time.time()
                 done = self.ac.mass_free_incremental(self._free_if_unvisited,
                                                      limit)
+                if self.gc_target_pause > 0.0 and not done:
+                    # only a step that used its whole limit gives a
+                    # meaningful throughput
+                    self.sweep_pages_rate = self.update_rate(
+                        self.sweep_pages_rate, limit,
+                        time.time() - sweep_start)
                 status = done and "No more pages left." or "More to do."
                 debug_print("freeing GC objects, up to", limit, "pages.", status)
             # XXX tweak the limits above
@@ -2546,11 +2883,38 @@ class IncrementalMiniMarkGC(MovingGCBase):
         debug_stop("gc-collect-step")
         duration = time.time() - start
         self.total_gc_time += duration
+        self.step_pauses.record(duration)
         self.hooks.fire_gc_collect_step(
             duration=duration,
             oldstate=oldstate,
             newstate=self.gc_state)
 
+    def step_budget(self, rate, default, minimum):
+        """Return how much work (in the unit of 'rate' per second) to do
+        in a major collection step so that it takes about
+        'gc_target_pause' seconds.  Returns 'default' as long as the
+        rate is not known."""
+        if rate <= 0.0:
+            return default
+        budget = self.gc_target_pause * rate
+        if budget >= float(sys.maxint):
+            return sys.maxint
+        result = int(budget)
+        if result < minimum:
+            result = minimum
+        return result
+
+    def update_rate(self, rate, work, duration):
+        """Return the new estimate for a throughput, after 'work' was
+        done in 'duration' seconds.  The measurements are averaged
+        exponentially, to adapt to changes of the heap shape."""
+        if work <= 0 or duration <= 0.0:
+            return rate
+        measured = float(work) / duration
+        if rate <= 0.0:
+            return measured
+        return rate * 0.75 + measured * 0.25
+
     def _sweep_old_objects_pointing_to_pinned(self, obj, new_list):
         if self.header(obj).tid & GCFLAG_VISITED:
             new_list.append(obj)
@@ -2676,6 +3040,10 @@ class IncrementalMiniMarkGC(MovingGCBase):
         # Objects can be added to pending by visit
         pending = self.objects_to_trace
         while pending.non_empty():
+            # switch to parallel marking as soon as there are enough objects
+            if (self.gc_mark_threads > 1 and not self.TEST_VISIT_SINGLE_STEP
+                    and pending.length() >= parallelmark.MIN_PENDING):
+                return self.parallel_visit_step(size_to_track)
             obj = pending.pop()
             size_to_track -= self.visit(obj)
             if size_to_track < 0 or self.TEST_VISIT_SINGLE_STEP:
@@ -2720,6 +3088,35 @@ class IncrementalMiniMarkGC(MovingGCBase):
         totalsize = size_gc_header + self.get_size(obj)
         return raw_malloc_usage(totalsize)
 
+    def parallel_visit_step(self, size_to_track):
+        if self.mark_pool is None:
+            self.mark_pool = parallelmark.MarkWorkerPool(self,
+                                                         self.gc_mark_threads)
+        debug_print("parallel marking with", self.gc_mark_threads, "threads")
+        return self.mark_pool.visit_step(self.objects_to_trace, size_to_track)
+
+    def visit_parallel(self, obj, worker):
+        # Like visit(), but called by the parallel marking threads, which
+        # push the referenced objects to their own 'worker'.  If several
+        # threads visit the same object at the same time, they all set
+        # the same flags and trace it, which is harmless.
+        hdr = self.header(obj)
+        if hdr.tid & (GCFLAG_VISITED | GCFLAG_NO_HEAP_PTRS):
+            return 0
+        hdr.tid |= GCFLAG_VISITED | GCFLAG_TRACK_YOUNG_PTRS
+        if self.has_gcptr(llop.extract_ushort(llgroup.HALFWORD, hdr.tid)):
+            self.trace(obj, self._collect_ref_parallel, worker)
+        size_gc_header = self.gcheaderbuilder.size_gc_header
+        totalsize = size_gc_header + self.get_size(obj)
+        return raw_malloc_usage(totalsize)
+
+    def _collect_ref_parallel(self, root, worker):
+        obj = root.address[0]
+        # pinned objects are still in the nursery, and handled by minor
+        # collections (see _collect_obj())
+        if not self.is_in_nursery(obj):
+            worker.push(obj)
+
     # ----------
     # id() and identityhash() support
 
@@ -3054,6 +3451,32 @@ class IncrementalMiniMarkGC(MovingGCBase):
             return intmask(self.nursery_size)
         elif stats_no == rgc.TOTAL_GC_TIME:
             return int(self.total_gc_time * 1000)
+        elif stats_no == rgc.MINOR_COLLECTIONS:
+            return self.minor_pauses.count
+        elif stats_no == rgc.MINOR_PAUSE_P50:
+            return self.minor_pauses.percentile(500)
+        elif stats_no == rgc.MINOR_PAUSE_P99:
+            return self.minor_pauses.percentile(990)
+        elif stats_no == rgc.MINOR_PAUSE_P999:
+            return self.minor_pauses.percentile(999)
+        elif stats_no == rgc.MINOR_PAUSE_MAX:
+            return self.minor_pauses.max_pause
+        elif stats_no == rgc.COLLECT_STEPS:
+            return self.step_pauses.count
+        elif stats_no == rgc.STEP_PAUSE_P50:
+            return self.step_pauses.percentile(500)
+        elif stats_no == rgc.STEP_PAUSE_P99:
+            return self.step_pauses.percentile(990)
+        elif stats_no == rgc.STEP_PAUSE_P999:
+            return self.step_pauses.percentile(999)
+        elif stats_no == rgc.STEP_PAUSE_MAX:
+            return self.step_pauses.max_pause
+        elif stats_no == rgc.TOTAL_NURSERY_ALLOCATED:
+            return intmask(self.nursery_allocated_total)
+        elif stats_no == rgc.TOTAL_NURSERY_PROMOTED:
+            return intmask(self.nursery_promoted_total)
+        elif stats_no == rgc.NURSERY_RESIZES:
+            return self.nursery_resizes
         return 0
 
 
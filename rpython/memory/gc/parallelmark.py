@@ -0,0 +1,436 @@
+"""
+Parallel marking for the incminimark GC.
+
+If PYPY_GC_MARK_THREADS is set to N > 1, the marking done by a major
+collection step is shared between the thread that runs the GC and N-1
+helper threads.  The mutator is stopped as usual: the helper threads are
+started by the first parallel step, and between the steps they wait on a
+lock of their own.  They are all done when the step returns.  After a
+fork(), the child process starts new helper threads.
+
+Each worker has a private stack of objects to visit, and a shared array
+where it moves some of its objects when it has many of them and the
+shared array is empty.  A worker whose private stack is empty first takes
+back its own shared objects, then steals half of the shared objects of
+another worker.  The shared arrays are protected by a lock each; the
+private stacks are only accessed by their owner.  Marking is finished when
+all the workers are idle, i.e. they found nothing to do anywhere.
+
+Two workers can visit the same object concurrently.  This is harmless:
+both set the same flags in the header, and at worst the object is traced
+twice.
+
+The helper threads run only raw code: no GC allocation, no debug prints,
+and nothing that raises, because the exception state is process-global.
+In particular the arrays of addresses grow without raising MemoryError.
+A worker whose private array cannot grow puts the objects in its overflow
+array instead, and stops after the current object.  The GC thread moves
+the overflow arrays back to its stack of objects to trace at the end of
+the step.  The overflow arrays are allocated by the GC thread with room
+for 256 objects, so they only need to grow if a single object references
+more objects than that: if they cannot, marking aborts with a fatal
+error.  When not translated, the workers are run in turn in the current
+thread, a few objects at a time, which is enough to exercise the sharing
+and stealing logic.
+"""
+import sys
+from rpython.rtyper.lltypesystem import lltype, llmemory, rffi
+from rpython.rtyper.annlowlevel import llhelper
+from rpython.rlib.objectmodel import free_non_gc_object, we_are_translated
+from rpython.rlib.debug import fatalerror_notb
+from rpython.rlib import rthread
+from rpython.translator.tool.cbuild import ExternalCompilationInfo
+
+
+MAX_THREADS = 64
+MIN_PENDING = 16       # don't start threads for less objects than that
+SHARE_THRESHOLD = 16   # share objects if we have more than that privately
+EMULATED_SLICE = 3     # objects visited in a row when not translated
+
+ADDRESS_ARRAY = lltype.Array(llmemory.Address, hints={'nolength': True})
+
+# a version of RPyThreadStart() without the GIL handling, which the GC
+# must not do
+c_thread_start = rthread.llexternal('RPyThreadStart', [rthread.CALLBACK],
+                                    rffi.LONG, _nowrapper=True)
+
+if sys.platform == 'win32':
+    def _yield_cpu():
+        pass
+
+    def _getpid():
+        return 0        # no fork()
+else:
+    _sched_yield = rffi.llexternal(
+        'sched_yield', [], rffi.INT, _nowrapper=True, sandboxsafe=True,
+        compilation_info=ExternalCompilationInfo(includes=['sched.h']))
+    _c_getpid = rffi.llexternal(
+        'getpid', [], rffi.INT, _nowrapper=True, sandboxsafe=True,
+        compilation_info=ExternalCompilationInfo(includes=['unistd.h']))
+
+    def _yield_cpu():
+        _sched_yield()
+
+    def _getpid():
+        return rffi.cast(lltype.Signed, _c_getpid())
+
+
+def _allocate_lock():
+    if we_are_translated():
+        return rthread.allocate_ll_lock()
+    return rthread.null_ll_lock
+
+def _acquire(ll_lock):
+    if we_are_translated():
+        rthread.c_thread_acquirelock_NOAUTO(ll_lock, rffi.cast(rffi.INT, 1))
+
+def _release(ll_lock):
+    if we_are_translated():
+        rthread.c_thread_releaselock_NOAUTO(ll_lock)
+
+def _free_lock(ll_lock):
+    if we_are_translated():
+        rthread.free_ll_lock(ll_lock)
+
+def _malloc_items(capacity):
+    """Allocate the items of an AddressArray.  Returns NULL instead of
+    raising MemoryError."""
+    adr = llmemory.raw_malloc(llmemory.sizeof(ADDRESS_ARRAY, capacity))
+    if not adr:
+        return lltype.nullptr(ADDRESS_ARRAY)
+    return llmemory.cast_adr_to_ptr(adr, lltype.Ptr(ADDRESS_ARRAY))
+
+def _free_items(items):
+    llmemory.raw_free(llmemory.cast_ptr_to_adr(items))
+
+
+class AddressArray(object):
+    """A growable array of addresses.  Unlike the AddressStack, it does
+    not use a global list of free chunks, so that it can be used from
+    several threads.  Only __init__() raises MemoryError: it is called
+    by the GC thread."""
+    _alloc_flavor_ = "raw"
+
+    def __init__(self):
+        self.capacity = 256
+        self.items = _malloc_items(self.capacity)
+        if not self.items:
+            raise MemoryError
+        self.length = 0
+
+    def append(self, addr):
+        """Append 'addr' and return True, or return False if the array is
+        full and cannot grow."""
+        if self.length == self.capacity and not self._grow(1):
+            return False
+        self.items[self.length] = addr
+        self.length += 1
+        return True
+
+    def pop(self):
+        self.length -= 1
+        return self.items[self.length]
+
+    def _grow(self, count):
+        """Make room for 'count' more items.  Returns False if there is
+        not enough memory."""
+        newcapacity = self.capacity * 2
+        while newcapacity < self.length + count:
+            newcapacity *= 2
+        newitems = _malloc_items(newcapacity)
+        if not newitems:
+            return False
+        i = 0
+        while i < self.length:
+            newitems[i] = self.items[i]
+            i += 1
+        _free_items(self.items)
+        self.items = newitems
+        self.capacity = newcapacity
+        return True
+    _grow._dont_inline_ = True
+
+    def move_to(self, other, count):
+        """Move the last 'count' items to the array 'other', or less if
+        'other' cannot grow.  Returns the number of items moved."""
+        if other.length + count > other.capacity and not other._grow(count):
+            count = other.capacity - other.length
+        i = 0
+        while i < count:
+            other.items[other.length] = self.pop()
+            other.length += 1
+            i += 1
+        return count
+
+    def delete(self):
+        _free_items(self.items)
+        free_non_gc_object(self)
+
+
+class MarkWorker(object):
+    _alloc_flavor_ = "raw"
+
+    def __init__(self, pool):
+        self.pool = pool
+        self.next = self             # the workers form a ring
+        self.private = AddressArray()
+        self.shared = AddressArray()
+        self.overflow = AddressArray()   # emptied by the GC thread
+        self.lock = _allocate_lock()         # protects 'shared'
+        self.start_lock = _allocate_lock()   # released to start a step
+        self.done_lock = _allocate_lock()    # held while the thread runs
+        self.budget = 0
+        self.idle = False
+        self.claimed = False         # owned by a helper thread
+        self.finished = False        # when not translated
+
+    def push(self, obj):
+        if not self.private.append(obj):
+            self.spill(obj)
+
+    def spill(self, obj):
+        # our private array cannot grow: stop after the current object,
+        # and leave the objects it references to the GC thread
+        self.budget = -1
+        if not self.overflow.append(obj):
+            fatalerror_notb("out of memory: cannot grow the marking stack")
+
+    def work(self, max_objects):
+        """Visit objects until marking is finished or our budget is
+        exhausted, in which case we return True.  When not translated,
+        return False after 'max_objects' objects to let the other workers
+        run."""
+        gc = self.pool.gc
+        while max_objects != 0:
+            if self.private.length > 0:
+                max_objects -= 1
+                obj = self.private.pop()
+                self.budget -= gc.visit_parallel(obj, self)
+                if self.budget < 0:
+                    self.set_idle()
+                    return True
+                if (self.private.length > SHARE_THRESHOLD and
+                        self.shared.length == 0):
+                    self.share()
+            elif not self.find_work():
+                if self.set_idle():
+                    return True
+                if we_are_translated():
+                    _yield_cpu()
+                else:
+                    return False
+        return False
+
+    def share(self):
+        _acquire(self.lock)
+        self.private.move_to(self.shared, self.private.length // 2)
+        _release(self.lock)
+
+    def find_work(self):
+        victim = self
+        while True:
+            if self.take_from(victim):
+                return True
+            victim = victim.next
+            if victim is self:
+                return False
+
+    def take_from(self, victim):
+        # reading 'victim.shared.length' without the lock is only a hint
+        if victim.shared.length == 0:
+            return False
+        if self.idle:
+            pool = self.pool
+            _acquire(pool.lock)
+            self.idle = False
+            pool.num_idle -= 1
+            _release(pool.lock)
+        _acquire(victim.lock)
+        count = victim.shared.length
+        if victim is not self:
+            count = (count + 1) // 2
+        count = victim.shared.move_to(self.private, count)
+        _release(victim.lock)
+        return count > 0
+
+    def set_idle(self):
+        """Mark this worker as idle, and return True if all the workers
+        are idle, which means that marking is finished."""
+        pool = self.pool
+        _acquire(pool.lock)
+        if not self.idle:
+            self.idle = True
+            pool.num_idle += 1
+        finished = pool.num_idle == pool.num_workers
+        _release(pool.lock)
+        return finished
+
+    def give_back(self, pending):
+        """Move the objects that were not visited back to 'pending'."""
+        while self.private.length > 0:
+            pending.append(self.private.pop())
+        while self.shared.length > 0:
+            pending.append(self.shared.pop())
+        while self.overflow.length > 0:
+            pending.append(self.overflow.pop())
+
+    def delete(self):
+        self.private.delete()
+        self.shared.delete()
+        self.overflow.delete()
+        _free_lock(self.lock)
+        _free_lock(self.start_lock)
+        _free_lock(self.done_lock)
+        free_non_gc_object(self)
+
+
+class MarkWorkerPool(object):
+    _alloc_flavor_ = "raw"
+
+    def __init__(self, gc, num_workers):
+        self.gc = gc
+        self.num_workers = num_workers
+        self.num_idle = 0
+        self.lock = _allocate_lock()  # protects 'num_idle' and 'claimed'
+        self.threads_pid = -1         # the process that runs the threads
+        self.first = MarkWorker(self)
+        i = 1
+        while i < num_workers:
+            worker = MarkWorker(self)
+            worker.next = self.first.next
+            self.first.next = worker
+            i += 1
+
+    def visit_step(self, pending, size_to_track):
+        """Visit the objects from the AddressStack 'pending', and the ones
+        they reference, up to a total size of about 'size_to_track' bytes.
+        Objects not visited are put back in 'pending'.  Returns the part
+        of 'size_to_track' that was not used, or 0 if the budget was
+        exhausted."""
+        if we_are_translated() and self.threads_pid != _getpid():
+            self._start_threads()
+        budget = size_to_track // self.num_workers
+        worker = self.first
+        while pending.non_empty():
+            obj = pending.pop()
+            if not worker.private.append(obj):
+                pending.append(obj)     # the rest waits for the next step
+                break
+            worker = worker.next
+        worker = self.first
+        while True:
+            worker.budget = budget
+            worker.idle = False
+            worker.finished = False
+            worker = worker.next
+            if worker is self.first:
+                break
+        self.num_idle = 0
+        #
+        if we_are_translated():
+            self._run_in_threads()
+        else:
+            self._run_emulated()
+        #
+        remaining = 0
+        exhausted = pending.non_empty()
+        worker = self.first
+        while True:
+            if worker.budget < 0 or worker.private.length > 0:
+                exhausted = True
+            remaining += worker.budget
+            worker.give_back(pending)
+            worker = worker.next
+            if worker is self.first:
+                break
+        if exhausted or remaining < 0:
+            return 0
+        return remaining
+
+    def _start_threads(self):
+        # Called by the first parallel step, and by the first one in the
+        # child process after a fork(), which has no helper thread.  The
+        # helper threads are waiting on their 'start_lock' when the
+        # mutator runs, so the locks are in the same state in both cases.
+        if self.threads_pid == -1:
+            worker = self.first.next
+            while worker is not self.first:
+                _acquire(worker.start_lock)
+                worker = worker.next
+        self.threads_pid = _getpid()
+        _state.pool = self
+        self.first.claimed = True        # run by the GC thread
+        worker = self.first.next
+        while worker is not self.first:
+            worker.claimed = False
+            worker = worker.next
+        started = 1
+        while started < self.num_workers:
+            ident = c_thread_start(llhelper(rthread.CALLBACK,
+                                            _mark_thread_main))
+            if rffi.cast(lltype.Signed, ident) == -1:
+                break
+            started += 1
+        # the workers that got no thread are removed
+        while self.num_workers > started:
+            self._drop_unclaimed_worker()
+
+    def _run_in_threads(self):
+        worker = self.first.next
+        while worker is not self.first:
+            _acquire(worker.done_lock)
+            _release(worker.start_lock)     # wake up its thread
+            worker = worker.next
+        self.first.work(-1)
+        worker = self.first.next
+        while worker is not self.first:
+            _acquire(worker.done_lock)    # wait for the thread to finish
+            _release(worker.done_lock)
+            worker = worker.next
+
+    def _drop_unclaimed_worker(self):
+        _acquire(self.lock)
+        prev = self.first
+        worker = prev.next
+        while worker.claimed:
+            prev = worker
+            worker = worker.next
+        prev.next = worker.next
+        self.num_workers -= 1
+        _release(self.lock)
+        worker.delete()
+
+    def _claim_worker(self):
+        _acquire(self.lock)
+        worker = self.first.next
+        while worker.claimed:
+            worker = worker.next
+        worker.claimed = True
+        _release(self.lock)
+        return worker
+
+    def _run_emulated(self):
+        finished = 0
+        worker = self.first
+        while finished < self.num_workers:
+            if not worker.finished:
+                if worker.work(EMULATED_SLICE):
+                    worker.finished = True
+                    finished += 1
+            worker = worker.next
+
+
+class _MarkThreadState(object):
+    _alloc_flavor_ = "raw"
+    pool = None
+
+_state = _MarkThreadState()
+
+def _mark_thread_main():
+    # runs forever: a helper thread waits on the 'start_lock' of its
+    # worker between the marking steps
+    worker = _state.pool._claim_worker()
+    while True:
+        _acquire(worker.start_lock)
+        worker.work(-1)
+        _release(worker.done_lock)
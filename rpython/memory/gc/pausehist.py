@@ -0,0 +1,80 @@
+"""
+Histograms of the GC pause times, maintained by the GC itself so that
+the percentiles are available without any hook or app-level callback.
+
+The pauses are recorded in microseconds, in buckets of logarithmic size:
+every power of two is split into 2**SUB_BITS buckets, so that the
+percentiles reported are within 1/2**SUB_BITS (12.5%) of the real value.
+"""
+from rpython.rlib.rarithmetic import LONG_BIT
+from rpython.rtyper.lltypesystem import lltype, rffi
+
+
+SUB_BITS = 3
+SUB_COUNT = 1 << SUB_BITS
+# pauses above 2**40 microseconds (2**30 on 32-bit) are clamped, so that
+# MAX_VALUE and all bucket limits fit in a signed word
+MAX_EXPONENT = min(40, LONG_BIT - 2)
+NUM_BUCKETS = (MAX_EXPONENT - SUB_BITS + 2) << SUB_BITS
+MAX_VALUE = (1 << (MAX_EXPONENT + 1)) - 1
+MAX_DURATION = MAX_VALUE / 1000000.0
+
+
+def bucket_index(value):
+    """Return the index of the bucket for 'value', which is >= 0."""
+    if value < SUB_COUNT:
+        return value
+    if value > MAX_VALUE:
+        value = MAX_VALUE
+    exponent = SUB_BITS
+    while (value >> (exponent + 1)) != 0:
+        exponent += 1
+    mantissa = (value >> (exponent - SUB_BITS)) & (SUB_COUNT - 1)
+    return ((exponent - SUB_BITS + 1) << SUB_BITS) + mantissa
+
+def bucket_limit(index):
+    """Return the largest value that goes to the bucket 'index'."""
+    if index < SUB_COUNT:
+        return index
+    exponent = (index >> SUB_BITS) + SUB_BITS - 1
+    mantissa = index & (SUB_COUNT - 1)
+    # written so that the limit of the last bucket, MAX_VALUE, does not
+    # overflow: (SUB_COUNT + mantissa + 1) << ... would be 2**(LONG_BIT-1)
+    step = 1 << (exponent - SUB_BITS)
+    return ((SUB_COUNT + mantissa) << (exponent - SUB_BITS)) - 1 + step
+
+
+class PauseHistogram(object):
+
+    def __init__(self):
+        self.buckets = lltype.malloc(rffi.CArray(lltype.Signed), NUM_BUCKETS,
+                                     flavor='raw', zero=True, immortal=True)
+        self.count = 0
+        self.max_pause = 0
+
+    def record(self, duration):
+        """Record a pause of 'duration' seconds."""
+        if duration < 0.0:
+            value = 0      # the clock went backward
+        elif duration > MAX_DURATION:
+            value = MAX_VALUE
+        else:
+            value = int(duration * 1000000.0)
+        self.buckets[bucket_index(value)] += 1
+        self.count += 1
+        if value > self.max_pause:
+            self.max_pause = value
+
+    def percentile(self, permille):
+        """Return an upper bound for the given percentile of the pauses,
+        expressed in 1/1000, in microseconds.  Returns 0 if no pause was
+        recorded."""
+        if self.count == 0:
+            return 0
+        rank = (self.count * permille + 999) // 1000
+        seen = 0
+        for i in range(NUM_BUCKETS):
+            seen += self.buckets[i]
+            if seen >= rank:
+                return min(bucket_limit(i), self.max_pause)
+        return self.max_pause
@@ -844,3 +844,217 @@ class TestIncrementalMiniMarkGCFull(DirectGCTest):
             (incminimark.STATE_SWEEPING, incminimark.STATE_FINALIZING),
             (incminimark.STATE_FINALIZING, incminimark.STATE_SCANNING)
             ]
+
+    def test_target_pause(self):
+        from rpython.rlib import rgc
+        self.gc.gc_target_pause = 0.001
+        self.stackroots.append(lltype.nullptr(S))
+        for i in range(50):
+            s = self.malloc(S)
+            s.x = i
+            self.write(s, 'next', self.stackroots[0])
+            self.stackroots[0] = s
+        self.gc.collect()
+        assert self.gc.mark_rate > 0.0
+        # now the budget of each step comes from the measured rate:
+        # force it to a single byte, which marks one object per step
+        n = 0
+        while True:
+            self.gc.mark_rate = 1000.0
+            if rgc.is_done(self.gc.collect_step()):
+                break
+            n += 1
+            assert n < 500, 'this looks like an endless loop'
+        assert n > 50
+        s = self.stackroots[0]
+        for i in range(49, -1, -1):
+            assert s.x == i
+            s = s.next
+        assert not s
+
+    def _marking_shortcut(self, marking_steps):
+        # reach a marking step where the gray objects are all visited
+        # within the budget, but the program has given us more objects
+        # to mark: return how the shortcut visited them
+        self.gc.gc_target_pause = 0.001
+        for i in range(3):
+            self.stackroots.append(self.malloc(S))
+        self.gc.collect()
+        self.gc.collect_step()
+        assert self.gc.gc_state == incminimark.STATE_MARKING
+        for s in self.stackroots:
+            self.write(s, 'next', self.malloc(S))
+        assert self.gc.gc_state == incminimark.STATE_MARKING
+        self.gc.marking_steps = marking_steps
+        self.gc.mark_rate = 1e12
+        calls = []
+        def visit_all_objects():
+            calls.append('all')
+            incminimark.IncrementalMiniMarkGC.visit_all_objects(self.gc)
+        def visit_all_objects_step(size_to_track):
+            calls.append('step')
+            return incminimark.IncrementalMiniMarkGC.visit_all_objects_step(
+                self.gc, size_to_track)
+        self.gc.visit_all_objects = visit_all_objects
+        self.gc.visit_all_objects_step = visit_all_objects_step
+        self.gc.collect_step()
+        del self.gc.visit_all_objects
+        del self.gc.visit_all_objects_step
+        assert self.gc.gc_state == incminimark.STATE_SWEEPING
+        for s in self.stackroots:
+            assert s.next
+        return calls
+
+    def test_target_pause_marking_shortcut(self):
+        # the objects added during marking are visited with what is left
+        # of the step's budget
+        assert self._marking_shortcut(0)[:2] == ['step', 'step']
+        assert self.gc.mark_rate < 1e12
+
+    def test_target_pause_marking_steps_bounded(self):
+        # after TARGET_PAUSE_MARKING_STEPS steps, they are all visited
+        steps = incminimark.TARGET_PAUSE_MARKING_STEPS
+        assert self._marking_shortcut(steps)[:2] == ['step', 'all']
+        assert self.gc.marking_steps == steps + 1
+        assert self.gc.mark_rate == 1e12     # not measured
+
+    def _build_heap_for_parallel_marking(self):
+        # enough roots to start the marking threads, and a large array
+        # to make one worker share its objects with the others
+        for i in range(70):
+            s = self.malloc(S)
+            s.x = i
+            self.stackroots.append(s)
+        self.stackroots.append(self.malloc(VAR, 300))
+        for i in range(300):
+            s = self.malloc(S)
+            s.x = 1000 + i
+            self.writearray(self.stackroots[-1], i, s)
+        garbage = self.malloc(S)
+        self.write(self.stackroots[0], 'next', garbage)
+        self.gc.collect()
+        garbage = self.stackroots[0].next
+        self.write(self.stackroots[0], 'next', lltype.nullptr(S))
+        return garbage
+
+    def _check_heap_after_parallel_marking(self, garbage):
+        assert self.gc.mark_pool is not None
+        for i in range(70):
+            assert self.stackroots[i].x == i
+        for i in range(300):
+            assert self.stackroots[-1][i].x == 1000 + i
+        py.test.raises(RuntimeError, 'garbage.x')
+
+    def test_parallel_marking(self):
+        self.gc.gc_mark_threads = 4
+        garbage = self._build_heap_for_parallel_marking()
+        self.gc.gc_increment_step = 10 ** 6     # mark all in one step
+        self.gc.collect()
+        self._check_heap_after_parallel_marking(garbage)
+
+    def test_parallel_marking_budget(self):
+        from rpython.rlib import rgc
+        self.gc.gc_mark_threads = 3
+        garbage = self._build_heap_for_parallel_marking()
+        self.gc.gc_increment_step = 1000
+        n = 0
+        while not rgc.is_done(self.gc.collect_step()):
+            n += 1
+            assert n < 500, 'this looks like an endless loop'
+        assert n > 5
+        self._check_heap_after_parallel_marking(garbage)
+
+    def test_parallel_marking_cannot_grow(self, monkeypatch):
+        # the arrays of the workers cannot grow: the objects that don't
+        # fit go to the overflow arrays, and are marked all the same
+        from rpython.memory.gc import parallelmark
+        self.gc.gc_mark_threads = 4
+        self.gc.mark_pool = parallelmark.MarkWorkerPool(self.gc, 4)
+        garbage = self._build_heap_for_parallel_marking()
+        spilled = []
+        def spill(worker, obj):
+            spilled.append(obj)
+            orig_spill(worker, obj)
+        orig_spill = parallelmark.MarkWorker.spill.im_func
+        monkeypatch.setattr(parallelmark.MarkWorker, 'spill', spill)
+        monkeypatch.setattr(parallelmark, '_malloc_items',
+            lambda capacity: lltype.nullptr(parallelmark.ADDRESS_ARRAY))
+        self.gc.gc_increment_step = 10 ** 6
+        self.gc.collect()
+        assert spilled
+        self._check_heap_after_parallel_marking(garbage)
+
+    def test_step_budget(self):
+        import sys
+        gc = self.gc
+        gc.gc_target_pause = 0.002
+        assert gc.step_budget(0.0, 1234, 1) == 1234
+        assert gc.step_budget(1e6, 1234, 1) == 2000
+        assert gc.step_budget(1e3, 1234, 10) == 10
+        assert gc.step_budget(1e300, 1234, 1) == sys.maxint
+        assert gc.update_rate(0.0, 100, 0.5) == 200.0
+        assert gc.update_rate(200.0, 100, 0.25) == 250.0
+        assert gc.update_rate(200.0, 0, 0.25) == 200.0
+        assert gc.update_rate(200.0, 100, 0.0) == 200.0
+
+    def test_adaptive_nursery_grows(self):
+        from rpython.rlib import rgc
+        gc = self.gc
+        assert gc.nursery_adaptive
+        assert gc.nursery_size == 32*WORD
+        # everything survives: the nursery grows up to its maximum size
+        for i in range(40):
+            self.stackroots.append(self.malloc(S))
+        assert gc.nursery_size == 128*WORD
+        assert gc.get_stats(rgc.NURSERY_SIZE) == 128*WORD
+        assert gc.get_stats(rgc.NURSERY_RESIZES) == 2
+        assert self.stackroots[-1].next == lltype.nullptr(S)
+        for s in self.stackroots[:8]:
+            assert not gc.is_in_nursery(llmemory.cast_ptr_to_adr(s))
+    test_adaptive_nursery_grows.GC_PARAMS = {'nursery_max_size': 128*WORD}
+
+    def test_adaptive_nursery_shrinks(self):
+        gc = self.gc
+        # nothing survives: the nursery shrinks down to its minimum size
+        for i in range(40):
+            self.malloc(S)
+        assert gc.nursery_size == 16*WORD
+        assert gc.nursery_resizes == 1
+        assert gc.nursery_survival_avg < 0.01
+    test_adaptive_nursery_shrinks.GC_PARAMS = {'nursery_max_size': 128*WORD,
+                                               'nursery_min_size': 8*WORD}
+
+    def test_adaptive_nursery_target_pause(self):
+        gc = self.gc
+        gc.gc_target_pause = 1e-9
+        # even if everything survives, a slow minor collection halves the
+        # nursery
+        self.stackroots.append(self.malloc(S))
+        gc.collect(-1)     # only a minor collection
+        assert gc.nursery_size == 24*WORD
+    test_adaptive_nursery_target_pause.GC_PARAMS = {
+        'nursery_max_size': 128*WORD, 'nursery_min_size': 24*WORD}
+
+    def test_pause_and_nursery_stats(self):
+        from rpython.rlib import rgc
+        size = llmemory.sizeof(S) + self.gc.gcheaderbuilder.size_gc_header
+        size = llmemory.raw_malloc_usage(size)
+        assert self.gc.get_stats(rgc.MINOR_COLLECTIONS) == 0
+        assert self.gc.get_stats(rgc.MINOR_PAUSE_P99) == 0
+        for i in range(3):
+            self.malloc(S)
+        self.stackroots.append(self.malloc(S))
+        self.gc.collect(-1)     # only a minor collection
+        assert self.gc.get_stats(rgc.MINOR_COLLECTIONS) == 1
+        assert self.gc.get_stats(rgc.COLLECT_STEPS) == 0
+        assert self.gc.get_stats(rgc.TOTAL_NURSERY_ALLOCATED) == 4 * size
+        assert self.gc.get_stats(rgc.TOTAL_NURSERY_PROMOTED) == size
+        p50 = self.gc.get_stats(rgc.MINOR_PAUSE_P50)
+        assert 0 <= p50 <= self.gc.get_stats(rgc.MINOR_PAUSE_P999)
+        assert (self.gc.get_stats(rgc.MINOR_PAUSE_P999) ==
+                self.gc.get_stats(rgc.MINOR_PAUSE_MAX))
+        self.gc.collect()
+        assert self.gc.get_stats(rgc.COLLECT_STEPS) >= 4
+        assert (0 <= self.gc.get_stats(rgc.STEP_PAUSE_P50) <=
+                self.gc.get_stats(rgc.STEP_PAUSE_P99) <=
+                self.gc.get_stats(rgc.STEP_PAUSE_MAX))
@@ -10,6 +10,7 @@ class MyGcHooks(GcHooks):
         self._gc_minor_enabled = False
         self._gc_collect_step_enabled = False
         self._gc_collect_enabled = False
+        self.alloc_sample_interval = 0
         self.reset()
 
     def is_gc_minor_enabled(self):
@@ -21,11 +22,16 @@ class MyGcHooks(GcHooks):
     def is_gc_collect_enabled(self):
         return self._gc_collect_enabled
 
+    def get_gc_alloc_sample_interval(self):
+        return self.alloc_sample_interval
+
     def reset(self):
         self.minors = []
         self.steps = []
         self.collects = []
         self.durations = []
+        self.samples = []
+        self.freed_samples = []
 
     def on_gc_minor(self, duration, total_memory_used, pinned_objects):
         self.durations.append(duration)
@@ -51,6 +57,18 @@ class MyGcHooks(GcHooks):
             'rawmalloc_bytes_before': rawmalloc_bytes_before,
             'rawmalloc_bytes_after': rawmalloc_bytes_after})
 
+    def on_gc_alloc_sample_start(self):
+        self.samples.append(None)
+        return len(self.samples) - 1
+
+    def on_gc_alloc_sample(self, sample, type_index, size):
+        assert self.samples[sample] is None
+        self.samples[sample] = (type_index, size)
+
+    def on_gc_alloc_sample_free(self, sample):
+        assert sample not in self.freed_samples
+        self.freed_samples.append(sample)
+
 
 class TestIncMiniMarkHooks(BaseDirectGCTest):
     from rpython.memory.gc.incminimark import IncrementalMiniMarkGC as GCClass
@@ -123,3 +141,34 @@ class TestIncMiniMarkHooks(BaseDirectGCTest):
         assert self.gc.hooks.minors == []
         assert self.gc.hooks.steps == []
         assert self.gc.hooks.collects == []
+
+    def test_alloc_sampling(self):
+        hooks = self.gc.hooks
+        hooks.alloc_sample_interval = self.size_of_S * 3
+        for i in range(40):
+            s = self.malloc(S)
+            if i % 2 == 0:
+                self.stackroots.append(s)
+        self.gc._minor_collection()
+        # the sampling starts only after the nursery was filled once
+        assert 8 <= len(hooks.samples) <= 13
+        type_index = self.gc.get_member_index(self.get_type_id(S))
+        size = llmemory.raw_malloc_usage(llmemory.sizeof(S))
+        assert hooks.samples == [(type_index, size)] * len(hooks.samples)
+        assert 0 < len(hooks.freed_samples) < len(hooks.samples)
+        #
+        # the survivors are freed by the next major collection
+        hooks.alloc_sample_interval = 0
+        self.gc.collect()
+        assert len(hooks.freed_samples) < len(hooks.samples)
+        del self.stackroots[:]
+        self.gc.collect()
+        assert sorted(hooks.freed_samples) == range(len(hooks.samples))
+        assert not self.gc.old_alloc_samples.non_empty()
+
+    def test_alloc_sampling_disabled(self):
+        for i in range(40):
+            self.malloc(S)
+        self.gc.collect()
+        assert self.gc.hooks.samples == []
+        assert self.gc.alloc_sample_top == llmemory.NULL
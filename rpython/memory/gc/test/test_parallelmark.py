@@ -0,0 +1,82 @@
+import py
+from rpython.rtyper.lltypesystem import lltype, llmemory
+from rpython.rlib.debug import FatalError
+from rpython.memory.gc import parallelmark
+from rpython.memory.gc.parallelmark import AddressArray, MarkWorker
+
+
+T = lltype.Struct('T', ('x', lltype.Signed))
+
+def make_addresses(n):
+    return [llmemory.cast_ptr_to_adr(lltype.malloc(T, immortal=True))
+            for i in range(n)]
+
+def test_address_array():
+    addrs = make_addresses(600)
+    a = AddressArray()
+    for addr in addrs:
+        a.append(addr)
+    assert a.length == 600
+    assert a.capacity >= 600
+    for addr in reversed(addrs):
+        assert a.pop() == addr
+    assert a.length == 0
+    a.delete()
+
+def test_move_to():
+    addrs = make_addresses(10)
+    a = AddressArray()
+    b = AddressArray()
+    for addr in addrs:
+        a.append(addr)
+    a.move_to(b, 4)
+    assert a.length == 6
+    assert b.length == 4
+    assert [b.pop() for i in range(4)] == addrs[6:]
+    a.delete()
+    b.delete()
+
+def test_cannot_grow(monkeypatch):
+    addrs = make_addresses(300)
+    a = AddressArray()
+    b = AddressArray()
+    monkeypatch.setattr(parallelmark, '_malloc_items',
+        lambda capacity: lltype.nullptr(parallelmark.ADDRESS_ARRAY))
+    for addr in addrs[:256]:
+        assert a.append(addr)
+    assert not a.append(addrs[256])      # no MemoryError
+    assert a.length == a.capacity == 256
+    for addr in addrs[256:296]:
+        assert b.append(addr)
+    # only the room left in 'a' is used
+    assert b.move_to(a, 0) == 0
+    a.pop()
+    a.pop()
+    assert b.move_to(a, 10) == 2
+    assert a.length == 256
+    assert b.length == 38
+    assert a.pop() == addrs[294]
+    assert a.pop() == addrs[295]
+    monkeypatch.undo()
+    a.delete()
+    b.delete()
+
+def test_spill(monkeypatch):
+    addrs = make_addresses(513)
+    worker = MarkWorker(None)
+    worker.budget = 1000
+    monkeypatch.setattr(parallelmark, '_malloc_items',
+        lambda capacity: lltype.nullptr(parallelmark.ADDRESS_ARRAY))
+    for addr in addrs[:256]:
+        worker.push(addr)
+    assert worker.budget == 1000
+    for addr in addrs[256:512]:
+        worker.push(addr)       # into the overflow array
+    assert worker.budget == -1
+    assert worker.overflow.length == 256
+    py.test.raises(FatalError, worker.push, addrs[512])
+    pending = []
+    worker.give_back(pending)
+    assert pending == addrs[255::-1] + addrs[511:255:-1]
+    monkeypatch.undo()
+    worker.delete()
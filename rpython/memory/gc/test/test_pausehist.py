@@ -0,0 +1,66 @@
+import sys
+
+from rpython.memory.gc import pausehist
+from rpython.memory.gc.pausehist import (
+    PauseHistogram, bucket_index, bucket_limit, NUM_BUCKETS, MAX_VALUE)
+
+
+def test_buckets():
+    assert [bucket_index(i) for i in range(10)] == range(10)
+    prev = -1
+    for index in range(NUM_BUCKETS):
+        limit = bucket_limit(index)
+        assert limit > prev
+        assert bucket_index(prev + 1) == index
+        assert bucket_index(limit) == index
+        # the buckets are at most 12.5% wide
+        assert limit - prev <= max(1, (prev + 1) // 8)
+        prev = limit
+    assert bucket_index(prev * 10) == NUM_BUCKETS - 1
+
+def test_percentiles():
+    h = PauseHistogram()
+    assert h.percentile(500) == 0
+    for i in range(1000):
+        h.record((i + 1) / 1000000.0)      # 1 to 1000 microseconds
+    h.record(0.5)
+    assert h.count == 1001
+    assert h.max_pause == 500000
+    assert 500 <= h.percentile(500) <= 500 * 1.125
+    assert 990 <= h.percentile(990) <= 990 * 1.125
+    assert h.percentile(999) == bucket_limit(bucket_index(1000))
+    assert h.percentile(1000) == 500000
+
+def test_negative_duration():
+    h = PauseHistogram()
+    h.record(-0.1)
+    assert h.count == 1
+    assert h.percentile(500) == 0
+
+def check_largest_bucket():
+    assert pausehist.MAX_VALUE <= sys.maxint
+    last = pausehist.NUM_BUCKETS - 1
+    assert bucket_index(pausehist.MAX_VALUE) == last
+    assert bucket_index(pausehist.MAX_VALUE // 2) < last
+    limit = bucket_limit(last)
+    assert limit == pausehist.MAX_VALUE
+    assert type(limit) is int      # no overflow into a long
+    assert bucket_limit(last - 1) < limit
+
+def test_largest_bucket():
+    check_largest_bucket()
+    h = PauseHistogram()
+    h.record(1e30)
+    assert h.max_pause == MAX_VALUE
+    assert h.buckets[NUM_BUCKETS - 1] == 1
+    assert h.percentile(1000) == MAX_VALUE
+
+def test_largest_bucket_32bit(monkeypatch):
+    max_exponent = min(40, 32 - 2)
+    monkeypatch.setattr(pausehist, 'MAX_EXPONENT', max_exponent)
+    monkeypatch.setattr(pausehist, 'NUM_BUCKETS',
+                        (max_exponent - pausehist.SUB_BITS + 2)
+                        << pausehist.SUB_BITS)
+    monkeypatch.setattr(pausehist, 'MAX_VALUE', (1 << (max_exponent + 1)) - 1)
+    assert pausehist.MAX_VALUE == 2 ** 31 - 1
+    check_largest_bucket()
@@ -1,66 +1,101 @@
 import py
-import sys
 from rpython.tool.version import rpythonroot
 from rpython.rtyper.lltypesystem import lltype, rffi
 from rpython.translator.tool.cbuild import ExternalCompilationInfo
-from rpython.rtyper.tool import rffi_platform as platform
-from rpython.translator.platform import platform as trans_plaform
 
-ROOT = py.path.local(rpythonroot).join('rpython', 'rlib', 'rutf8')
+ROOT = py.path.local(rpythonroot).join('rpython', 'rlib', 'fastutf8')
 SRC = ROOT.join('src')
 
-if sys.platform.startswith('linux'):
-    _libs = ['dl']
-else:
-    _libs = []
+# The SSE4.1 and AVX2 kernels carry their own target attributes (see
+# utf8.h), so all files are compiled with the default flags and the
+# best kernel is chosen at runtime, with CPUID.  On non-x86 builds only
+# the scalar kernel is compiled in.
+eci = ExternalCompilationInfo(
+    include_dirs = [SRC],
+    includes = ['utf8.h'],
+    separate_module_files = [SRC.join('utf8.c'),
+                             SRC.join('utf8-sse4.c'),
+                             SRC.join('utf8-avx.c'),
+                             SRC.join('transcode.c')],
+    )
 
+# ISET_* values returned by instruction_set()
+ISET_SSE4 = 0x1
+ISET_AVX = 0x2
+ISET_AVX2 = 0x4
 
-IDXTAB = lltype.ForwardReference()
-IDXTAB.become(rffi.CStruct("fu8_idxtab",
-                           ('character_step', rffi.INT),
-                           ('byte_positions', rffi.SIZE_TP),
-                           ('bytepos_table_length', rffi.SIZE_T)))
-IDXTABP = lltype.Ptr(IDXTAB)
+count_utf8_codepoints = rffi.llexternal("fu8_count_utf8_codepoints",
+                                        [rffi.CCHARP, rffi.SIZE_T],
+                                        rffi.SSIZE_T, compilation_info=eci,
+                                        releasegil=False, sandboxsafe=True,
+                                        _nowrapper=True)
 
-def setup():
-    compile_extra = ['-DRPYTHON_LL2CTYPES', '-DALLOW_SURROGATES=0', '-fPIC']
-    eci_kwds = dict(
-        include_dirs = [SRC],
-        includes = ['utf8.h'],
-        libraries = _libs,
-        compile_extra = compile_extra)
-    # compile the SSE4.1 and AVX version
-    compile_extra.append('-msse4.1')
-    ofile_eci = ExternalCompilationInfo(**eci_kwds)
-    sse4_o, = trans_plaform._compile_o_files([SRC.join('utf8-sse4.c')], ofile_eci)
-    compile_extra.pop()
-    compile_extra.append('-mavx2')
-    ofile_eci = ExternalCompilationInfo(**eci_kwds)
-    avx_o, = trans_plaform._compile_o_files([SRC.join('utf8-avx.c')], ofile_eci)
-    del ofile_eci
+count_utf8_codepoints_seq = rffi.llexternal("fu8_count_utf8_codepoints_seq",
+                                        [rffi.CCHARP, rffi.SIZE_T],
+                                        rffi.SSIZE_T, compilation_info=eci,
+                                        releasegil=False, sandboxsafe=True,
+                                        _nowrapper=True)
 
-    eci_kwds['separate_module_files'] = [SRC.join('utf8.c')]
-    eci_kwds['link_files'] = [sse4_o.strpath, avx_o.strpath]
-    eci = ExternalCompilationInfo(**eci_kwds)
-    platform.verify_eci(eci)
-    count_utf8_codepoints = rffi.llexternal("fu8_count_utf8_codepoints",
-                                  [rffi.CCHARP, rffi.SSIZE_T],
-                                  rffi.SSIZE_T, compilation_info=eci,
-                                  _nowrapper=True)
-    index2byteposition = rffi.llexternal("fu8_idx2bytepos",
-                                  [rffi.SIZE_T, rffi.CCHARP, rffi.SIZE_T, IDXTABP],
-                                  rffi.SSIZE_T, compilation_info=eci,
+instruction_set = rffi.llexternal("fu8_instruction_set", [], rffi.INT,
+                                  compilation_info=eci,
+                                  releasegil=False, sandboxsafe=True,
                                   _nowrapper=True)
 
-    return CInterface(locals())
+ascii_prefix = rffi.llexternal("fu8_ascii_prefix",
+                               [rffi.CCHARP, rffi.SIZE_T],
+                               rffi.SSIZE_T, compilation_info=eci,
+                               releasegil=False, sandboxsafe=True,
+                               _nowrapper=True)
+
+ascii_prefix_seq = rffi.llexternal("fu8_ascii_prefix_seq",
+                                   [rffi.CCHARP, rffi.SIZE_T],
+                                   rffi.SSIZE_T, compilation_info=eci,
+                                   releasegil=False, sandboxsafe=True,
+                                   _nowrapper=True)
 
+def _transcoder(name, byteorder):
+    """Make a function (p, length, dst[, big_endian]) that converts the
+    'length' bytes at 'p' into 'dst' with the C function 'name'.  It
+    returns the number of bytes written, or -1 if the data needs an error
+    handler or has a surrogate.
+    """
+    argtypes = [rffi.CCHARP, rffi.SIZE_T, rffi.CCHARP]
+    if byteorder:
+        argtypes.append(rffi.INT)
+    kernel = rffi.llexternal(name, argtypes, rffi.SSIZE_T,
+                             compilation_info=eci,
+                             releasegil=False, sandboxsafe=True,
+                             _nowrapper=True)
+    if byteorder:
+        def transcode(p, length, dst, big_endian):
+            res = kernel(p, rffi.cast(rffi.SIZE_T, length), dst,
+                         rffi.cast(rffi.INT, big_endian))
+            return rffi.cast(lltype.Signed, res)
+    else:
+        def transcode(p, length, dst):
+            res = kernel(p, rffi.cast(rffi.SIZE_T, length), dst)
+            return rffi.cast(lltype.Signed, res)
+    transcode.__name__ = name[len('fu8_'):]
+    return transcode
 
-class CInterface(object):
-    def __init__(self, namespace):
-        for k, v in namespace.iteritems():
-            setattr(self, k, v)
+latin1_to_utf8 = _transcoder("fu8_latin1_to_utf8", False)
+utf8_to_latin1 = _transcoder("fu8_utf8_to_latin1", False)
+utf16_to_utf8 = _transcoder("fu8_utf16_to_utf8", True)
+utf8_to_utf16 = _transcoder("fu8_utf8_to_utf16", True)
+utf32_to_utf8 = _transcoder("fu8_utf32_to_utf8", True)
+utf8_to_utf32 = _transcoder("fu8_utf8_to_utf32", True)
 
-    def _freeze_(self):
-        return True
 
+def count_utf8_codepoints_in_buffer(p, length):
+    """Count the codepoints in the 'length' bytes at 'p', using the best
+    kernel for this CPU.  Returns -1 if the bytes are not valid utf-8, or
+    if they contain a surrogate.
+    """
+    res = count_utf8_codepoints(p, rffi.cast(rffi.SIZE_T, length))
+    return rffi.cast(lltype.Signed, res)
 
+def ascii_prefix_in_buffer(p, length):
+    """Return the number of ASCII bytes at the start of the 'length' bytes
+    at 'p'."""
+    res = ascii_prefix(p, rffi.cast(rffi.SIZE_T, length))
+    return rffi.cast(lltype.Signed, res)
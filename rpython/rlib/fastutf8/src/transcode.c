@@ -0,0 +1,476 @@
+#include "utf8.h"
+
+#include <string.h>
+#ifdef FU8_X86_DISPATCH
+#include <immintrin.h>
+#endif
+
+/* Transcoders between utf-8 and latin-1, utf-16 and utf-32.
+ *
+ * They all handle runs of ASCII characters a block at a time: 8 bytes
+ * per step in portable C, 16 bytes with SSE2 (which every x86-64 has)
+ * and 32 bytes with AVX2, selected at runtime like the counting kernels
+ * in utf8.c.  The other characters are converted one by one.
+ *
+ * None of them handles errors: they return -1 as soon as they find
+ * something that needs an error handler (or a surrogate), and the
+ * caller must then use its general implementation instead.  The utf-8
+ * they read is assumed to be valid, but they never read beyond 'len'.
+ */
+
+static size_t ascii_run_seq(const uint8_t * s, size_t len)
+{
+    size_t i = 0;
+    while (i + 8 <= len) {
+        uint64_t word;
+        memcpy(&word, s + i, 8);
+        if (word & 0x8080808080808080ULL) {
+            break;
+        }
+        i += 8;
+    }
+    while (i < len && s[i] < 0x80) {
+        i++;
+    }
+    return i;
+}
+
+#ifdef FU8_X86_DISPATCH
+static size_t ascii_run_sse2(const uint8_t * s, size_t len)
+{
+    size_t i = 0;
+    while (i + 16 <= len) {
+        __m128i chunk = _mm_loadu_si128((const __m128i *)(s + i));
+        int mask = _mm_movemask_epi8(chunk);
+        if (mask != 0) {
+            return i + __builtin_ctz(mask);
+        }
+        i += 16;
+    }
+    return i + ascii_run_seq(s + i, len - i);
+}
+
+FU8_TARGET("avx2")
+static size_t ascii_run_avx2(const uint8_t * s, size_t len)
+{
+    size_t i = 0;
+    while (i + 32 <= len) {
+        __m256i chunk = _mm256_loadu_si256((const __m256i *)(s + i));
+        unsigned int mask = (unsigned int)_mm256_movemask_epi8(chunk);
+        if (mask != 0) {
+            return i + __builtin_ctz(mask);
+        }
+        i += 32;
+    }
+    return i + ascii_run_sse2(s + i, len - i);
+}
+#endif
+
+typedef size_t (*ascii_run_fn)(const uint8_t *, size_t);
+
+static size_t ascii_run_resolve(const uint8_t * s, size_t len);
+
+// selected on the first call, see _fu8_count_resolve() in utf8.c
+static ascii_run_fn ascii_run = ascii_run_resolve;
+
+static size_t ascii_run_resolve(const uint8_t * s, size_t len)
+{
+    ascii_run_fn impl = ascii_run_seq;
+#ifdef FU8_X86_DISPATCH
+    impl = ascii_run_sse2;
+    if ((fu8_instruction_set() & FU8_ISET_AVX2) != 0) {
+        impl = ascii_run_avx2;
+    }
+#endif
+    ascii_run = impl;
+    return impl(s, len);
+}
+
+ssize_t fu8_ascii_prefix(const char * s, size_t len)
+{
+    return ascii_run((const uint8_t *)s, len);
+}
+
+ssize_t fu8_ascii_prefix_seq(const char * s, size_t len)
+{
+    return ascii_run_seq((const uint8_t *)s, len);
+}
+
+/* Decodes one utf-8 sequence of at most 3 bytes, or returns -1 for a
+ * 4-byte sequence, for a truncated sequence and for a surrogate.
+ */
+static inline long decode_bmp(const uint8_t * s, size_t len, size_t * pos)
+{
+    size_t i = *pos;
+    uint8_t c = s[i];
+    long ch;
+    if (c < 0xe0) {
+        if (i + 2 > len) {
+            return -1;
+        }
+        ch = ((c & 0x1f) << 6) | (s[i + 1] & 0x3f);
+        *pos = i + 2;
+        return ch;
+    }
+    if (c >= 0xf0 || i + 3 > len) {
+        return -1;
+    }
+    ch = ((c & 0x0f) << 12) | ((s[i + 1] & 0x3f) << 6) | (s[i + 2] & 0x3f);
+    if (ch >= 0xd800 && ch < 0xe000) {
+        return -1;
+    }
+    *pos = i + 3;
+    return ch;
+}
+
+static inline uint8_t * encode_utf8(uint8_t * d, unsigned long ch)
+{
+    if (ch < 0x80) {
+        *d++ = (uint8_t)ch;
+    } else if (ch < 0x800) {
+        *d++ = (uint8_t)(0xc0 | (ch >> 6));
+        *d++ = (uint8_t)(0x80 | (ch & 0x3f));
+    } else if (ch < 0x10000) {
+        *d++ = (uint8_t)(0xe0 | (ch >> 12));
+        *d++ = (uint8_t)(0x80 | ((ch >> 6) & 0x3f));
+        *d++ = (uint8_t)(0x80 | (ch & 0x3f));
+    } else {
+        *d++ = (uint8_t)(0xf0 | (ch >> 18));
+        *d++ = (uint8_t)(0x80 | ((ch >> 12) & 0x3f));
+        *d++ = (uint8_t)(0x80 | ((ch >> 6) & 0x3f));
+        *d++ = (uint8_t)(0x80 | (ch & 0x3f));
+    }
+    return d;
+}
+
+/**
+ * latin-1 -> utf-8.  'dst' must have room for 2 * len bytes.  Returns the
+ * number of bytes written.
+ */
+ssize_t fu8_latin1_to_utf8(const char * src, size_t len, char * dst)
+{
+    const uint8_t * s = (const uint8_t *)src;
+    uint8_t * d = (uint8_t *)dst;
+    size_t i = 0;
+    while (i < len) {
+        size_t n = ascii_run(s + i, len - i);
+        memcpy(d, s + i, n);
+        d += n;
+        i += n;
+        while (i < len && s[i] >= 0x80) {
+            d[0] = (uint8_t)(0xc0 | (s[i] >> 6));
+            d[1] = (uint8_t)(0x80 | (s[i] & 0x3f));
+            d += 2;
+            i++;
+        }
+    }
+    return d - (uint8_t *)dst;
+}
+
+/**
+ * utf-8 -> latin-1.  'dst' must have room for len bytes.  Returns the
+ * number of bytes written, or -1 if there is a character above U+00FF.
+ */
+ssize_t fu8_utf8_to_latin1(const char * src, size_t len, char * dst)
+{
+    const uint8_t * s = (const uint8_t *)src;
+    uint8_t * d = (uint8_t *)dst;
+    size_t i = 0;
+    while (i < len) {
+        size_t n = ascii_run(s + i, len - i);
+        memcpy(d, s + i, n);
+        d += n;
+        i += n;
+        while (i < len && s[i] >= 0x80) {
+            if ((s[i] & 0xfe) != 0xc2 || i + 2 > len) {
+                return -1;
+            }
+            *d++ = (uint8_t)(((s[i] & 0x03) << 6) | (s[i + 1] & 0x3f));
+            i += 2;
+        }
+    }
+    return d - (uint8_t *)dst;
+}
+
+#define LOAD16(p, be) ((be) ? (((p)[0] << 8) | (p)[1]) \
+                            : (((p)[1] << 8) | (p)[0]))
+
+static inline uint8_t * store16(uint8_t * d, unsigned int unit, int be)
+{
+    if (be) {
+        d[0] = (uint8_t)(unit >> 8);
+        d[1] = (uint8_t)unit;
+    } else {
+        d[0] = (uint8_t)unit;
+        d[1] = (uint8_t)(unit >> 8);
+    }
+    return d + 2;
+}
+
+/**
+ * utf-16 -> utf-8.  'len' must be even, and 'dst' must have room for
+ * 3 * len / 2 bytes.  Returns the number of bytes written, or -1 if
+ * there is a lone surrogate (including a high surrogate at the end).
+ */
+ssize_t fu8_utf16_to_utf8(const char * src, size_t len, char * dst,
+                          int big_endian)
+{
+    const uint8_t * s = (const uint8_t *)src;
+    uint8_t * d = (uint8_t *)dst;
+    size_t i = 0;
+#ifdef FU8_X86_DISPATCH
+    // in a 16-bit lane loaded from big-endian data, the character is in
+    // the high byte
+    const __m128i nonascii = _mm_set1_epi16(big_endian ? (short)0x80ff
+                                                       : (short)0xff80);
+    const __m128i zero = _mm_setzero_si128();
+#endif
+    while (i < len) {
+#ifdef FU8_X86_DISPATCH
+        // 8 ASCII characters at a time
+        while (i + 16 <= len) {
+            __m128i chunk = _mm_loadu_si128((const __m128i *)(s + i));
+            __m128i high = _mm_and_si128(chunk, nonascii);
+            if (_mm_movemask_epi8(_mm_cmpeq_epi16(high, zero)) != 0xffff) {
+                break;
+            }
+            if (big_endian) {
+                chunk = _mm_srli_epi16(chunk, 8);
+            }
+            _mm_storel_epi64((__m128i *)d, _mm_packus_epi16(chunk, chunk));
+            d += 8;
+            i += 16;
+        }
+        if (i >= len) {
+            break;
+        }
+#endif
+        unsigned long ch = LOAD16(s + i, big_endian);
+        i += 2;
+        if (ch >= 0xd800 && ch < 0xe000) {
+            unsigned long ch2;
+            if (ch >= 0xdc00 || i + 2 > len) {
+                return -1;
+            }
+            ch2 = LOAD16(s + i, big_endian);
+            if (ch2 < 0xdc00 || ch2 >= 0xe000) {
+                return -1;
+            }
+            i += 2;
+            ch = (((ch & 0x3ff) << 10) | (ch2 & 0x3ff)) + 0x10000;
+        }
+        d = encode_utf8(d, ch);
+    }
+    return d - (uint8_t *)dst;
+}
+
+/**
+ * utf-8 -> utf-16.  'dst' must have room for 2 * len bytes.  Returns the
+ * number of bytes written, or -1 if there is a surrogate.
+ */
+ssize_t fu8_utf8_to_utf16(const char * src, size_t len, char * dst,
+                          int big_endian)
+{
+    const uint8_t * s = (const uint8_t *)src;
+    uint8_t * d = (uint8_t *)dst;
+    size_t i = 0;
+#ifdef FU8_X86_DISPATCH
+    const __m128i zero = _mm_setzero_si128();
+#endif
+    while (i < len) {
+        long ch;
+#ifdef FU8_X86_DISPATCH
+        // 16 ASCII characters at a time
+        while (i + 16 <= len) {
+            __m128i chunk = _mm_loadu_si128((const __m128i *)(s + i));
+            if (_mm_movemask_epi8(chunk) != 0) {
+                break;
+            }
+            if (big_endian) {
+                _mm_storeu_si128((__m128i *)d, _mm_unpacklo_epi8(zero, chunk));
+                _mm_storeu_si128((__m128i *)(d + 16),
+                                 _mm_unpackhi_epi8(zero, chunk));
+            } else {
+                _mm_storeu_si128((__m128i *)d, _mm_unpacklo_epi8(chunk, zero));
+                _mm_storeu_si128((__m128i *)(d + 16),
+                                 _mm_unpackhi_epi8(chunk, zero));
+            }
+            d += 32;
+            i += 16;
+        }
+        if (i >= len) {
+            break;
+        }
+#endif
+        if (s[i] < 0x80) {
+            d = store16(d, s[i], big_endian);
+            i++;
+            continue;
+        }
+        if (s[i] < 0xf0) {
+            ch = decode_bmp(s, len, &i);
+            if (ch < 0) {
+                return -1;
+            }
+            d = store16(d, (unsigned int)ch, big_endian);
+            continue;
+        }
+        if (i + 4 > len) {
+            return -1;
+        }
+        ch = ((s[i] & 0x07) << 18) | ((s[i + 1] & 0x3f) << 12) |
+             ((s[i + 2] & 0x3f) << 6) | (s[i + 3] & 0x3f);
+        i += 4;
+        ch -= 0x10000;
+        d = store16(d, 0xd800 | (unsigned int)(ch >> 10), big_endian);
+        d = store16(d, 0xdc00 | (unsigned int)(ch & 0x3ff), big_endian);
+    }
+    return d - (uint8_t *)dst;
+}
+
+#define LOAD32(p, be) ((be) ? (((unsigned long)(p)[0] << 24) |          \
+                               ((unsigned long)(p)[1] << 16) |          \
+                               ((unsigned long)(p)[2] << 8) | (p)[3])   \
+                            : (((unsigned long)(p)[3] << 24) |          \
+                               ((unsigned long)(p)[2] << 16) |          \
+                               ((unsigned long)(p)[1] << 8) | (p)[0]))
+
+static inline uint8_t * store32(uint8_t * d, unsigned long ch, int be)
+{
+    if (be) {
+        d[0] = 0;
+        d[1] = (uint8_t)(ch >> 16);
+        d[2] = (uint8_t)(ch >> 8);
+        d[3] = (uint8_t)ch;
+    } else {
+        d[0] = (uint8_t)ch;
+        d[1] = (uint8_t)(ch >> 8);
+        d[2] = (uint8_t)(ch >> 16);
+        d[3] = 0;
+    }
+    return d + 4;
+}
+
+/**
+ * utf-32 -> utf-8.  'len' must be a multiple of 4, and 'dst' must have
+ * room for len bytes.  Returns the number of bytes written, or -1 if
+ * there is a surrogate or a value above U+10FFFF.
+ */
+ssize_t fu8_utf32_to_utf8(const char * src, size_t len, char * dst,
+                          int big_endian)
+{
+    const uint8_t * s = (const uint8_t *)src;
+    uint8_t * d = (uint8_t *)dst;
+    size_t i = 0;
+#ifdef FU8_X86_DISPATCH
+    const __m128i nonascii = _mm_set1_epi32(big_endian ? (int)0x80ffffff
+                                                       : (int)0xffffff80);
+    const __m128i zero = _mm_setzero_si128();
+#endif
+    while (i < len) {
+#ifdef FU8_X86_DISPATCH
+        // 4 ASCII characters at a time
+        while (i + 16 <= len) {
+            __m128i chunk = _mm_loadu_si128((const __m128i *)(s + i));
+            __m128i high = _mm_and_si128(chunk, nonascii);
+            if (_mm_movemask_epi8(_mm_cmpeq_epi32(high, zero)) != 0xffff) {
+                break;
+            }
+            if (big_endian) {
+                chunk = _mm_srli_epi32(chunk, 24);
+            }
+            chunk = _mm_packs_epi32(chunk, chunk);
+            chunk = _mm_packus_epi16(chunk, chunk);
+            int32_t four = _mm_cvtsi128_si32(chunk);
+            memcpy(d, &four, 4);
+            d += 4;
+            i += 16;
+        }
+        if (i >= len) {
+            break;
+        }
+#endif
+        unsigned long ch = LOAD32(s + i, big_endian);
+        if ((ch >= 0xd800 && ch < 0xe000) || ch >= 0x110000) {
+            return -1;
+        }
+        i += 4;
+        d = encode_utf8(d, ch);
+    }
+    return d - (uint8_t *)dst;
+}
+
+/**
+ * utf-8 -> utf-32.  'dst' must have room for 4 * len bytes.  Returns the
+ * number of bytes written, or -1 if there is a surrogate.
+ */
+ssize_t fu8_utf8_to_utf32(const char * src, size_t len, char * dst,
+                          int big_endian)
+{
+    const uint8_t * s = (const uint8_t *)src;
+    uint8_t * d = (uint8_t *)dst;
+    size_t i = 0;
+#ifdef FU8_X86_DISPATCH
+    const __m128i zero = _mm_setzero_si128();
+#endif
+    while (i < len) {
+        long ch;
+#ifdef FU8_X86_DISPATCH
+        // 16 ASCII characters at a time
+        while (i + 16 <= len) {
+            __m128i chunk = _mm_loadu_si128((const __m128i *)(s + i));
+            if (_mm_movemask_epi8(chunk) != 0) {
+                break;
+            }
+            __m128i lo, hi;
+            if (big_endian) {
+                lo = _mm_unpacklo_epi8(zero, chunk);
+                hi = _mm_unpackhi_epi8(zero, chunk);
+                _mm_storeu_si128((__m128i *)d, _mm_unpacklo_epi16(zero, lo));
+                _mm_storeu_si128((__m128i *)(d + 16),
+                                 _mm_unpackhi_epi16(zero, lo));
+                _mm_storeu_si128((__m128i *)(d + 32),
+                                 _mm_unpacklo_epi16(zero, hi));
+                _mm_storeu_si128((__m128i *)(d + 48),
+                                 _mm_unpackhi_epi16(zero, hi));
+            } else {
+                lo = _mm_unpacklo_epi8(chunk, zero);
+                hi = _mm_unpackhi_epi8(chunk, zero);
+                _mm_storeu_si128((__m128i *)d, _mm_unpacklo_epi16(lo, zero));
+                _mm_storeu_si128((__m128i *)(d + 16),
+                                 _mm_unpackhi_epi16(lo, zero));
+                _mm_storeu_si128((__m128i *)(d + 32),
+                                 _mm_unpacklo_epi16(hi, zero));
+                _mm_storeu_si128((__m128i *)(d + 48),
+                                 _mm_unpackhi_epi16(hi, zero));
+            }
+            d += 64;
+            i += 16;
+        }
+        if (i >= len) {
+            break;
+        }
+#endif
+        if (s[i] < 0x80) {
+            d = store32(d, s[i], big_endian);
+            i++;
+            continue;
+        }
+        if (s[i] < 0xf0) {
+            ch = decode_bmp(s, len, &i);
+            if (ch < 0) {
+                return -1;
+            }
+            d = store32(d, (unsigned long)ch, big_endian);
+            continue;
+        }
+        if (i + 4 > len) {
+            return -1;
+        }
+        ch = ((s[i] & 0x07) << 18) | ((s[i + 1] & 0x3f) << 12) |
+             ((s[i + 2] & 0x3f) << 6) | (s[i + 3] & 0x3f);
+        i += 4;
+        d = store32(d, (unsigned long)ch, big_endian);
+    }
+    return d - (uint8_t *)dst;
+}
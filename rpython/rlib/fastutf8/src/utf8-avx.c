@@ -3,10 +3,18 @@
 #include <stddef.h>
 #include <stdio.h>
 #include <stdint.h>
+#ifdef FU8_X86_DISPATCH
+
 #include <immintrin.h>
 
 #define BIT(B,P) ((B >> (P-1)) & 0x1)
 
+// _mm256_slli_si256 shifts each 128 bit lane on its own; a utf8 sequence
+// can span the two lanes, thus shift the whole register by N bytes (N < 16)
+#define _fu8_mm256_slli_bytes(A, N) \
+    _mm256_alignr_epi8((A), _mm256_permute2x128_si256((A), (A), 0x08), 16-(N))
+
+FU8_TARGET("avx2")
 void _print_mmy(const char * msg, __m256i chunk)
 {
     printf("%s:", msg);
@@ -61,6 +69,7 @@ void _print_mmy(const char * msg, __m256i chunk)
     printf("\n");
 }
 
+FU8_TARGET("avx2")
 ssize_t fu8_count_utf8_codepoints_avx(const char * utf8, size_t len)
 {
     const uint8_t * encoded = (const uint8_t*)utf8;
@@ -110,13 +119,13 @@ ssize_t fu8_count_utf8_codepoints_avx(const char * utf8, size_t len)
         }
 
         __m256i state2 = _mm256_andnot_si256(threebytemarker, twobytemarker);
-        __m256i contbytes = _mm256_slli_si256(_mm256_blendv_epi8(state2, _mm256_set1_epi8(0x1), twobytemarker), 1);
+        __m256i contbytes = _fu8_mm256_slli_bytes(_mm256_blendv_epi8(state2, _mm256_set1_epi8(0x1), twobytemarker), 1);
 
         if (_mm256_movemask_epi8(threebytemarker) != 0) {
             // contains at least one 3 byte marker
             __m256i istate3 = _mm256_andnot_si256(fourbytemarker, threebytemarker);
-            __m256i state3 = _mm256_slli_si256(_mm256_blendv_epi8(zero, _mm256_set1_epi8(0x3), istate3), 1);
-            state3 = _mm256_or_si256(state3, _mm256_slli_si256(state3, 1));
+            __m256i state3 = _fu8_mm256_slli_bytes(_mm256_blendv_epi8(zero, _mm256_set1_epi8(0x3), istate3), 1);
+            state3 = _mm256_or_si256(state3, _fu8_mm256_slli_bytes(state3, 1));
 
             contbytes = _mm256_or_si256(contbytes, state3);
 
@@ -124,7 +133,7 @@ ssize_t fu8_count_utf8_codepoints_avx(const char * utf8, size_t len)
             __m256i equal_e0 = _mm256_cmpeq_epi8(_mm256_blendv_epi8(zero, chunk_signed, istate3),
                                               _mm256_set1_epi8(0xe0-0x80));
             if (_mm256_movemask_epi8(equal_e0) != 0) {
-                __m256i mask = _mm256_blendv_epi8(_mm256_set1_epi8(0x7f), chunk_signed, _mm256_slli_si256(equal_e0, 1));
+                __m256i mask = _mm256_blendv_epi8(_mm256_set1_epi8(0x7f), chunk_signed, _fu8_mm256_slli_bytes(equal_e0, 1));
                 __m256i check_surrogate = _mm256_cmpgt_epi8(_mm256_set1_epi8(0xa0-0x80), mask); // lt
                 if (_mm256_movemask_epi8(check_surrogate) != 0) {
                     // invalid surrograte character!!!
@@ -137,7 +146,7 @@ ssize_t fu8_count_utf8_codepoints_avx(const char * utf8, size_t len)
                 __m256i equal_ed = _mm256_cmpeq_epi8(_mm256_blendv_epi8(zero, chunk_signed, istate3),
                                                   _mm256_set1_epi8(0xed-0x80));
                 if (_mm256_movemask_epi8(equal_ed) != 0) {
-                    __m256i mask = _mm256_blendv_epi8(_mm256_set1_epi8(0x80), chunk_signed, _mm256_slli_si256(equal_ed, 1));
+                    __m256i mask = _mm256_blendv_epi8(_mm256_set1_epi8(0x80), chunk_signed, _fu8_mm256_slli_bytes(equal_ed, 1));
                     __m256i check_surrogate = _mm256_cmpgt_epi8(mask, _mm256_set1_epi8(0xa0-1-0x80));
                     if (_mm256_movemask_epi8(check_surrogate) != 0) {
                         // invalid surrograte character!!!
@@ -149,9 +158,9 @@ ssize_t fu8_count_utf8_codepoints_avx(const char * utf8, size_t len)
 
         if (_mm256_movemask_epi8(fourbytemarker) != 0) {
             // contain a 4 byte marker
-            __m256i istate4 = _mm256_slli_si256(_mm256_blendv_epi8(zero, _mm256_set1_epi8(0x7), fourbytemarker), 1);
-            __m256i state4 =_mm256_or_si256(istate4, _mm256_slli_si256(istate4, 1));
-            state4 =_mm256_or_si256(state4, _mm256_slli_si256(istate4, 2));
+            __m256i istate4 = _fu8_mm256_slli_bytes(_mm256_blendv_epi8(zero, _mm256_set1_epi8(0x7), fourbytemarker), 1);
+            __m256i state4 =_mm256_or_si256(istate4, _fu8_mm256_slli_bytes(istate4, 1));
+            state4 =_mm256_or_si256(state4, _fu8_mm256_slli_bytes(istate4, 2));
 
             contbytes = _mm256_or_si256(contbytes, state4);
 
@@ -159,7 +168,7 @@ ssize_t fu8_count_utf8_codepoints_avx(const char * utf8, size_t len)
             __m256i equal_f0 = _mm256_cmpeq_epi8(_mm256_blendv_epi8(zero, chunk_signed, fourbytemarker),
                                               _mm256_set1_epi8(0xf0-0x80));
             if (_mm256_movemask_epi8(equal_f0) != 0) {
-                __m256i mask = _mm256_blendv_epi8(_mm256_set1_epi8(0x7f), chunk_signed, _mm256_slli_si256(equal_f0, 1));
+                __m256i mask = _mm256_blendv_epi8(_mm256_set1_epi8(0x7f), chunk_signed, _fu8_mm256_slli_bytes(equal_f0, 1));
                 __m256i check_surrogate = _mm256_cmpgt_epi8(_mm256_set1_epi8(0x90-0x80), mask);
                 if (_mm256_movemask_epi8(check_surrogate) != 0) {
                     return -1;
@@ -169,7 +178,7 @@ ssize_t fu8_count_utf8_codepoints_avx(const char * utf8, size_t len)
             __m256i equal_f4 = _mm256_cmpeq_epi8(_mm256_blendv_epi8(zero, chunk_signed, fourbytemarker),
                                               _mm256_set1_epi8(0xf4-0x80));
             if (_mm256_movemask_epi8(equal_f4) != 0) {
-                __m256i mask = _mm256_blendv_epi8(_mm256_set1_epi8(0x80), chunk_signed, _mm256_slli_si256(equal_f4, 1));
+                __m256i mask = _mm256_blendv_epi8(_mm256_set1_epi8(0x80), chunk_signed, _fu8_mm256_slli_bytes(equal_f4, 1));
                 __m256i check_surrogate = _mm256_cmpgt_epi8(mask, _mm256_set1_epi8(0x90-1-0x80));
                 if (_mm256_movemask_epi8(check_surrogate) != 0) {
                     return -1;
@@ -245,7 +254,7 @@ ssize_t fu8_count_utf8_codepoints_avx(const char * utf8, size_t len)
         return num_codepoints;
     }
 
-    ssize_t result = fu8_count_utf8_codepoints_seq(encoded, len);
+    ssize_t result = fu8_count_utf8_codepoints_seq((const char *)encoded, len);
     if (result == -1) {
         return -1;
     }
@@ -253,3 +262,5 @@ ssize_t fu8_count_utf8_codepoints_avx(const char * utf8, size_t len)
     return num_codepoints + result;
     return -1;
 }
+
+#endif /* FU8_X86_DISPATCH */
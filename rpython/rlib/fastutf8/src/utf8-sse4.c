@@ -3,11 +3,14 @@
 #include <stddef.h>
 #include <stdio.h>
 #include <stdint.h>
+#ifdef FU8_X86_DISPATCH
+
 #include <xmmintrin.h>
 #include <smmintrin.h>
 
 #define BIT(B,P) ((B >> (P-1)) & 0x1)
 
+FU8_TARGET("sse4.1")
 void _print_mmx(const char * msg, __m128i chunk)
 {
     printf("%s:", msg);
@@ -40,6 +43,7 @@ void _print_mmx(const char * msg, __m128i chunk)
 }
 
 
+FU8_TARGET("sse4.1")
 ssize_t fu8_count_utf8_codepoints_sse4(const char * utf8, size_t len)
 {
     const uint8_t * encoded = (const uint8_t*)utf8;
@@ -223,7 +227,7 @@ ssize_t fu8_count_utf8_codepoints_sse4(const char * utf8, size_t len)
         return num_codepoints;
     }
 
-    ssize_t result = fu8_count_utf8_codepoints_seq(encoded, len);
+    ssize_t result = fu8_count_utf8_codepoints_seq((const char *)encoded, len);
     if (result == -1) {
         return -1;
     }
@@ -237,3 +241,5 @@ ssize_t fu8_idx2bytepos_sse4(size_t index,
 {
     return 0;
 }
+
+#endif /* FU8_X86_DISPATCH */
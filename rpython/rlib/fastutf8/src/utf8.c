@@ -6,54 +6,64 @@
 #include "utf8-scalar.c" // copy code for scalar operations
 
 
-int instruction_set = -1;
-#define ISET_SSE4 0x1
-#define ISET_AVX 0x2
-#define ISET_AVX2 0x4
+static int instruction_set = -1;
 
-void detect_instructionset(void)
+static void detect_instructionset(void)
 {
-    long eax;
-    long ebx;
-    long ecx;
-    long edx;
-    long op = 1;
-    asm ("cpuid"
-            : "=a" (eax),
-              "=b" (ebx),
-              "=c" (ecx),
-              "=d" (edx)
-            : "a" (op));
-
-    instruction_set = 0;
-    if (ecx & (1<<19)) { // sse4.1
-        instruction_set |= ISET_SSE4;
+    int iset = 0;
+#ifdef FU8_X86_DISPATCH
+    __builtin_cpu_init();
+    if (__builtin_cpu_supports("sse4.1")) {
+        iset |= FU8_ISET_SSE4;
     }
-    if(__builtin_cpu_supports("avx")) {
-        instruction_set |= ISET_AVX;
+    if (__builtin_cpu_supports("avx")) {
+        iset |= FU8_ISET_AVX;
     }
-    if(__builtin_cpu_supports("avx2")) {
-        instruction_set |= ISET_AVX2;
+    if (__builtin_cpu_supports("avx2")) {
+        iset |= FU8_ISET_AVX2;
     }
+#endif
+    instruction_set = iset;
 }
 
-ssize_t fu8_count_utf8_codepoints(const char * utf8, size_t len)
+int fu8_instruction_set(void)
 {
     if (instruction_set == -1) {
         detect_instructionset();
     }
+    return instruction_set;
+}
+
+typedef ssize_t (*fu8_count_fn)(const char *, size_t);
+
+static ssize_t _fu8_count_resolve(const char * utf8, size_t len);
 
-    if (len >= 32 && (instruction_set & ISET_AVX2) != 0) {
+// the kernel to use, selected on the first call.  The race between two
+// threads doing the first call at the same time is harmless: both store
+// the same value
+static fu8_count_fn _fu8_count_impl = _fu8_count_resolve;
+
+static ssize_t _fu8_count_resolve(const char * utf8, size_t len)
+{
+    int iset = fu8_instruction_set();
+    fu8_count_fn impl = fu8_count_utf8_codepoints_seq;
+#ifdef FU8_X86_DISPATCH
+    if ((iset & FU8_ISET_AVX2) != 0) {
         // to the MOON!
-        return fu8_count_utf8_codepoints_avx(utf8, len);
-    }
-    if (len >= 16 && (instruction_set == ISET_SSE4) != 0) {
+        impl = fu8_count_utf8_codepoints_avx;
+    } else if ((iset & FU8_ISET_SSE4) != 0) {
         // speed!!
-        return fu8_count_utf8_codepoints_sse4(utf8, len);
+        impl = fu8_count_utf8_codepoints_sse4;
     }
+#endif
+    // otherwise, oh no, just do it sequentially!
+    _fu8_count_impl = impl;
+    return impl(utf8, len);
+}
 
-    // oh no, just do it sequentially!
-    return fu8_count_utf8_codepoints_seq(utf8, len);
+ssize_t fu8_count_utf8_codepoints(const char * utf8, size_t len)
+{
+    return _fu8_count_impl(utf8, len);
 }
 
 typedef struct fu8_idxtab {
@@ -152,16 +162,6 @@ ssize_t _fu8_build_idxtab(size_t cpidx, size_t cpidx_off, size_t cplen,
 
 size_t _fu8_idxtab_lookup_bytepos_i(struct fu8_idxtab * tab, size_t cpidx);
 
-ssize_t _fu8_idx2bytepos(size_t index,
-                        const uint8_t * utf8, size_t bytelen, size_t cplen,
-                        struct fu8_idxtab ** tab)
-{
-
-    assert(index != 0 && "index must not be 0");
-    // note that itab STILL can be NULL
-
-}
-
 size_t _fu8_idxtab_lookup_bytepos_i(struct fu8_idxtab * tab, size_t cpidx)
 {
     if (cpidx == 0 || tab == NULL) {
@@ -1,21 +1,38 @@
 #pragma once
 
-#include <unistd.h>
 #include <stdint.h>
 #include <stddef.h>
+#ifdef _WIN32
+#include <basetsd.h>
+typedef SSIZE_T ssize_t;
+#else
+#include <unistd.h>
+#endif
 
-#ifdef RPYTHON_LL2CTYPES
-   /* only for testing: ll2ctypes sets RPY_EXTERN from the command-line */
 #ifndef RPY_EXTERN
 #  define RPY_EXTERN RPY_EXPORTED
 #endif
-
+#ifndef RPY_EXPORTED
 #ifdef _WIN32
 #  define RPY_EXPORTED __declspec(dllexport)
 #else
 #  define RPY_EXPORTED  extern __attribute__((visibility("default")))
 #endif
+#endif
 
+#ifndef ALLOW_SURROGATES
+#  define ALLOW_SURROGATES 0
+#endif
+
+/* The vectorized implementations are only compiled on x86-64 with a
+ * gcc-compatible compiler.  They do not need -msse4.1/-mavx2 on the
+ * command line: each kernel is tagged with FU8_TARGET, and the dispatcher
+ * in utf8.c only calls it if CPUID says the instructions are available.
+ * Everywhere else only the scalar implementation is used.
+ */
+#if defined(__GNUC__) && defined(__x86_64__)
+#  define FU8_X86_DISPATCH 1
+#  define FU8_TARGET(isa) __attribute__((target(isa)))
 #endif
 
 /**
@@ -27,13 +44,42 @@
  * found below.
  *
  * fu8_count_utf8_codepoints dispatches amongst several
- * implementations (e.g. seq, SSE4, AVX)
+ * implementations (e.g. seq, SSE4, AVX). The choice is made once, with
+ * CPUID, on the first call.  fu8_instruction_set() returns the bitmask
+ * of the instruction sets that were detected (see FU8_ISET_*).
  */
-// TODO rename (fu8 prefix)
 RPY_EXTERN ssize_t fu8_count_utf8_codepoints(const char * utf8, size_t len);
 RPY_EXTERN ssize_t fu8_count_utf8_codepoints_seq(const char * utf8, size_t len);
+#ifdef FU8_X86_DISPATCH
 RPY_EXTERN ssize_t fu8_count_utf8_codepoints_sse4(const char * utf8, size_t len);
 RPY_EXTERN ssize_t fu8_count_utf8_codepoints_avx(const char * utf8, size_t len);
+#endif
+
+#define FU8_ISET_SSE4 0x1
+#define FU8_ISET_AVX 0x2
+#define FU8_ISET_AVX2 0x4
+RPY_EXTERN int fu8_instruction_set(void);
+
+/**
+ * Transcoding between utf-8 and other encodings, see transcode.c.
+ * fu8_ascii_prefix() returns the length of the run of ASCII bytes at
+ * the start of the string.  The others return the number of bytes
+ * written to 'dst', or -1 if the string needs an error handler.
+ */
+RPY_EXTERN ssize_t fu8_ascii_prefix(const char * s, size_t len);
+RPY_EXTERN ssize_t fu8_ascii_prefix_seq(const char * s, size_t len);
+RPY_EXTERN ssize_t fu8_latin1_to_utf8(const char * src, size_t len,
+                                      char * dst);
+RPY_EXTERN ssize_t fu8_utf8_to_latin1(const char * src, size_t len,
+                                      char * dst);
+RPY_EXTERN ssize_t fu8_utf16_to_utf8(const char * src, size_t len,
+                                     char * dst, int big_endian);
+RPY_EXTERN ssize_t fu8_utf8_to_utf16(const char * src, size_t len,
+                                     char * dst, int big_endian);
+RPY_EXTERN ssize_t fu8_utf32_to_utf8(const char * src, size_t len,
+                                     char * dst, int big_endian);
+RPY_EXTERN ssize_t fu8_utf8_to_utf32(const char * src, size_t len,
+                                     char * dst, int big_endian);
 
 
 struct fu8_idxtab;
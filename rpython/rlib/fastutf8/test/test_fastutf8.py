@@ -0,0 +1,220 @@
+import pytest
+from hypothesis import given, strategies, example
+
+from rpython.rlib import rutf8
+from rpython.rlib.fastutf8 import capi
+from rpython.rtyper.lltypesystem import lltype, rffi
+
+
+def _count(func, s):
+    with rffi.scoped_str2charp(s) as p:
+        return rffi.cast(lltype.Signed, func(p, rffi.cast(rffi.SIZE_T, len(s))))
+
+def _expected(s):
+    try:
+        u = s.decode('utf-8')
+    except UnicodeDecodeError:
+        return -1
+    if rutf8.surrogate_in_utf8(s) >= 0:
+        return -1
+    return rutf8._check_utf8_slowpath(s, False, 0, len(s))
+
+def test_instruction_set():
+    iset = capi.instruction_set()
+    assert iset >= 0
+    assert iset & ~(capi.ISET_SSE4 | capi.ISET_AVX | capi.ISET_AVX2) == 0
+
+@pytest.mark.parametrize('s', [
+    '', 'a', 'a' * 15, 'a' * 16, 'a' * 31, 'a' * 32, 'a' * 100,
+    # a two-byte character split across 16 and 32 byte boundaries
+    'a' * 15 + '\xc3\xa5' + 'a' * 40,
+    'a' * 31 + '\xc3\xa5' + 'a' * 40,
+    # three and four-byte characters across the boundaries
+    'a' * 30 + '\xe2\x82\xac' * 10,
+    'a' * 29 + '\xf0\x9f\x98\x80' * 10,
+    '\xe2\x82\xac' * 11 + 'a' * 10,
+    # invalid
+    'a' * 40 + '\x80', 'a' * 40 + '\xc3', '\xc0\x80' * 20,
+    'a' * 20 + '\xed\xa0\x80' + 'a' * 20,          # surrogate
+    'a' * 20 + '\xf4\x90\x80\x80' + 'a' * 20,      # > 0x10ffff
+    'a' * 20 + '\xe0\x80\x80' + 'a' * 20,          # overlong
+    ])
+def test_count_examples(s):
+    assert _count(capi.count_utf8_codepoints, s) == _expected(s)
+    assert _count(capi.count_utf8_codepoints_seq, s) == _expected(s)
+
+@given(strategies.binary())
+def test_count_binary(s):
+    assert _count(capi.count_utf8_codepoints, s) == _expected(s)
+
+@given(strategies.text())
+def test_count_text(u):
+    s = u.encode('utf-8')
+    assert _count(capi.count_utf8_codepoints, s) == _expected(s)
+
+def _transcode(func, s, size, *args):
+    with rffi.scoped_str2charp(s) as p:
+        with lltype.scoped_alloc(rffi.CCHARP.TO, max(size, 1)) as dst:
+            res = func(p, len(s), dst, *args)
+            if res < 0:
+                return None
+            return rffi.charpsize2str(dst, res)
+
+@pytest.mark.parametrize('s', [
+    '', 'a' * 7, 'a' * 8, 'a' * 16, 'a' * 100, 'a' * 31 + '\x80',
+    'a' * 32 + '\xff' + 'a' * 40, '\x80' + 'a' * 40])
+def test_ascii_prefix(s):
+    expected = len(s) - len(s.lstrip(''.join(map(chr, range(128)))))
+    with rffi.scoped_str2charp(s) as p:
+        assert capi.ascii_prefix_in_buffer(p, len(s)) == expected
+        res = capi.ascii_prefix_seq(p, rffi.cast(rffi.SIZE_T, len(s)))
+        assert rffi.cast(lltype.Signed, res) == expected
+
+@given(strategies.binary())
+def test_latin1(s):
+    utf8 = s.decode('latin-1').encode('utf-8')
+    assert _transcode(capi.latin1_to_utf8, s, 2 * len(s)) == utf8
+    assert _transcode(capi.utf8_to_latin1, utf8, len(utf8)) == s
+
+@given(strategies.text(), strategies.booleans())
+def test_utf16(u, big_endian):
+    encoding = 'utf-16-be' if big_endian else 'utf-16-le'
+    utf8 = u.encode('utf-8')
+    data = u.encode(encoding)
+    assert _transcode(capi.utf8_to_utf16, utf8, 2 * len(utf8),
+                      big_endian) == data
+    assert _transcode(capi.utf16_to_utf8, data, len(data) // 2 * 3,
+                      big_endian) == utf8
+
+@given(strategies.text(), strategies.booleans())
+def test_utf32(u, big_endian):
+    encoding = 'utf-32-be' if big_endian else 'utf-32-le'
+    utf8 = u.encode('utf-8')
+    data = u.encode(encoding)
+    assert _transcode(capi.utf8_to_utf32, utf8, 4 * len(utf8),
+                      big_endian) == data
+    assert _transcode(capi.utf32_to_utf8, data, len(data),
+                      big_endian) == utf8
+
+def test_transcode_errors():
+    a = 'a' * 20
+    # characters above U+00FF
+    assert _transcode(capi.utf8_to_latin1, a + '\xe2\x82\xac', 30) is None
+    # lone surrogates
+    for data in [a + '\x00\xd8' + a, a + '\x00\xdc\x00\xd8',
+                 a + '\x00\xd8']:
+        assert _transcode(capi.utf16_to_utf8, data, 100, 0) is None
+    assert _transcode(capi.utf8_to_utf16, a + '\xed\xa0\x80', 100, 0) is None
+    assert _transcode(capi.utf8_to_utf32, a + '\xed\xa0\x80', 100, 0) is None
+    # out of range for utf-32
+    for data in [a * 2 + '\x00\xd8\x00\x00', a * 2 + '\x00\x00\x11\x00']:
+        assert _transcode(capi.utf32_to_utf8, data, 100, 0) is None
+
+
+class TestRutf8WithKernel(object):
+    def setup_method(self, meth):
+        rutf8._fastutf8_untranslated = True
+
+    def teardown_method(self, meth):
+        rutf8._fastutf8_untranslated = False
+
+    @given(strategies.binary(), strategies.booleans())
+    @example('a' * 20 + '\xed\xa0\x80' + 'a' * 20, True)
+    @example('a' * 20 + '\xed\xa0\x80' + 'a' * 20, False)
+    def test_check_utf8(self, s, allow_surrogates):
+        expected = rutf8._check_utf8_slowpath(s, allow_surrogates, 0, len(s))
+        assert rutf8._check_utf8(s, allow_surrogates, 0, -1) == expected
+
+    @given(strategies.binary(), strategies.text(), strategies.binary())
+    def test_check_utf8_slice(self, a, b, c):
+        start = len(a)
+        b_utf8 = b.encode('utf-8')
+        end = start + len(b_utf8)
+        assert rutf8.check_utf8(a + b_utf8 + c, True, start, end) == len(b)
+
+    @given(strategies.text(), strategies.integers(0, 1000))
+    def test_codepoints_in_utf8(self, u, start):
+        s = u.encode('utf-8')
+        start = min(start, len(s))
+        while start < len(s) and 0x80 <= ord(s[start]) < 0xc0:
+            start += 1
+        assert (rutf8.codepoints_in_utf8(s, start) ==
+                len(s[start:].decode('utf-8')))
+
+    @given(strategies.binary())
+    def test_first_non_ascii_char(self, s):
+        for i in range(len(s)):
+            if ord(s[i]) > 0x7F:
+                break
+        else:
+            i = -1
+        assert rutf8.first_non_ascii_char(s) == i
+
+    @given(strategies.binary())
+    def test_decode_latin_1(self, s):
+        assert rutf8.decode_latin_1(s) == s.decode('latin-1').encode('utf-8')
+
+    @given(strategies.text(), strategies.booleans())
+    def test_fast_codecs(self, u, big_endian):
+        utf8 = u.encode('utf-8')
+        if big_endian:
+            utf16, utf32 = u.encode('utf-16-be'), u.encode('utf-32-be')
+        else:
+            utf16, utf32 = u.encode('utf-16-le'), u.encode('utf-32-le')
+        if len(utf8) >= rutf8.FASTUTF8_MIN_LENGTH:
+            assert rutf8.encode_utf16_fast(utf8, big_endian) == utf16
+            assert rutf8.encode_utf32_fast(utf8, big_endian) == utf32
+        else:
+            assert rutf8.encode_utf16_fast(utf8, big_endian) is None
+        data = 'xx' + utf16
+        res = rutf8.decode_utf16_fast(data, 2, len(data), big_endian)
+        assert res == (utf8 if len(utf16) >= rutf8.FASTUTF8_MIN_LENGTH
+                       else None)
+        data = 'xxxx' + utf32
+        res = rutf8.decode_utf32_fast(data, 4, len(data), big_endian)
+        assert res == (utf8 if len(utf32) >= rutf8.FASTUTF8_MIN_LENGTH
+                       else None)
+
+    def test_surrogates(self):
+        s = 'x' * 30 + '\xed\xa0\x80' + 'y' * 30
+        assert rutf8.get_utf8_length(s) == 61
+        assert rutf8.codepoints_in_utf8(s) == 61
+        with pytest.raises(rutf8.CheckError) as e:
+            rutf8.check_utf8(s, False)
+        assert e.value.pos == 30
+
+
+def test_translated():
+    from rpython.translator.c.test.test_genc import compile
+
+    def f(n):
+        s = 'abc\xc3\xa5' * n
+        try:
+            rutf8.check_utf8(s + '\xff', False)
+        except rutf8.CheckError as e:
+            err = e.pos
+        else:
+            err = -1
+        return (rutf8.check_utf8(s, False) * 1000000 +
+                rutf8.codepoints_in_utf8(s, 3) * 1000 + err)
+
+    fc = compile(f, [int])
+    assert fc(10) == f(10) == 40 * 1000000 + 37 * 1000 + 50
+
+def test_transcode_translated():
+    from rpython.translator.c.test.test_genc import compile
+
+    def f(n):
+        s = 'abc\xc3\xa5' * n
+        utf16 = rutf8.encode_utf16_fast(s, True)
+        latin1 = rutf8.encode_latin_1_fast(s)
+        back = rutf8.decode_utf16_fast(utf16, 0, len(utf16), True)
+        res = len(utf16) * 1000000 + len(latin1) * 1000
+        if back == s and rutf8.decode_latin_1(latin1) == s:
+            res += 1
+        if rutf8.encode_latin_1_fast('\xe2\x82\xac' * n) is None:
+            res += 2
+        return res
+
+    fc = compile(f, [int])
+    assert fc(10) == 80 * 1000000 + 40 * 1000 + 3
@@ -553,6 +553,7 @@ PARAMETER_DOCS = {
     'trace_limit': 'number of recorded operations before we abort tracing with ABORT_TOO_LONG',
     'inlining': 'inline python functions or not (1/0)',
     'loop_longevity': 'a parameter controlling how long loops will be kept before being freed, an estimate',
+    'code_budget': 'size of the machine code in KB above which the coldest and largest loops are freed (0=no limit)',
     'retrace_limit': 'how many times we can try retracing before giving up',
     'max_retrace_guards': 'number of extra guards a retrace can cause',
     'max_unroll_loops': 'number of extra unrollings a loop can cause',
@@ -574,6 +575,7 @@ PARAMETERS = {'threshold': 1039, # just above 1024, prime
               'trace_limit': 6000,
               'inlining': 1,
               'loop_longevity': 1000,
+              'code_budget': 0,
               'retrace_limit': 0,
               'max_retrace_guards': 15,
               'max_unroll_loops': 0,
@@ -1324,10 +1326,12 @@ class Counters(object):
     OPT_VECTORIZE_TRY
     OPT_VECTORIZED
     ABORT_TOO_LONG
+    ABORT_SEGMENTED_TRACE
     ABORT_BRIDGE
     ABORT_BAD_LOOP
     ABORT_ESCAPE
     ABORT_FORCE_QUASIIMMUT
+    TRACE_SEGMENTS
     NVIRTUALS
     NVHOLES
     NVREUSED
@@ -1335,6 +1339,9 @@ class Counters(object):
     TOTAL_COMPILED_BRIDGES
     TOTAL_FREED_LOOPS
     TOTAL_FREED_BRIDGES
+    TOTAL_FREED_CODE
+    TOTAL_EVICTED_LOOPS
+    TOTAL_RECOMPILED_LOOPS
     """
 
     counter_names = []
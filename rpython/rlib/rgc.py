@@ -786,7 +786,12 @@ def cast_gcref_to_int(gcref):
 (TOTAL_MEMORY, TOTAL_ALLOCATED_MEMORY, TOTAL_MEMORY_PRESSURE,
  PEAK_MEMORY, PEAK_ALLOCATED_MEMORY, TOTAL_ARENA_MEMORY,
  TOTAL_RAWMALLOCED_MEMORY, PEAK_ARENA_MEMORY, PEAK_RAWMALLOCED_MEMORY,
- NURSERY_SIZE, TOTAL_GC_TIME) = range(11)
+ NURSERY_SIZE, TOTAL_GC_TIME,
+ # the pauses are in microseconds
+ MINOR_COLLECTIONS, MINOR_PAUSE_P50, MINOR_PAUSE_P99, MINOR_PAUSE_P999,
+ MINOR_PAUSE_MAX, COLLECT_STEPS, STEP_PAUSE_P50, STEP_PAUSE_P99,
+ STEP_PAUSE_P999, STEP_PAUSE_MAX, TOTAL_NURSERY_ALLOCATED,
+ TOTAL_NURSERY_PROMOTED, NURSERY_RESIZES) = range(24)
 
 @not_rpython
 def get_stats(stat_no):
@@ -4,6 +4,7 @@ import math
 
 from rpython.rlib.rarithmetic import intmask, ovfcheck
 from rpython.rlib.rarithmetic import r_uint, LONG_BIT
+from rpython.rlib.rstring import StringBuilder
 
 LOG2 = math.log(2)
 NBITS = int(math.log(sys.maxint) / LOG2) + 2
@@ -1508,3 +1509,63 @@ def _str_encode_utf_8(s):
         result.append(chr((0xc0 | (ch >> 6))))
         result.append(chr((0x80 | (ch & 0x3f))))
     return "".join(result)
+
+
+# ____________________________________________________________
+# Lazy strings: strings that are only built when they are needed.
+# Unlike the nodes above, they are used by the string objects of PyPy,
+# which keep either a flat string or a LazyString.
+
+class LazyString(object):
+    def length(self):
+        """The length of the string, without building it."""
+        raise NotImplementedError("base class")
+
+    def flatten(self):
+        """Build the string."""
+        raise NotImplementedError("base class")
+
+
+# a LazyConcat with at least LAZY_MIN_PIECES pieces is flattened when
+# appending to it if its pieces are on average smaller than
+# LAZY_MIN_PIECE_SIZE: this bounds the memory overhead of many small
+# pieces, and the cost of an append stays amortized constant.
+LAZY_MIN_PIECES = 16
+LAZY_MIN_PIECE_SIZE = 32
+
+
+class LazyConcat(LazyString):
+    """The concatenation of pieces[:count].  The list 'pieces' is only
+    ever appended to, so that appending to the last LazyConcat of a list
+    can reuse the list: a sequence of appends takes linear time, and the
+    LazyConcats built in-between stay valid."""
+    _immutable_fields_ = ['pieces', 'count', 'size']
+
+    def __init__(self, pieces, count, size):
+        self.pieces = pieces
+        self.count = count
+        self.size = size
+
+    def length(self):
+        return self.size
+
+    def append(self, s):
+        if (self.count >= LAZY_MIN_PIECES and
+                self.size < self.count * LAZY_MIN_PIECE_SIZE):
+            return lazy_concat(self.flatten(), s)
+        pieces = self.pieces
+        if len(pieces) != self.count:
+            # somebody else appended to this LazyConcat already
+            pieces = pieces[:self.count]
+        pieces.append(s)
+        return LazyConcat(pieces, self.count + 1, self.size + len(s))
+
+    def flatten(self):
+        builder = StringBuilder(self.size)
+        for i in range(self.count):
+            builder.append(self.pieces[i])
+        return builder.build()
+
+
+def lazy_concat(s1, s2):
+    return LazyConcat([s1, s2], 2, len(s1) + len(s2))
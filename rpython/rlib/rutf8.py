@@ -24,7 +24,12 @@ from rpython.rlib.signature import signature, finishsigs
 from rpython.rlib.types import char, none
 from rpython.rlib.rarithmetic import r_uint
 from rpython.rlib.unicodedata import unicodedb
-from rpython.rtyper.lltypesystem import lltype, rffi
+from rpython.rtyper.lltypesystem import lltype, llmemory, rffi
+from rpython.rtyper.lltypesystem.lloperation import llop
+from rpython.rtyper.lltypesystem.rstr import STR
+from rpython.rtyper.annlowlevel import llstr
+from rpython.rlib import rawstorage
+from rpython.rlib.fastutf8 import capi as fastutf8
 
 # We always use MAXUNICODE = 0x10ffff when unicode objects use utf8
 MAXUNICODE = 0x10ffff
@@ -249,6 +254,11 @@ def check_ascii(s):
 
 @jit.elidable
 def first_non_ascii_char(s):
+    if _fastutf8_enabled(0, len(s)):
+        res = _fastutf8_ascii_prefix(s)
+        if res == len(s):
+            return -1
+        return res
     for i in range(len(s)):
         if ord(s[i]) > 0x7F:
             return i
@@ -367,14 +377,65 @@ def get_utf8_length(s, start=0, end=-1):
     """
     return check_utf8(s, True, start, end)
 
+# Strings shorter than this are handled in RPython: calling the C kernel
+# (and making sure that the string does not move) costs more than it saves
+FASTUTF8_MIN_LENGTH = 16
+# tests set this to True to use the C kernels before translation
+_fastutf8_untranslated = False
+
+def _fastutf8_enabled(start, end):
+    if end - start < FASTUTF8_MIN_LENGTH:
+        return False
+    return we_are_translated() or _fastutf8_untranslated
+
+def _fastutf8_count(s, start, end):
+    """Count the codepoints in s[start:end] with the fastutf8 kernel that
+    was selected for this CPU (SSE4.1, AVX2 or scalar).  Returns -1 if
+    this part of 's' is invalid utf-8 or contains surrogates; the caller
+    must then fall back to the RPython version.
+    """
+    assert s is not None
+    with rffi.scoped_nonmovingbuffer(s) as p:
+        return fastutf8.count_utf8_codepoints_in_buffer(
+            rffi.ptradd(p, start), end - start)
+
+def _fastutf8_ascii_prefix(s):
+    assert s is not None
+    with rffi.scoped_nonmovingbuffer(s) as p:
+        return fastutf8.ascii_prefix_in_buffer(p, len(s))
+
+@specialize.arg(0)
+def _fastutf8_transcode(kernel, s, start, end, size, *args):
+    """Convert s[start:end] into a new string of at most 'size' bytes with
+    one of the transcoding kernels of fastutf8.  Returns None if the kernel
+    gave up; the caller must then fall back to the RPython version.
+    """
+    assert s is not None
+    assert 0 <= start <= end
+    with rffi.scoped_nonmovingbuffer(s) as p:
+        with rffi.scoped_alloc_buffer(size) as buf:
+            res = kernel(rffi.ptradd(p, start), end - start, buf.raw, *args)
+            if res < 0:
+                return None
+            return buf.str(res)
+
 @jit.elidable
 def _check_utf8(s, allow_surrogates, start, stop):
-    pos = start
-    continuation_bytes = 0
     if stop < 0:
         end = len(s)
     else:
         end = stop
+    if _fastutf8_enabled(start, end):
+        res = _fastutf8_count(s, start, end)
+        if res >= 0:
+            return res
+        # either an error, whose position is computed below, or
+        # surrogates, which may be allowed
+    return _check_utf8_slowpath(s, allow_surrogates, start, end)
+
+def _check_utf8_slowpath(s, allow_surrogates, start, end):
+    pos = start
+    continuation_bytes = 0
     while pos < end:
         ordch1 = ord(s[pos])
         pos += 1
@@ -477,6 +538,11 @@ def codepoints_in_utf8(value, start=0, end=sys.maxint):
     if end > len(value):
         end = len(value)
     assert 0 <= start <= end
+    if _fastutf8_enabled(start, end):
+        res = _fastutf8_count(value, start, end)
+        if res >= 0:
+            return res
+        # surrogates: count them below
     length = 0
     for i in range(start, end):
         # we want to count the number of chars not between 0x80 and 0xBF;
@@ -497,44 +563,102 @@ def surrogate_in_utf8(value):
     return -1
 
 
-UTF8_INDEX_STORAGE = lltype.GcArray(lltype.Struct('utf8_loc_elem',
+UTF8_INDEX_BLOCKS = lltype.GcArray(lltype.Struct('utf8_loc_elem',
         ('baseindex', lltype.Signed),
         ('ofs', lltype.FixedSizeArray(lltype.Char, 16)),
     ))
 
+# The index storage is filled lazily: a block describes 64 codepoints, and
+# blocks are only computed up to the highest index (or byte position) that
+# was asked for.  'nextbase' is the byte position of the first codepoint of
+# the block number 'count', i.e. where the computation resumes.
+# 'lastindex' and 'lastpos' are a cursor, see codepoint_position_near_cursor.
+UTF8_INDEX_STORAGE = lltype.GcStruct('utf8_index_storage',
+        ('length', lltype.Signed),      # in codepoints
+        ('count', lltype.Signed),       # number of blocks computed so far
+        ('nextbase', lltype.Signed),
+        ('blocks', lltype.Ptr(UTF8_INDEX_BLOCKS)),
+        ('lastindex', lltype.Signed),
+        ('lastpos', lltype.Signed),
+    )
+
+# never allocate less than this number of blocks
+UTF8_INDEX_MIN_BLOCKS = 8
+
 def null_storage():
     return lltype.nullptr(UTF8_INDEX_STORAGE)
 
+@jit.dont_look_inside
 def create_utf8_index_storage(utf8, utf8len):
     """ Create an index storage which stores index of each 4th character
-    in utf8 encoded unicode string.
+    in utf8 encoded unicode string.  Nothing is computed here: the
+    functions reading the storage compute it incrementally, only as far as
+    they need to.  The storage must only be used with the same 'utf8'.
     """
-    arraysize = utf8len // 64 + 1
-    storage = lltype.malloc(UTF8_INDEX_STORAGE, arraysize)
-    baseindex = 0
-    current = 0
-    while True:
-        storage[current].baseindex = baseindex
+    storage = lltype.malloc(UTF8_INDEX_STORAGE)
+    storage.length = utf8len
+    storage.count = 0
+    storage.nextbase = 0
+    storage.blocks = lltype.malloc(UTF8_INDEX_BLOCKS, 0)
+    storage.lastindex = 0
+    storage.lastpos = 0
+    return storage
+
+def _index_storage_total_blocks(storage):
+    return storage.length // 64 + 1
+
+def _index_storage_complete(storage):
+    return storage.count == _index_storage_total_blocks(storage)
+
+@always_inline
+def _ensure_index_storage(utf8, storage, current):
+    """ Make sure that the block number 'current' is computed. """
+    if current >= storage.count:
+        _extend_index_storage(utf8, storage, current + 1)
+
+def _grow_index_storage(storage, newcount):
+    blocks = storage.blocks
+    newsize = max(max(len(blocks) * 2, newcount), UTF8_INDEX_MIN_BLOCKS)
+    newsize = min(newsize, _index_storage_total_blocks(storage))
+    newblocks = lltype.malloc(UTF8_INDEX_BLOCKS, newsize)
+    for i in range(storage.count):
+        newblocks[i].baseindex = blocks[i].baseindex
+        for j in range(16):
+            newblocks[i].ofs[j] = blocks[i].ofs[j]
+    storage.blocks = newblocks
+
+@dont_inline
+def _extend_index_storage(utf8, storage, newcount):
+    """ Compute the blocks up to (excluding) 'newcount'. """
+    total = _index_storage_total_blocks(storage)
+    if newcount > total:
+        newcount = total
+    if newcount > len(storage.blocks):
+        _grow_index_storage(storage, newcount)
+    blocks = storage.blocks
+    current = storage.count
+    baseindex = storage.nextbase
+    utf8len = storage.length - (current << 6)  # codepoints left from here
+    while current < newcount:
+        blocks[current].baseindex = baseindex
         next = baseindex
         for i in range(16):
             if utf8len == 0:
                 next += 1      # assume there is an extra '\x00' character
             else:
                 next = next_codepoint_pos(utf8, next)
-            storage[current].ofs[i] = chr(next - baseindex)
+            blocks[current].ofs[i] = chr(next - baseindex)
             utf8len -= 4
             if utf8len < 0:
-                assert current + 1 == len(storage)
+                assert current + 1 == total
                 break
             next = next_codepoint_pos(utf8, next)
             next = next_codepoint_pos(utf8, next)
             next = next_codepoint_pos(utf8, next)
-        else:
-            current += 1
-            baseindex = next
-            continue
-        break
-    return storage
+        current += 1
+        baseindex = next
+    storage.count = current
+    storage.nextbase = baseindex
 
 @jit.elidable
 def codepoint_position_at_index(utf8, storage, index):
@@ -544,8 +668,10 @@ def codepoint_position_at_index(utf8, storage, index):
     this function.
     """
     current = index >> 6
-    ofs = ord(storage[current].ofs[(index >> 2) & 0x0F])
-    bytepos = storage[current].baseindex + ofs
+    _ensure_index_storage(utf8, storage, current)
+    blocks = storage.blocks
+    ofs = ord(blocks[current].ofs[(index >> 2) & 0x0F])
+    bytepos = blocks[current].baseindex + ofs
     index &= 0x3
     if index == 0:
         return prev_codepoint_pos(utf8, bytepos)
@@ -557,6 +683,48 @@ def codepoint_position_at_index(utf8, storage, index):
     else:
         return next_codepoint_pos(utf8, next_codepoint_pos(utf8, bytepos))
 
+# how many codepoints codepoint_position_near_cursor() walks at most,
+# instead of using the table
+CURSOR_MAX_WALK = 8
+
+@jit.unroll_safe
+@always_inline
+def codepoint_position_near_cursor(utf8, storage, index):
+    """ Like codepoint_position_at_index(), but first looks at the index
+    that was last asked for with this function: if 'index' is at most
+    CURSOR_MAX_WALK codepoints before or after it, walk from there.  This
+    makes loops like 'for i in range(len(u)): u[i]', or going backward, or
+    with a small step, cost O(1) per index.  This is not elidable on
+    purpose: the JIT sees the cursor and, in such loops, only the
+    walk in the utf8 string remains.
+    """
+    lastindex = storage.lastindex
+    pos = storage.lastpos
+    delta = index - lastindex
+    if 0 <= delta <= CURSOR_MAX_WALK:
+        while delta > 0:
+            pos = next_codepoint_pos(utf8, pos)
+            delta -= 1
+    elif -CURSOR_MAX_WALK <= delta < 0:
+        while delta < 0:
+            pos = prev_codepoint_pos(utf8, pos)
+            delta += 1
+    else:
+        pos = codepoint_position_at_index(utf8, storage, index)
+    assert pos >= 0
+    storage.lastindex = index
+    storage.lastpos = pos
+    return pos
+
+@always_inline
+def move_cursor(storage, index, bytepos):
+    """ Move the cursor used by codepoint_position_near_cursor() to
+    'index', which the caller knows is at 'bytepos', for example because
+    it just found something there.
+    """
+    storage.lastindex = index
+    storage.lastpos = bytepos
+
 def _pos_at_index(utf8, index):
     # Slow!
     pos = 0
@@ -570,8 +738,10 @@ def codepoint_at_index(utf8, storage, index):
     storage of type UTF8_INDEX_STORAGE
     """
     current = index >> 6
-    ofs = ord(storage[current].ofs[(index >> 2) & 0x0F])
-    bytepos = storage[current].baseindex + ofs
+    _ensure_index_storage(utf8, storage, current)
+    blocks = storage.blocks
+    ofs = ord(blocks[current].ofs[(index >> 2) & 0x0F])
+    bytepos = blocks[current].baseindex + ofs
     index &= 0x3
     if index == 0:
         return codepoint_before_pos(utf8, bytepos)
@@ -592,16 +762,20 @@ def codepoint_index_at_byte_position(utf8, storage, bytepos):
     """
     if bytepos < 0:
         return bytepos
+    # compute the blocks until one starts after 'bytepos'
+    while storage.nextbase <= bytepos and not _index_storage_complete(storage):
+        _extend_index_storage(utf8, storage, storage.count * 2 + 1)
+    blocks = storage.blocks
     index_min = 0
-    index_max = len(storage) - 1
+    index_max = storage.count - 1
     while index_min < index_max:
         index_middle = (index_min + index_max + 1) // 2
-        base_bytepos = storage[index_middle].baseindex
+        base_bytepos = blocks[index_middle].baseindex
         if bytepos < base_bytepos:
             index_max = index_middle - 1
         else:
             index_min = index_middle
-    bytepos1 = storage[index_min].baseindex
+    bytepos1 = blocks[index_min].baseindex
     result = index_min << 6
     while bytepos1 < bytepos:
         bytepos1 = next_codepoint_pos(utf8, bytepos1)
@@ -824,6 +998,79 @@ class Utf8StringPosIterator(object):
         return (self.it.next(), pos)
 
 
+# ____________________________________________________________
+# Word-at-a-time helpers, to handle runs of ASCII characters WORD_SIZE
+# bytes at a time.  A "word" is an r_uint loaded from a string with
+# load_word().  The words are loaded from unaligned positions, so the
+# callers should only use these helpers if WORD_AT_A_TIME is True.
+
+WORD_SIZE = rffi.sizeof(lltype.Unsigned)
+WORD_AT_A_TIME = rawstorage.misaligned_is_fine
+_BYTE_ONES = r_uint(-1) // r_uint(0xff)        # 0x0101...01
+_BYTE_HIGHS = _BYTE_ONES * r_uint(0x80)        # 0x8080...80
+_STR_CHARS_OFS = (llmemory.offsetof(STR, 'chars') +
+                  llmemory.itemoffsetof(STR.chars, 0))
+
+@always_inline
+def load_word(s, pos):
+    """ Return the WORD_SIZE bytes of 's' starting at 'pos', in the
+    machine's byte order.  The caller must check that
+    pos + WORD_SIZE <= len(s).
+    """
+    if not we_are_translated():
+        return _load_word_emulated(s, pos)
+    lls = lltype.cast_opaque_ptr(llmemory.GCREF, llstr(s))
+    return llop.gc_load_indexed(lltype.Unsigned, lls, pos,
+                                llmemory.sizeof(lltype.Char), _STR_CHARS_OFS)
+
+def _load_word_emulated(s, pos):
+    word = r_uint(0)
+    for i in range(WORD_SIZE):
+        if sys.byteorder == 'little':
+            shift = i * 8
+        else:
+            shift = (WORD_SIZE - 1 - i) * 8
+        word |= r_uint(ord(s[pos + i])) << shift
+    return word
+
+@always_inline
+def word_is_ascii(word):
+    return word & _BYTE_HIGHS == 0
+
+@always_inline
+def ascii_range_mask(word, lo, hi):
+    """ For a word containing only ASCII bytes, return a word where the
+    bytes whose value is in range(lo, hi + 1) are 0x80, and the other
+    bytes are 0.  No addition can carry over to the next byte.
+    """
+    above_lo = word + _BYTE_ONES * r_uint(0x80 - lo)
+    above_hi = word + _BYTE_ONES * r_uint(0x7f - hi)
+    return above_lo & ~above_hi & _BYTE_HIGHS
+
+@always_inline
+def ascii_word_upper_mask(word):
+    """ 0x80 in the bytes of 'word' that are 'A'-'Z' """
+    return ascii_range_mask(word, ord('A'), ord('Z'))
+
+@always_inline
+def ascii_word_lower_mask(word):
+    """ 0x80 in the bytes of 'word' that are 'a'-'z' """
+    return ascii_range_mask(word, ord('a'), ord('z'))
+
+@always_inline
+def ascii_word_control_mask(word):
+    """ 0x80 in the bytes of 'word' that are <= ' '.  All the ASCII
+    whitespace and linebreak characters are in this range.
+    """
+    return ascii_range_mask(word, 0, ord(' '))
+
+@always_inline
+def ascii_word_is_plain(word):
+    """ True if 'word' contains only ASCII characters above ' ', which
+    are never whitespaces nor linebreaks.
+    """
+    return word_is_ascii(word) and not ascii_word_control_mask(word)
+
 def decode_latin_1(s):
     if len(s) == 0:
         return s
@@ -836,6 +1083,11 @@ def decode_latin_1(s):
         return _decode_latin_1_slowpath(s)
 
 def _decode_latin_1_slowpath(s):
+    if _fastutf8_enabled(0, len(s)):
+        res = _fastutf8_transcode(fastutf8.latin1_to_utf8, s, 0, len(s),
+                                  2 * len(s))
+        if res is not None:
+            return res
     res = StringBuilder(len(s))
     i = 0
     while i < len(s):
@@ -852,6 +1104,52 @@ def _decode_latin_1_slowpath(s):
             i = end
     return res.build()
 
+# The following functions convert between utf-8 and other encodings with
+# the fastutf8 kernels.  They return None if the string needs an error
+# handler or has surrogates, and also if it is too short to be worth
+# calling the kernel: the caller must then use its general implementation.
+
+def encode_latin_1_fast(s):
+    """ Return the latin-1 version of the utf-8 string 's'.
+    """
+    if not _fastutf8_enabled(0, len(s)):
+        return None
+    return _fastutf8_transcode(fastutf8.utf8_to_latin1, s, 0, len(s), len(s))
+
+def decode_utf16_fast(s, start, end, big_endian):
+    """ Return the utf-8 version of the utf-16 data in s[start:end],
+    whose length must be even.
+    """
+    if not _fastutf8_enabled(start, end):
+        return None
+    return _fastutf8_transcode(fastutf8.utf16_to_utf8, s, start, end,
+                               (end - start) // 2 * 3, big_endian)
+
+def encode_utf16_fast(s, big_endian):
+    """ Return the utf-16 version of the utf-8 string 's', without BOM.
+    """
+    if not _fastutf8_enabled(0, len(s)):
+        return None
+    return _fastutf8_transcode(fastutf8.utf8_to_utf16, s, 0, len(s),
+                               2 * len(s), big_endian)
+
+def decode_utf32_fast(s, start, end, big_endian):
+    """ Return the utf-8 version of the utf-32 data in s[start:end],
+    whose length must be a multiple of 4.
+    """
+    if not _fastutf8_enabled(start, end):
+        return None
+    return _fastutf8_transcode(fastutf8.utf32_to_utf8, s, start, end,
+                               end - start, big_endian)
+
+def encode_utf32_fast(s, big_endian):
+    """ Return the utf-32 version of the utf-8 string 's', without BOM.
+    """
+    if not _fastutf8_enabled(0, len(s)):
+        return None
+    return _fastutf8_transcode(fastutf8.utf8_to_utf32, s, 0, len(s),
+                               4 * len(s), big_endian)
+
 # ____________________________________________________________
 # MBCS codecs for Windows
 
@@ -859,3 +859,50 @@ def test_decode_utf8():
 def test_multiply_result_needs_no_rebalancing():
     r1 = multiply(LiteralStringNode("s"), 2**31 - 2)
     assert r1.rebalance() is r1
+
+def test_lazy_concat():
+    c = lazy_concat("ab", "cd")
+    assert c.length() == 4
+    c1 = c.append("e")
+    c2 = c1.append("fg")
+    assert c2.pieces is c.pieces        # the list is reused
+    assert c2.flatten() == "abcdefg"
+    assert c1.flatten() == "abcde"
+    assert c.flatten() == "abcd"
+    # appending to an older LazyConcat copies the list
+    c3 = c1.append("x")
+    assert c3.pieces is not c.pieces
+    assert c3.flatten() == "abcdex"
+    assert c2.flatten() == "abcdefg"
+    assert c3.length() == 6
+
+def test_lazy_concat_small_pieces():
+    c = lazy_concat("a" * 100, "b")
+    for i in range(LAZY_MIN_PIECES - 2):
+        c = c.append("c")
+    assert c.count == LAZY_MIN_PIECES
+    # too many small pieces: the next append flattens them into one
+    c1 = c.append("d")
+    assert c1.count == 2
+    assert c1.pieces[0] == c.flatten()
+    assert c1.flatten() == "a" * 100 + "b" + "c" * (LAZY_MIN_PIECES - 2) + "d"
+    assert c1.length() == c.length() + 1
+    # large pieces are kept as they are
+    c = lazy_concat("a" * LAZY_MIN_PIECE_SIZE, "b" * LAZY_MIN_PIECE_SIZE)
+    for i in range(LAZY_MIN_PIECES):
+        c = c.append("c" * LAZY_MIN_PIECE_SIZE)
+    assert c.count == LAZY_MIN_PIECES + 2
+    assert c.flatten() == ("a" * LAZY_MIN_PIECE_SIZE +
+                           "b" * LAZY_MIN_PIECE_SIZE +
+                           "c" * (LAZY_MIN_PIECE_SIZE * LAZY_MIN_PIECES))
+
+def test_lazy_concat_translated():
+    from rpython.translator.c.test.test_genc import compile
+    def f(n):
+        c = lazy_concat("x", "y")
+        for i in range(n):
+            c = c.append(str(i))
+        s = c.flatten()
+        return len(s) * 1000 + c.length() + ord(s[-1])
+    fc = compile(f, [int])
+    assert fc(100) == f(100)
@@ -141,6 +141,60 @@ def test_codepoint_index_at_byte_position(u):
                        u.encode('utf8'), storage, bytepos) == i
 
 
+def test_utf8_index_storage_is_lazy():
+    u = u'\xe4' * 100000
+    utf8 = u.encode('utf8')
+    storage = rutf8.create_utf8_index_storage(utf8, len(u))
+    assert storage.count == 0
+    assert rutf8.codepoint_position_at_index(utf8, storage, 10) == 20
+    assert storage.count == 1
+    assert len(storage.blocks) == rutf8.UTF8_INDEX_MIN_BLOCKS
+    assert rutf8.codepoint_position_at_index(utf8, storage, 5000) == 10000
+    assert storage.count == 5000 // 64 + 1
+    assert len(storage.blocks) < 2 * storage.count
+    # going back does not compute anything more
+    assert rutf8.codepoint_at_index(utf8, storage, 3) == 0xe4
+    assert storage.count == 5000 // 64 + 1
+    assert rutf8.codepoint_index_at_byte_position(utf8, storage, 30000) == 15000
+    assert 15000 // 64 < storage.count < 2 * (15000 // 64 + 1)
+    assert rutf8.codepoint_position_at_index(utf8, storage, 100000) == 200000
+    assert storage.count == len(storage.blocks) == 100000 // 64 + 1
+
+@given(strategies.text(), strategies.lists(strategies.integers(0, 1000)))
+def test_utf8_index_storage_any_order(u, indexes):
+    utf8 = u.encode('utf8')
+    storage = rutf8.create_utf8_index_storage(utf8, len(u))
+    for i in indexes:
+        i = i % (len(u) + 1)
+        assert (rutf8.codepoint_position_at_index(utf8, storage, i) ==
+                len(u[:i].encode('utf8')))
+        bytepos = len(u[:i].encode('utf8'))
+        assert rutf8.codepoint_index_at_byte_position(
+                       utf8, storage, bytepos) == i
+
+
+@given(strategies.text(), strategies.lists(strategies.integers(-20, 20)))
+def test_codepoint_position_near_cursor(u, deltas):
+    utf8 = u.encode('utf8')
+    storage = rutf8.create_utf8_index_storage(utf8, len(u))
+    i = 0
+    for delta in deltas:
+        i = (i + delta) % (len(u) + 1)
+        assert (rutf8.codepoint_position_near_cursor(utf8, storage, i) ==
+                len(u[:i].encode('utf8')))
+        assert storage.lastindex == i
+
+def test_codepoint_position_near_cursor_does_not_use_table():
+    u = u'\u1234' * 1000
+    utf8 = u.encode('utf8')
+    storage = rutf8.create_utf8_index_storage(utf8, len(u))
+    for i in range(len(u) + 1):
+        assert rutf8.codepoint_position_near_cursor(utf8, storage, i) == 3 * i
+    for i in range(len(u), -1, -3):
+        assert rutf8.codepoint_position_near_cursor(utf8, storage, i) == 3 * i
+    assert storage.count == 0
+
+
 repr_func = rutf8.make_utf8_escape_function(prefix='u', pass_printable=False,
                                             quotes=True)
 
@@ -225,3 +279,25 @@ def test_utf8_iterator_pos(arg):
         assert pos == i
         i = rutf8.next_codepoint_pos(utf8s, i)
     assert list(arg) == l
+
+@given(strategies.binary(min_size=rutf8.WORD_SIZE,
+                         max_size=rutf8.WORD_SIZE))
+def test_load_word(s):
+    word = rutf8.load_word(s, 0)
+    assert rutf8.word_is_ascii(word) == all(c < '\x80' for c in s)
+    if rutf8.word_is_ascii(word):
+        upper = rutf8.ascii_word_upper_mask(word)
+        lower = rutf8.ascii_word_lower_mask(word)
+        expected_upper = ''.join(['\x80' if c.isupper() else '\x00'
+                                  for c in s])
+        expected_lower = ''.join(['\x80' if c.islower() else '\x00'
+                                  for c in s])
+        assert upper == rutf8.load_word(expected_upper, 0)
+        assert lower == rutf8.load_word(expected_lower, 0)
+        expected_control = ''.join(['\x80' if c <= ' ' else '\x00'
+                                    for c in s])
+        assert (rutf8.ascii_word_control_mask(word) ==
+                rutf8.load_word(expected_control, 0))
+        assert rutf8.ascii_word_is_plain(word) == all(c > ' ' for c in s)
+    else:
+        assert not rutf8.ascii_word_is_plain(word)
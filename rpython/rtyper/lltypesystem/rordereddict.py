@@ -1390,7 +1390,9 @@ def _make_ll_keys_values_items(kind):
         assert p == res.ll_length()
         return res
     ll_kvi.oopspec = 'odict.%s(dic)' % kind
-    return ll_kvi
+    # if 'dic' is virtual, look inside: the loop is unrolled and the
+    # result is built from the virtual entries, instead of forcing 'dic'
+    return jit.look_inside_iff(lambda LIST, dic: jit.isvirtual(dic))(ll_kvi)
 
 ll_dict_keys   = _make_ll_keys_values_items('keys')
 ll_dict_values = _make_ll_keys_values_items('values')
@@ -1912,6 +1912,81 @@ class TestIncrementalMiniMarkGC(TestMiniMarkGC):
     def test_total_gc_time(self):
         res = self.run("total_gc_time")
         assert res > 0 # should take a few microseconds
+
+    def define_parallel_marking(cls):
+        class Node(object):
+            def __init__(self, next, value):
+                self.next = next
+                self.value = value
+        def f():
+            chains = []
+            for i in range(300):
+                node = None
+                for j in range(500):
+                    node = Node(node, j)
+                    Node(None, -1)     # garbage
+                chains.append(node)
+                if i % 100 == 0:
+                    rgc.collect()
+            rgc.collect()
+            total = 0
+            for node in chains:
+                while node is not None:
+                    total += node.value
+                    node = node.next
+            return total
+        return f
+
+    def test_parallel_marking(self, monkeypatch):
+        monkeypatch.setenv('PYPY_GC_MARK_THREADS', '4')
+        res = self.run("parallel_marking")
+        assert res == 300 * sum(range(500))
+
+    def define_parallel_marking_fork(cls):
+        class Node(object):
+            def __init__(self, next, value):
+                self.next = next
+                self.value = value
+        def build(chains):
+            for i in range(100):
+                node = None
+                for j in range(500):
+                    node = Node(node, j)
+                    Node(None, -1)     # garbage
+                chains.append(node)
+            rgc.collect()
+        def total(chains):
+            result = 0
+            for node in chains:
+                while node is not None:
+                    result += node.value
+                    node = node.next
+            return result
+        chain_total = sum(range(500))
+        def f():
+            chains = []
+            build(chains)       # starts the marking threads
+            pid = os.fork()
+            if pid == 0:
+                # the child has no marking thread until the next step
+                build(chains)
+                build(chains)
+                if total(chains) != 300 * chain_total:
+                    os._exit(1)
+                os._exit(0)
+            build(chains)
+            pid1, status = os.waitpid(pid, 0)
+            if total(chains) != 200 * chain_total:
+                return -1
+            return os.WEXITSTATUS(status)
+        return f
+
+    def test_parallel_marking_fork(self, monkeypatch):
+        if not hasattr(os, 'fork'):
+            py.test.skip("requires fork()")
+        monkeypatch.setenv('PYPY_GC_MARK_THREADS', '4')
+        res = self.run("parallel_marking_fork")
+        assert res == 0
 # ____________________________________________________________________
 
 class TaggedPointersTest(object):
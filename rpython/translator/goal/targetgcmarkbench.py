@@ -0,0 +1,100 @@
+"""
+Measures the time spent marking objects during the major collections of
+incminimark, as a function of the heap size.  Translate with:
+
+    rpython -O2 targetgcmarkbench.py
+
+and run the result with the sizes of the heaps to test, in thousands of
+objects, for several values of PYPY_GC_MARK_THREADS:
+
+    for n in 1 2 4 8; do
+        PYPY_GC_MARK_THREADS=$n ./targetgcmarkbench-c 1000 4000 16000
+    done
+
+The heap is a list of binary trees, all alive, so that the marking phase
+visits every object.  The time reported is the best of a few collections,
+measured with the GC hooks on the steps that end the marking phase.
+"""
+import os, time
+from rpython.rlib import rgc
+from rpython.rlib.nonconst import NonConstant
+from rpython.memory.gc.hook import GcHooks
+from rpython.memory.gc.incminimark import STATE_MARKING
+
+TREE_DEPTH = 14
+REPEAT = 5
+
+
+class MarkStats(object):
+    mark_time = 0.0
+
+    def reset(self):
+        # see GcHooksStats in test_transformed_gc.py for the NonConstant
+        self.mark_time = NonConstant(0.0)
+
+
+class MarkTimeHooks(GcHooks):
+
+    def __init__(self, stats):
+        self.stats = stats
+
+    def is_gc_collect_step_enabled(self):
+        return True
+
+    def on_gc_collect_step(self, duration, oldstate, newstate):
+        if oldstate == STATE_MARKING:
+            self.stats.mark_time += duration
+
+
+MARK_STATS = MarkStats()
+
+
+class Node(object):
+    def __init__(self, left, right):
+        self.left = left
+        self.right = right
+
+def make_tree(depth):
+    if depth == 0:
+        return Node(None, None)
+    return Node(make_tree(depth - 1), make_tree(depth - 1))
+
+def build_heap(num_objects):
+    trees = []
+    tree_size = (1 << (TREE_DEPTH + 1)) - 1
+    for i in range(num_objects // tree_size + 1):
+        trees.append(make_tree(TREE_DEPTH))
+    return trees
+
+def bench(num_objects):
+    trees = build_heap(num_objects)
+    rgc.collect()
+    best = -1.0
+    total_start = time.time()
+    for i in range(REPEAT):
+        MARK_STATS.reset()
+        rgc.collect()
+        if best < 0.0 or MARK_STATS.mark_time < best:
+            best = MARK_STATS.mark_time
+    total = (time.time() - total_start) / REPEAT
+    print '%d objects: marking %d us, whole collection %d us' % (
+        len(trees) * ((1 << (TREE_DEPTH + 1)) - 1), int(best * 1000000.0),
+        int(total * 1000000.0))
+    return trees
+
+def entry_point(argv):
+    if len(argv) < 2:
+        print 'usage: %s size-in-thousands-of-objects...' % (argv[0],)
+        return 2
+    threads = os.environ.get('PYPY_GC_MARK_THREADS')
+    print 'PYPY_GC_MARK_THREADS=%s' % (threads or '1',)
+    for arg in argv[1:]:
+        trees = bench(int(arg) * 1000)
+        trees = None
+    return 0
+
+def get_gchooks():
+    return MarkTimeHooks(MARK_STATS)
+
+def target(*args):
+    return entry_point, None
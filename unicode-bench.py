@@ -41,6 +41,15 @@ def find(main_l):
     for i in xrange(RANGE):
         l[0] = main_l[i % 100].find(u"foo")
 
+def find_loop(main_l):
+    l = [None]
+    for i in xrange(RANGE // 1000):
+        u = main_l[i % 100]
+        pos = u.find(u"u")
+        while pos >= 0:
+            pos = u.find(u"u", pos + 1)
+        l[0] = pos
+
 def split(main_l):
     l = [None]
     for i in xrange(RANGE):
@@ -62,6 +71,39 @@ def indexing(main_l):
     for i in xrange(RANGE * 10):
         l[0] = main_l[i % 100][13]
 
+def indexing_forward(main_l):
+    l = [None]
+    for i in xrange(RANGE // 1000):
+        u = main_l[i % 100]
+        for j in xrange(len(u)):
+            l[0] = u[j]
+
+def indexing_backward(main_l):
+    l = [None]
+    for i in xrange(RANGE // 1000):
+        u = main_l[i % 100]
+        for j in xrange(len(u) - 1, -1, -1):
+            l[0] = u[j]
+
+def indexing_strided(main_l):
+    l = [None]
+    for i in xrange(RANGE // 1000):
+        u = main_l[i % 100]
+        for j in xrange(0, len(u), 3):
+            l[0] = u[j]
+
+log_lines = [u"2018-03-%02d 12:00:%02d GET /caf\xe9/index-%d.html 200 "
+             u"Mozilla/5.0 (X11; Linux x86_64)" % (i % 28 + 1, i % 60, i)
+             for i in range(100)]
+
+def log_parsing(main_l):
+    l = [None]
+    for i in xrange(RANGE // 10):
+        line = main_l[i % 100]
+        rest = line[20:]
+        if rest[:4] == u"GET ":
+            l[0] = rest[4:].strip()
+
 def isspace(main_l):
     l = [None]
     for i in xrange(RANGE // 10000):
@@ -75,3 +117,15 @@ for func in [isspace]:#, lower, isupper, islower]:
     #func(non_ascii_unicodes)
     #t2 = time.time()
     #print "non-ascii %s %.2f" % (func.__name__, t2 - t1)
+
+for func in [indexing_forward, indexing_backward, indexing_strided,
+             find_loop]:
+    t0 = time.time()
+    func(non_ascii_unicodes)
+    t1 = time.time()
+    print "non-ascii %s %.2f" % (func.__name__, t1 - t0)
+
+t0 = time.time()
+log_parsing(log_lines)
+t1 = time.time()
+print "non-ascii log_parsing %.2f" % (t1 - t0)